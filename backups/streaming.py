@@ -0,0 +1,268 @@
+import os
+import re
+import struct
+import time
+import zlib
+import logging
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+CRC_CACHE_TIMEOUT = 60 * 60 * 24
+
+ZIP32_LIMIT = 0xFFFFFFFF
+ZIP64_VERSION = 45
+ZIP_VERSION = 20
+FLAG_DATA_DESCRIPTOR = 0x08
+FLAG_UTF8 = 0x800
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def parse_range_header(header, size):
+    """
+    Parse a single-range ``Range`` header against a resource of ``size`` bytes.
+
+    Returns ``None`` when no (usable) range was requested, ``(start, end)``
+    with an inclusive end for a satisfiable range, and raises ``ValueError``
+    when the range cannot be satisfied.
+    """
+    if not header:
+        return None
+
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        # Multi-range and malformed headers are ignored, the full body is sent
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError('Unsatisfiable range')
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError('Unsatisfiable range')
+    return start, min(end, size - 1)
+
+
+def iter_file_range(file_path, start, end, chunk_size=CHUNK_SIZE):
+    """Yield bytes ``start``..``end`` (inclusive) of a file in chunks"""
+    remaining = end - start + 1
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        while remaining > 0:
+            data = f.read(min(chunk_size, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+
+
+def _dos_datetime(timestamp):
+    t = time.localtime(timestamp)
+    year = max(t.tm_year, 1980)
+    dos_date = ((year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    return dos_time, dos_date
+
+
+class ZipMember:
+    """A file on disk that is stored (uncompressed) inside the streamed archive"""
+
+    def __init__(self, path, arcname):
+        stat = os.stat(path)
+        self.path = path
+        self.arcname = arcname.encode('utf-8')
+        self.size = stat.st_size
+        self.mtime = stat.st_mtime
+        self.dos_time, self.dos_date = _dos_datetime(stat.st_mtime)
+        self.offset = 0
+        self.crc = None
+
+    @property
+    def crc_cache_key(self):
+        return f"backup_zip_crc_{self.path}_{self.size}_{int(self.mtime)}"
+
+    def get_crc(self):
+        """Return the CRC32 of the member, reading the file only if unknown"""
+        if self.crc is None:
+            self.crc = cache.get(self.crc_cache_key)
+        if self.crc is None:
+            crc = 0
+            for chunk in iter_file_range(self.path, 0, self.size - 1) if self.size else ():
+                crc = zlib.crc32(chunk, crc)
+            self.set_crc(crc)
+        return self.crc
+
+    def set_crc(self, crc):
+        self.crc = crc & 0xFFFFFFFF
+        cache.set(self.crc_cache_key, self.crc, CRC_CACHE_TIMEOUT)
+
+
+class ZipStream:
+    """
+    Deterministic, uncompressed (ZIP_STORED) zip archive built on the fly.
+
+    The backup members are already compressed (``.json.gz`` / ``.zip``), so
+    storing them keeps the byte layout of the archive fully predictable from
+    the file sizes alone. That gives an exact ``Content-Length`` before any
+    data is read and allows serving arbitrary byte ranges for resumed
+    downloads without ever writing a temporary archive to disk.
+
+    CRCs are written in data descriptors after each member. They are computed
+    while the member is streamed and cached, so a resumed download only needs
+    to re-read a member when its CRC was never computed before.
+    """
+
+    def __init__(self, files):
+        self.members = [ZipMember(path, arcname) for path, arcname in files]
+        self.zip64 = self._estimate_size() >= ZIP32_LIMIT
+        self.segments = []
+        self.size = 0
+        self._build_layout()
+
+    def _estimate_size(self):
+        # Upper bound of the zip32 layout; zip64 records are only ever larger
+        return sum(30 + 46 + 16 + 2 * len(m.arcname) + m.size for m in self.members) + 22
+
+    # ------------------------------------------------------------------
+    # Layout
+    # ------------------------------------------------------------------
+    def _add(self, length, kind, member=None):
+        self.segments.append((self.size, length, kind, member))
+        self.size += length
+
+    def _build_layout(self):
+        for member in self.members:
+            member.offset = self.size
+            self._add(len(self._local_header(member)), 'local_header', member)
+            self._add(member.size, 'data', member)
+            self._add(24 if self.zip64 else 16, 'descriptor', member)
+
+        self.central_directory_offset = self.size
+        self.central_directory_size = sum(len(self._central_header(m, crc=0)) for m in self.members)
+        self._add(self.central_directory_size, 'central_directory')
+        self._add(len(self._end_records()), 'end_records')
+
+    @property
+    def version(self):
+        return ZIP64_VERSION if self.zip64 else ZIP_VERSION
+
+    @property
+    def flags(self):
+        return FLAG_DATA_DESCRIPTOR | FLAG_UTF8
+
+    def _local_header(self, member):
+        extra = b''
+        if self.zip64:
+            # Sizes live in the data descriptor, the extra field only reserves zip64
+            extra = struct.pack('<HHQQ', 0x0001, 16, 0, 0)
+        return struct.pack(
+            '<IHHHHHIIIHH',
+            0x04034B50, self.version, self.flags, 0,
+            member.dos_time, member.dos_date,
+            0, ZIP32_LIMIT if self.zip64 else 0, ZIP32_LIMIT if self.zip64 else 0,
+            len(member.arcname), len(extra),
+        ) + member.arcname + extra
+
+    def _descriptor(self, member):
+        if self.zip64:
+            return struct.pack('<IIQQ', 0x08074B50, member.get_crc(), member.size, member.size)
+        return struct.pack('<IIII', 0x08074B50, member.get_crc(), member.size, member.size)
+
+    def _central_header(self, member, crc):
+        extra = b''
+        size = offset = None
+        if self.zip64:
+            extra = struct.pack('<HHQQQ', 0x0001, 24, member.size, member.size, member.offset)
+            size = offset = ZIP32_LIMIT
+        return struct.pack(
+            '<IHHHHHHIIIHHHHHII',
+            0x02014B50, self.version, self.version, self.flags, 0,
+            member.dos_time, member.dos_date, crc,
+            member.size if size is None else size,
+            member.size if size is None else size,
+            len(member.arcname), len(extra), 0, 0, 0, 0o100644 << 16,
+            member.offset if offset is None else offset,
+        ) + member.arcname + extra
+
+    def _central_directory(self):
+        return b''.join(self._central_header(m, m.get_crc()) for m in self.members)
+
+    def _end_records(self):
+        count = len(self.members)
+        records = b''
+        if self.zip64:
+            zip64_end_offset = self.central_directory_offset + self.central_directory_size
+            records += struct.pack(
+                '<IQHHIIQQQQ',
+                0x06064B50, 44, ZIP64_VERSION, ZIP64_VERSION, 0, 0,
+                count, count, self.central_directory_size, self.central_directory_offset,
+            )
+            records += struct.pack('<IIQI', 0x07064B50, 0, zip64_end_offset, 1)
+            return records + struct.pack(
+                '<IHHHHIIH', 0x06054B50, 0, 0, 0xFFFF, 0xFFFF,
+                ZIP32_LIMIT, ZIP32_LIMIT, 0,
+            )
+        return struct.pack(
+            '<IHHHHIIH', 0x06054B50, 0, 0, count, count,
+            self.central_directory_size, self.central_directory_offset, 0,
+        )
+
+    # ------------------------------------------------------------------
+    # Streaming
+    # ------------------------------------------------------------------
+    @property
+    def etag(self):
+        parts = ';'.join(f"{m.arcname.decode()}:{m.size}:{int(m.mtime)}" for m in self.members)
+        return '"%08x"' % zlib.crc32(parts.encode('utf-8'))
+
+    def _render(self, kind, member):
+        if kind == 'local_header':
+            return self._local_header(member)
+        if kind == 'descriptor':
+            return self._descriptor(member)
+        if kind == 'central_directory':
+            return self._central_directory()
+        return self._end_records()
+
+    def iter_range(self, start=0, end=None):
+        """Yield the archive bytes ``start``..``end`` (inclusive)"""
+        if end is None:
+            end = self.size - 1
+
+        for seg_start, length, kind, member in self.segments:
+            seg_end = seg_start + length - 1
+            if length == 0 or seg_end < start:
+                continue
+            if seg_start > end:
+                break
+
+            lo = max(start, seg_start) - seg_start
+            hi = min(end, seg_end) - seg_start
+
+            if kind == 'data':
+                yield from self._iter_member_data(member, lo, hi)
+            else:
+                yield self._render(kind, member)[lo:hi + 1]
+
+    def _iter_member_data(self, member, lo, hi):
+        # Compute the CRC on the fly when the whole member is streamed
+        whole = lo == 0 and hi == member.size - 1 and member.crc is None
+        crc = 0
+        for chunk in iter_file_range(member.path, lo, hi):
+            if whole:
+                crc = zlib.crc32(chunk, crc)
+            yield chunk
+        if whole:
+            member.set_crc(crc)
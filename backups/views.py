@@ -1,5 +1,5 @@
 from django.shortcuts import render, get_object_or_404
-from django.http import HttpResponse, FileResponse, JsonResponse
+from django.http import HttpResponse, FileResponse, JsonResponse, StreamingHttpResponse
 from django.db.models import Sum, Count, Q
 from django.utils import timezone
 from django.conf import settings
@@ -21,6 +21,7 @@ from .serializers import (
     RestoreLogSerializer, BackupStatsSerializer
 )
 from .services import BackupService, RestoreService, BackupUploadService
+from .streaming import ZipStream, parse_range_header, iter_file_range
 
 import os
 import logging
@@ -191,46 +192,81 @@ class BackupViewSet(viewsets.ModelViewSet):
         if content_type is None:
             content_type = 'application/octet-stream'
         
-        response = FileResponse(
-            open(file_path, 'rb'),
-            content_type=content_type
-        )
+        size = os.path.getsize(file_path)
+        try:
+            byte_range = parse_range_header(self.request.headers.get('Range'), size)
+        except ValueError:
+            return self._range_not_satisfiable(size)
+        
+        if byte_range is None:
+            response = FileResponse(
+                open(file_path, 'rb'),
+                content_type=content_type
+            )
+        else:
+            response = self._partial_response(
+                iter_file_range(file_path, *byte_range), byte_range, size, content_type
+            )
+        response['Accept-Ranges'] = 'bytes'
         response['Content-Disposition'] = f'attachment; filename="{os.path.basename(file_path)}"'
         return response
     
     def _serve_combined_backup(self, backup):
-        """Create and serve a combined backup file"""
-        import tempfile
-        import zipfile
+        """Stream a combined zip of the backup files without a temporary archive"""
+        files = []
+        if backup.database_file and os.path.exists(backup.database_file):
+            files.append((backup.database_file, f"database/{os.path.basename(backup.database_file)}"))
         
-        # Create temporary zip file
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.zip')
+        if backup.media_file and os.path.exists(backup.media_file):
+            files.append((backup.media_file, f"media/{os.path.basename(backup.media_file)}"))
         
         try:
-            with zipfile.ZipFile(temp_file.name, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                if backup.database_file and os.path.exists(backup.database_file):
-                    zipf.write(backup.database_file, f"database/{os.path.basename(backup.database_file)}")
-                
-                if backup.media_file and os.path.exists(backup.media_file):
-                    zipf.write(backup.media_file, f"media/{os.path.basename(backup.media_file)}")
-            
-            response = FileResponse(
-                open(temp_file.name, 'rb'),
-                content_type='application/zip'
-            )
-            response['Content-Disposition'] = f'attachment; filename="{backup.name}_complete.zip"'
-            
-            # Clean up temp file after response (in a real app, you'd want to do this asynchronously)
-            # os.unlink(temp_file.name)
-            
-            return response
-            
-        except Exception as e:
-            os.unlink(temp_file.name)
+            archive = ZipStream(files)
+        except OSError as e:
             return Response(
                 {'error': f'Failed to create combined backup: {str(e)}'}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+        
+        # Only honour the range when it refers to the same archive (If-Range)
+        range_header = self.request.headers.get('Range')
+        if_range = self.request.headers.get('If-Range')
+        if if_range and if_range != archive.etag:
+            range_header = None
+        
+        try:
+            byte_range = parse_range_header(range_header, archive.size)
+        except ValueError:
+            return self._range_not_satisfiable(archive.size)
+        
+        if byte_range is None:
+            response = StreamingHttpResponse(archive.iter_range(), content_type='application/zip')
+            response['Content-Length'] = str(archive.size)
+        else:
+            response = self._partial_response(
+                archive.iter_range(*byte_range), byte_range, archive.size, 'application/zip'
+            )
+        response['Accept-Ranges'] = 'bytes'
+        response['ETag'] = archive.etag
+        response['Content-Disposition'] = f'attachment; filename="{backup.name}_complete.zip"'
+        return response
+    
+    def _partial_response(self, stream, byte_range, size, content_type):
+        """Build a 206 response for a single byte range"""
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            stream,
+            content_type=content_type,
+            status=status.HTTP_206_PARTIAL_CONTENT
+        )
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        return response
+    
+    def _range_not_satisfiable(self, size):
+        response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
     
     @action(detail=False, methods=['post'], parser_classes=[MultiPartParser, FormParser])
     def upload(self, request):
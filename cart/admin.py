@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from .models import Cart, CartItem, SavedItem, Coupon, CouponUsage
+from .totals import cart_items_prefetch
 
 
 class CartItemInline(admin.TabularInline):
@@ -34,6 +35,10 @@ class CartAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+    
+    def get_queryset(self, request):
+        # Totals are computed from the prefetched items
+        return super().get_queryset(request).prefetch_related(cart_items_prefetch())
 
 
 @admin.register(CartItem)
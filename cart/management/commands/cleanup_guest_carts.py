@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from cart.storage import get_cart_storage
+
+
+class Command(BaseCommand):
+    help = 'Delete expired guest carts kept in the database'
+    
+    def handle(self, *args, **options):
+        carts = get_cart_storage().purge_expired()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {carts} expired guest carts'))
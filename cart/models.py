@@ -20,28 +20,43 @@ class Cart(models.Model):
             return f"Cart for {self.user.username}"
         return f"Anonymous cart {self.session_id}"
     
+    def get_totals(self):
+        """
+        Item count, subtotal and weight computed in one pass (see ``cart.totals``),
+        memoized on the instance until its items change
+        """
+        totals = getattr(self, '_totals', None)
+        if totals is None:
+            from .totals import CartTotals
+            totals = self._totals = CartTotals.for_cart(self)
+        return totals
+    
+    def reset_totals(self):
+        self._totals = None
+    
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self.reset_totals()
+    
     @property
     def total_items(self):
         """Total number of items in cart"""
-        return sum(item.quantity for item in self.items.all())
+        return self.get_totals().total_items
     
     @property
     def subtotal(self):
         """Calculate cart subtotal"""
-        return sum(item.total_price for item in self.items.all())
+        return self.get_totals().subtotal
     
     @property
     def total_weight(self):
         """Calculate total weight of cart items"""
-        total = 0
-        for item in self.items.all():
-            if item.product.weight:
-                total += item.product.weight * item.quantity
-        return total
+        return self.get_totals().total_weight
     
     def clear(self):
         """Clear all items from cart"""
         self.items.all().delete()
+        self.reset_totals()
 
 
 class CartItem(models.Model):
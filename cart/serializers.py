@@ -38,11 +38,10 @@ class CartItemSerializer(serializers.ModelSerializer):
             # For URL-based variant images, use image_url property
             return obj.variant.image_url
         elif obj.product:
-            primary_image = obj.product.images.filter(is_primary=True).first()
-            if primary_image:
-                return primary_image.image_url
-            elif obj.product.images.exists():
-                return obj.product.images.first().image_url
+            # Images are ordered primary first and prefetched with the cart items
+            images = list(obj.product.images.all())
+            if images:
+                return images[0].image_url
         return None
     
     def validate_product_id(self, value):
@@ -103,26 +102,42 @@ class CartSerializer(serializers.ModelSerializer):
     
     def get_shipping_summary(self, obj):
         """Get shipping options for this cart"""
-        from .shipping import ShippingCalculator
+        from .totals import CartTotals
         
-        # Get location from request context (default to Dhaka)
-        request = self.context.get('request')
-        location = 'dhaka'
-        if request and hasattr(request, 'GET'):
-            location = request.GET.get('location', 'dhaka').lower()
-        
-        if location not in ['dhaka', 'outside']:
-            location = 'dhaka'
-        
-        cart_items = obj.items.select_related('product').all()
-        if not cart_items:
-            return None
-        
-        shipping_calculator = ShippingCalculator(cart_items, location)
-        return shipping_calculator.get_shipping_summary()
+        # Reuses the items prefetched for the ``items`` field
+        return CartTotals.for_cart(obj).shipping_summary(get_shipping_location(self.context))
         read_only_fields = ('id', 'created_at', 'updated_at')
 
 
+class GuestCartSerializer(serializers.Serializer):
+    """Guest cart (``cart.storage.GuestCart``) with the fields of ``CartSerializer``"""
+    
+    def to_representation(self, guest_cart):
+        totals = guest_cart.get_totals()
+        return {
+            'id': None,
+            'items': CartItemSerializer(totals.items, many=True, context=self.context).data,
+            'total_items': totals.total_items,
+            'subtotal': totals.subtotal,
+            'total_weight': totals.total_weight,
+            'shipping_summary': totals.shipping_summary(get_shipping_location(self.context)),
+            'created_at': None,
+            'updated_at': None,
+        }
+
+
+def get_shipping_location(context):
+    """Get location from request context (default to Dhaka)"""
+    request = context.get('request')
+    location = 'dhaka'
+    if request and hasattr(request, 'GET'):
+        location = request.GET.get('location', 'dhaka').lower()
+    
+    if location not in ['dhaka', 'outside']:
+        location = 'dhaka'
+    return location
+
+
 class AddToCartSerializer(serializers.Serializer):
     """Add to cart serializer"""
     product_id = serializers.IntegerField()
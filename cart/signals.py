@@ -0,0 +1,48 @@
+import logging
+
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from products.models import Product, ProductVariant
+from .models import Cart, CartItem
+from .storage import GuestCart
+from .totals import bump_cart_version, bump_catalog_version, forget_cart_owner
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=CartItem)
+@receiver(post_delete, sender=CartItem)
+def invalidate_cart_summary(sender, instance, **kwargs):
+    """Cached summaries of a cart are keyed by its version"""
+    bump_cart_version(instance.cart_id)
+    if CartItem.cart.is_cached(instance):
+        instance.cart.reset_totals()
+
+
+@receiver(post_delete, sender=Cart)
+def forget_deleted_cart(sender, instance, **kwargs):
+    """Drop the cached owner -> cart lookup so a new cart is picked up"""
+    forget_cart_owner(instance)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+def invalidate_cart_summaries_for_catalog(sender, instance, **kwargs):
+    """Product names, weights and shipping rules are part of every cart summary"""
+    bump_catalog_version()
+
+
+@receiver(user_logged_in)
+def merge_guest_cart(sender, request, user, **kwargs):
+    """Move the cart a visitor built as a guest into their account cart"""
+    if request is None or not hasattr(request, 'session'):
+        return
+    try:
+        GuestCart(request).merge_into(user)
+    except Exception as e:
+        # Never block a login because of the cart
+        logger.error(f"Failed to merge guest cart for {user}: {e}")
@@ -0,0 +1,545 @@
+"""
+Guest cart storage
+
+Carts of anonymous visitors are kept in a pluggable storage backend instead
+of the ``Cart``/``CartItem`` tables, so browsing visitors and bots adding
+products to their cart cause no database writes. A guest cart is written to
+the database only when it is needed there:
+
+- at checkout, where orders are created from ``Cart`` rows
+  (``GuestCart.materialize``)
+- at login, where it is merged into the user's cart (``GuestCart.merge_into``)
+
+Backends (``settings.CART_STORAGE_BACKEND``):
+
+- ``RedisCartStorage``: one Redis hash per cart with a sliding TTL
+- ``SessionCartStorage``: the visitor's own session, for setups without
+  Redis (whose database sessions are never culled); the cart lives as long
+  as the session
+- ``DatabaseCartStorage``: ``Cart``/``CartItem`` rows keyed by the cart
+  token; expired rows are deleted by ``python manage.py cleanup_guest_carts``
+- ``CacheCartStorage``: the Django cache, only for a cache that never culls
+  entries (the database cache evicts them once it is full)
+- ``InMemoryCartStorage``: process-local dict, used by the tests
+
+A cart is a mapping of ``"<product_id>:<variant_id>"`` fields to quantities.
+The guest cart token lives in the session, which survives the session key
+rotation done at login.
+"""
+import functools
+import logging
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models import Prefetch
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+from products.models import Product, ProductVariant, ProductImage
+from .totals import CartTotals, bump_cart_version, get_cart_summary
+
+logger = logging.getLogger(__name__)
+
+GUEST_CART_SESSION_KEY = 'guest_cart'
+GUEST_CART_ROW_SESSION_KEY = 'guest_cart_row'
+DEFAULT_TIMEOUT = 60 * 60 * 24 * 7
+
+# Guest items have no database id; the id exposed to the frontend packs
+# product and variant ids so update/remove URLs keep their integer ids.
+ITEM_ID_SHIFT = 32
+
+
+def make_field(product_id, variant_id=None):
+    return f"{product_id}:{variant_id or 0}"
+
+
+def parse_field(field):
+    product_id, variant_id = field.split(':')
+    return int(product_id), int(variant_id) or None
+
+
+def make_item_id(product_id, variant_id=None):
+    return (product_id << ITEM_ID_SHIFT) | (variant_id or 0)
+
+
+def parse_item_id(item_id):
+    return item_id >> ITEM_ID_SHIFT, (item_id & ((1 << ITEM_ID_SHIFT) - 1)) or None
+
+
+# ----------------------------------------------------------------------
+# Backends
+# ----------------------------------------------------------------------
+class BaseCartStorage:
+    """
+    Stores ``{field: quantity}`` mappings per cart key.
+
+    Subclasses implement ``load``/``store``/``delete``; backends that support
+    atomic updates override the item methods, backends whose entries do not
+    expire on their own override ``purge_expired`` and backends storing carts
+    per request override ``bind``.
+    """
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout or getattr(settings, 'CART_STORAGE_TIMEOUT', DEFAULT_TIMEOUT)
+
+    def load(self, cart_key):
+        raise NotImplementedError
+
+    def store(self, cart_key, items):
+        raise NotImplementedError
+
+    def delete(self, cart_key):
+        raise NotImplementedError
+
+    def bind(self, request):
+        """The storage to use for the cart of ``request``"""
+        return self
+
+    def get_items(self, cart_key):
+        return dict(self.load(cart_key))
+
+    def add_item(self, cart_key, field, quantity):
+        """Add ``quantity`` to an item and return the new quantity"""
+        items = self.load(cart_key)
+        items[field] = items.get(field, 0) + quantity
+        self.store(cart_key, items)
+        return items[field]
+
+    def set_item(self, cart_key, field, quantity):
+        items = self.load(cart_key)
+        items[field] = quantity
+        self.store(cart_key, items)
+
+    def remove_item(self, cart_key, field):
+        items = self.load(cart_key)
+        if items.pop(field, None) is None:
+            return False
+        if items:
+            self.store(cart_key, items)
+        else:
+            self.delete(cart_key)
+        return True
+
+    def clear(self, cart_key):
+        self.delete(cart_key)
+
+    def purge_expired(self):
+        """Delete carts untouched for longer than the timeout, return how many"""
+        return 0
+
+
+class InMemoryCartStorage(BaseCartStorage):
+    """Process-local storage, used as a stand-in for Redis in tests"""
+
+    def __init__(self, timeout=None):
+        super().__init__(timeout)
+        self._carts = {}
+        self._lock = threading.Lock()
+
+    def load(self, cart_key):
+        with self._lock:
+            entry = self._carts.get(cart_key)
+            if entry is None or entry[0] < time.monotonic():
+                self._carts.pop(cart_key, None)
+                return {}
+            return dict(entry[1])
+
+    def store(self, cart_key, items):
+        with self._lock:
+            self._carts[cart_key] = (time.monotonic() + self.timeout, dict(items))
+
+    def delete(self, cart_key):
+        with self._lock:
+            self._carts.pop(cart_key, None)
+
+
+class SessionCartStorage(BaseCartStorage):
+    """
+    Stores the cart in the session of the visitor it belongs to, so cart
+    changes only write the session; expired carts go with their sessions
+    (``python manage.py clearsessions``)
+    """
+
+    SESSION_KEY = 'guest_cart_items'
+
+    def __init__(self, timeout=None, session=None):
+        super().__init__(timeout)
+        self.session = session
+
+    def bind(self, request):
+        return type(self)(self.timeout, session=request.session)
+
+    def _cart(self, cart_key):
+        if self.session is None:
+            raise RuntimeError("SessionCartStorage must be bound to a request with bind()")
+        cart = self.session.get(self.SESSION_KEY)
+        return cart if cart and cart.get('key') == cart_key else None
+
+    def load(self, cart_key):
+        cart = self._cart(cart_key)
+        return dict(cart['items']) if cart else {}
+
+    def store(self, cart_key, items):
+        self.session[self.SESSION_KEY] = {'key': cart_key, 'items': dict(items)}
+
+    def delete(self, cart_key):
+        if self._cart(cart_key) is not None:
+            del self.session[self.SESSION_KEY]
+
+
+class DatabaseCartStorage(BaseCartStorage):
+    """
+    Stores each cart as a ``Cart`` row without user whose ``session_id`` is
+    the cart key, carts untouched for longer than the timeout are ignored
+    until ``purge_expired`` deletes them
+    """
+
+    def _cutoff(self):
+        return timezone.now() - timedelta(seconds=self.timeout)
+
+    def _items(self, cart_key):
+        from .models import CartItem
+
+        return CartItem.objects.filter(
+            cart__session_id=cart_key, cart__user=None, cart__updated_at__gte=self._cutoff(),
+        )
+
+    def load(self, cart_key):
+        return {
+            make_field(product_id, variant_id): quantity
+            for product_id, variant_id, quantity in self._items(cart_key).values_list('product_id', 'variant_id', 'quantity')
+        }
+
+    def store(self, cart_key, items):
+        from .models import Cart, CartItem
+
+        with transaction.atomic():
+            cart, created = Cart.objects.get_or_create(session_id=cart_key, user=None)
+            existing = {} if created else {
+                make_field(row.product_id, row.variant_id): row for row in cart.items.all()
+            }
+            new_rows, changed_rows = [], []
+            for field, quantity in items.items():
+                row = existing.pop(field, None)
+                if row is None:
+                    product_id, variant_id = parse_field(field)
+                    new_rows.append(CartItem(cart=cart, product_id=product_id, variant_id=variant_id, quantity=quantity))
+                elif row.quantity != quantity:
+                    row.quantity = quantity
+                    changed_rows.append(row)
+            # Prices of new rows, in one query per model instead of one per row
+            products = Product.objects.in_bulk({row.product_id for row in new_rows})
+            variant_ids = {row.variant_id for row in new_rows if row.variant_id}
+            variants = ProductVariant.objects.in_bulk(variant_ids) if variant_ids else {}
+            for row in new_rows:
+                row.unit_price = variants[row.variant_id].effective_price if row.variant_id else products[row.product_id].price
+            # bulk_create() and update() skip the per-row signals, the cart version is bumped by GuestCart
+            CartItem.objects.bulk_create(new_rows)
+            for row in changed_rows:
+                CartItem.objects.filter(pk=row.pk).update(quantity=row.quantity)
+            if existing:
+                CartItem.objects.filter(pk__in=[row.pk for row in existing.values()]).delete()
+            if not created:
+                # Refresh updated_at, the expiry of the cart
+                cart.save(update_fields=['updated_at'])
+
+    def delete(self, cart_key):
+        from .models import Cart
+
+        Cart.objects.filter(session_id=cart_key, user=None).delete()
+
+    def purge_expired(self):
+        """
+        Delete guest carts untouched for longer than the timeout, including
+        the checkout rows written by ``GuestCart.materialize`` (written again
+        on the next checkout)
+        """
+        from .models import Cart
+
+        deleted, per_model = Cart.objects.filter(user=None, updated_at__lt=self._cutoff()).delete()
+        return per_model.get(Cart._meta.label, 0)
+
+
+class CacheCartStorage(BaseCartStorage):
+    """Stores each cart as one Django cache entry"""
+
+    def load(self, cart_key):
+        return cache.get(cart_key) or {}
+
+    def store(self, cart_key, items):
+        cache.set(cart_key, items, self.timeout)
+
+    def delete(self, cart_key):
+        cache.delete(cart_key)
+
+
+class RedisCartStorage(BaseCartStorage):
+    """One Redis hash per cart; every write refreshes the TTL"""
+
+    def __init__(self, timeout=None, url=None):
+        if not REDIS_AVAILABLE:
+            raise ImportError("RedisCartStorage requires the 'redis' package")
+        super().__init__(timeout)
+        url = url or getattr(settings, 'CART_STORAGE_REDIS_URL', 'redis://127.0.0.1:6379/4')
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+
+    def load(self, cart_key):
+        return {field: int(quantity) for field, quantity in self.client.hgetall(cart_key).items()}
+
+    def store(self, cart_key, items):
+        pipe = self.client.pipeline()
+        pipe.delete(cart_key)
+        if items:
+            pipe.hset(cart_key, mapping=items)
+            pipe.expire(cart_key, self.timeout)
+        pipe.execute()
+
+    def delete(self, cart_key):
+        self.client.delete(cart_key)
+
+    def add_item(self, cart_key, field, quantity):
+        pipe = self.client.pipeline()
+        pipe.hincrby(cart_key, field, quantity)
+        pipe.expire(cart_key, self.timeout)
+        return int(pipe.execute()[0])
+
+    def set_item(self, cart_key, field, quantity):
+        pipe = self.client.pipeline()
+        pipe.hset(cart_key, field, quantity)
+        pipe.expire(cart_key, self.timeout)
+        pipe.execute()
+
+    def remove_item(self, cart_key, field):
+        return bool(self.client.hdel(cart_key, field))
+
+
+@functools.lru_cache(maxsize=None)
+def _load_storage(backend_path):
+    return import_string(backend_path)()
+
+
+def get_cart_storage():
+    """Return the configured guest cart storage backend (one per process)"""
+    return _load_storage(getattr(settings, 'CART_STORAGE_BACKEND', 'cart.storage.DatabaseCartStorage'))
+
+
+@receiver(setting_changed)
+def reset_cart_storage(setting, **kwargs):
+    if setting in ('CART_STORAGE_BACKEND', 'CART_STORAGE_TIMEOUT', 'CART_STORAGE_REDIS_URL'):
+        _load_storage.cache_clear()
+
+
+# ----------------------------------------------------------------------
+# Guest cart
+# ----------------------------------------------------------------------
+class GuestCart:
+    """The cart of an anonymous visitor, kept in the cart storage backend"""
+
+    def __init__(self, request, storage=None):
+        self.request = request
+        self.storage = (storage or get_cart_storage()).bind(request)
+
+    @property
+    def token(self):
+        return self.request.session.get(GUEST_CART_SESSION_KEY)
+
+    @property
+    def cart_key(self):
+        token = self.token
+        return f"guest_cart:{token}" if token else None
+
+    @property
+    def cache_ref(self):
+        """Reference used for the versioned summary cache in ``cart.totals``"""
+        return f"guest_{self.token}"
+
+    def _ensure_key(self):
+        if not self.token:
+            # Stored in the session data, the session itself is saved by the middleware
+            self.request.session[GUEST_CART_SESSION_KEY] = uuid.uuid4().hex
+        return self.cart_key
+
+    def _changed(self):
+        bump_cart_version(self.cache_ref)
+
+    # Reading ----------------------------------------------------------
+    def quantities(self):
+        """``{(product_id, variant_id): quantity}`` without touching the database"""
+        if not self.cart_key:
+            return {}
+        return {parse_field(field): quantity for field, quantity in self.storage.get_items(self.cart_key).items()}
+
+    @property
+    def total_items(self):
+        return sum(self.quantities().values())
+
+    def get_items(self):
+        """Unsaved ``CartItem`` instances with products, variants and images loaded"""
+        from .models import CartItem
+
+        quantities = self.quantities()
+        if not quantities:
+            return []
+
+        products = Product.objects.filter(
+            id__in={product_id for product_id, _ in quantities}, is_active=True
+        ).prefetch_related(
+            Prefetch('images', queryset=ProductImage.objects.order_by('-is_primary', 'created_at'))
+        ).in_bulk()
+        variant_ids = {variant_id for _, variant_id in quantities if variant_id}
+        variants = ProductVariant.objects.filter(id__in=variant_ids, is_active=True).in_bulk() if variant_ids else {}
+
+        items = []
+        removed = False
+        for (product_id, variant_id), quantity in quantities.items():
+            product = products.get(product_id)
+            variant = variants.get(variant_id) if variant_id else None
+            if product is None or (variant_id and variant is None):
+                # Product was removed or deactivated since it was added
+                self.storage.remove_item(self.cart_key, make_field(product_id, variant_id))
+                removed = True
+                continue
+            items.append(CartItem(
+                id=make_item_id(product_id, variant_id),
+                product=product,
+                variant=variant,
+                quantity=quantity,
+                unit_price=variant.effective_price if variant else product.price,
+            ))
+        if removed:
+            # Cached summaries and badges still count the removed items
+            self._changed()
+        return items
+
+    def get_item(self, item_id):
+        product_id, variant_id = parse_item_id(item_id)
+        for item in self.get_items():
+            if item.product_id == product_id and item.variant_id == variant_id:
+                return item
+        return None
+
+    def get_totals(self):
+        return CartTotals(self.get_items())
+
+    def summary(self, location='dhaka'):
+        """Cached summary, same shape as ``cart.totals.get_cart_summary``"""
+        if not self.cart_key:
+            return CartTotals([]).summary(location)
+        return get_cart_summary(self.cache_ref, location, load_items=self.get_items)
+
+    # Writing ----------------------------------------------------------
+    def get_quantity(self, product, variant=None):
+        return self.quantities().get((product.id, variant.id if variant else None), 0)
+
+    def add(self, product, variant, quantity):
+        """Add to an item and return it as an unsaved ``CartItem``"""
+        from .models import CartItem
+
+        new_quantity = self.storage.add_item(
+            self._ensure_key(), make_field(product.id, variant.id if variant else None), quantity
+        )
+        self._changed()
+        return CartItem(
+            id=make_item_id(product.id, variant.id if variant else None),
+            product=product,
+            variant=variant,
+            quantity=new_quantity,
+            unit_price=variant.effective_price if variant else product.price,
+        )
+
+    def set_quantity(self, item, quantity):
+        self.storage.set_item(self._ensure_key(), make_field(item.product_id, item.variant_id), quantity)
+        item.quantity = quantity
+        self._changed()
+
+    def remove(self, item_id):
+        if not self.cart_key:
+            return False
+        removed = self.storage.remove_item(self.cart_key, make_field(*parse_item_id(item_id)))
+        if removed:
+            self._changed()
+        return removed
+
+    def clear(self):
+        if self.cart_key:
+            self.storage.clear(self.cart_key)
+            self._changed()
+
+    # Persisting -------------------------------------------------------
+    def materialize(self):
+        """
+        Write the guest cart to the ``Cart``/``CartItem`` tables for checkout.
+
+        The session cart row is synced to the stored items, so calling this
+        again after the visitor edited their cart only writes the difference.
+        Returns ``None`` for an empty cart.
+        """
+        from .models import Cart, CartItem
+
+        items = self.get_items()
+        if not items:
+            return None
+
+        session = self.request.session
+        if not session.session_key:
+            session.create()
+
+        with transaction.atomic():
+            cart, created = Cart.objects.get_or_create(session_id=session.session_key, user=None)
+            existing = {(row.product_id, row.variant_id): row for row in cart.items.all()}
+            for item in items:
+                row = existing.pop((item.product_id, item.variant_id), None)
+                if row is None:
+                    CartItem.objects.create(cart=cart, product=item.product, variant=item.variant, quantity=item.quantity)
+                elif row.quantity != item.quantity:
+                    row.quantity = item.quantity
+                    row.save()
+            for row in existing.values():
+                row.delete()
+        # The session key rotates at login, remember the row so the merge can drop it
+        session[GUEST_CART_ROW_SESSION_KEY] = cart.pk
+        return cart
+
+    def merge_into(self, user):
+        """
+        Add the guest cart to ``user``'s cart and empty the guest cart, the
+        session cart row written by ``materialize`` is deleted
+        """
+        from .models import Cart, CartItem
+
+        items = self.get_items()
+        session_cart_id = self.request.session.pop(GUEST_CART_ROW_SESSION_KEY, None)
+        if not items:
+            if session_cart_id:
+                Cart.objects.filter(pk=session_cart_id, user=None).delete()
+            return None
+
+        with transaction.atomic():
+            if session_cart_id:
+                Cart.objects.filter(pk=session_cart_id, user=None).delete()
+            cart, created = Cart.objects.get_or_create(user=user)
+            existing = {(row.product_id, row.variant_id): row for row in cart.items.all()}
+            for item in items:
+                row = existing.get((item.product_id, item.variant_id))
+                if row is None:
+                    CartItem.objects.create(cart=cart, product=item.product, variant=item.variant, quantity=item.quantity)
+                else:
+                    row.quantity += item.quantity
+                    row.save()
+
+        self.clear()
+        logger.info(f"Merged guest cart with {len(items)} items into cart of {user}")
+        return cart
@@ -1,3 +1,299 @@
-from django.test import TestCase
+from decimal import Decimal
+from types import SimpleNamespace
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from products.models import Category, Product
+from utils.testing import LOCMEM_CACHES
+from .models import Cart, CartItem
+from .storage import GuestCart
+from .totals import CartTotals, get_cart_summary
+
+User = get_user_model()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CartTotalsTest(TestCase):
+    """Test cases for single-pass cart totals and the cached cart summary"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='buyer', email='buyer@example.com', password='pass12345', is_email_verified=True
+        )
+        category = Category.objects.create(name='Shoes', slug='shoes')
+        self.shoe = Product.objects.create(
+            name='Runner', slug='runner', sku='RUN-1', category=category,
+            price=Decimal('50.00'), stock_quantity=10, weight=Decimal('0.50')
+        )
+        self.sock = Product.objects.create(
+            name='Sock', slug='sock', sku='SOCK-1', category=category,
+            price=Decimal('5.00'), stock_quantity=10
+        )
+        self.cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=self.cart, product=self.shoe, quantity=2)
+        CartItem.objects.create(cart=self.cart, product=self.sock, quantity=3)
+
+    def test_totals_computed_in_one_query(self):
+        """Test items, products and images are loaded once for all totals"""
+        with self.assertNumQueries(2):
+            totals = CartTotals.for_cart(self.cart)
+            self.assertEqual(len(totals.items_data()), 2)
+        shipping = totals.shipping_summary('dhaka')
+
+        self.assertEqual(totals.total_items, 5)
+        self.assertEqual(totals.subtotal, Decimal('115.00'))
+        self.assertEqual(totals.total_weight, Decimal('1.00'))
+        self.assertEqual(shipping['total_weight'], Decimal('1.00'))
+
+    def test_cart_totals_memoized_until_items_change(self):
+        """Test the totals properties load the items once per cart instance"""
+        with self.assertNumQueries(2):
+            self.assertEqual(self.cart.total_items, 5)
+            self.assertEqual(self.cart.subtotal, Decimal('115.00'))
+            self.assertEqual(self.cart.total_weight, Decimal('1.00'))
+
+        item = CartItem.objects.get(cart=self.cart, product=self.sock)
+        item.cart = self.cart
+        item.quantity = 1
+        item.save()
+        self.assertEqual(self.cart.total_items, 3)
+
+    def test_version_keys_expire(self):
+        """Test cart versions are not kept forever"""
+        from unittest import mock
+
+        from .totals import CART_VERSION_KEY, VERSION_TIMEOUT, bump_cart_version
+
+        with mock.patch.object(cache, 'set') as cache_set:
+            bump_cart_version(self.cart.id)
+        cache_set.assert_called_once_with(CART_VERSION_KEY.format(cart_id=self.cart.id), mock.ANY, VERSION_TIMEOUT)
+
+    def test_summary_cached_until_cart_changes(self):
+        """Test the summary is served from cache and refreshed on item changes"""
+        self.assertEqual(get_cart_summary(self.cart.id)['total_items'], 5)
+        with self.assertNumQueries(0):
+            get_cart_summary(self.cart.id)
+
+        self.cart.items.filter(product=self.sock).delete()
+        self.assertEqual(get_cart_summary(self.cart.id)['total_items'], 2)
+
+    def test_summary_refreshed_on_product_change(self):
+        """Test product edits invalidate cached summaries"""
+        get_cart_summary(self.cart.id)
+        self.shoe.name = 'Runner Pro'
+        self.shoe.save()
+
+        names = [item['product_name'] for item in get_cart_summary(self.cart.id)['items']]
+        self.assertIn('Runner Pro', names)
+
+    def test_summary_endpoint(self):
+        """Test the summary API uses the cached totals"""
+        self.client.force_login(self.user)
+        response = self.client.get('/api/v1/cart/summary/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_items'], 5)
+        self.assertEqual(response.data['subtotal'], Decimal('115.00'))
+        self.assertEqual(len(response.data['items']), 2)
+
+
+@override_settings(CART_STORAGE_BACKEND='cart.storage.InMemoryCartStorage')
+class GuestCartStorageTest(TestCase):
+    """Test cases for guest carts kept in the cart storage backend"""
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Shoes', slug='shoes')
+        self.product = Product.objects.create(
+            name='Runner', slug='runner', sku='RUN-1', category=category,
+            price=Decimal('50.00'), stock_quantity=10
+        )
+        self.user = User.objects.create_user(
+            username='buyer', email='buyer@example.com', password='pass12345', is_email_verified=True
+        )
+
+    def add(self, quantity=1):
+        return self.client.post('/api/v1/cart/add/', {'product_id': self.product.id, 'quantity': quantity})
+
+    def test_guest_cart_not_written_to_database(self):
+        """Test adding, updating and removing items never creates cart rows"""
+        self.add(2)
+        response = self.add(1)
+        self.assertEqual(response.data['cart_total'], 3)
+
+        item_id = response.data['cart_item']['id']
+        response = self.client.put(
+            f'/api/v1/cart/items/{item_id}/update/', {'quantity': 5}, content_type='application/json'
+        )
+        self.assertEqual(response.data['cart_item']['quantity'], 5)
+
+        response = self.client.get('/api/v1/cart/summary/')
+        self.assertEqual(response.data['total_items'], 5)
+        self.assertEqual(response.data['subtotal'], Decimal('250.00'))
+        self.assertEqual(self.client.get('/api/v1/cart/').data['total_items'], 5)
+
+        self.client.delete(f'/api/v1/cart/items/{item_id}/remove/')
+        self.assertEqual(self.client.get('/api/v1/cart/summary/').data['total_items'], 0)
+        self.assertFalse(Cart.objects.exists())
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_checkout_materializes_guest_cart(self):
+        """Test the cart is written to the database for checkout"""
+        self.add(2)
+        request = SimpleNamespace(session=self.client.session)
+        cart = GuestCart(request).materialize()
+        self.assertEqual(cart.session_id, self.client.session.session_key)
+        self.assertEqual(cart.total_items, 2)
+
+        # Materializing again only syncs the difference
+        self.add(1)
+        GuestCart(request).materialize()
+        self.assertEqual(Cart.objects.get(user=None).total_items, 3)
+        self.assertEqual(CartItem.objects.count(), 1)
+
+    def test_login_merges_guest_cart(self):
+        """Test the guest cart is merged into the user's cart at login"""
+        user_cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=user_cart, product=self.product, quantity=1)
+
+        self.add(2)
+        self.client.force_login(self.user)
+
+        self.assertEqual(Cart.objects.get(user=self.user).total_items, 3)
+        self.assertEqual(self.client.get('/api/v1/cart/summary/').data['total_items'], 3)
+
+    def test_login_drops_materialized_session_cart(self):
+        """Test the session cart row written for checkout is removed by the merge"""
+        self.add(2)
+        session = self.client.session
+        GuestCart(SimpleNamespace(session=session)).materialize()
+        session.save()
+        self.assertTrue(Cart.objects.filter(user=None).exists())
+
+        self.client.force_login(self.user)
+
+        self.assertFalse(Cart.objects.filter(user=None).exists())
+        self.assertEqual(Cart.objects.get(user=self.user).total_items, 2)
+
+    def test_removed_products_refresh_summary(self):
+        """Test items dropped for deactivated products are no longer counted"""
+        self.add(2)
+        self.assertEqual(self.client.get('/api/v1/cart/summary/').data['total_items'], 2)
+
+        Product.objects.filter(pk=self.product.pk).update(is_active=False)
+        request = SimpleNamespace(session=self.client.session)
+        self.assertEqual(GuestCart(request).get_items(), [])
+        self.assertEqual(self.client.get('/api/v1/cart/summary/').data['total_items'], 0)
+
+
+@override_settings(CART_STORAGE_BACKEND='cart.storage.DatabaseCartStorage')
+class DatabaseCartStorageTest(TestCase):
+    """Test cases for guest carts kept as database rows without Redis"""
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Shoes', slug='shoes')
+        self.product = Product.objects.create(
+            name='Runner', slug='runner', sku='RUN-1', category=category,
+            price=Decimal('50.00'), stock_quantity=10
+        )
+        self.user = User.objects.create_user(
+            username='buyer', email='buyer@example.com', password='pass12345', is_email_verified=True
+        )
+
+    def test_guest_cart_survives_cache_clear_and_merges_at_login(self):
+        """Test the guest cart does not depend on the cache and is merged into the account cart"""
+        self.client.post('/api/v1/cart/add/', {'product_id': self.product.id, 'quantity': 2})
+        self.client.post('/api/v1/cart/add/', {'product_id': self.product.id, 'quantity': 1})
+        cache.clear()
+        self.assertEqual(self.client.get('/api/v1/cart/summary/').data['total_items'], 3)
+        self.assertTrue(Cart.objects.get(user=None).session_id.startswith('guest_cart:'))
+
+        self.client.force_login(self.user)
+
+        self.assertFalse(Cart.objects.filter(user=None).exists())
+        self.assertEqual(Cart.objects.get(user=self.user).total_items, 3)
+
+    def test_expired_guest_carts_purged(self):
+        """Test guest carts untouched for longer than the timeout are deleted, others are kept"""
+        from datetime import timedelta
+        from io import StringIO
+        from django.core.management import call_command
+        from django.utils import timezone
+
+        self.client.post('/api/v1/cart/add/', {'product_id': self.product.id, 'quantity': 1})
+        stale = Cart.objects.create(session_id='guest_cart:stale')
+        CartItem.objects.create(cart=stale, product=self.product, quantity=1)
+        Cart.objects.filter(pk=stale.pk).update(updated_at=timezone.now() - timedelta(days=8))
+        Cart.objects.create(user=self.user)
+        Cart.objects.filter(user=self.user).update(updated_at=timezone.now() - timedelta(days=8))
+
+        out = StringIO()
+        call_command('cleanup_guest_carts', stdout=out)
+        self.assertIn('Deleted 1 expired guest carts', out.getvalue())
+        self.assertFalse(Cart.objects.filter(pk=stale.pk).exists())
+        self.assertEqual(Cart.objects.count(), 2)
+        self.assertEqual(self.client.get('/api/v1/cart/summary/').data['total_items'], 1)
+
+    def test_store_writes_new_lines_in_bulk(self):
+        """Test storing a cart loads products and variants once instead of once per line"""
+        from products.models import ProductVariant
+        from .storage import DatabaseCartStorage, make_field
+
+        other = Product.objects.create(
+            name='Trail', slug='trail', sku='TRL-1', category=self.product.category,
+            price=Decimal('70.00'), stock_quantity=10
+        )
+        variant = ProductVariant.objects.create(
+            product=self.product, name='Large', sku='RUN-1-L', price=Decimal('55.00'), stock_quantity=5
+        )
+        storage = DatabaseCartStorage()
+        items = {
+            make_field(self.product.id): 1, make_field(other.id): 2, make_field(self.product.id, variant.id): 3
+        }
+
+        # Cart lookup and creation, products, variants and new lines, plus the savepoints
+        with self.assertNumQueries(9):
+            storage.store('guest_cart:bulk', items)
+
+        self.assertEqual(storage.load('guest_cart:bulk'), items)
+        cart = Cart.objects.get(session_id='guest_cart:bulk')
+        self.assertEqual(cart.items.get(variant=variant).unit_price, Decimal('55.00'))
+        self.assertEqual(cart.items.get(product=other).unit_price, Decimal('70.00'))
+
+        storage.store('guest_cart:bulk', {make_field(other.id): 5})
+        self.assertEqual(storage.load('guest_cart:bulk'), {make_field(other.id): 5})
+
+
+@override_settings(CART_STORAGE_BACKEND='cart.storage.SessionCartStorage')
+class SessionCartStorageTest(TestCase):
+    """Test cases for guest carts kept in the session without Redis"""
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Shoes', slug='shoes')
+        self.product = Product.objects.create(
+            name='Runner', slug='runner', sku='RUN-1', category=category,
+            price=Decimal('50.00'), stock_quantity=10
+        )
+        self.user = User.objects.create_user(
+            username='buyer', email='buyer@example.com', password='pass12345', is_email_verified=True
+        )
+
+    def test_guest_cart_kept_out_of_cart_tables_and_merged_at_login(self):
+        """Test guest cart changes write no cart rows, survive a cache clear and are merged at login"""
+        self.client.post('/api/v1/cart/add/', {'product_id': self.product.id, 'quantity': 2})
+        self.client.post('/api/v1/cart/add/', {'product_id': self.product.id, 'quantity': 1})
+        cache.clear()
+        self.assertEqual(self.client.get('/api/v1/cart/summary/').data['total_items'], 3)
+        self.assertFalse(Cart.objects.exists())
+        self.assertFalse(CartItem.objects.exists())
+
+        self.client.force_login(self.user)
+
+        self.assertEqual(Cart.objects.get().user, self.user)
+        self.assertEqual(Cart.objects.get().total_items, 3)
+        self.assertEqual(self.client.get('/api/v1/cart/summary/').data['total_items'], 3)
@@ -0,0 +1,194 @@
+"""
+Cart totals engine
+
+Cart items are loaded once together with their products, variants and
+product images, and item count, subtotal, weight and shipping options are
+all computed from that single list. Summaries are cached per cart version:
+the version is bumped whenever a cart item or a product changes (see
+``cart.signals``), so header badges and repeated summary requests are
+served from cache without touching the database.
+"""
+import time
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Prefetch
+
+from products.models import ProductImage
+from .shipping import ShippingCalculator
+
+SUMMARY_TIMEOUT = 60 * 30
+# A missing version means "recompute", so versions only have to outlive the
+# summaries cached under them, they must not pile up one key per cart forever
+VERSION_TIMEOUT = SUMMARY_TIMEOUT * 2
+OWNER_TIMEOUT = 60 * 60 * 8
+SHIPPING_LOCATIONS = ('dhaka', 'outside')
+
+CART_VERSION_KEY = 'cart_version_{cart_id}'
+CATALOG_VERSION_KEY = 'cart_catalog_version'
+CART_OWNER_KEY = 'cart_owner_{owner}'
+CART_SUMMARY_KEY = 'cart_summary_{cart_id}_{location}_{version}_{catalog_version}'
+
+
+def cart_items_queryset():
+    """Cart items with their products, variants and product images"""
+    from .models import CartItem
+    return CartItem.objects.select_related('product', 'variant').prefetch_related(
+        Prefetch('product__images', queryset=ProductImage.objects.order_by('-is_primary', 'created_at'))
+    )
+
+
+def cart_items_prefetch():
+    """Prefetch for ``Cart`` querysets whose items are serialized or totalled"""
+    return Prefetch('items', queryset=cart_items_queryset())
+
+
+def load_cart_items(cart):
+    """Return the items of a cart, reusing prefetched items when available"""
+    if 'items' in getattr(cart, '_prefetched_objects_cache', {}):
+        return list(cart.items.all())
+    return list(cart_items_queryset().filter(cart_id=cart.pk))
+
+
+class CartTotals:
+    """Totals of a cart computed in a single pass over its items"""
+
+    def __init__(self, items):
+        self.items = list(items)
+        self.total_items = 0
+        self.subtotal = Decimal('0.00')
+        self.total_weight = Decimal('0.00')
+
+        for item in self.items:
+            self.total_items += item.quantity
+            self.subtotal += item.total_price
+            if item.product.weight:
+                self.total_weight += item.product.weight * item.quantity
+
+    @classmethod
+    def for_cart(cls, cart):
+        return cls(load_cart_items(cart))
+
+    def shipping_summary(self, location='dhaka'):
+        """Shipping options for the loaded items, ``None`` for an empty cart"""
+        if not self.items:
+            return None
+        return ShippingCalculator(self.items, location).get_shipping_summary()
+
+    def items_data(self):
+        """Line items as displayed on the checkout page"""
+        data = []
+        for item in self.items:
+            images = list(item.product.images.all())
+            variant = item.variant
+            data.append({
+                'id': item.id,
+                'product_name': item.product.name,
+                'product_image': images[0].image if images else None,
+                'variant_name': variant.name if variant else None,
+                'variant_color': variant.color if variant else None,
+                'variant_size': variant.size if variant else None,
+                'quantity': item.quantity,
+                'price': str(item.unit_price),
+                'total_price': str(item.total_price),
+            })
+        return data
+
+    def summary(self, location='dhaka'):
+        """Cart-derived part of the cart summary (coupons live in the session)"""
+        return {
+            'items': self.items_data(),
+            'subtotal': self.subtotal,
+            'total_items': self.total_items,
+            'total_weight': self.total_weight,
+            'shipping_summary': self.shipping_summary(location),
+        }
+
+
+# ----------------------------------------------------------------------
+# Versioned summary cache
+# ----------------------------------------------------------------------
+def _new_version():
+    return time.time_ns()
+
+
+def bump_cart_version(cart_id):
+    cache.set(CART_VERSION_KEY.format(cart_id=cart_id), _new_version(), VERSION_TIMEOUT)
+
+
+def bump_catalog_version():
+    cache.set(CATALOG_VERSION_KEY, _new_version(), None)
+
+
+def get_cart_owner(request):
+    """Identify the cart owner of a request without creating a session"""
+    if request.user.is_authenticated:
+        return f'user_{request.user.pk}'
+    session_key = request.session.session_key
+    if session_key:
+        return f'session_{session_key}'
+    return None
+
+
+def remember_cart_owner(request, cart):
+    owner = get_cart_owner(request)
+    if owner:
+        cache.set(CART_OWNER_KEY.format(owner=owner), cart.pk, OWNER_TIMEOUT)
+
+
+def forget_cart_owner(cart):
+    if cart.user_id:
+        cache.delete(CART_OWNER_KEY.format(owner=f'user_{cart.user_id}'))
+    if cart.session_id:
+        cache.delete(CART_OWNER_KEY.format(owner=f'session_{cart.session_id}'))
+
+
+def get_cart_id(request):
+    """Return the id of the request's cart, looking it up in the database once"""
+    owner = get_cart_owner(request)
+    if owner is None:
+        return None
+
+    owner_key = CART_OWNER_KEY.format(owner=owner)
+    cart_id = cache.get(owner_key)
+    if cart_id is not None:
+        return cart_id
+
+    from .models import Cart
+    if request.user.is_authenticated:
+        cart_id = Cart.objects.filter(user=request.user).values_list('id', flat=True).first()
+    else:
+        cart_id = Cart.objects.filter(
+            session_id=request.session.session_key, user=None
+        ).values_list('id', flat=True).first()
+
+    if cart_id is not None:
+        cache.set(owner_key, cart_id, OWNER_TIMEOUT)
+    return cart_id
+
+
+def get_cart_summary(cart_id, location='dhaka', load_items=None):
+    """
+    Return the cached cart summary for the current cart version.
+
+    ``cart_id`` is a database cart id, or any other reference whose version
+    is bumped on change together with a ``load_items`` callable (guest carts).
+    """
+    if location not in SHIPPING_LOCATIONS:
+        location = 'dhaka'
+
+    version_key = CART_VERSION_KEY.format(cart_id=cart_id)
+    versions = cache.get_many([version_key, CATALOG_VERSION_KEY])
+    key = CART_SUMMARY_KEY.format(
+        cart_id=cart_id,
+        location=location,
+        version=versions.get(version_key, 0),
+        catalog_version=versions.get(CATALOG_VERSION_KEY, 0),
+    )
+
+    summary = cache.get(key)
+    if summary is None:
+        items = load_items() if load_items else cart_items_queryset().filter(cart_id=cart_id)
+        summary = CartTotals(items).summary(location)
+        cache.set(key, summary, SUMMARY_TIMEOUT)
+    return summary
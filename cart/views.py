@@ -13,11 +13,13 @@ class CsrfExemptSessionAuthentication(SessionAuthentication):
         return  # To not enforce CSRF
 from .models import Cart, CartItem, SavedItem, Coupon
 from .serializers import (
-    CartSerializer, CartItemSerializer, AddToCartSerializer,
+    CartSerializer, GuestCartSerializer, CartItemSerializer, AddToCartSerializer,
     UpdateCartItemSerializer, SavedItemSerializer, CouponSerializer,
     ApplyCouponSerializer, CouponValidationSerializer, CartSummarySerializer
 )
 from .shipping import ShippingCalculator
+from .totals import cart_items_prefetch, get_cart_id, get_cart_summary, remember_cart_owner
+from .storage import GuestCart
 from products.models import Product, ProductVariant
 
 
@@ -27,20 +29,19 @@ class CartView(generics.RetrieveAPIView):
     permission_classes = [permissions.AllowAny]
     
     def get_object(self):
-        if self.request.user.is_authenticated:
-            cart, created = Cart.objects.get_or_create(user=self.request.user)
-        else:
-            # For guest users, use session-based cart
-            session_id = self.request.session.session_key
-            if not session_id:
-                self.request.session.create()
-                session_id = self.request.session.session_key
-            
-            cart, created = Cart.objects.get_or_create(
-                session_id=session_id,
-                user=None
-            )
+        if not self.request.user.is_authenticated:
+            # Guest carts live in the cart storage backend
+            return GuestCart(self.request)
+        
+        carts = Cart.objects.prefetch_related(cart_items_prefetch())
+        cart, created = carts.get_or_create(user=self.request.user)
+        remember_cart_owner(self.request, cart)
         return cart
+    
+    def get_serializer_class(self):
+        if not self.request.user.is_authenticated:
+            return GuestCartSerializer
+        return CartSerializer
 
 
 @api_view(['POST'])
@@ -55,20 +56,13 @@ def add_to_cart(request):
     variant_id = serializer.validated_data.get('variant_id')
     quantity = serializer.validated_data['quantity']
     
-    # Get or create cart
+    # Get or create cart (guest carts are kept out of the database until checkout)
+    cart = guest_cart = None
     if request.user.is_authenticated:
         cart, created = Cart.objects.get_or_create(user=request.user)
+        remember_cart_owner(request, cart)
     else:
-        # For guest users, use session-based cart
-        session_id = request.session.session_key
-        if not session_id:
-            request.session.create()
-            session_id = request.session.session_key
-        
-        cart, created = Cart.objects.get_or_create(
-            session_id=session_id,
-            user=None
-        )
+        guest_cart = GuestCart(request)
     
     # Get product and variant
     product = get_object_or_404(Product, id=product_id, is_active=True)
@@ -118,16 +112,21 @@ def add_to_cart(request):
     else:
         unit_price = product.price
     
-    cart_item, created = CartItem.objects.get_or_create(
-        cart=cart,
-        product=product,
-        variant=variant,
-        defaults={'quantity': quantity, 'unit_price': unit_price}
-    )
+    if guest_cart:
+        existing_quantity = guest_cart.get_quantity(product, variant)
+        cart_item, created = None, existing_quantity == 0
+    else:
+        cart_item, created = CartItem.objects.get_or_create(
+            cart=cart,
+            product=product,
+            variant=variant,
+            defaults={'quantity': quantity, 'unit_price': unit_price}
+        )
+        existing_quantity = cart_item.quantity
     
     if not created:
         # Update quantity
-        new_quantity = cart_item.quantity + quantity
+        new_quantity = existing_quantity + quantity
         
         # Check stock for new quantity
         if variant:
@@ -141,8 +140,15 @@ def add_to_cart(request):
                     'error': f'Only {product.stock_quantity} items available in stock'
                 }, status=status.HTTP_400_BAD_REQUEST)
         
-        cart_item.quantity = new_quantity
-        cart_item.save()
+        if not guest_cart:
+            cart_item.quantity = new_quantity
+            cart_item.save()
+    
+    if guest_cart:
+        cart_item = guest_cart.add(product, variant, quantity)
+        cart_total = guest_cart.total_items
+    else:
+        cart_total = get_cart_summary(cart.id)['total_items']
     
     # Prepare response message
     response_message = 'Product added to cart successfully'
@@ -156,7 +162,7 @@ def add_to_cart(request):
     response_data = {
         'message': response_message,
         'cart_item': CartItemSerializer(cart_item, context={'request': request}).data,
-        'cart_total': cart.total_items
+        'cart_total': cart_total
     }
     
     # Include variant info if auto-selected
@@ -181,6 +187,7 @@ def update_cart_item(request, item_id):
     quantity = serializer.validated_data['quantity']
     
     # Get cart item - handle both authenticated and guest users
+    guest_cart = None
     if request.user.is_authenticated:
         cart_item = get_object_or_404(
             CartItem, 
@@ -188,20 +195,14 @@ def update_cart_item(request, item_id):
             cart__user=request.user
         )
     else:
-        # For guest users, use session
-        session_id = request.session.session_key
-        if not session_id:
+        # For guest users, use the guest cart storage
+        guest_cart = GuestCart(request)
+        cart_item = guest_cart.get_item(item_id)
+        if cart_item is None:
             return Response(
-                {'error': 'No active session found. Please refresh the page.'},
-                status=status.HTTP_400_BAD_REQUEST
+                {'error': 'Cart item not found. Please refresh the page.'},
+                status=status.HTTP_404_NOT_FOUND
             )
-        
-        cart_item = get_object_or_404(
-            CartItem,
-            id=item_id,
-            cart__session_id=session_id,
-            cart__user=None
-        )
     
     # Check stock availability
     if cart_item.variant:
@@ -215,8 +216,11 @@ def update_cart_item(request, item_id):
                 'error': f'Only {cart_item.product.stock_quantity} items available in stock'
             }, status=status.HTTP_400_BAD_REQUEST)
     
-    cart_item.quantity = quantity
-    cart_item.save()
+    if guest_cart:
+        guest_cart.set_quantity(cart_item, quantity)
+    else:
+        cart_item.quantity = quantity
+        cart_item.save()
     
     return Response({
         'message': 'Cart item updated successfully',
@@ -236,20 +240,15 @@ def remove_from_cart(request, item_id):
             cart__user=request.user
         )
     else:
-        # For guest users, use session
-        session_id = request.session.session_key
-        if not session_id:
+        # For guest users, use the guest cart storage
+        if not GuestCart(request).remove(item_id):
             return Response(
-                {'error': 'No active session found. Please refresh the page.'},
-                status=status.HTTP_400_BAD_REQUEST
+                {'error': 'Cart item not found. Please refresh the page.'},
+                status=status.HTTP_404_NOT_FOUND
             )
-        
-        cart_item = get_object_or_404(
-            CartItem,
-            id=item_id,
-            cart__session_id=session_id,
-            cart__user=None
-        )
+        return Response({
+            'message': 'Product removed from cart successfully'
+        })
     
     cart_item.delete()
     
@@ -266,15 +265,19 @@ def clear_cart(request):
         if request.user.is_authenticated:
             cart = Cart.objects.get(user=request.user)
         else:
+            GuestCart(request).clear()
             session_id = request.session.session_key
             if session_id:
+                # Cart written to the database at checkout
                 cart = Cart.objects.get(session_id=session_id, user=None)
             else:
-                return Response({'message': 'Cart is already empty'})
+                return Response({'message': 'Cart cleared successfully'})
         
         cart.clear()
         return Response({'message': 'Cart cleared successfully'})
     except Cart.DoesNotExist:
+        if not request.user.is_authenticated:
+            return Response({'message': 'Cart cleared successfully'})
         return Response({'message': 'Cart is already empty'})
 
 
@@ -366,25 +369,14 @@ def apply_coupon(request):
     coupon_code = serializer.validated_data['code']
     user = request.user if request.user.is_authenticated else None
     
-    # Get cart - support both authenticated and guest users
-    try:
-        if request.user.is_authenticated:
-            cart = Cart.objects.get(user=request.user)
-        else:
-            session_id = request.session.session_key
-            if not session_id:
-                request.session.create()
-                session_id = request.session.session_key
-            cart, created = Cart.objects.get_or_create(
-                session_id=session_id,
-                user=None
-            )
-    except Cart.DoesNotExist:
-        return Response({
-            'error': 'Cart is empty'
-        }, status=status.HTTP_400_BAD_REQUEST)
+    # Get cart totals - support both authenticated and guest users
+    if request.user.is_authenticated:
+        cart_id = get_cart_id(request)
+        cart_data = get_cart_summary(cart_id) if cart_id else None
+    else:
+        cart_data = GuestCart(request).summary()
     
-    if not cart.items.exists():
+    if not cart_data or not cart_data['total_items']:
         return Response({
             'error': 'Cart is empty'
         }, status=status.HTTP_400_BAD_REQUEST)
@@ -398,7 +390,7 @@ def apply_coupon(request):
         }, status=status.HTTP_400_BAD_REQUEST)
     
     # Validate coupon
-    cart_total = cart.subtotal
+    cart_total = cart_data['subtotal']
     is_valid, message = coupon.is_valid(user, cart_total)
     
     if not is_valid:
@@ -454,18 +446,11 @@ def validate_coupon(request):
     user = request.user if request.user.is_authenticated else None
     
     # Get cart total
-    try:
-        if request.user.is_authenticated:
-            cart = Cart.objects.get(user=request.user)
-        else:
-            session_id = request.session.session_key
-            if not session_id:
-                cart_total = 0
-            else:
-                cart = Cart.objects.get(session_id=session_id, user=None)
-                cart_total = cart.subtotal
-    except Cart.DoesNotExist:
-        cart_total = 0
+    if request.user.is_authenticated:
+        cart_id = get_cart_id(request)
+        cart_total = get_cart_summary(cart_id)['subtotal'] if cart_id else 0
+    else:
+        cart_total = GuestCart(request).summary()['subtotal']
     
     # Get coupon
     try:
@@ -504,27 +489,11 @@ def validate_coupon(request):
 @permission_classes([permissions.AllowAny])
 def cart_summary(request):
     """Get cart summary with totals - supports both authenticated users and guests"""
-    try:
-        if request.user.is_authenticated:
-            cart = Cart.objects.get(user=request.user)
-        else:
-            session_id = request.session.session_key
-            if not session_id:
-                # Return empty cart summary for guests without session
-                return Response({
-                    'items': [],
-                    'subtotal': '0.00',
-                    'shipping_cost': '0.00',
-                    'tax_amount': '0.00',
-                    'discount_amount': '0.00',
-                    'coupon_discount': '0.00',
-                    'total_amount': '0.00',
-                    'coupon_code': '',
-                    'total_items': 0,
-                    'total_weight': '0.00'
-                })
-            cart = Cart.objects.get(session_id=session_id, user=None)
-    except Cart.DoesNotExist:
+    location = request.GET.get('location', 'dhaka').lower()
+    cart_id = get_cart_id(request) if request.user.is_authenticated else None
+    guest_cart = None if request.user.is_authenticated else GuestCart(request)
+    if cart_id is None and (guest_cart is None or not guest_cart.cart_key):
+        # Return empty cart summary for guests without session or cart
         return Response({
             'items': [],
             'subtotal': '0.00',
@@ -538,7 +507,13 @@ def cart_summary(request):
             'total_weight': '0.00'
         })
     
-    subtotal = cart.subtotal
+    # Items, totals and shipping options are cached per cart version
+    if guest_cart:
+        cart_data = guest_cart.summary(location)
+    else:
+        cart_data = get_cart_summary(cart_id, location)
+    
+    subtotal = cart_data['subtotal']
     shipping_cost = Decimal('0.00')  # Implement shipping calculation
     tax_amount = Decimal('0.00')     # Implement tax calculation
     discount_amount = Decimal('0.00')
@@ -553,36 +528,8 @@ def cart_summary(request):
     
     total_amount = subtotal + shipping_cost + tax_amount - discount_amount - coupon_discount
     
-    # Get cart items data for checkout display
-    items_data = []
-    for item in cart.items.all():
-        # Get product image
-        product_image = None
-        primary_image = item.product.images.filter(is_primary=True).first()
-        if primary_image:
-            product_image = primary_image.image
-        elif item.product.images.exists():
-            product_image = item.product.images.first().image
-        
-        # Get variant information
-        variant_name = item.variant.name if item.variant else None
-        variant_color = item.variant.color if item.variant else None
-        variant_size = item.variant.size if item.variant else None
-        
-        items_data.append({
-            'id': item.id,
-            'product_name': item.product.name,
-            'product_image': product_image,
-            'variant_name': variant_name,
-            'variant_color': variant_color,
-            'variant_size': variant_size,
-            'quantity': item.quantity,
-            'price': str(item.unit_price),
-            'total_price': str(item.total_price)
-        })
-    
     summary = {
-        'items': items_data,
+        'items': cart_data['items'],
         'subtotal': subtotal,
         'shipping_cost': shipping_cost,
         'tax_amount': tax_amount,
@@ -590,8 +537,9 @@ def cart_summary(request):
         'coupon_discount': coupon_discount,
         'total_amount': total_amount,
         'coupon_code': coupon_code,
-        'total_items': cart.total_items,
-        'total_weight': cart.total_weight or Decimal('0.00')
+        'total_items': cart_data['total_items'],
+        'total_weight': cart_data['total_weight'],
+        'shipping_summary': cart_data['shipping_summary']
     }
     
     return Response(summary)
@@ -608,35 +556,27 @@ def get_shipping_options(request):
             'error': 'Invalid location. Must be "dhaka" or "outside"'
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    # Get cart
-    try:
-        if request.user.is_authenticated:
-            cart = Cart.objects.get(user=request.user)
-        else:
-            session_id = request.session.session_key
-            if not session_id:
-                return Response({
-                    'error': 'Cart not found'
-                }, status=status.HTTP_404_NOT_FOUND)
-            cart = Cart.objects.get(session_id=session_id, user=None)
-        
-        cart_items = cart.items.select_related('product').all()
-        
-        if not cart_items:
-            return Response({
-                'error': 'Cart is empty'
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Calculate shipping options
-        shipping_calculator = ShippingCalculator(cart_items, location)
-        shipping_summary = shipping_calculator.get_shipping_summary()
-        
-        return Response(shipping_summary)
-        
-    except Cart.DoesNotExist:
+    if request.user.is_authenticated:
+        cart_id = get_cart_id(request)
+        cart_data = get_cart_summary(cart_id, location) if cart_id else None
+    else:
+        guest_cart = GuestCart(request)
+        cart_data = guest_cart.summary(location) if guest_cart.cart_key else None
+    
+    if cart_data is None:
         return Response({
             'error': 'Cart not found'
         }, status=status.HTTP_404_NOT_FOUND)
+    
+    # Shipping options are computed together with the cart totals
+    shipping_summary = cart_data['shipping_summary']
+    
+    if not shipping_summary:
+        return Response({
+            'error': 'Cart is empty'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response(shipping_summary)
 
 
 @api_view(['POST'])
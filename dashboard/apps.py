@@ -7,3 +7,5 @@ class DashboardConfig(AppConfig):
     
     def ready(self):
         import dashboard.signals
+        import dashboard.email_templates
+        import dashboard.blocklist
@@ -0,0 +1,264 @@
+"""
+Compiled blocklist matcher.
+
+Active ``BlockList`` entries are compiled into an in-process structure:
+
+- a dict of normalized phone numbers
+- per IP version, a sorted list of disjoint address segments built from
+  single IPs, CIDR networks (``10.0.0.0/8``) and ranges
+  (``192.168.1.10-192.168.1.50``), searched with ``bisect``
+
+Checks are O(1) for phones and O(log n) for IPs without touching the
+database. The compiled structure is rebuilt when the blocklist version in
+the cache changes; the version is bumped whenever an entry is saved or
+deleted (and by the dashboard bulk actions that use ``QuerySet.update``).
+
+Block hits are counted with increments of shared cache counters, so every
+worker adds to the same totals, and written with one ``UPDATE`` per flush:
+at most every ``HIT_FLUSH_INTERVAL`` seconds from the request path and by
+the ``flush_blocklist_hits`` management command (run it from cron so hits of
+idle periods reach the database too). Increments are atomic with Redis; the
+database cache used without Redis may drop concurrent or culled hits, which
+only makes the informational ``block_count`` low.
+"""
+import bisect
+import heapq
+import ipaddress
+import threading
+import time
+
+from django.core.cache import cache
+from django.db.models import Case, F, IntegerField, When
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from orders.phone_utils import normalize_bangladeshi_phone
+from .models import BlockList
+
+VERSION_KEY = 'blocklist_version'
+HIT_COUNT_KEY = 'blocklist_hits:{entry_id}'
+HIT_AT_KEY = 'blocklist_hit_at:{entry_id}'
+HIT_FLUSH_LOCK_KEY = 'blocklist_hits_flush_lock'
+HIT_FLUSH_INTERVAL = 30  # seconds between hit counter writes
+HIT_FLUSH_LOCK_TIMEOUT = 60
+
+
+def normalize_phone(phone):
+    return normalize_bangladeshi_phone(str(phone).strip()) if phone else ''
+
+
+def parse_ip_range(value):
+    """
+    Parse an IP, CIDR network or ``start-end`` range.
+
+    Returns ``(version, first, last)`` with integer addresses, raises
+    ``ValueError`` for invalid values.
+    """
+    value = str(value).strip()
+    if '-' in value:
+        start, end = (ipaddress.ip_address(part.strip()) for part in value.split('-', 1))
+        if start.version != end.version or int(end) < int(start):
+            raise ValueError(f"Invalid IP range: {value}")
+        return start.version, int(start), int(end)
+    network = ipaddress.ip_network(value, strict=False)
+    return network.version, int(network.network_address), int(network.broadcast_address)
+
+
+def _build_segments(ranges):
+    """
+    Turn possibly overlapping ``(first, last, entry_id)`` ranges into sorted,
+    disjoint segments, each owned by the narrowest range covering it.
+    """
+    starts = {}
+    for first, last, entry_id in ranges:
+        starts.setdefault(first, []).append((last - first, last, entry_id))
+    points = sorted(set(starts) | {last + 1 for _, last, _ in ranges})
+
+    segments = []
+    active = []
+    for index, point in enumerate(points[:-1]):
+        for item in starts.get(point, ()):
+            heapq.heappush(active, item)
+        while active and active[0][1] < point:
+            heapq.heappop(active)
+        if not active:
+            continue
+        entry_id = active[0][2]
+        last = points[index + 1] - 1
+        if segments and segments[-1][2] == entry_id and segments[-1][1] == point - 1:
+            segments[-1] = (segments[-1][0], last, entry_id)
+        else:
+            segments.append((point, last, entry_id))
+    return segments
+
+
+class CompiledBlocklist:
+    """Snapshot of the active blocklist, built with a single query"""
+
+    def __init__(self, entries, version=None):
+        self.version = version
+        self.phones = {}
+        ranges = {4: [], 6: []}
+
+        for entry_id, block_type, value in entries:
+            if block_type == 'phone':
+                phone = normalize_phone(value)
+                if phone:
+                    self.phones.setdefault(phone, entry_id)
+            elif block_type == 'ip':
+                try:
+                    ip_version, first, last = parse_ip_range(value)
+                except ValueError:
+                    continue
+                ranges[ip_version].append((first, last, entry_id))
+
+        self.segments = {}
+        self.starts = {}
+        for ip_version, version_ranges in ranges.items():
+            segments = _build_segments(version_ranges)
+            self.segments[ip_version] = segments
+            self.starts[ip_version] = [segment[0] for segment in segments]
+
+    @classmethod
+    def load(cls, version=None):
+        entries = BlockList.objects.filter(is_active=True).values_list('id', 'block_type', 'value')
+        return cls(list(entries), version)
+
+    def match_phone(self, phone):
+        """Id of the entry blocking ``phone``, or ``None``"""
+        return self.phones.get(normalize_phone(phone)) if phone else None
+
+    def match_ip(self, ip):
+        """Id of the entry blocking ``ip``, or ``None``"""
+        try:
+            address = ipaddress.ip_address(str(ip).strip())
+        except ValueError:
+            return None
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+
+        starts = self.starts[address.version]
+        index = bisect.bisect_right(starts, int(address)) - 1
+        if index < 0:
+            return None
+        first, last, entry_id = self.segments[address.version][index]
+        return entry_id if int(address) <= last else None
+
+    def match(self, block_type, value):
+        if block_type == 'phone':
+            return self.match_phone(value)
+        if block_type == 'ip':
+            return self.match_ip(value)
+        return None
+
+
+_compiled = None
+_lock = threading.Lock()
+
+
+def bump_blocklist_version():
+    cache.set(VERSION_KEY, time.time_ns(), None)
+
+
+def get_blocklist():
+    """The compiled blocklist, rebuilt when the cached version changed"""
+    global _compiled
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+
+    compiled = _compiled
+    if compiled is None or compiled.version != version:
+        with _lock:
+            if _compiled is None or _compiled.version != version:
+                _compiled = CompiledBlocklist.load(version)
+            compiled = _compiled
+    return compiled
+
+
+# ----------------------------------------------------------------------
+# Hit counters
+# ----------------------------------------------------------------------
+_last_flush = time.monotonic()
+
+
+def record_hit(entry_id):
+    """Count a block hit, written to the database with the next flush"""
+    key = HIT_COUNT_KEY.format(entry_id=entry_id)
+    if not cache.add(key, 1, None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Expired or culled since the add
+            cache.add(key, 1, None)
+    cache.set(HIT_AT_KEY.format(entry_id=entry_id), timezone.now(), None)
+    flush_hits_if_due()
+
+
+def flush_hits_if_due():
+    if time.monotonic() - _last_flush >= HIT_FLUSH_INTERVAL:
+        flush_hits()
+
+
+def flush_hits():
+    """
+    Write the shared hit counters with a single UPDATE, returns the number of
+    entries (``0`` while another worker is flushing)
+    """
+    global _last_flush
+    _last_flush = time.monotonic()
+    if not cache.add(HIT_FLUSH_LOCK_KEY, True, HIT_FLUSH_LOCK_TIMEOUT):
+        return 0
+    try:
+        entry_ids = list(BlockList.objects.values_list('pk', flat=True))
+        counts = cache.get_many([HIT_COUNT_KEY.format(entry_id=entry_id) for entry_id in entry_ids])
+        hits = {}
+        for entry_id in entry_ids:
+            key = HIT_COUNT_KEY.format(entry_id=entry_id)
+            if counts.get(key):
+                # Hits counted meanwhile stay in the counter for the next flush
+                try:
+                    cache.decr(key, counts[key])
+                except ValueError:
+                    pass
+                hits[entry_id] = counts[key]
+        if not hits:
+            return 0
+
+        found = cache.get_many([HIT_AT_KEY.format(entry_id=entry_id) for entry_id in hits])
+        last_hit = {
+            entry_id: found[HIT_AT_KEY.format(entry_id=entry_id)]
+            for entry_id in hits if HIT_AT_KEY.format(entry_id=entry_id) in found
+        }
+        BlockList.objects.filter(pk__in=hits).update(
+            block_count=F('block_count') + Case(
+                *[When(pk=entry_id, then=count) for entry_id, count in hits.items()],
+                default=0,
+                output_field=IntegerField(),
+            ),
+            last_triggered=Case(
+                *[When(pk=entry_id, then=triggered) for entry_id, triggered in last_hit.items()],
+                default=F('last_triggered'),
+            ),
+        )
+        return len(hits)
+    finally:
+        cache.delete(HIT_FLUSH_LOCK_KEY)
+
+
+def check(block_type, value, count_hit=True):
+    """Id of the active entry blocking ``value``, counting the hit"""
+    entry_id = get_blocklist().match(block_type, value)
+    if entry_id is not None and count_hit:
+        record_hit(entry_id)
+    else:
+        flush_hits_if_due()
+    return entry_id
+
+
+@receiver(post_save, sender=BlockList)
+@receiver(post_delete, sender=BlockList)
+def invalidate_blocklist(sender, **kwargs):
+    bump_blocklist_version()
@@ -204,7 +204,7 @@ class BulkEmailForm(forms.Form):
         initial=False,
         required=False,
         widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
-        help_text="Send immediately or queue for background processing"
+        help_text="Send the first batch right away, the rest is sent by the send_queued_emails command"
     )
     
     def clean_custom_emails(self):
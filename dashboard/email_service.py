@@ -19,7 +19,6 @@ else:
 
 from django.conf import settings
 from django.core.mail import get_connection, EmailMultiAlternatives
-from django.template import Template, Context
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.contrib.auth import get_user_model
@@ -93,74 +92,20 @@ class EmailService:
             bool: True if email was sent successfully, False otherwise
         """
         try:
-            from .models import EmailTemplate
+            from .email_templates import get_compiled_template
             
-            # Get email template
-            template = EmailTemplate.objects.filter(
-                template_type=template_type,
-                is_active=True
-            ).first()
+            # Get compiled email template
+            compiled = get_compiled_template(template_type)
             
-            if not template:
+            if not compiled:
                 logger.error(f"No active email template found for type: {template_type}")
                 return False
+            template = compiled.template
             
-            # Prepare context
-            if context is None:
-                context = {}
-            
-            # Get site settings from database
-            try:
-                from settings.models import SiteSettings
-                site_settings = SiteSettings.get_active_settings()
-                site_name = site_settings.site_name if site_settings else 'Our Store'
-                site_url = getattr(settings, 'SITE_URL', 'http://localhost:8000')
-            except:
-                site_name = getattr(settings, 'SITE_NAME', 'Our Store')
-                site_url = getattr(settings, 'SITE_URL', 'http://localhost:8000')
-            
-            # Add default context variables
-            context.update({
-                'site_name': site_name,
-                'site_url': site_url,
-                'current_year': datetime.now().year,
-                'current_date': datetime.now().strftime('%Y-%m-%d'),
-                'current_time': datetime.now().strftime('%H:%M:%S'),
-            })
-            
-            if user:
-                context.update({
-                    'user_name': user.first_name or user.username,
-                    'user_email': user.email,
-                    'user_full_name': f"{user.first_name} {user.last_name}".strip(),
-                })
-            
-            if order:
-                context.update({
-                    'order_number': order.order_number,
-                    'order_total': order.total_amount,
-                    'order_status': order.get_status_display(),
-                    'order_date': order.created_at,
-                    'tracking_number': getattr(order, 'tracking_number', 'TRK' + str(order.id).zfill(8)),
-                    'carrier': getattr(order, 'carrier', 'Express Logistics'),
-                    'shipping_method': getattr(order, 'shipping_method', 'Standard Delivery'),
-                    'estimated_delivery': getattr(order, 'estimated_delivery', '3-5 business days'),
-                    'tracking_url': f"{site_url}/track/{getattr(order, 'tracking_number', order.order_number)}",
-                    'shipping_address': getattr(order, 'shipping_address', 'Your delivery address'),
-                })
+            context = self._build_context(context, user, order)
             
             # Render template content
-            subject = template.get_rendered_subject(context)
-            html_content = template.get_rendered_content(context)
-            
-            # Generate text content if not provided
-            text_content = template.text_content
-            if not text_content:
-                text_content = strip_tags(html_content)
-            else:
-                # Render text content with context
-                text_template = Template(text_content)
-                text_content = text_template.render(Context(context))
+            subject, html_content, text_content = compiled.render(context)
             
             # Send email
             success = self.send_email(
@@ -200,6 +145,279 @@ class EmailService:
             
             return False
     
+    def _get_site_context(self) -> Dict[str, Any]:
+        """Site-wide variables available to every template."""
+        # Get site settings from database
+        try:
+            from settings.models import SiteSettings
+            site_settings = SiteSettings.get_active_settings()
+            site_name = site_settings.site_name if site_settings else 'Our Store'
+            site_url = getattr(settings, 'SITE_URL', 'http://localhost:8000')
+        except:
+            site_name = getattr(settings, 'SITE_NAME', 'Our Store')
+            site_url = getattr(settings, 'SITE_URL', 'http://localhost:8000')
+        
+        return {
+            'site_name': site_name,
+            'site_url': site_url,
+            'current_year': datetime.now().year,
+            'current_date': datetime.now().strftime('%Y-%m-%d'),
+            'current_time': datetime.now().strftime('%H:%M:%S'),
+        }
+    
+    def _build_context(self, context=None, user=None, order=None, site_context=None) -> Dict[str, Any]:
+        """Template context with site, user and order variables."""
+        context = dict(context or {})
+        site_context = site_context or self._get_site_context()
+        context.update(site_context)
+        site_url = site_context['site_url']
+        
+        if user:
+            context.update({
+                'user_name': user.first_name or user.username,
+                'user_email': user.email,
+                'user_full_name': f"{user.first_name} {user.last_name}".strip(),
+            })
+        
+        if order:
+            context.update({
+                'order_number': order.order_number,
+                'order_total': order.total_amount,
+                'order_status': order.get_status_display(),
+                'order_date': order.created_at,
+                'tracking_number': getattr(order, 'tracking_number', 'TRK' + str(order.id).zfill(8)),
+                'carrier': getattr(order, 'carrier', 'Express Logistics'),
+                'shipping_method': getattr(order, 'shipping_method', 'Standard Delivery'),
+                'estimated_delivery': getattr(order, 'estimated_delivery', '3-5 business days'),
+                'tracking_url': f"{site_url}/track/{getattr(order, 'tracking_number', order.order_number)}",
+                'shipping_address': getattr(order, 'shipping_address', 'Your delivery address'),
+            })
+        
+        return context
+    
+    def send_bulk_template_email(
+        self,
+        template_type: str,
+        recipients: List[Dict[str, Any]],
+        subject_override: str = None
+    ) -> Dict[str, int]:
+        """
+        Send one template to many recipients.
+        
+        The template is compiled once, every context is rendered against it
+        and all messages go out over a single connection.
+        
+        Args:
+            template_type: Type of email template to use
+            recipients: Dicts with ``recipient_email`` and optional
+                ``context``, ``user`` and ``order``
+            subject_override: Subject used instead of the template subject
+        
+        Returns:
+            dict: Number of emails ``sent`` and ``failed``
+        """
+        from .email_templates import get_compiled_template
+        from .models import EmailLog
+        
+        result = {'sent': 0, 'failed': 0}
+        recipients = [r for r in recipients if r.get('recipient_email')]
+        if not recipients:
+            return result
+        
+        compiled = get_compiled_template(template_type)
+        if not compiled or not self.active_config:
+            logger.error(f"Cannot send bulk email: no active template or configuration for {template_type}")
+            result['failed'] = len(recipients)
+            return result
+        
+        site_context = self._get_site_context()
+        rendered = compiled.render_many(
+            self._build_context(r.get('context'), r.get('user'), r.get('order'), site_context)
+            for r in recipients
+        )
+        
+        logs = []
+        now = datetime.now(timezone.utc)
+        connection = self.get_connection()
+        try:
+            connection.open()
+            for recipient, (subject, html_content, text_content) in zip(recipients, rendered):
+                subject = subject_override or subject
+                error_message = ""
+                try:
+                    email = self._build_message(
+                        subject, html_content, text_content, recipient['recipient_email'], connection
+                    )
+                    sent = connection.send_messages([email])
+                    if not sent:
+                        error_message = "Failed to send email"
+                except Exception as e:
+                    error_message = str(e)
+                
+                result['failed' if error_message else 'sent'] += 1
+                logs.append(EmailLog(
+                    recipient_email=recipient['recipient_email'],
+                    sender_email=self.active_config.from_email,
+                    subject=subject,
+                    template=compiled.template,
+                    status='failed' if error_message else 'sent',
+                    error_message=error_message,
+                    user=recipient.get('user'),
+                    order=recipient.get('order'),
+                    email_config=self.active_config,
+                    sent_at=None if error_message else now,
+                ))
+        except Exception as e:
+            logger.error(f"Error sending bulk email: {str(e)}")
+            result['failed'] = len(recipients) - result['sent']
+        finally:
+            connection.close()
+        
+        try:
+            EmailLog.objects.bulk_create(logs)
+        except Exception as e:
+            logger.error(f"Error logging bulk email: {str(e)}")
+        
+        return result
+    
+    def queue_bulk_template_email(
+        self,
+        template,
+        recipients,
+        subject_override: str = None,
+        batch_size: int = 500
+    ) -> int:
+        """
+        Queue one template for many recipients without sending anything.
+        
+        Every recipient gets a ``pending`` ``EmailLog`` row, written in
+        batches; ``send_queued_emails`` (``python manage.py
+        send_queued_emails``) sends them.
+        
+        Args:
+            template: ``EmailTemplate`` to send
+            recipients: Iterable of dicts with ``recipient_email`` and
+                optional ``user`` and ``order``
+            subject_override: Subject used instead of the template subject
+            batch_size: Rows written per ``bulk_create``
+        
+        Returns:
+            int: Number of emails queued
+        """
+        from itertools import islice
+        from .models import EmailLog
+        
+        sender_email = self.active_config.from_email if self.active_config else "system@example.com"
+        recipients = (r for r in recipients if r.get('recipient_email'))
+        queued = 0
+        while True:
+            batch = [
+                EmailLog(
+                    recipient_email=recipient['recipient_email'],
+                    sender_email=sender_email,
+                    # Empty until sent, the template subject is rendered per recipient
+                    subject=subject_override or "",
+                    template=template,
+                    status='pending',
+                    user=recipient.get('user'),
+                    order=recipient.get('order'),
+                )
+                for recipient in islice(recipients, batch_size)
+            ]
+            if not batch:
+                return queued
+            EmailLog.objects.bulk_create(batch)
+            queued += len(batch)
+    
+    def send_queued_emails(self, batch_size: int = 100, max_batches: int = None) -> Dict[str, int]:
+        """
+        Send the emails queued by ``queue_bulk_template_email``.
+        
+        Emails go out in batches over one connection per batch, and the logs
+        of a batch are updated before the next batch starts, so a stopped run
+        can only send the batch in progress again. Batches are claimed with
+        ``SELECT ... FOR UPDATE SKIP LOCKED`` where the database supports it,
+        so concurrent runs don't send the same rows.
+        
+        Args:
+            batch_size: Emails sent per batch
+            max_batches: Stop after this many batches (default: until the
+                queue is empty)
+        
+        Returns:
+            dict: Number of emails ``sent`` and ``failed``
+        """
+        from django.db import transaction
+        from .email_templates import compile_template
+        from .models import EmailLog
+        
+        result = {'sent': 0, 'failed': 0}
+        if not self.active_config:
+            logger.error("Cannot send queued emails: no active email configuration")
+            return result
+        
+        site_context = self._get_site_context()
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            with transaction.atomic():
+                ids = list(
+                    EmailLog.objects.filter(status='pending', template__isnull=False)
+                    .select_for_update(skip_locked=True)
+                    .order_by('id').values_list('id', flat=True)[:batch_size]
+                )
+                logs = list(
+                    EmailLog.objects.filter(id__in=ids).select_related('template', 'user', 'order').order_by('id')
+                )
+                if not logs:
+                    break
+                
+                now = datetime.now(timezone.utc)
+                connection = self.get_connection()
+                try:
+                    connection.open()
+                    for log in logs:
+                        subject, html_content, text_content = compile_template(log.template).render(
+                            self._build_context(None, log.user, log.order, site_context)
+                        )
+                        log.subject = log.subject or subject
+                        log.email_config = self.active_config
+                        try:
+                            email = self._build_message(
+                                log.subject, html_content, text_content, log.recipient_email, connection
+                            )
+                            log.error_message = "" if connection.send_messages([email]) else "Failed to send email"
+                        except Exception as e:
+                            log.error_message = str(e)
+                        log.status = 'failed' if log.error_message else 'sent'
+                        log.sent_at = None if log.error_message else now
+                        result[log.status] += 1
+                finally:
+                    connection.close()
+                
+                EmailLog.objects.bulk_update(
+                    logs, ['subject', 'status', 'error_message', 'email_config', 'sent_at']
+                )
+            batches += 1
+        
+        return result
+    
+    def _build_message(self, subject, html_content, text_content, recipient_email, connection):
+        """Create an email message with the configured From header."""
+        email = EmailMultiAlternatives(
+            subject=subject,
+            body=text_content or strip_tags(html_content),
+            from_email=self.active_config.from_email,
+            to=[recipient_email],
+            connection=connection
+        )
+        
+        # Set the From header with both name and email
+        email.extra_headers['From'] = f"{self.active_config.from_name} <{self.active_config.from_email}>"
+        
+        # Add HTML content
+        email.attach_alternative(html_content, "text/html")
+        return email
+    
     def send_email(
         self,
         subject: str,
@@ -227,22 +445,10 @@ class EmailService:
                 return False
             
             # Create email message
-            email = EmailMultiAlternatives(
-                subject=subject,
-                body=text_content or strip_tags(html_content),
-                from_email=self.active_config.from_email,
-                to=[recipient_email],
-                connection=self.get_connection()
+            email = self._build_message(
+                subject, html_content, text_content, recipient_email, self.get_connection()
             )
-            
-            # Set the From header with both name and email
-            from_header = f"{self.active_config.from_name} <{self.active_config.from_email}>"
-            email.extra_headers['From'] = from_header
-            
-            logger.info(f"Sending email with From header: {from_header}")
-            
-            # Add HTML content
-            email.attach_alternative(html_content, "text/html")
+            logger.info(f"Sending email with From header: {email.extra_headers['From']}")
             
             # Add attachments if provided
             if attachments:
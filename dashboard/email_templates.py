@@ -0,0 +1,128 @@
+"""
+Compiled email template cache.
+
+``EmailTemplate`` rows are looked up once per template type (cached in the
+Django cache) and their subject, HTML and text bodies are parsed by the
+template engine once per template id and ``updated_at`` (cached in process).
+Saving or deleting a template invalidates both for every type (a save may
+change the type), and since compiled entries are keyed by ``updated_at``
+other processes pick up edits on their next lookup.
+
+``CompiledEmailTemplate.render_many`` renders any number of contexts against
+the same compiled template, for order-status and bulk campaign sends.
+"""
+import logging
+import threading
+
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.template import Context, Template
+from django.utils.html import strip_tags
+
+from .models import EmailTemplate
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_CACHE_KEY = 'email_template_{template_type}'
+TEMPLATE_CACHE_TIMEOUT = 60 * 60
+
+_compiled = {}
+_lock = threading.Lock()
+
+
+def _compile(source):
+    try:
+        return Template(source)
+    except Exception as e:
+        logger.error(f"Could not compile email template: {str(e)}")
+        return None
+
+
+class CompiledEmailTemplate:
+    """Subject, HTML and text bodies of an ``EmailTemplate``, parsed once"""
+
+    def __init__(self, template):
+        self.template = template
+        self.subject = _compile(template.subject)
+        self.html = _compile(template.html_content)
+        self.text = _compile(template.text_content) if template.text_content else None
+
+    @staticmethod
+    def _render(compiled, source, context):
+        # Rendering errors fall back to the raw source, like the model's render methods
+        if compiled is None:
+            return source
+        try:
+            return compiled.render(context)
+        except Exception:
+            return source
+
+    def render_subject(self, context=None):
+        if not context:
+            return self.template.subject
+        return self._render(self.subject, self.template.subject, Context(context))
+
+    def render_content(self, context=None):
+        if not context:
+            return self.template.html_content
+        return self._render(self.html, self.template.html_content, Context(context))
+
+    def render(self, context):
+        """Return ``(subject, html_content, text_content)`` for one context"""
+        context = Context(context)
+        subject = self._render(self.subject, self.template.subject, context)
+        html_content = self._render(self.html, self.template.html_content, context)
+        if self.text is not None:
+            text_content = self._render(self.text, self.template.text_content, context)
+        else:
+            text_content = strip_tags(html_content)
+        return subject, html_content, text_content
+
+    def render_many(self, contexts):
+        """Render every context against the same compiled template"""
+        return [self.render(context) for context in contexts]
+
+
+def compile_template(template):
+    """Return the compiled form of an ``EmailTemplate`` instance"""
+    key = (template.pk, template.updated_at)
+    compiled = _compiled.get(key)
+    if compiled is None:
+        compiled = CompiledEmailTemplate(template)
+        with _lock:
+            # Drop compiled copies of older versions of this template
+            for stale in [k for k in _compiled if k[0] == template.pk]:
+                del _compiled[stale]
+            _compiled[key] = compiled
+    return compiled
+
+
+def get_compiled_template(template_type):
+    """Compiled active template of ``template_type``, or ``None``"""
+    cache_key = TEMPLATE_CACHE_KEY.format(template_type=template_type)
+    template = cache.get(cache_key)
+    if template is None:
+        template = EmailTemplate.objects.filter(template_type=template_type, is_active=True).first()
+        # Cache misses too, so unknown types don't query on every send
+        cache.set(cache_key, template or False, TEMPLATE_CACHE_TIMEOUT)
+    if not template:
+        return None
+    return compile_template(template)
+
+
+def clear_template_cache():
+    with _lock:
+        _compiled.clear()
+    cache.delete_many([
+        TEMPLATE_CACHE_KEY.format(template_type=template_type)
+        for template_type, _ in EmailTemplate.TEMPLATE_TYPE_CHOICES
+    ])
+
+
+@receiver(post_save, sender=EmailTemplate)
+@receiver(post_delete, sender=EmailTemplate)
+def invalidate_email_template(sender, instance, **kwargs):
+    # A save may have moved the template to another type, which leaves its
+    # instance cached under the old type, so every type is looked up again
+    clear_template_cache()
@@ -345,15 +345,46 @@ def email_log_detail(request, pk):
     return render(request, 'dashboard/email_settings/log_detail.html', context)
 
 
+def _bulk_email_recipients(recipient_type, custom_emails=None):
+    """Recipients for a bulk email, as accepted by ``queue_bulk_template_email``."""
+    from django.contrib.auth import get_user_model
+    from datetime import timedelta
+    
+    if recipient_type == 'custom':
+        return [{'recipient_email': email} for email in custom_emails or []]
+    
+    users = get_user_model().objects.exclude(email='')
+    if recipient_type == 'active_users':
+        users = users.filter(is_active=True)
+    elif recipient_type == 'newsletter_subscribers':
+        users = users.filter(is_active=True, profile__newsletter_subscription=True)
+    elif recipient_type == 'recent_customers':
+        users = users.filter(orders__created_at__gte=timezone.now() - timedelta(days=30)).distinct()
+    
+    return ({'recipient_email': user.email, 'user': user} for user in users.iterator())
+
+
 @staff_member_required
 def bulk_email(request):
-    """Send bulk emails."""
+    """Queue bulk emails, sent in batches by the send_queued_emails command."""
     if request.method == 'POST':
         form = BulkEmailForm(request.POST)
         if form.is_valid():
-            # This would implement bulk email sending
-            # For now, just show a success message
-            messages.success(request, 'Bulk email job queued successfully.')
+            queued = email_service.queue_bulk_template_email(
+                form.cleaned_data['template'],
+                _bulk_email_recipients(form.cleaned_data['recipient_type'], form.cleaned_data.get('custom_emails')),
+                subject_override=form.cleaned_data.get('subject_override') or None
+            )
+            if form.cleaned_data.get('send_immediately'):
+                # One batch at most, a large audience would outlast the request
+                result = email_service.send_queued_emails(max_batches=1)
+                messages.success(
+                    request,
+                    f"{queued} emails queued, {result['sent']} sent now ({result['failed']} failed). "
+                    f"The rest are sent by the send_queued_emails command."
+                )
+            else:
+                messages.success(request, f"{queued} emails queued, they are sent by the send_queued_emails command.")
             return redirect('dashboard:email_log_list')
     else:
         form = BulkEmailForm()
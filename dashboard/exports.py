@@ -0,0 +1,144 @@
+"""
+Streaming exports for dashboard reports.
+
+An export is a list of column headers plus a generator of rows. Rows are
+produced from querysets read with ``iterator(chunk_size=...)`` so that the
+response starts with the first chunk and memory stays flat no matter how
+many rows the report contains. CSV is streamed directly; XLSX and Parquet
+writers are available when ``openpyxl`` / ``pyarrow`` are installed.
+"""
+import csv
+import io
+import logging
+
+from django.http import HttpResponse, StreamingHttpResponse
+
+try:
+    from openpyxl import Workbook
+    XLSX_AVAILABLE = True
+except ImportError:
+    XLSX_AVAILABLE = False
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 2000
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+
+class ExportFormatError(ValueError):
+    """Raised when an export format is unknown or its writer is not installed"""
+
+
+class Echo:
+    """File-like object that hands back what is written, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def iter_queryset(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Iterate a queryset in chunks without caching the results.
+
+    ``prefetch_related`` lookups on the queryset are applied per chunk,
+    so related rows are fetched with one query per chunk instead of one
+    per object.
+    """
+    return queryset.iterator(chunk_size=chunk_size)
+
+
+def available_formats():
+    """Return the export formats that can be produced in this environment"""
+    formats = ['csv']
+    if XLSX_AVAILABLE:
+        formats.append('xlsx')
+    if PARQUET_AVAILABLE:
+        formats.append('parquet')
+    return formats
+
+
+class StreamingExport:
+    """A named report made of ``headers`` and a ``rows`` iterable"""
+
+    def __init__(self, filename, headers, rows):
+        self.filename = filename
+        self.headers = list(headers)
+        self.rows = rows
+
+    def response(self, export_format='csv'):
+        """Build the HTTP response for the requested format"""
+        export_format = (export_format or 'csv').lower()
+        if export_format not in EXPORT_FORMATS:
+            raise ExportFormatError(f"Unsupported export format: {export_format}")
+        if export_format not in available_formats():
+            raise ExportFormatError(f"Export format '{export_format}' is not available on this server")
+
+        content_type, extension = EXPORT_FORMATS[export_format]
+        if export_format == 'csv':
+            response = StreamingHttpResponse(self.iter_csv(), content_type=content_type)
+        elif export_format == 'xlsx':
+            response = HttpResponse(self.render_xlsx(), content_type=content_type)
+        else:
+            response = HttpResponse(self.render_parquet(), content_type=content_type)
+
+        response['Content-Disposition'] = f'attachment; filename="{self.filename}.{extension}"'
+        return response
+
+    def iter_csv(self):
+        writer = csv.writer(Echo())
+        yield writer.writerow(self.headers)
+        for row in self.rows:
+            yield writer.writerow(row)
+
+    def render_xlsx(self):
+        # write_only workbooks keep only the current row in memory
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet(title=self.filename[:31])
+        sheet.append(self.headers)
+        for row in self.rows:
+            sheet.append(row)
+
+        output = io.BytesIO()
+        workbook.save(output)
+        return output.getvalue()
+
+    def render_parquet(self, batch_size=DEFAULT_CHUNK_SIZE):
+        output = io.BytesIO()
+        writer = None
+        batch = []
+
+        def flush():
+            nonlocal writer
+            columns = list(zip(*batch))
+            table = pa.table({
+                header: pa.array([None if v is None else str(v) for v in column], type=pa.string())
+                for header, column in zip(self.headers, columns)
+            })
+            if writer is None:
+                writer = pq.ParquetWriter(output, table.schema)
+            writer.write_table(table)
+            batch.clear()
+
+        for row in self.rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+        if writer is None:
+            # Empty report: still write the schema
+            writer = pq.ParquetWriter(output, pa.schema([(header, pa.string()) for header in self.headers]))
+        writer.close()
+        return output.getvalue()
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+from dashboard.blocklist import HIT_FLUSH_INTERVAL, flush_hits
+
+
+class Command(BaseCommand):
+    help = 'Write buffered blocklist hit counts to the database'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running and flush every --interval seconds'
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=HIT_FLUSH_INTERVAL,
+            help=f'Seconds between flushes with --loop (default: {HIT_FLUSH_INTERVAL})'
+        )
+    
+    def handle(self, *args, **options):
+        while True:
+            entries = flush_hits()
+            self.stdout.write(self.style.SUCCESS(f'Updated hit counts of {entries} blocklist entries'))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
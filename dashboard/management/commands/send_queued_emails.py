@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+from dashboard.email_service import email_service
+
+
+class Command(BaseCommand):
+    help = 'Send queued bulk emails in batches'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Emails sent per batch (default: 100)'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running and send new emails every --interval seconds'
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=60,
+            help='Seconds between runs with --loop (default: 60)'
+        )
+    
+    def handle(self, *args, **options):
+        while True:
+            result = email_service.send_queued_emails(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Sent {result['sent']} queued emails ({result['failed']} failed)"
+            ))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -12,6 +12,8 @@ from django.conf import settings
 from datetime import timedelta
 import logging
 
+from .session_activity import get_dashboard_tracker, get_session_refresh_tracker
+
 logger = logging.getLogger(__name__)
 
 class DashboardSecurityMiddleware:
@@ -31,6 +33,8 @@ class DashboardSecurityMiddleware:
         self.validate_ip = getattr(settings, 'DASHBOARD_VALIDATE_IP', False)
         # User agent validation enabled
         self.validate_user_agent = getattr(settings, 'DASHBOARD_VALIDATE_USER_AGENT', False)
+        # Activity is written at most once per DASHBOARD_ACTIVITY_GRANULARITY seconds
+        self.activity_tracker = get_dashboard_tracker()
 
     def __call__(self, request):
         # Only apply to dashboard URLs
@@ -94,30 +98,20 @@ class DashboardSecurityMiddleware:
         last_activity_str = request.session.get('last_activity')
         
         if last_activity_str:
-            try:
-                last_activity = timezone.datetime.fromisoformat(last_activity_str.replace('Z', '+00:00'))
-                
-                # Make timezone aware if needed
-                if timezone.is_naive(last_activity):
-                    last_activity = timezone.make_aware(last_activity)
-                
-                # Calculate time since last activity
-                time_since_activity = timezone.now() - last_activity
-                timeout_duration = timedelta(minutes=self.session_timeout)
-                
-                if time_since_activity > timeout_duration:
-                    # Session has timed out
-                    logger.info(f"Session timeout for user {request.user.username}")
-                    logout(request)
-                    messages.warning(request, 
-                        f'Your session has expired due to inactivity. '
-                        f'Please log in again.')
-                    return redirect('dashboard:login')
-                    
-            except (ValueError, TypeError) as e:
-                logger.warning(f"Invalid last_activity format: {e}")
+            last_activity = self.activity_tracker.last_seen(request.session)
+            
+            if last_activity is None:
+                logger.warning(f"Invalid last_activity format: {last_activity_str!r}")
                 # Reset activity timestamp
                 request.session['last_activity'] = timezone.now().isoformat()
+            elif timezone.now() - last_activity > timedelta(minutes=self.session_timeout):
+                # Session has timed out
+                logger.info(f"Session timeout for user {request.user.username}")
+                logout(request)
+                messages.warning(request, 
+                    f'Your session has expired due to inactivity. '
+                    f'Please log in again.')
+                return redirect('dashboard:login')
         
         return None
 
@@ -161,8 +155,8 @@ class DashboardSecurityMiddleware:
         return None
 
     def update_activity(self, request):
-        """Update last activity timestamp"""
-        request.session['last_activity'] = timezone.now().isoformat()
+        """Update last activity timestamp, skipped while it is still recent"""
+        self.activity_tracker.touch(request.session)
 
     def get_client_ip(self, request):
         """Get client IP address from request"""
@@ -174,6 +168,32 @@ class DashboardSecurityMiddleware:
         return ip
 
 
+class SessionRefreshMiddleware:
+    """
+    Keeps the expiry of authenticated sessions sliding without
+    ``SESSION_SAVE_EVERY_REQUEST``.
+
+    The session of a logged in user is marked modified (and so saved with a
+    new expiry) at most once per ``SESSION_REFRESH_GRANULARITY`` seconds.
+    Anonymous sessions are only saved when a view changes them.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.tracker = get_session_refresh_tracker()
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        # Without a session cookie there is no session to keep alive
+        if settings.SESSION_COOKIE_NAME in request.COOKIES:
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                self.tracker.touch(request.session)
+
+        return response
+
+
 class DashboardCSRFMiddleware:
     """
     Enhanced CSRF protection specifically for dashboard
@@ -167,29 +167,18 @@ class EmailTemplate(models.Model):
     def __str__(self):
         return f"{self.name} ({self.get_template_type_display()})"
     
+    def get_compiled(self):
+        """Compiled subject and bodies, cached per template version."""
+        from .email_templates import compile_template
+        return compile_template(self)
+    
     def get_rendered_subject(self, context=None):
         """Render subject with context variables."""
-        if not context:
-            return self.subject
-        
-        try:
-            from django.template import Template, Context
-            template = Template(self.subject)
-            return template.render(Context(context))
-        except Exception:
-            return self.subject
+        return self.get_compiled().render_subject(context)
     
     def get_rendered_content(self, context=None):
         """Render HTML content with context variables."""
-        if not context:
-            return self.html_content
-        
-        try:
-            from django.template import Template, Context
-            template = Template(self.html_content)
-            return template.render(Context(context))
-        except Exception:
-            return self.html_content
+        return self.get_compiled().render_content(context)
 
 
 class EmailLog(models.Model):
@@ -331,20 +320,17 @@ class BlockList(models.Model):
     def clean(self):
         """Validate the blocked value based on type"""
         from django.core.exceptions import ValidationError
-        from django.core.validators import validate_ipv4_address, validate_ipv6_address
         import re
         
         if self.block_type == 'ip':
-            # Validate IP address format
+            # Validate IP address, CIDR network or range format
+            from .blocklist import parse_ip_range
             try:
-                # Try IPv4 first, then IPv6
-                try:
-                    validate_ipv4_address(self.value)
-                except ValidationError:
-                    validate_ipv6_address(self.value)
-            except ValidationError:
+                parse_ip_range(self.value)
+            except ValueError:
                 raise ValidationError({
-                    'value': 'Please enter a valid IP address (IPv4 or IPv6).'
+                    'value': 'Please enter a valid IP address, CIDR network (e.g. 10.0.0.0/24) '
+                             'or range (e.g. 10.0.0.1-10.0.0.50).'
                 })
         
         elif self.block_type == 'phone':
@@ -364,33 +350,21 @@ class BlockList(models.Model):
         super().save(*args, **kwargs)
     
     def trigger_block(self):
-        """Record that this block was triggered"""
-        from django.utils import timezone
-        self.block_count += 1
-        self.last_triggered = timezone.now()
-        self.save(update_fields=['block_count', 'last_triggered'])
+        """Record that this block was triggered (buffered, see ``dashboard.blocklist``)"""
+        from .blocklist import record_hit
+        record_hit(self.pk)
     
     @classmethod
     def is_blocked(cls, block_type, value):
         """Check if a phone number or IP address is blocked"""
-        return cls.objects.filter(
-            block_type=block_type,
-            value=value,
-            is_active=True
-        ).exists()
+        from .blocklist import check
+        return check(block_type, value, count_hit=False) is not None
     
     @classmethod
     def check_and_block(cls, block_type, value):
         """Check if blocked and trigger the block if found"""
-        try:
-            block_entry = cls.objects.get(
-                block_type=block_type,
-                value=value,
-                is_active=True
-            )
-            block_entry.trigger_block()
-            return block_entry
-        except cls.DoesNotExist:
+        from .blocklist import check
+        entry_id = check(block_type, value)
+        if entry_id is None:
             return None
-
-
+        return cls.objects.filter(pk=entry_id).first()
@@ -768,17 +768,14 @@ class BlockListSerializer(serializers.ModelSerializer):
         block_type = self.initial_data.get('block_type')
         
         if block_type == 'ip':
-            # Validate IP address format
-            from django.core.validators import validate_ipv4_address, validate_ipv6_address
-            from django.core.exceptions import ValidationError as DjangoValidationError
+            # Validate IP address, CIDR network or range format
+            from .blocklist import parse_ip_range
             try:
-                # Try IPv4 first, then IPv6
-                try:
-                    validate_ipv4_address(value)
-                except DjangoValidationError:
-                    validate_ipv6_address(value)
-            except DjangoValidationError:
-                raise serializers.ValidationError("Please enter a valid IP address (IPv4 or IPv6).")
+                parse_ip_range(value)
+            except ValueError:
+                raise serializers.ValidationError(
+                    "Please enter a valid IP address, CIDR network (e.g. 10.0.0.0/24) or range (e.g. 10.0.0.1-10.0.0.50)."
+                )
         
         elif block_type == 'phone':
             # Validate and clean phone number
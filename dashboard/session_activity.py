@@ -0,0 +1,73 @@
+"""
+Throttled session activity tracking.
+
+Writing a timestamp into the session on every request marks the session
+modified, so each dashboard page view and AJAX poll becomes a write to the
+session store. ``ActivityTracker`` only rewrites its timestamp once it is
+older than the configured granularity and otherwise leaves the session
+untouched, so the store is written at most once per granularity window.
+
+With ``SESSION_SAVE_EVERY_REQUEST`` disabled, sessions of anonymous
+storefront visitors are only saved when a view actually changes them (cart,
+coupon, ...), while the expiry of authenticated sessions is kept sliding by
+``SessionRefreshMiddleware`` on the same throttled schedule.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+DEFAULT_ACTIVITY_GRANULARITY = 60  # seconds
+DEFAULT_SESSION_REFRESH_GRANULARITY = 300  # seconds
+
+
+def parse_timestamp(value):
+    """Timezone aware datetime of an ISO timestamp, ``None`` if invalid"""
+    if not value:
+        return None
+    try:
+        timestamp = timezone.datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except (ValueError, TypeError):
+        return None
+    if timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp)
+    return timestamp
+
+
+class ActivityTracker:
+    """Keeps an activity timestamp in the session, written at most once per ``granularity`` seconds"""
+
+    def __init__(self, key, granularity):
+        self.key = key
+        self.granularity = timedelta(seconds=max(0, granularity))
+
+    def last_seen(self, session):
+        return parse_timestamp(session.get(self.key))
+
+    def touch(self, session, now=None):
+        """
+        Record activity, returns ``True`` when the session was written.
+
+        Reading the stored value doesn't mark the session modified, so
+        requests inside the granularity window cause no session save.
+        """
+        now = now or timezone.now()
+        last_seen = self.last_seen(session)
+        if last_seen is not None and timedelta(0) <= now - last_seen < self.granularity:
+            return False
+        session[self.key] = now.isoformat()
+        return True
+
+
+def get_dashboard_tracker():
+    return ActivityTracker(
+        'last_activity',
+        getattr(settings, 'DASHBOARD_ACTIVITY_GRANULARITY', DEFAULT_ACTIVITY_GRANULARITY),
+    )
+
+
+def get_session_refresh_tracker():
+    return ActivityTracker(
+        '_session_refreshed',
+        getattr(settings, 'SESSION_REFRESH_GRANULARITY', DEFAULT_SESSION_REFRESH_GRANULARITY),
+    )
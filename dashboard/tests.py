@@ -1,3 +1,394 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from orders.models import Order, OrderItem
+from products.models import Product, Category, ProductVariant
+from utils.testing import LOCMEM_CACHES
+from .exports import StreamingExport, ExportFormatError
+
+User = get_user_model()
+
+
+class StreamingExportTest(TestCase):
+    """Test cases for the streaming export subsystem"""
+
+    def test_csv_is_streamed(self):
+        """Test CSV exports are streamed row by row"""
+        export = StreamingExport('report', ['A', 'B'], iter([[1, 'x'], [2, 'y,z']]))
+        response = export.response('csv')
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="report.csv"')
+        self.assertEqual(b''.join(response.streaming_content), b'A,B\r\n1,x\r\n2,"y,z"\r\n')
+
+    def test_unknown_format(self):
+        """Test unknown export formats are rejected"""
+        export = StreamingExport('report', ['A'], iter([]))
+        with self.assertRaises(ExportFormatError):
+            export.response('pdf')
+
+
+class DashboardExportViewTest(TestCase):
+    """Test cases for dashboard export endpoints"""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='testpass123',
+            is_staff=True, is_superuser=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+        category = Category.objects.create(name='Shirts', slug='shirts')
+        self.plain = Product.objects.create(
+            name='Plain Shirt', slug='plain-shirt', sku='PS-1', category=category,
+            price=Decimal('100.00'), cost_price=Decimal('60.00'), stock_quantity=5
+        )
+        self.variant_product = Product.objects.create(
+            name='Variant Shirt', slug='variant-shirt', sku='VS-1', category=category,
+            price=Decimal('200.00'), cost_price=Decimal('80.00'), stock_quantity=0
+        )
+        ProductVariant.objects.create(
+            product=self.variant_product, name='Large', sku='VS-L', stock_quantity=3
+        )
+
+        order = Order.objects.create(
+            subtotal=Decimal('300.00'), total_amount=Decimal('300.00'), status='delivered'
+        )
+        OrderItem.objects.create(
+            order=order, product=self.plain, quantity=2, unit_price=Decimal('100.00')
+        )
+
+    def test_export_stock_report(self):
+        """Test the stock report streams product and variant rows"""
+        response = self.client.get('/mb-admin/api/stock/export_stock_report/')
+
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content).decode('utf-8')
+        self.assertIn('Plain Shirt', content)
+        self.assertIn('Variant Level', content)
+        self.assertIn('└─ Large', content)
+
+    def test_export_products_performance(self):
+        """Test the performance export aggregates orders in the database"""
+        response = self.client.get('/mb-admin/api/export-products/', {'sort': 'orders'})
+
+        self.assertEqual(response.status_code, 200)
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(lines[1], 'Plain Shirt,Shirts,1,2,300.00,100.00,60.00,5')
+
+    def test_products_performance_matches_export(self):
+        """Test the JSON view uses the same aggregates"""
+        response = self.client.get('/mb-admin/api/products-performance/', {'sort': 'revenue'})
+
+        self.assertEqual(response.status_code, 200)
+        first = response.data['products'][0]
+        self.assertEqual(first['product_name'], 'Plain Shirt')
+        self.assertEqual(first['delivered_quantity'], 2)
+        self.assertEqual(first['revenue'], 300.0)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class EmailTemplateCacheTest(TestCase):
+    """Test cases for compiled email templates and bulk rendering"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from .models import EmailConfiguration, EmailTemplate
+
+        cache.clear()
+        self.template = EmailTemplate.objects.create(
+            name='Newsletter',
+            template_type='newsletter',
+            subject='News for {{ user_name }}',
+            html_content='<p>Hello {{ user_name }} from {{ site_name }}</p>',
+        )
+        self.config = EmailConfiguration.objects.create(
+            name='Test', smtp_host='localhost', smtp_username='shop', smtp_password='secret',
+            from_email='shop@example.com', from_name='Shop', is_active=True
+        )
+
+    def test_template_compiled_once_per_version(self):
+        """Test lookups and compilation are cached until the template is saved"""
+        from .email_templates import get_compiled_template
+
+        compiled = get_compiled_template('newsletter')
+        with self.assertNumQueries(0):
+            self.assertIs(get_compiled_template('newsletter'), compiled)
+        self.assertEqual(compiled.render({'user_name': 'Ana'})[0], 'News for Ana')
+
+        self.template.subject = 'Update for {{ user_name }}'
+        self.template.save()
+        self.assertEqual(get_compiled_template('newsletter').render_subject({'user_name': 'Ana'}), 'Update for Ana')
+        self.assertEqual(self.template.get_rendered_subject({'user_name': 'Bo'}), 'Update for Bo')
+
+    def test_type_change_drops_old_type(self):
+        """Test a template moved to another type is no longer served for the old one"""
+        from .email_templates import get_compiled_template
+
+        self.assertIsNotNone(get_compiled_template('newsletter'))
+        self.template.template_type = 'custom'
+        self.template.save()
+        self.assertIsNone(get_compiled_template('newsletter'))
+        self.assertEqual(get_compiled_template('custom').template, self.template)
+
+    def test_bulk_send_renders_against_one_template(self):
+        """Test a bulk send renders every recipient and uses one connection"""
+        from django.core import mail
+        from django.core.mail import get_connection
+        from .email_service import EmailService
+        from .models import EmailLog
+
+        connections = []
+
+        def locmem_connection():
+            connections.append(get_connection('django.core.mail.backends.locmem.EmailBackend'))
+            return connections[-1]
+
+        service = EmailService()
+        service.active_config = self.config
+        service.get_connection = locmem_connection
+
+        result = service.send_bulk_template_email('newsletter', [
+            {'recipient_email': 'a@example.com', 'context': {'user_name': 'Ana'}},
+            {'recipient_email': 'b@example.com', 'context': {'user_name': 'Bo'}},
+        ])
+
+        self.assertEqual(result, {'sent': 2, 'failed': 0})
+        self.assertEqual(len(connections), 1)
+        self.assertEqual([message.subject for message in mail.outbox], ['News for Ana', 'News for Bo'])
+        self.assertEqual(EmailLog.objects.filter(status='sent', template=self.template).count(), 2)
+
+
+    def test_bulk_email_is_queued_and_sent_in_batches(self):
+        """Test the bulk email form only queues, batches are sent and logged one at a time"""
+        from unittest import mock
+        from io import StringIO
+        from django.core import mail
+        from django.core.mail import get_connection
+        from django.core.management import call_command
+        from .email_service import email_service
+        from .models import EmailLog
+
+        staff = User.objects.create_user(
+            username='staff', email='staff@example.com', password='pass12345', is_staff=True, is_superuser=True
+        )
+        self.client.force_login(staff)
+        locmem = lambda: get_connection('django.core.mail.backends.locmem.EmailBackend')
+        with mock.patch.object(email_service, 'active_config', self.config), \
+                mock.patch.object(email_service, 'get_connection', locmem):
+            response = self.client.post('/mb-admin/email-settings/bulk/', {
+                'recipient_type': 'custom', 'custom_emails': 'a@example.com, b@example.com\nc@example.com',
+                'template': self.template.pk,
+            })
+            self.assertEqual(response.status_code, 302)
+            self.assertEqual(len(mail.outbox), 0)
+            self.assertEqual(EmailLog.objects.filter(status='pending').count(), 3)
+
+            self.assertEqual(email_service.send_queued_emails(batch_size=2, max_batches=1), {'sent': 2, 'failed': 0})
+            self.assertEqual(EmailLog.objects.filter(status='sent').count(), 2)
+            call_command('send_queued_emails', stdout=StringIO())
+
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), ['a@example.com', 'b@example.com', 'c@example.com'])
+        self.assertEqual(set(EmailLog.objects.values_list('status', 'subject')), {('sent', 'News for ')})
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BlocklistMatcherTest(TestCase):
+    """Test cases for the compiled blocklist matcher"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from .models import BlockList
+
+        cache.clear()
+        self.phone = BlockList.objects.create(block_type='phone', value='01777173040')
+        self.network = BlockList.objects.create(block_type='ip', value='10.0.0.0/8')
+        self.host = BlockList.objects.create(block_type='ip', value='10.1.2.3')
+        self.range = BlockList.objects.create(block_type='ip', value='192.168.1.10-192.168.1.20')
+
+    def test_matches_without_queries(self):
+        """Test phones, single IPs, CIDRs and ranges match from the compiled index"""
+        from .blocklist import get_blocklist
+
+        get_blocklist()
+        with self.assertNumQueries(0):
+            blocklist = get_blocklist()
+            self.assertEqual(blocklist.match_phone('+880 1777-173040'), self.phone.pk)
+            self.assertEqual(blocklist.match_ip('10.200.0.1'), self.network.pk)
+            self.assertEqual(blocklist.match_ip('10.1.2.3'), self.host.pk)  # narrowest entry wins
+            self.assertEqual(blocklist.match_ip('192.168.1.20'), self.range.pk)
+            self.assertIsNone(blocklist.match_ip('192.168.1.21'))
+            self.assertIsNone(blocklist.match_ip('11.0.0.1'))
+            self.assertIsNone(blocklist.match_phone('01777173041'))
+
+    def test_rebuilt_on_change_and_hits_flushed_in_bulk(self):
+        """Test edits invalidate the index and hit counts are written on flush"""
+        from io import StringIO
+        from django.core.management import call_command
+        from .blocklist import check, flush_hits
+        from .models import BlockList
+
+        self.network.is_active = False
+        self.network.save()
+        self.assertIsNone(check('ip', '10.200.0.1'))
+        BlockList.objects.create(block_type='ip', value='2001:db8::/32')
+        self.assertIsNotNone(check('ip', '2001:db8::1'))
+
+        for _ in range(3):
+            self.assertEqual(check('phone', '01777173040'), self.phone.pk)
+        self.phone.refresh_from_db()
+        self.assertEqual(self.phone.block_count, 0)
+
+        with self.assertNumQueries(2):
+            flush_hits()
+        self.phone.refresh_from_db()
+        self.assertEqual(self.phone.block_count, 3)
+        self.assertIsNotNone(self.phone.last_triggered)
+
+        check('phone', '01777173040')
+        call_command('flush_blocklist_hits', stdout=StringIO())
+        self.assertEqual(flush_hits(), 0)
+        self.phone.refresh_from_db()
+        self.assertEqual(self.phone.block_count, 4)
+
+
+class SessionActivityTrackerTest(TestCase):
+    """Test cases for throttled session activity writes"""
+
+    def test_touch_is_throttled(self):
+        """Test activity is only rewritten once it is older than the granularity"""
+        from datetime import timedelta
+        from django.contrib.sessions.backends.cache import SessionStore
+        from django.utils import timezone
+        from .session_activity import ActivityTracker
+
+        tracker = ActivityTracker('last_activity', 60)
+        session = SessionStore()
+        now = timezone.now()
+        self.assertTrue(tracker.touch(session, now))
+
+        session.modified = False
+        self.assertFalse(tracker.touch(session, now + timedelta(seconds=30)))
+        self.assertFalse(session.modified)
+
+        self.assertTrue(tracker.touch(session, now + timedelta(seconds=61)))
+        self.assertTrue(session.modified)
+        self.assertEqual(tracker.last_seen(session), now + timedelta(seconds=61))
+
+    def test_anonymous_requests_do_not_save_session(self):
+        """Test storefront requests without session changes don't write a session"""
+        from importlib import import_module
+        from django.conf import settings
+
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session['recently_viewed'] = [1]
+        session.create()
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+        response = self.client.get('/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PerformanceProfilerTest(TestCase):
+    """Test cases for the request profiler and its statistics API"""
+
+    def setUp(self):
+        from utils.profiling import install_hooks, reset_stats
+
+        install_hooks()
+        reset_stats()
+
+    def test_profile_counts_queries_cache_and_n_plus_one(self):
+        """Test SQL shapes, cache lookups and repeated queries are recorded"""
+        from django.core.cache import cache
+        from utils.profiling import get_stats, profile_request, record, sql_shape
+
+        self.assertEqual(
+            sql_shape('SELECT * FROM t WHERE id = 12 AND name = \'a\' AND pk IN (%s, %s, %s)'),
+            'SELECT * FROM t WHERE id = ? AND name = ? AND pk IN (...)',
+        )
+
+        category = Category.objects.create(name='Shoes', slug='shoes')
+        cache.set('profiled_key', 1)
+        with profile_request() as profile:
+            for _ in range(5):
+                list(Category.objects.filter(pk=category.pk))
+            cache.get('profiled_key')
+            cache.get('missing_key')
+
+        self.assertEqual(profile.sql_count, 5)
+        self.assertEqual((profile.cache_hits, profile.cache_misses), (1, 1))
+        self.assertEqual(len(profile.n_plus_one(5)), 1)
+
+        record('GET /shop/', profile)
+        endpoint = get_stats()['endpoints'][0]
+        self.assertEqual(endpoint['endpoint'], 'GET /shop/')
+        self.assertEqual(endpoint['requests'], 1)
+        self.assertEqual(endpoint['sql_count'], 5)
+        self.assertEqual(endpoint['n_plus_one_requests'], 1)
+        self.assertEqual(sum(endpoint['histogram']), 1)
+
+    def test_cache_lookups_counted_once_with_database_cache(self):
+        """Test nested get/get_many calls of the database cache count one lookup each"""
+        from django.core.cache import cache
+        from django.core.management import call_command
+        from utils.profiling import profile_request
+
+        database_caches = {
+            'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'profiler_test_cache'},
+        }
+        with override_settings(CACHES=database_caches):
+            call_command('createcachetable', verbosity=0)
+            cache.set('profiled_key', 1)
+            with profile_request() as profile:
+                cache.get('profiled_key')
+                cache.get('missing_key')
+                cache.get_many(['profiled_key', 'missing_key'])
+
+        self.assertEqual((profile.cache_hits, profile.cache_misses), (2, 2))
+
+    def test_worker_totals_are_merged(self):
+        """Test every worker writes its own cache slot and statistics add them up"""
+        from django.core.cache import cache
+        from utils import profiling
+
+        with profiling.profile_request() as profile:
+            pass
+        profiling.record('GET /shop/', profile)
+        profiling.flush()
+
+        # Another worker flushing at the same time
+        other = profiling._new_totals()
+        other['endpoints']['GET /shop/'] = {**profiling._empty_endpoint(), 'requests': 2, 'total_ms': 4.0}
+        slot = cache.incr(profiling.SLOTS_CACHE_KEY)
+        cache.set(profiling.STATS_CACHE_KEY.format(slot=slot), other, None)
+
+        endpoint = profiling.get_stats()['endpoints'][0]
+        self.assertEqual(endpoint['requests'], 3)
+
+        profiling.reset_stats()
+        self.assertEqual(profiling.get_stats()['endpoints'], [])
+
+    def test_statistics_api(self):
+        """Test sampled requests are aggregated per route and exposed to staff"""
+        from django.test import override_settings
+
+        admin = User.objects.create_user(username='admin', email='admin@example.com', password='pass', is_staff=True, is_superuser=True)
+        client = APIClient()
+        client.force_authenticate(admin)
+
+        with override_settings(PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=1):
+            client.get('/mb-admin/api/statistics/')
+        response = client.get('/mb-admin/api/performance/')
+        self.assertEqual(response.status_code, 200)
+        endpoints = {item['endpoint']: item for item in response.data['endpoints']}
+        self.assertIn('GET /mb-admin/api/statistics/', endpoints)
+        self.assertGreater(endpoints['GET /mb-admin/api/statistics/']['sql_count'], 0)
+
+        client.delete('/mb-admin/api/performance/')
+        self.assertEqual(client.get('/mb-admin/api/performance/').data['endpoints'], [])
@@ -160,4 +160,7 @@ urlpatterns = [
     path('api/cache/search-keys/', views.cache_search_keys_api, name='cache_search_keys_api'),
     path('api/cache/delete-keys/', views.cache_delete_keys_api, name='cache_delete_keys_api'),
     path('api/cache/warmup/', views.cache_warmup_api, name='cache_warmup_api'),
+
+    # Request profiler statistics
+    path('api/performance/', views.performance_stats_api, name='performance_stats_api'),
 ]
\ No newline at end of file
@@ -1,5 +1,5 @@
 from django.shortcuts import render
-from django.db.models import Sum, Count, Q, F
+from django.db.models import Sum, Count, Q, F, Max, Prefetch
 from django.utils import timezone
 from datetime import timedelta, datetime
 from rest_framework import viewsets, permissions, status
@@ -23,6 +23,11 @@ import json
 import uuid
 
 from .models import DashboardSetting, AdminActivity, Expense
+from .exports import StreamingExport, ExportFormatError, iter_queryset
+from .session_activity import get_dashboard_tracker
+from utils.conditional import conditional, make_validators
+from utils.fragment_cache import bump_fragment_versions
+from utils.pagination import HybridPagination
 from .serializers import (
     DashboardSettingSerializer, AdminActivitySerializer, UserDashboardSerializer,
     CategoryDashboardSerializer, ProductDashboardSerializer, ProductDetailSerializer, ProductVariantDashboardSerializer,
@@ -1016,103 +1021,101 @@ class StockDashboardViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def export_stock_report(self, request):
-        """Export intelligent stock report as CSV"""
-        try:
-            import csv
-            from django.http import HttpResponse
-            from io import StringIO
-            
-            # Create CSV content
-            output = StringIO()
-            writer = csv.writer(output)
-            
-            # Write header
-            writer.writerow([
+        """Export intelligent stock report as CSV (or XLSX/Parquet via ?export_format=)"""
+        products = self.get_queryset().prefetch_related(None).prefetch_related(
+            Prefetch(
+                'variants',
+                queryset=ProductVariant.objects.filter(is_active=True),
+                to_attr='active_variants'
+            )
+        )
+        
+        export = StreamingExport(
+            'intelligent_stock_report',
+            [
                 'Product Name', 'SKU', 'Category', 'Stock Management Type',
                 'Effective Stock', 'Effective Cost Price (৳)', 'Stock Value (৳)', 
                 'Low Stock Threshold', 'Stock Status', 'Variants Count'
-            ])
-            
-            # Get products
-            products = self.get_queryset().prefetch_related('variants')
-            for product in products:
-                variants = product.variants.filter(is_active=True)
+            ],
+            self._stock_report_rows(products)
+        )
+        try:
+            return export.response(request.query_params.get('export_format', 'csv'))
+        except ExportFormatError as e:
+            return Response({'error': str(e)}, status=400)
+    
+    def _stock_report_rows(self, products):
+        """Yield stock report rows, reading products in chunks"""
+        for product in iter_queryset(products):
+            variants = product.active_variants
+            
+            if variants:
+                # Product has variants
+                total_stock = sum(v.stock_quantity for v in variants)
+                total_value = sum(
+                    v.stock_quantity * (v.effective_cost_price or 0) 
+                    for v in variants
+                )
+                avg_cost = total_value / total_stock if total_stock > 0 else 0
                 
-                if variants.exists():
-                    # Product has variants
-                    total_stock = sum(v.stock_quantity for v in variants)
-                    total_value = sum(
-                        v.stock_quantity * (v.effective_cost_price or 0) 
-                        for v in variants
-                    )
-                    avg_cost = total_value / total_stock if total_stock > 0 else 0
-                    
-                    stock_status = 'Out of Stock' if total_stock == 0 else (
-                        'Low Stock' if any(v.stock_quantity <= product.low_stock_threshold for v in variants) 
-                        else 'In Stock'
-                    )
-                    
-                    writer.writerow([
-                        product.name,
-                        product.sku or '',
-                        product.category.name if product.category else '',
-                        'Variant Level',
-                        total_stock,
-                        round(avg_cost, 2),
-                        round(total_value, 2),
-                        product.low_stock_threshold,
-                        stock_status,
-                        variants.count()
-                    ])
-                    
-                    # Add individual variant rows
-                    for variant in variants:
-                        variant_value = variant.stock_quantity * (variant.effective_cost_price or 0)
-                        variant_status = 'Out of Stock' if variant.stock_quantity == 0 else (
-                            'Low Stock' if variant.stock_quantity <= product.low_stock_threshold 
-                            else 'In Stock'
-                        )
-                        
-                        writer.writerow([
-                            f"  └─ {variant.name}",
-                            variant.sku or '',
-                            '',
-                            'Variant',
-                            variant.stock_quantity,
-                            variant.effective_cost_price or 0,
-                            round(variant_value, 2),
-                            product.low_stock_threshold,
-                            variant_status,
-                            ''
-                        ])
-                else:
-                    # Product has no variants
-                    stock_status = 'Out of Stock' if product.stock_quantity == 0 else (
-                        'Low Stock' if product.stock_quantity <= product.low_stock_threshold 
+                stock_status = 'Out of Stock' if total_stock == 0 else (
+                    'Low Stock' if any(v.stock_quantity <= product.low_stock_threshold for v in variants) 
+                    else 'In Stock'
+                )
+                
+                yield [
+                    product.name,
+                    product.sku or '',
+                    product.category.name if product.category else '',
+                    'Variant Level',
+                    total_stock,
+                    round(avg_cost, 2),
+                    round(total_value, 2),
+                    product.low_stock_threshold,
+                    stock_status,
+                    len(variants)
+                ]
+                
+                # Add individual variant rows
+                for variant in variants:
+                    variant_value = variant.stock_quantity * (variant.effective_cost_price or 0)
+                    variant_status = 'Out of Stock' if variant.stock_quantity == 0 else (
+                        'Low Stock' if variant.stock_quantity <= product.low_stock_threshold 
                         else 'In Stock'
                     )
-                    stock_value = product.stock_quantity * (product.cost_price or 0)
                     
-                    writer.writerow([
-                        product.name,
-                        product.sku or '',
-                        product.category.name if product.category else '',
-                        'Product Level',
-                        product.stock_quantity,
-                        product.cost_price or 0,
-                        round(stock_value, 2),
+                    yield [
+                        f"  └─ {variant.name}",
+                        variant.sku or '',
+                        '',
+                        'Variant',
+                        variant.stock_quantity,
+                        variant.effective_cost_price or 0,
+                        round(variant_value, 2),
                         product.low_stock_threshold,
-                        stock_status,
-                        0
-                    ])
-            
-            # Create response
-            response = HttpResponse(output.getvalue(), content_type='text/csv')
-            response['Content-Disposition'] = 'attachment; filename="intelligent_stock_report.csv"'
-            return response
-            
-        except Exception as e:
-            return Response({'error': str(e)}, status=500)
+                        variant_status,
+                        ''
+                    ]
+            else:
+                # Product has no variants
+                stock_status = 'Out of Stock' if product.stock_quantity == 0 else (
+                    'Low Stock' if product.stock_quantity <= product.low_stock_threshold 
+                    else 'In Stock'
+                )
+                stock_value = product.stock_quantity * (product.cost_price or 0)
+                
+                yield [
+                    product.name,
+                    product.sku or '',
+                    product.category.name if product.category else '',
+                    'Product Level',
+                    product.stock_quantity,
+                    product.cost_price or 0,
+                    round(stock_value, 2),
+                    product.low_stock_threshold,
+                    stock_status,
+                    0
+                ]
     
     @action(detail=True, methods=['get'])
     def stock_activity_history(self, request, pk=None):
@@ -1344,6 +1347,7 @@ class OrderDashboardViewSet(viewsets.ModelViewSet):
     search_fields = ['order_number', 'user__username', 'user__email', 'shipping_address__first_name', 'shipping_address__last_name', 'shipping_address__phone']
     ordering_fields = ['created_at', 'total_amount', 'status']
     ordering = ['-created_at']
+    pagination_class = HybridPagination
     
     def get_queryset(self):
         """Enhanced queryset with better search and filtering"""
@@ -1736,21 +1740,19 @@ class OrderDashboardViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['post'], permission_classes=[])
     def bulk_action(self, request):
         """Perform bulk actions on multiple orders"""
-        print(f"🔄 BULK ACTION CALLED! User: {request.user}, Data: {request.data}")
-        print(f"🔄 Request method: {request.method}")
-        print(f"🔄 Request headers: {dict(request.headers)}")
+        logger.debug(f"Order bulk action by {request.user}: {request.data}")
         try:
             order_ids = request.data.get('order_ids', [])
             action = request.data.get('action')
             
-            print(f"📋 Order IDs: {order_ids}, Action: {action}")
+            logger.debug(f"Order bulk action {action} on orders {order_ids}")
             
             if not order_ids:
-                print("❌ No order IDs provided")
+                logger.debug("Order bulk action without order IDs")
                 return Response({'error': 'No order IDs provided'}, status=400)
             
             if not action:
-                print("❌ No action specified")
+                logger.debug("Order bulk action without action")
                 return Response({'error': 'No action specified'}, status=400)
             
             # Get the orders
@@ -1764,7 +1766,7 @@ class OrderDashboardViewSet(viewsets.ModelViewSet):
             if action == 'delete':
                 # Restock items before deleting orders
                 for order in orders:
-                    print(f"Restocking items for order {order.order_number} before deletion")
+                    logger.info(f"Restocking items for order {order.order_number} before deletion")
                     restock_order_items(order)
                 
                 # Delete orders
@@ -1786,12 +1788,12 @@ class OrderDashboardViewSet(viewsets.ModelViewSet):
                     if old_status != new_status:
                         # If changing FROM cancelled TO active status, reduce stock
                         if should_restock_status(old_status) and should_reduce_stock_status(new_status):
-                            print(f"Order {order.order_number}: Changing from {old_status} to {new_status} - reducing stock")
+                            logger.info(f"Order {order.order_number}: Changing from {old_status} to {new_status} - reducing stock")
                             reduce_order_stock(order)
                         
                         # If changing TO cancelled FROM active status, restock
                         elif should_reduce_stock_status(old_status) and should_restock_status(new_status):
-                            print(f"Order {order.order_number}: Changing from {old_status} to {new_status} - restocking")
+                            logger.info(f"Order {order.order_number}: Changing from {old_status} to {new_status} - restocking")
                             restock_order_items(order)
                     
                     # Handle special cases for partially returned status
@@ -1807,7 +1809,7 @@ class OrderDashboardViewSet(viewsets.ModelViewSet):
                     try:
                         self.log_activity(f'bulk_updated_to_{new_status}', order)
                     except Exception as e:
-                        print(f"Error logging activity: {str(e)}")
+                        logger.warning(f"Error logging activity: {str(e)}")
                 
                 return Response({
                     'success': True,
@@ -1815,9 +1817,7 @@ class OrderDashboardViewSet(viewsets.ModelViewSet):
                 })
                 
         except Exception as e:
-            print(f"❌ Error in bulk action: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"Error in order bulk action: {str(e)}")
             return Response({
                 'error': f'An error occurred: {str(e)}'
             }, status=500)
@@ -2409,7 +2409,7 @@ def dashboard_home(request):
     Dashboard home with user activity tracking and enhanced statistics
     """
     # Track user activity
-    request.session['last_activity'] = timezone.now().isoformat()
+    get_dashboard_tracker().touch(request.session)
     
     # Get some basic statistics for the dashboard home
     total_orders = Order.objects.count()
@@ -2984,15 +2984,8 @@ class IncompleteOrderDashboardViewSet(viewsets.ModelViewSet):
                 })
             
             elif action == 'send_recovery':
-                sent_count = 0
-                for order in orders:
-                    try:
-                        from incomplete_orders.services import IncompleteOrderService
-                        if IncompleteOrderService.send_recovery_email(order):
-                            order.increment_recovery_attempt()
-                            sent_count += 1
-                    except:
-                        pass
+                from incomplete_orders.mailer import RecoveryMailer
+                sent_count = RecoveryMailer().send_candidates(orders)['sent']
                 
                 return Response({
                     'success': True,
@@ -3037,19 +3030,12 @@ class IncompleteOrderDashboardViewSet(viewsets.ModelViewSet):
         incomplete_order = self.get_object()
         
         try:
-            items = incomplete_order.items.all().select_related('product', 'variant').prefetch_related('product__images')
+            items = incomplete_order.items.all().select_related('product', 'variant')
             items_data = []
             
             for item in items:
-                # Get product image (first image from product images)
-                product_image = None
-                if item.product and item.product.images.exists():
-                    first_image = item.product.images.first()
-                    if first_image and first_image.image:
-                        try:
-                            product_image = first_image.image.url
-                        except:
-                            product_image = None
+                # Get product image (primary image stored on the product)
+                product_image = (item.product.primary_image_url or None) if item.product else None
                 
                 # Get variant image
                 variant_image = None
@@ -3452,6 +3438,115 @@ class ExpenseDashboardViewSet(viewsets.ModelViewSet):
         })
 
 
+PERFORMANCE_SORT_FIELDS = {
+    'name': 'name_lower',
+    'orders': 'orders_count',
+    'delivered': 'delivered_quantity',
+    'revenue': 'total_revenue',
+}
+
+
+def build_product_performance_queryset(params):
+    """
+    Build the product performance query plan from request query params.
+    
+    Order counts, delivered quantity and revenue are computed by correlated
+    subqueries so the database returns one annotated, already sorted row per
+    product instead of the view running several queries per product.
+    Returns ``(queryset, filters)``.
+    """
+    from django.db.models import DecimalField, IntegerField, OuterRef, Subquery, Value
+    from django.db.models.functions import Coalesce, Lower
+    
+    period = params.get('period', 'all')
+    date_from = params.get('date_from')
+    date_to = params.get('date_to')
+    search = params.get('search', '').strip()
+    sort_by = params.get('sort', 'orders')
+    sort_order = params.get('order', 'desc')
+    
+    # Define time periods if no specific dates provided
+    now = timezone.now()
+    start_date = None
+    if not date_from and not date_to:
+        if period == 'day':
+            start_date = now - timedelta(days=1)
+        elif period == 'week':
+            start_date = now - timedelta(days=7)
+        elif period == 'month':
+            start_date = now - timedelta(days=30)
+        elif period == 'year':
+            start_date = now - timedelta(days=365)
+    
+    # Build date filter on the order of each item
+    order_date_filter = Q()
+    if date_from:
+        try:
+            from_date = timezone.datetime.strptime(date_from, '%Y-%m-%d').date()
+            order_date_filter &= Q(order__created_at__date__gte=from_date)
+        except ValueError:
+            pass
+            
+    if date_to:
+        try:
+            to_date = timezone.datetime.strptime(date_to, '%Y-%m-%d').date()
+            order_date_filter &= Q(order__created_at__date__lte=to_date)
+        except ValueError:
+            pass
+            
+    if start_date:
+        order_date_filter = Q(order__created_at__gte=start_date)
+    
+    items = OrderItem.objects.filter(order_date_filter, product=OuterRef('pk')).order_by().values('product')
+    
+    def item_aggregate(aggregate, output_field, **filters):
+        return Coalesce(
+            Subquery(items.filter(**filters).annotate(value=aggregate).values('value')[:1]),
+            Value(0),
+            output_field=output_field
+        )
+    
+    money = DecimalField(max_digits=14, decimal_places=2)
+    queryset = Product.objects.filter(is_active=True).select_related('category').annotate(
+        orders_count=item_aggregate(Count('order', distinct=True), IntegerField()),
+        delivered_quantity=item_aggregate(
+            Sum('quantity'), IntegerField(), order__status__in=['delivered', 'shipped']
+        ),
+        delivered_shipped_revenue=item_aggregate(
+            Sum('order__total_amount'), money, order__status__in=['delivered', 'shipped']
+        ),
+        partial_return_revenue=item_aggregate(
+            Sum('order__partially_ammount'), money, order__status='partially_returned'
+        ),
+    ).annotate(
+        total_revenue=F('delivered_shipped_revenue') + F('partial_return_revenue'),
+        name_lower=Lower('name'),
+    )
+    
+    # Apply search filter
+    if search:
+        queryset = queryset.filter(
+            Q(name__icontains=search) | 
+            Q(category__name__icontains=search)
+        )
+    
+    sort_field = PERFORMANCE_SORT_FIELDS.get(sort_by, 'orders_count')
+    if sort_order.lower() == 'desc':
+        queryset = queryset.order_by(F(sort_field).desc(), 'id')
+    else:
+        queryset = queryset.order_by(F(sort_field).asc(), 'id')
+    
+    filters = {
+        'period': period,
+        'date_from': date_from,
+        'date_to': date_to,
+        'search': search,
+        'sort_by': sort_by,
+        'sort_order': sort_order
+    }
+    return queryset, filters
+
+
 class ProductPerformanceView(APIView):
     """
     API endpoint for detailed product performance data with filtering and sorting
@@ -3464,147 +3559,35 @@ class ProductPerformanceView(APIView):
             return Response({'error': 'Admin access required'}, status=403)
         
         try:
-            # Get query parameters
-            period = request.GET.get('period', 'all')
-            date_from = request.GET.get('date_from')
-            date_to = request.GET.get('date_to')
-            search = request.GET.get('search', '').strip()
-            sort_by = request.GET.get('sort', 'orders')
-            sort_order = request.GET.get('order', 'desc')
-            
-            # Define time periods if no specific dates provided
-            now = timezone.now()
-            if not date_from and not date_to:
-                if period == 'day':
-                    start_date = now - timedelta(days=1)
-                elif period == 'week':
-                    start_date = now - timedelta(days=7)
-                elif period == 'month':
-                    start_date = now - timedelta(days=30)
-                elif period == 'year':
-                    start_date = now - timedelta(days=365)
-                else:  # 'all'
-                    start_date = None
-            else:
-                start_date = None
-            
-            # Build date filter for orders
-            order_date_filter = Q()
-            if date_from:
-                try:
-                    from_date = timezone.datetime.strptime(date_from, '%Y-%m-%d').date()
-                    order_date_filter &= Q(created_at__date__gte=from_date)
-                except ValueError:
-                    pass
-                    
-            if date_to:
-                try:
-                    to_date = timezone.datetime.strptime(date_to, '%Y-%m-%d').date()
-                    order_date_filter &= Q(created_at__date__lte=to_date)
-                except ValueError:
-                    pass
-                    
-            if start_date and not (date_from or date_to):
-                order_date_filter = Q(created_at__gte=start_date)
-            
-            # Get all active products
-            products_query = Product.objects.filter(is_active=True)
-            
-            # Apply search filter
-            if search:
-                products_query = products_query.filter(
-                    Q(name__icontains=search) | 
-                    Q(category__name__icontains=search)
-                )
+            products_query, filters = build_product_performance_queryset(request.GET)
+            products_query = products_query.prefetch_related('images')
             
             products_data = []
             
             for product in products_query:
-                # Get all orders for this product within date range
-                product_orders = Order.objects.filter(
-                    order_date_filter,
-                    items__product=product
-                ).distinct()
-                
-                # Count total orders
-                orders_count = product_orders.count()
-                
-                # Calculate delivered quantity
-                delivered_orders = product_orders.filter(status__in=['delivered', 'shipped'])
-                delivered_quantity = OrderItem.objects.filter(
-                    order__in=delivered_orders,
-                    product=product
-                ).aggregate(total=Sum('quantity'))['total'] or 0
-                
-                # Calculate revenue (from delivered and shipped orders + partial returns)
-                delivered_shipped_revenue = Order.objects.filter(
-                    order_date_filter &
-                    Q(status__in=['delivered', 'shipped']) &
-                    Q(items__product=product)
-                ).aggregate(total=Sum('total_amount'))['total'] or 0
-                
-                partial_return_revenue = Order.objects.filter(
-                    order_date_filter &
-                    Q(status='partially_returned') &
-                    Q(items__product=product)
-                ).aggregate(total=Sum('partially_ammount'))['total'] or 0
-                
-                total_revenue = delivered_shipped_revenue + partial_return_revenue
-                
-                # Get category name
-                category_name = product.category.name if product.category else 'Uncategorized'
-                
-                # Get product image URL
+                # Get product image URL from the prefetched images
                 image_url = None
-                if hasattr(product, 'images') and product.images.exists():
-                    first_image = product.images.first()
-                    if first_image and first_image.image:
-                        image_url = first_image.image_url
-                elif hasattr(product, 'productimage_set') and product.productimage_set.exists():
-                    first_image = product.productimage_set.first()
-                    if first_image and first_image.image:
-                        image_url = first_image.image_url
+                images = list(product.images.all())
+                if images and images[0].image:
+                    image_url = images[0].image_url
                 
-                product_data = {
+                products_data.append({
                     'id': product.id,
                     'product_name': product.name,
-                    'category': category_name,
-                    'orders': orders_count,
-                    'delivered_quantity': int(delivered_quantity),
-                    'revenue': float(total_revenue),
+                    'category': product.category.name if product.category else 'Uncategorized',
+                    'orders': product.orders_count,
+                    'delivered_quantity': int(product.delivered_quantity),
+                    'revenue': float(product.total_revenue),
                     'price': float(product.price) if product.price else 0,
                     'cost_price': float(product.cost_price) if product.cost_price else 0,
                     'stock': product.stock_quantity if hasattr(product, 'stock_quantity') else 0,
                     'image_url': image_url
-                }
-                
-                products_data.append(product_data)
-            
-            # Sort the data
-            reverse_sort = sort_order.lower() == 'desc'
-            
-            if sort_by == 'name':
-                products_data.sort(key=lambda x: x['product_name'].lower(), reverse=reverse_sort)
-            elif sort_by == 'orders':
-                products_data.sort(key=lambda x: x['orders'], reverse=reverse_sort)
-            elif sort_by == 'delivered':
-                products_data.sort(key=lambda x: x['delivered_quantity'], reverse=reverse_sort)
-            elif sort_by == 'revenue':
-                products_data.sort(key=lambda x: x['revenue'], reverse=reverse_sort)
-            else:
-                products_data.sort(key=lambda x: x['orders'], reverse=reverse_sort)
+                })
             
             return Response({
                 'products': products_data,
                 'total_count': len(products_data),
-                'filters': {
-                    'period': period,
-                    'date_from': date_from,
-                    'date_to': date_to,
-                    'search': search,
-                    'sort_by': sort_by,
-                    'sort_order': sort_order
-                }
+                'filters': filters
             })
             
         except Exception as e:
@@ -3618,31 +3601,29 @@ class ProductPerformanceView(APIView):
 @permission_classes([permissions.IsAuthenticated])
 def export_products_performance(request):
     """
-    Export product performance data as CSV
+    Export product performance data as CSV (or XLSX/Parquet via ?export_format=)
     """
     if not request.user.is_staff:
         return Response({'error': 'Admin access required'}, status=403)
     
-    try:
-        import csv
-        from django.http import HttpResponse
-        
-        # Get the same data as the API
-        view = ProductPerformanceView()
-        view.request = request
-        response_data = view.get(request).data
-        
-        if 'error' in response_data:
-            return Response(response_data, status=500)
-        
-        # Create CSV response
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="products_performance.csv"'
-        
-        writer = csv.writer(response)
-        
-        # Write header
-        writer.writerow([
+    products_query, _ = build_product_performance_queryset(request.GET)
+    
+    def rows():
+        for product in iter_queryset(products_query):
+            yield [
+                product.name,
+                product.category.name if product.category else 'Uncategorized',
+                product.orders_count,
+                int(product.delivered_quantity),
+                f"{float(product.total_revenue):.2f}",
+                f"{float(product.price or 0):.2f}",
+                f"{float(product.cost_price or 0):.2f}",
+                product.stock_quantity
+            ]
+    
+    export = StreamingExport(
+        'products_performance',
+        [
             'Product Name',
             'Category', 
             'Total Orders',
@@ -3651,28 +3632,13 @@ def export_products_performance(request):
             'Price ($)',
             'Cost Price ($)',
             'Stock'
-        ])
-        
-        # Write data rows
-        for product in response_data['products']:
-            writer.writerow([
-                product['product_name'],
-                product['category'],
-                product['orders'],
-                product['delivered_quantity'],
-                f"{product['revenue']:.2f}",
-                f"{product['price']:.2f}",
-                f"{product['cost_price']:.2f}",
-                product['stock']
-            ])
-        
-        return response
-        
-    except Exception as e:
-        return Response({
-            'error': 'Failed to export data',
-            'detail': str(e)
-        }, status=500)
+        ],
+        rows()
+    )
+    try:
+        return export.response(request.GET.get('export_format', 'csv'))
+    except ExportFormatError as e:
+        return Response({'error': str(e)}, status=400)
 
 
 class CheckoutCustomizationViewSet(viewsets.ModelViewSet):
@@ -3956,6 +3922,7 @@ def get_checkout_customization(request):
 # BlockList Management Views
 from .models import BlockList
 from .serializers import BlockListSerializer
+from .blocklist import bump_blocklist_version, check as check_blocklist
 
 class BlockListViewSet(viewsets.ModelViewSet):
     """ViewSet for managing block list entries"""
@@ -4070,6 +4037,7 @@ class BlockListViewSet(viewsets.ModelViewSet):
         
         try:
             updated_count = BlockList.objects.filter(id__in=ids).update(is_active=is_active)
+            bump_blocklist_version()
             
             try:
                 AdminActivity.objects.create(
@@ -4152,6 +4120,7 @@ class BlockListViewSet(viewsets.ModelViewSet):
         
         try:
             updated_count = BlockList.objects.filter(id__in=ids).update(is_active=True)
+            bump_blocklist_version()
             
             try:
                 AdminActivity.objects.create(
@@ -4182,6 +4151,7 @@ class BlockListViewSet(viewsets.ModelViewSet):
         
         try:
             updated_count = BlockList.objects.filter(id__in=ids).update(is_active=False)
+            bump_blocklist_version()
             
             try:
                 AdminActivity.objects.create(
@@ -4214,11 +4184,10 @@ def check_blocked(request):
         return Response({'error': 'block_type and value are required'}, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        is_blocked = BlockList.is_blocked(block_type, value)
-        block_entry = None
+        entry_id = check_blocklist(block_type, value, count_hit=False)
         
-        if is_blocked:
-            block_entry = BlockList.objects.get(block_type=block_type, value=value, is_active=True)
+        if entry_id is not None:
+            block_entry = BlockList.objects.get(pk=entry_id)
             serializer = BlockListSerializer(block_entry)
             return Response({
                 'is_blocked': True,
@@ -4378,12 +4347,12 @@ def review_bulk_action(request):
         
         reviews = Review.objects.filter(id__in=review_ids)
         
-        if action == 'approve':
-            reviews.update(is_approved=True)
-            message = f'{reviews.count()} reviews approved successfully'
-        elif action == 'disapprove':
-            reviews.update(is_approved=False)
-            message = f'{reviews.count()} reviews disapproved successfully'
+        if action in ('approve', 'disapprove'):
+            product_ids = list(reviews.values_list('product_id', flat=True))
+            reviews.update(is_approved=action == 'approve')
+            # update() sends no signals, cards and product pages show the review counts
+            bump_fragment_versions(Product, product_ids)
+            message = f'{reviews.count()} reviews {action}d successfully'
         elif action == 'delete':
             count = reviews.count()
             reviews.delete()
@@ -4999,8 +4968,15 @@ def print_order_invoice(request, order_id):
 
 # Hero Content API Endpoints
 
+def hero_content_validators(request, *args, **kwargs):
+    """Newest change and slide count, so deleted slides change the ETag too"""
+    summary = HeroContent.objects.aggregate(last_modified=Max('updated_at'), count=Count('id'))
+    return make_validators(['hero_content', summary['count'], summary['last_modified']], summary['last_modified'])
+
+
 @api_view(['GET', 'POST'])
 @permission_classes([IsStaffUser])
+@conditional(hero_content_validators)
 def hero_content_api(request):
     """Hero Content API - List and Create"""
     
@@ -5896,6 +5872,28 @@ def cache_warmup_api(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['GET', 'DELETE'])
+@authentication_classes([SessionAuthentication, BasicAuthentication])
+@permission_classes([IsStaffUser])
+def performance_stats_api(request):
+    """
+    Per-endpoint latency histograms, SQL/cache/HTTP totals and N+1 flags
+    collected by the request profiler. DELETE resets the aggregates.
+    """
+    from utils.profiling import get_stats, reset_stats
+
+    if request.method == 'DELETE':
+        reset_stats()
+        return Response({'success': True, 'message': 'Performance statistics reset'})
+
+    stats = get_stats()
+    try:
+        limit = int(request.GET.get('limit', 50))
+    except ValueError:
+        limit = 50
+    stats['endpoints'] = stats['endpoints'][:max(limit, 1)]
+    return Response({'success': True, **stats})
+
 def format_bytes(bytes_value):
     """Format bytes to human readable string"""
     if bytes_value == 0:
@@ -66,8 +66,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'utils.middleware.ProfilingMiddleware',  # Sampled per-request SQL/cache/HTTP profiling
     'corsheaders.middleware.CorsMiddleware',
-    # 'django.middleware.cache.UpdateCacheMiddleware',  # Cache middleware (disabled temporarily)
+    # 'django.middleware.cache.UpdateCacheMiddleware',  # Disabled, anonymous pages are cached by utils.page_cache
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -77,10 +78,10 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',  # Moved before custom middleware
     'users.middleware.DashboardPermissionMiddleware',
     'dashboard.middleware.DashboardSecurityMiddleware',  # Enhanced dashboard security
+    'dashboard.middleware.SessionRefreshMiddleware',    # Throttled expiry refresh for logged in users
     'dashboard.middleware.DashboardCSRFMiddleware',     # Enhanced CSRF protection
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'incomplete_orders.middleware.CheckoutAbandonmentMiddleware',
-    # 'django.middleware.cache.FetchFromCacheMiddleware',  # Cache middleware (disabled temporarily)
+    # 'django.middleware.cache.FetchFromCacheMiddleware',  # Disabled, anonymous pages are cached by utils.page_cache
 ]
 
 ROOT_URLCONF = 'ecommerce_project.urls'
@@ -101,6 +102,7 @@ TEMPLATES = [
                 'settings.context_processors.checkout_customization',
                 'settings.context_processors.navbar_categories',
                 'settings.context_processors.integration_settings',
+                'utils.page_cache.page_cache_holes',
             ],
         },
     },
@@ -199,6 +201,16 @@ else:
             'OPTIONS': {
                 'MAX_ENTRIES': 1000,
             }
+        },
+        # Fragment versions, one per product: culling them would re-render
+        # every card and page, so they get a table sized for the catalog
+        'versions': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'version_cache_table',
+            'TIMEOUT': None,
+            'OPTIONS': {
+                'MAX_ENTRIES': 1000000,
+            }
         }
     }
 
@@ -414,6 +426,9 @@ CKEDITOR_CONFIGS = {
 # Site configuration
 SITE_URL = 'http://127.0.0.1:8000'
 
+# Prebuilt sitemap files (python manage.py build_sitemaps)
+SITEMAP_ROOT = STATIC_ROOT / 'sitemaps'
+
 # Authentication backends
 AUTHENTICATION_BACKENDS = [
     'users.authentication.EmailVerificationBackend',
@@ -461,6 +476,9 @@ FORCE_PUBLIC_IP_DETECTION = True
 # Dashboard session timeout in minutes (default: 30 minutes)
 DASHBOARD_SESSION_TIMEOUT = 30
 
+# Dashboard activity is written to the session at most once per this many seconds
+DASHBOARD_ACTIVITY_GRANULARITY = 60
+
 # IP address validation for dashboard sessions (set to True in production)
 DASHBOARD_VALIDATE_IP = False
 
@@ -477,7 +495,11 @@ SESSION_COOKIE_SECURE = False  # Set to True with HTTPS
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SAMESITE = 'Lax'
 SESSION_COOKIE_AGE = 60 * 60 * 8  # 8 hours default session age
-SESSION_SAVE_EVERY_REQUEST = True
+# Sessions are only saved when modified, anonymous storefront requests don't write
+# to the session store. Authenticated sessions are refreshed by SessionRefreshMiddleware
+# at most once per SESSION_REFRESH_GRANULARITY seconds.
+SESSION_SAVE_EVERY_REQUEST = False
+SESSION_REFRESH_GRANULARITY = 300
 
 # CSRF security settings
 CSRF_COOKIE_SECURE = False  # Set to True with HTTPS
@@ -530,6 +552,21 @@ LOGGING = {
     },
 }
 
+# Listing pagination: 'page' (page numbers) or 'keyset' (cursor based, no COUNT/OFFSET).
+# Clients can also opt in per request with ?pagination=keyset
+PAGINATION_MODE = 'page'
+# Show an approximate total count on keyset-paginated listings
+PAGINATION_APPROXIMATE_COUNT = False
+
+# Request profiling: SQL count/time, cache hits/misses and outgoing HTTP time per endpoint,
+# aggregated on the dashboard performance API. Only the sampled share of requests is profiled.
+PROFILING_ENABLED = True
+PROFILING_SAMPLE_RATE = 0.05
+# Identical query shapes repeated this often in one request are flagged as N+1 patterns
+PROFILING_N_PLUS_ONE_THRESHOLD = 5
+# Seconds between merges of the per-process aggregates into the shared cache
+PROFILING_FLUSH_INTERVAL = 30
+
 # Cache Framework Configuration
 CACHE_MIDDLEWARE_ALIAS = 'default'
 CACHE_MIDDLEWARE_SECONDS = 300  # 5 minutes default
@@ -542,6 +579,8 @@ CACHE_TIMEOUTS = {
     'product_detail': 1800, # 30 minutes
     'category_list': 3600,  # 1 hour
     'static_pages': 86400,  # 24 hours
+    'fragments': 3600,      # 1 hour, versioned template fragments
+    'anonymous_pages': 600, # 10 minutes, versioned anonymous page cache
 }
 
 # Cache keys configuration
@@ -554,4 +593,35 @@ CACHE_KEYS = {
     'product_reviews': 'product_reviews_{product_id}',
 }
 
+# Guest cart storage: guest carts are kept out of the database until checkout or login
+# Without Redis they are kept in the database sessions, which are never culled (the database cache is)
+CART_STORAGE_BACKEND = 'cart.storage.RedisCartStorage' if USE_REDIS else 'cart.storage.SessionCartStorage'
+CART_STORAGE_REDIS_URL = os.getenv('CART_STORAGE_REDIS_URL', 'redis://127.0.0.1:6379/4')
+CART_STORAGE_TIMEOUT = 60 * 60 * 24 * 7  # 7 days, refreshed on every cart change
+
+# Checkout-abandonment events are buffered and consolidated by `manage.py consolidate_checkout_events`
+CHECKOUT_EVENT_BUFFER_BACKEND = (
+    'incomplete_orders.ingestion.RedisEventBuffer' if USE_REDIS
+    else 'incomplete_orders.ingestion.DatabaseEventBuffer'
+)
+
+# Product and page views are buffered and written by `manage.py flush_view_counts` (run it from cron
+# or with --loop); `utils.view_counters.MemoryViewCounter` is an in-process counter for tests only
+VIEW_COUNTER_BACKEND = (
+    'utils.view_counters.RedisViewCounter' if USE_REDIS
+    else 'utils.view_counters.DatabaseViewCounter'
+)
+# Without Redis each worker adds up views in process and writes them every
+# VIEW_COUNT_BUFFER_INTERVAL seconds or once VIEW_COUNT_BUFFER_SIZE objects were viewed
+VIEW_COUNT_BUFFER_INTERVAL = 10
+VIEW_COUNT_BUFFER_SIZE = 500
+
+# Recovery emails: parallel SMTP connections per batch and messages/second per recipient domain
+RECOVERY_EMAIL_CONCURRENCY = 4
+RECOVERY_EMAIL_RATE_LIMITS = {
+    'gmail.com': 20,
+    'yahoo.com': 5,
+    'default': 10,
+}
+
 
@@ -15,10 +15,9 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
-from django.contrib.sitemaps.views import sitemap
 from django.views.generic import TemplateView
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import (
@@ -26,7 +25,8 @@ from rest_framework_simplejwt.views import (
     TokenRefreshView,
 )
 from dashboard.views import get_checkout_customization
-from products.sitemaps import sitemaps
+from products.views import sitemap_index, sitemap_section
+from incomplete_orders.views import ingest_checkout_event
 
 # API URL patterns
 api_urlpatterns = [
@@ -51,7 +51,8 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     
     # SEO: Sitemap and Robots.txt
-    path('sitemap.xml', sitemap, {'sitemaps': sitemaps}, name='django.contrib.sitemaps.views.sitemap'),
+    path('sitemap.xml', sitemap_index, name='django.contrib.sitemaps.views.sitemap'),
+    re_path(r'^(?P<filename>sitemap-[\w-]+-\d+\.xml\.gz)$', sitemap_section, name='sitemap_section'),
     path('robots.txt', TemplateView.as_view(template_name='robots.txt', content_type='text/plain'), name='robots_txt'),
     
     # CKEditor
@@ -60,6 +61,10 @@ urlpatterns = [
     # API
     path('api/v1/', include(api_urlpatterns)),
     
+    # Checkout tracking endpoints used by checkout pages rendered before the versioned API
+    path('api/incomplete-orders/save-checkout-data/', ingest_checkout_event, {'event_type': 'checkout_data'}),
+    path('api/incomplete-orders/track-abandonment/', ingest_checkout_event, {'event_type': 'abandonment'}),
+    
     # Fraud Checker
     path('fraud-checker/', include('fraud_checker.urls')),
     
@@ -0,0 +1,81 @@
+"""
+Homepage data builder.
+
+The category sections of the homepage show the newest active products of
+every ``show_homepage`` category; a top level category also shows the
+products of its active child categories. Instead of querying each category
+separately, ``get_homepage_categories`` ranks the candidate products with
+``ROW_NUMBER()`` twice in a single query, once per own category and once
+per top level category and keeps the rows ranked within the limit. Cards
+use the image URLs stored on ``Product``, so no image query is needed.
+"""
+from operator import itemgetter
+
+from django.db.models import F, Q, Window
+from django.db.models.functions import Coalesce, RowNumber
+
+from products.models import Category, Product
+
+HOMEPAGE_CATEGORY_PRODUCTS = 4
+FEATURED_PRODUCTS = 8
+
+
+def get_homepage_categories(limit=HOMEPAGE_CATEGORY_PRODUCTS):
+    """List of ``{'category', 'products'}`` for homepage categories with products, by name"""
+    categories = list(Category.objects.filter(is_active=True, show_homepage=True).order_by('name'))
+    if not categories:
+        return []
+
+    parent_ids = {category.id for category in categories if category.parent_id is None}
+    child_ids = {category.id for category in categories if category.parent_id is not None}
+    newest_first = [F('created_at').desc(), F('id').desc()]
+
+    products = (
+        Product.objects.filter(is_active=True)
+        .filter(
+            Q(category_id__in=parent_ids)
+            | Q(category__parent_id__in=parent_ids, category__is_active=True)
+            | Q(category_id__in=child_ids)
+        )
+        .annotate(
+            parent_group=Coalesce('category__parent_id', 'category_id'),
+            category_rank=Window(RowNumber(), partition_by=[F('category_id')], order_by=newest_first),
+            parent_rank=Window(RowNumber(), partition_by=[F('parent_group')], order_by=newest_first),
+        )
+        .filter(
+            Q(category_id__in=child_ids, category_rank__lte=limit)
+            | Q(parent_group__in=parent_ids, parent_rank__lte=limit)
+        )
+        .select_related('category')
+    )
+
+    grouped = {category.id: [] for category in categories}
+    for product in products:
+        if product.category_id in child_ids and product.category_rank <= limit:
+            grouped[product.category_id].append((product.category_rank, product))
+        if product.parent_group in parent_ids and product.parent_rank <= limit:
+            grouped[product.parent_group].append((product.parent_rank, product))
+
+    return [
+        {'category': category, 'products': [product for _, product in sorted(grouped[category.id], key=itemgetter(0))]}
+        for category in categories
+        if grouped[category.id]
+    ]
+
+
+def build_homepage_data():
+    """Cacheable context of the homepage"""
+    from settings.models import HeroContent
+
+    parent_categories = list(Category.objects.filter(is_active=True, parent=None).order_by('name'))
+    return {
+        'hero_slides': list(HeroContent.get_active_slides()),
+        'featured_products': list(
+            Product.objects.filter(is_featured=True, is_active=True)
+            .select_related('category')[:FEATURED_PRODUCTS]
+        ),
+        # Kept for templates still using the first six parent categories
+        'featured_categories': parent_categories[:6],
+        'parent_categories': parent_categories,
+        'homepage_categories': get_homepage_categories(),
+    }
@@ -0,0 +1,42 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from utils.fragment_cache import render_fragment
+
+register = template.Library()
+
+
+class CachedFragmentNode(template.Node):
+    def __init__(self, nodelist, name, objects):
+        self.nodelist = nodelist
+        self.name = name
+        self.objects = objects
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        objects = [obj.resolve(context) for obj in self.objects]
+        return mark_safe(render_fragment(name, objects, lambda: self.nodelist.render(context)))
+
+
+@register.tag('cached_fragment')
+def do_cached_fragment(parser, token):
+    """
+    Cache the enclosed block until one of the given objects changes
+
+    {% cached_fragment 'product_card' product product.category %}
+        ...
+    {% endcached_fragment %}
+
+    Objects are model instances (versioned per object) or model labels such
+    as 'products.category' (versioned per model, for lists of a model).
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' tag requires at least a fragment name")
+    nodelist = parser.parse(('endcached_fragment',))
+    parser.delete_first_token()
+    return CachedFragmentNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        [parser.compile_filter(bit) for bit in bits[2:]],
+    )
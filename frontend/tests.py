@@ -1,3 +1,244 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.core.cache import caches
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from products.models import Category, Product, ProductImage, Review
+from utils.testing import LOCMEM_CACHES
+
+from .homepage import get_homepage_categories
+
+
+class HomepageCategoriesTest(TestCase):
+    """Test cases for the homepage category sections"""
+
+    def create_product(self, category, number, age_days, **extra):
+        product = Product.objects.create(
+            name=f'{category.name} product {number}', sku=f'{category.slug}-{number}', category=category,
+            price=100, **extra
+        )
+        Product.objects.filter(pk=product.pk).update(created_at=timezone.now() - timedelta(days=age_days))
+        ProductImage.objects.create(product=product, image=f'/media/{product.pk}.webp', is_primary=True)
+        return product
+
+    def test_top_products_per_category(self):
+        """Test each homepage category gets its newest products in a fixed number of queries"""
+        parent = Category.objects.create(name='Men', show_homepage=True)
+        child = Category.objects.create(name='Shirts', parent=parent, show_homepage=True)
+        hidden_child = Category.objects.create(name='Old', parent=parent, is_active=False)
+        Category.objects.create(name='Empty', show_homepage=True)
+
+        parent_products = [self.create_product(parent, n, age_days=n * 2) for n in range(3)]
+        child_products = [self.create_product(child, n, age_days=n * 2 + 1) for n in range(5)]
+        self.create_product(hidden_child, 0, age_days=0)
+        self.create_product(child, 9, age_days=0, is_active=False)
+
+        with self.assertNumQueries(2):
+            sections = get_homepage_categories(limit=4)
+            images = [product.primary_image_url for section in sections for product in section['products']]
+
+        self.assertEqual([section['category'] for section in sections], [parent, child])
+        self.assertEqual(
+            sections[0]['products'],
+            [parent_products[0], child_products[0], parent_products[1], child_products[1]],
+        )
+        self.assertEqual(sections[1]['products'], child_products[:4])
+        self.assertTrue(all(images))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class FragmentCacheTest(TestCase):
+    """Test cases for the versioned template fragment cache"""
+
+    template = Template(
+        "{% load fragment_cache %}{% cached_fragment 'card' product %}"
+        "{{ product.name }} ({{ product.review_count }}){% endcached_fragment %}"
+    )
+
+    def setUp(self):
+        for alias in LOCMEM_CACHES:
+            caches[alias].clear()
+        self.category = Category.objects.create(name='Shoes')
+        self.product = Product.objects.create(name='Runner', sku='RUN-1', category=self.category, price=100)
+
+    def render(self):
+        return self.template.render(Context({'product': self.product}))
+
+    def test_fragment_reused_until_product_changes(self):
+        """Test a fragment is rendered once and re-rendered after the product or its reviews change"""
+        self.assertEqual(self.render(), 'Runner (0)')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.render(), 'Runner (0)')
+
+        Review.objects.create(product=self.product, guest_name='Sam', rating=5, comment='Great', is_approved=True)
+        self.assertEqual(self.render(), 'Runner (1)')
+
+        self.product.name = 'Trail runner'
+        self.product.save()
+        self.assertEqual(self.render(), 'Trail runner (1)')
+
+    def test_admin_bulk_actions_invalidate_cards(self):
+        """Test admin actions saving with update() still re-render the cards of their products"""
+        from unittest import mock
+        from django.contrib.admin.sites import site
+        from django.test import RequestFactory
+        from products.admin import ReviewAdmin
+
+        review = Review.objects.create(product=self.product, guest_name='Sam', rating=5, comment='Great')
+        self.assertEqual(self.render(), 'Runner (0)')
+
+        with mock.patch.object(ReviewAdmin, 'message_user'):
+            ReviewAdmin(Review, site).approve_reviews(RequestFactory().post('/admin/'), Review.objects.filter(pk=review.pk))
+        self.assertEqual(self.render(), 'Runner (1)')
+
+    def test_card_rendered_during_image_save_is_replaced(self):
+        """Test a card cached between the image save signal and the stored URL update is not reused"""
+        from django.db.models.signals import post_save
+
+        template = Template(
+            "{% load fragment_cache %}{% cached_fragment 'card' product %}{{ product.primary_image_url }}{% endcached_fragment %}"
+        )
+        render = lambda: template.render(Context({'product': Product.objects.get(pk=self.product.pk)}))
+        rendered = []
+
+        def render_concurrently(sender, **kwargs):
+            rendered.append(render())
+
+        post_save.connect(render_concurrently, sender=ProductImage)
+        try:
+            ProductImage.objects.create(product=self.product, image='https://cdn.example.com/runner.jpg')
+        finally:
+            post_save.disconnect(render_concurrently, sender=ProductImage)
+        self.assertEqual(rendered, [''])
+        self.assertEqual(render(), 'https://cdn.example.com/runner.jpg')
+
+    def test_model_fragment_invalidated_by_any_category(self):
+        """Test fragments keyed on a model label are re-rendered after any category changes"""
+        template = Template(
+            "{% load fragment_cache %}{% cached_fragment 'menu' 'products.category' %}"
+            "{% for category in categories %}{{ category.name }} {% endfor %}{% endcached_fragment %}"
+        )
+        render = lambda: template.render(Context({'categories': Category.objects.order_by('name')}))
+        self.assertEqual(render(), 'Shoes ')
+        with self.assertNumQueries(0):
+            self.assertEqual(render(), 'Shoes ')
+
+        Category.objects.create(name='Bags')
+        self.assertEqual(render(), 'Bags Shoes ')
+
+    def test_versions_outlive_the_default_cache(self):
+        """Test fragments stay valid when the default cache drops entries if versions have their own cache"""
+        self.assertEqual(self.render(), 'Runner (0)')
+        caches['default'].clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.render(), 'Runner (0)')
+
+        self.product.name = 'Trail runner'
+        self.product.save()
+        self.assertEqual(self.render(), 'Trail runner (0)')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AnonymousPageCacheTest(TestCase):
+    """Test cases for the anonymous full-page cache"""
+
+    def setUp(self):
+        for alias in LOCMEM_CACHES:
+            caches[alias].clear()
+        self.category = Category.objects.create(name='Shoes')
+        self.product = Product.objects.create(name='Runner', sku='RUN-1', category=self.category, price=100)
+
+    def test_cached_page_gets_own_csrf_token(self):
+        """Test a cached page is served without queries and with the visitor's own CSRF token"""
+        from django.middleware.csrf import _does_token_match
+
+        from utils.page_cache import CART_HOLE, CSRF_HOLE
+
+        # The first render also creates the default integration settings
+        self.client.get('/products/')
+        first = self.client.get('/products/')
+        self.assertContains(first, 'Runner')
+
+        self.client.cookies.clear()
+        with self.assertNumQueries(0):
+            second = self.client.get('/products/')
+        content = second.content.decode()
+        self.assertNotIn(CSRF_HOLE, content)
+        self.assertNotIn(CART_HOLE, content)
+        token = content.split('name="csrf-token" content="')[1].split('"')[0]
+        self.assertTrue(_does_token_match(token, second.cookies['csrftoken'].value))
+
+    def test_catalog_changes_purge_pages(self):
+        """Test saving a product renders the page again"""
+        self.client.get('/products/')
+        self.product.name = 'Trail runner'
+        self.product.save()
+        self.assertContains(self.client.get('/products/'), 'Trail runner')
+
+    def test_carted_sessions_skip_the_cache(self):
+        """Test a visitor with a guest cart gets a rendered page with their cart count"""
+        from cart.storage import GuestCart
+
+        self.client.get('/products/')
+        session = self.client.session
+        session.save()
+        self.client.cookies['sessionid'] = session.session_key
+
+        request = type('Request', (), {'session': session})()
+        GuestCart(request).add(self.product, None, 3)
+        session.save()
+
+        response = self.client.get('/products/')
+        self.assertIsNotNone(response.context)
+        self.assertContains(response, 'class="action-badge cart-count">3</span>')
+
+    def test_carted_sessions_are_not_revalidated(self):
+        """Test a guest who adds to the cart gets the page again instead of a stale 304"""
+        from cart.storage import GuestCart
+
+        self.client.get('/')
+        etag = self.client.get('/')['ETag']
+        session = self.client.session
+        session.save()
+        self.client.cookies['sessionid'] = session.session_key
+
+        request = type('Request', (), {'session': session})()
+        GuestCart(request).add(self.product, None, 2)
+        session.save()
+
+        response = self.client.get('/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+        self.assertContains(response, 'class="action-badge cart-count">2</span>')
+
+
+class ProductPageRevalidationTest(TestCase):
+    """Test cases for conditional GET on the product page"""
+
+    def setUp(self):
+        for alias in LOCMEM_CACHES:
+            caches[alias].clear()
+        self.product = Product.objects.create(
+            name='Runner', sku='RUN-1', category=Category.objects.create(name='Shoes'), price=100
+        )
+
+    def test_not_modified_still_counts_the_view(self):
+        """Test a 304 for the product page is counted as a view"""
+        from utils.view_counters import flush_view_counts, get_view_counter
+
+        # Views buffered in process by earlier tests are not rolled back
+        get_view_counter().drain()
+
+        url = f'/products/{self.product.slug}/'
+        # The first render also creates the default integration settings
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        flush_view_counts()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.view_count, 3)
@@ -13,26 +13,27 @@ from django.core.cache import cache
 from datetime import timedelta
 import logging
 
+from products.category_tree import get_category_tree
 from products.models import Product, Category, Review
 from users.models import User
 from cart.models import Cart, CartItem
+from cart.storage import GuestCart
 from orders.models import Order
 from pages.models import Page
-from utils.cache_utils import get_cache_manager, cache_view
+from utils.cache_utils import get_cache_manager
+from utils.conditional import conditional, page_validators
+from utils.page_cache import CATALOG_LABELS, cache_anonymous_page, versioned_key
+from utils.pagination import paginate
+from utils.view_counters import get_visitor_id, record_product_view, record_view
+
+from .homepage import build_homepage_data
 
 logger = logging.getLogger(__name__)
 
 
 def get_product_image_url(product):
     """Get product image URL safely"""
-    if product.images.exists():
-        first_image = product.images.first()
-        if hasattr(first_image, 'image') and hasattr(first_image.image, 'url'):
-            try:
-                return first_image.image.url
-            except (ValueError, AttributeError):
-                pass
-    return None
+    return product.primary_image_url or None
 
 
 def get_image_url(image_path, request=None):
@@ -59,14 +60,18 @@ def get_image_url(image_path, request=None):
         return f"{base_url}/media/{image_path}"
 
 
-@cache_view(timeout=300, vary_on_user=False)  # Cache for 5 minutes
+def catalog_page_validators(request, *args, **kwargs):
+    """Product pages show products, the category menus and the site settings"""
+    return page_validators(request, CATALOG_LABELS)
+
+
+@conditional(catalog_page_validators)
+@cache_anonymous_page()
 def home(request):
     """Homepage view with featured products and categories."""
-    from settings.models import HeroContent
-    
     # Try to get cached homepage data
     cache_manager = get_cache_manager()
-    cache_key = 'homepage_data'
+    cache_key = versioned_key('homepage_data')
     cached_data = cache_manager.get_page_cache(cache_key)
     
     if cached_data is not None:
@@ -74,66 +79,7 @@ def home(request):
         # Add request-specific data that shouldn't be cached
         context['request'] = request
     else:
-        # Get hero slides
-        hero_slides = list(HeroContent.get_active_slides())
-        
-        # Get featured products
-        featured_products = list(Product.objects.filter(
-            is_featured=True, 
-            is_active=True
-        ).select_related('category').prefetch_related('images')[:8])
-        
-        # Get all parent categories (not limited to 6)
-        parent_categories = list(Category.objects.filter(
-            is_active=True, 
-            parent=None
-        ).order_by('name'))
-        
-        # Also keep featured categories for backward compatibility if needed
-        featured_categories = parent_categories[:6]
-        
-        # Get categories marked to show on homepage with their products
-        homepage_categories_data = []
-        homepage_categories = Category.objects.filter(
-            is_active=True,
-            show_homepage=True
-        ).order_by('name')
-        
-        for category in homepage_categories:
-            # If it's a parent category, get all products from this category and its children
-            if category.parent is None:
-                # Get all child category IDs
-                child_categories = Category.objects.filter(
-                    parent=category, 
-                    is_active=True
-                ).values_list('id', flat=True)
-                
-                # Include both parent and child category products
-                category_ids = list(child_categories) + [category.id]
-                category_products = Product.objects.filter(
-                    category_id__in=category_ids,
-                    is_active=True
-                ).select_related('category').prefetch_related('images')[:4]
-            else:
-                # If it's a child category, get only its products
-                category_products = Product.objects.filter(
-                    category=category,
-                    is_active=True
-                ).select_related('category').prefetch_related('images')[:4]
-            
-            if category_products.exists():
-                homepage_categories_data.append({
-                    'category': category,
-                    'products': list(category_products)
-                })
-        
-        context = {
-            'hero_slides': hero_slides,
-            'featured_products': featured_products,
-            'featured_categories': featured_categories,
-            'parent_categories': parent_categories,  # All parent categories
-            'homepage_categories': homepage_categories_data,  # Categories with show_homepage=True
-        }
+        context = build_homepage_data()
         
         # Cache the data
         cache_manager.set_page_cache(cache_key, context, 'home_page')
@@ -142,7 +88,8 @@ def home(request):
 
 
 
-@cache_view(timeout=600, vary_on_params=True)  # Cache for 10 minutes, vary on filters
+@conditional(catalog_page_validators)
+@cache_anonymous_page()
 def products(request):
     """Products listing page with filters."""
     from django.db.models import Avg
@@ -169,7 +116,7 @@ def products(request):
     
     products_list = Product.objects.filter(is_active=True).select_related(
         'category'
-    ).prefetch_related('images')
+    )
     
     # Get all categories for filter dropdown (cached)
     categories_key = 'all_categories'
@@ -235,10 +182,8 @@ def products(request):
         else:
             products_list = products_list.order_by(ordering)
     
-    # Pagination
-    paginator = Paginator(products_list, 12)  # 12 products per page
-    page_number = request.GET.get('page')
-    products_page = paginator.get_page(page_number)
+    # Pagination (keyset mode skips COUNT/OFFSET on deep pages)
+    products_page = paginate(request, products_list, 12)  # 12 products per page
     
     context = {
         'products': products_page,
@@ -247,6 +192,7 @@ def products(request):
     return render(request, 'frontend/products.html', context)
 
 
+@conditional(catalog_page_validators, not_modified=record_product_view)
 def product_detail(request, slug):
     """Product detail page."""
     product = get_object_or_404(
@@ -256,6 +202,7 @@ def product_detail(request, slug):
         slug=slug,
         is_active=True
     )
+    record_view('product', product.pk, get_visitor_id(request))
     
     # Get related products
     related_products = Product.objects.filter(
@@ -338,18 +285,18 @@ def categories(request):
     return render(request, 'frontend/categories.html', context)
 
 
+@conditional(catalog_page_validators)
 def category_products(request, slug):
     """Products in a specific category."""
     category = get_object_or_404(Category, slug=slug, is_active=True)
     
-    # Get products in this category or its subcategories
-    category_ids = [category.id]
-    category_ids.extend(category.subcategories.values_list('id', flat=True))
+    # Get products in this category or its active subcategories
+    category_ids = get_category_tree().descendant_ids(category.id)
     
     products_list = Product.objects.filter(
         category_id__in=category_ids,
         is_active=True
-    ).select_related('category').prefetch_related('images')
+    ).select_related('category')
     
     # Apply same filters as products view
     min_price = request.GET.get('min_price')
@@ -374,9 +321,7 @@ def category_products(request, slug):
         products_list = products_list.order_by(sort)
     
     # Pagination (using 12 products per page which gives 3 rows of 4 on desktop)
-    paginator = Paginator(products_list, 12)
-    page_number = request.GET.get('page')
-    products_page = paginator.get_page(page_number)
+    products_page = paginate(request, products_list, 12)
     
     context = {
         'category': category,
@@ -402,7 +347,7 @@ def search(request):
             Q(description__icontains=query) |
             Q(category__name__icontains=query),
             is_active=True
-        ).select_related('category').prefetch_related('images').distinct()
+        ).select_related('category').distinct()
         
         # Apply category filter
         if category:
@@ -440,9 +385,7 @@ def search(request):
     categories = Category.objects.filter(is_active=True, parent=None).order_by('name')
     
     # Pagination
-    paginator = Paginator(products_list, 12)
-    page_number = request.GET.get('page')
-    products_page = paginator.get_page(page_number)
+    products_page = paginate(request, products_list, 12)
     
     context = {
         'query': query,
@@ -489,21 +432,7 @@ def live_search_api(request):
         # Format product suggestions
         product_suggestions = []
         for product in products:
-            image_url = ''
-            # Try to get product image safely
-            try:
-                if hasattr(product, 'images') and product.images.exists():
-                    # Get primary image or first image
-                    primary_image = product.images.filter(is_primary=True).first()
-                    if not primary_image:
-                        primary_image = product.images.first()
-                    
-                    if primary_image and primary_image.image:
-                        image_url = get_image_url(primary_image.image, request)
-                                
-            except Exception as e:
-                logger.error(f"Error getting product image for {product.name}: {str(e)}")
-                image_url = ''
+            image_url = get_image_url(product.primary_image_url, request)
             
             product_suggestions.append({
                 'id': product.id,
@@ -572,7 +501,7 @@ def ajax_search(request):
         Q(category__name__icontains=query) |
         Q(sku__icontains=query),
         is_active=True
-    ).select_related('category').prefetch_related('images')[:8]  # Limit to 8 results
+    ).select_related('category')[:8]  # Limit to 8 results
     
     # Search for categories
     categories = Category.objects.filter(
@@ -595,11 +524,7 @@ def ajax_search(request):
     
     # Add product results
     for product in products:
-        # Get first image if available
-        first_image = product.images.first()
-        image_url = None
-        if first_image and first_image.image:
-            image_url = get_image_url(first_image.image, request)
+        image_url = get_image_url(product.primary_image_url, request) or None
         
         # Format price
         price_display = f"৳{product.price}"
@@ -659,16 +584,8 @@ def cart(request):
     if request.user.is_authenticated:
         cart_obj, created = Cart.objects.get_or_create(user=request.user)
     else:
-        # For guests, get cart by session
-        session_id = request.session.session_key
-        if not session_id:
-            request.session.create()
-            session_id = request.session.session_key
-        
-        cart_obj, created = Cart.objects.get_or_create(
-            session_id=session_id,
-            user=None
-        )
+        # Guest carts live in the cart storage backend and are loaded by the page's API calls
+        cart_obj = None
     
     context = {
         'cart': cart_obj,
@@ -681,25 +598,19 @@ def checkout(request):
     if request.user.is_authenticated:
         cart_obj, created = Cart.objects.get_or_create(user=request.user)
     else:
-        # For guests, get cart by session
-        session_id = request.session.session_key
-        if not session_id:
-            request.session.create()
-            session_id = request.session.session_key
-        
-        cart_obj, created = Cart.objects.get_or_create(
-            session_id=session_id,
-            user=None
-        )
+        # Guest carts are written to the database when checkout starts
+        cart_obj = GuestCart(request).materialize()
+    
+    # Load the items once and compute the totals from them
+    totals = cart_obj.get_totals() if cart_obj else None
     
     # Redirect to cart if empty
-    if not cart_obj.items.exists():
+    if not totals or not totals.items:
         messages.warning(request, 'Your cart is empty. Add items before checkout.')
         return redirect('frontend:cart')
     
-    # Calculate totals
-    cart_items = cart_obj.items.all()
-    subtotal = sum(item.total_price for item in cart_items)
+    cart_items = totals.items
+    subtotal = totals.subtotal
     shipping_cost = 0  # You can implement shipping calculation logic here
     total = subtotal + shipping_cost
     
@@ -1240,7 +1151,7 @@ def wishlist(request):
     """User wishlist page."""
     wishlist_items = request.user.wishlist_items.all().select_related(
         'product__category'
-    ).prefetch_related('product__images')
+    )
     
     context = {
         'wishlist_items': wishlist_items,
@@ -1415,7 +1326,7 @@ def track_order(request):
                 'items': [{
                     'product': {
                         'name': item.product.name,
-                        'image_url': item.product.images.first().image.url if item.product.images.exists() else None
+                        'image_url': get_product_image_url(item.product)
                     },
                     'variant': {
                         'color': item.variant.color if item.variant else None,
@@ -1737,8 +1648,7 @@ def page_detail(request, slug):
         return redirect('frontend:login')
     
     # Increment view count
-    page.view_count += 1
-    page.save(update_fields=['view_count'])
+    page.increment_view_count(get_visitor_id(request))
     
     # Get related pages from the same category
     related_pages = Page.objects.filter(
@@ -164,14 +164,10 @@ class IncompleteOrderAdmin(admin.ModelAdmin):
     mark_as_abandoned.short_description = "Mark selected as abandoned"
     
     def send_recovery_email(self, request, queryset):
-        # This would implement recovery email sending
-        # For now, just increment recovery attempts
-        count = 0
-        for incomplete_order in queryset.filter(status__in=['pending', 'abandoned']):
-            incomplete_order.increment_recovery_attempt()
-            count += 1
+        from .mailer import RecoveryMailer
+        result = RecoveryMailer().send_candidates(queryset.filter(status__in=['pending', 'abandoned']))
         
-        self.message_user(request, f"Sent recovery emails to {count} customers.")
+        self.message_user(request, f"Sent recovery emails to {result['sent']} customers.")
     
     send_recovery_email.short_description = "Send recovery emails"
 
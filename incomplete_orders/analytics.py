@@ -0,0 +1,175 @@
+"""
+Incomplete order analytics rollup
+
+Builds ``IncompleteOrderAnalytics`` rows for any range of days with one
+grouped query per source table (incomplete orders by creation day, recovery
+emails by send day) and writes all days with a single upsert.
+
+``refresh_analytics`` only recomputes the days touched since its previous
+run: days of orders that were created, updated or expired and days of
+recovery emails sent or answered since then. Scheduled via the
+``update_analytics --incremental`` management command.
+"""
+from datetime import timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Max, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import IncompleteOrder, IncompleteOrderAnalytics, RecoveryEmailLog
+
+LAST_RUN_KEY = 'incomplete_order_analytics_last_run'
+
+COUNTER_FIELDS = (
+    'total_incomplete_orders', 'abandoned_orders', 'converted_orders', 'expired_orders',
+    'recovery_emails_sent', 'recovery_success_count',
+    'total_lost_revenue', 'recovered_revenue',
+    'conversion_rate', 'recovery_rate',
+)
+
+
+def _rate(part, whole):
+    if not whole:
+        return Decimal('0.00')
+    return (Decimal(part) * 100 / whole).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def _order_totals(orders, now):
+    """Per-day order counts and revenue in one grouped query"""
+    rows = orders.annotate(day=TruncDate('created_at')).values('day').annotate(
+        total=Count('id'),
+        abandoned=Count('id', filter=Q(status='abandoned')),
+        converted=Count('id', filter=Q(status='converted')),
+        expired=Count('id', filter=Q(expires_at__lt=now)),
+        lost_revenue=Sum('total_amount', filter=Q(status='abandoned')),
+        recovered_revenue=Sum('total_amount', filter=Q(status='converted')),
+    ).order_by()
+    return {row['day']: row for row in rows}
+
+
+def _email_totals(emails):
+    """Per-day recovery email counts in one grouped query"""
+    rows = emails.annotate(day=TruncDate('sent_at')).values('day').annotate(
+        sent=Count('id'),
+        responded=Count('id', filter=Q(responded=True)),
+    ).order_by()
+    return {row['day']: row for row in rows}
+
+
+def _build(day, orders, emails):
+    orders = orders or {}
+    emails = emails or {}
+    analytics = IncompleteOrderAnalytics(
+        date=day,
+        total_incomplete_orders=orders.get('total', 0),
+        abandoned_orders=orders.get('abandoned', 0),
+        converted_orders=orders.get('converted', 0),
+        expired_orders=orders.get('expired', 0),
+        recovery_emails_sent=emails.get('sent', 0),
+        recovery_success_count=emails.get('responded', 0),
+        total_lost_revenue=orders.get('lost_revenue') or Decimal('0.00'),
+        recovered_revenue=orders.get('recovered_revenue') or Decimal('0.00'),
+    )
+    analytics.conversion_rate = _rate(analytics.converted_orders, analytics.total_incomplete_orders)
+    analytics.recovery_rate = _rate(analytics.recovery_success_count, analytics.recovery_emails_sent)
+    return analytics
+
+
+def _upsert(rows):
+    """Insert or update all analytics rows in one statement"""
+    if not rows:
+        return
+    options = {'update_conflicts': True, 'update_fields': [*COUNTER_FIELDS, 'updated_at']}
+    if connection.features.supports_update_conflicts_with_target:
+        options['unique_fields'] = ['date']
+    IncompleteOrderAnalytics.objects.bulk_create(rows, **options)
+
+
+def rollup_days(days):
+    """Recompute and store analytics for the given dates, returns the rows"""
+    days = sorted(set(days))
+    if not days:
+        return []
+
+    now = timezone.now()
+    order_totals = _order_totals(IncompleteOrder.objects.filter(created_at__date__in=days), now)
+    email_totals = _email_totals(RecoveryEmailLog.objects.filter(sent_at__date__in=days))
+
+    rows = [_build(day, order_totals.get(day), email_totals.get(day)) for day in days]
+    _upsert(rows)
+    return rows
+
+
+def rollup_range(start_date, end_date=None):
+    """Recompute and store analytics for every day from ``start_date`` to ``end_date``"""
+    end_date = end_date or start_date
+    if end_date < start_date:
+        start_date, end_date = end_date, start_date
+
+    now = timezone.now()
+    order_totals = _order_totals(
+        IncompleteOrder.objects.filter(created_at__date__range=(start_date, end_date)), now
+    )
+    email_totals = _email_totals(
+        RecoveryEmailLog.objects.filter(sent_at__date__range=(start_date, end_date))
+    )
+
+    rows = []
+    day = start_date
+    while day <= end_date:
+        rows.append(_build(day, order_totals.get(day), email_totals.get(day)))
+        day += timedelta(days=1)
+    _upsert(rows)
+    return rows
+
+
+def touched_days(since, now=None):
+    """Dates whose analytics may have changed since ``since``"""
+    now = now or timezone.now()
+    orders = IncompleteOrder.objects.filter(
+        Q(updated_at__gte=since) | Q(expires_at__gte=since, expires_at__lt=now)
+    )
+    emails = RecoveryEmailLog.objects.filter(Q(sent_at__gte=since) | Q(response_date__gte=since))
+
+    days = set(
+        orders.annotate(day=TruncDate('created_at')).values_list('day', flat=True).distinct().order_by()
+    )
+    days.update(
+        emails.annotate(day=TruncDate('sent_at')).values_list('day', flat=True).distinct().order_by()
+    )
+    days.add(timezone.localdate(now))
+    return days
+
+
+def get_last_run():
+    """Start of the previous incremental run, falling back to the newest stored row"""
+    last_run = cache.get(LAST_RUN_KEY)
+    if last_run is None:
+        last_run = IncompleteOrderAnalytics.objects.aggregate(last=Max('updated_at'))['last']
+    return last_run
+
+
+def refresh_analytics():
+    """
+    Recompute only the days touched since the previous run.
+
+    Without any previous run (empty analytics table) every day with orders
+    or recovery emails is rolled up.
+    """
+    started = timezone.now()
+    since = get_last_run()
+
+    if since is None:
+        first_order = IncompleteOrder.objects.order_by('created_at').values_list('created_at', flat=True).first()
+        first_email = RecoveryEmailLog.objects.order_by('sent_at').values_list('sent_at', flat=True).first()
+        firsts = [value for value in (first_order, first_email) if value]
+        start = timezone.localdate(min(firsts)) if firsts else timezone.localdate(started)
+        rows = rollup_range(start, timezone.localdate(started))
+    else:
+        rows = rollup_days(touched_days(since, started))
+
+    cache.set(LAST_RUN_KEY, started, None)
+    return rows
@@ -0,0 +1,439 @@
+"""
+Buffered checkout-abandonment tracking
+
+The checkout page reports form changes (``checkout_data`` events) and page
+exits (``abandonment`` events). The ingestion endpoint only appends these
+events to a buffer; ``consolidate_events`` (run periodically by the
+``consolidate_checkout_events`` command) reads them in batches and creates
+or updates incomplete orders in bulk.
+
+Buffers (``settings.CHECKOUT_EVENT_BUFFER_BACKEND``):
+
+- ``RedisEventBuffer``: a Redis list (RPUSH / LMOVE to a processing list)
+- ``DatabaseEventBuffer``: the append-only ``CheckoutEvent`` table
+
+Events are only dropped from the buffer once the consolidation committed.
+Checkout data of visitors who have not abandoned checkout yet is kept as
+``pending_data`` rows of the ``CheckoutEvent`` table until they do.
+"""
+import functools
+import json
+import logging
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import (
+    CheckoutEvent, IncompleteOrder, IncompleteOrderItem,
+    IncompleteShippingAddress, IncompleteOrderHistory
+)
+
+logger = logging.getLogger(__name__)
+
+EVENT_TYPES = ('checkout_data', 'abandonment')
+CHECKOUT_FIELDS = ('full_name', 'email', 'phone_number', 'address', 'order_instruction')
+ACTIVE_STATUSES = ('pending', 'abandoned')
+ABANDONMENT_REASON = 'checkout_form_abandonment'
+
+# Checkout data of visitors who have no incomplete order yet
+PENDING_DATA_EVENT = 'pending_data'
+PENDING_DATA_TIMEOUT = timedelta(days=1)
+
+
+def get_client_ip(request):
+    """Get client IP address"""
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        return x_forwarded_for.split(',')[0]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def get_event_owner(request):
+    """``user:<id>`` for customers, ``session:<key>`` for guests, ``None`` without a session"""
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    if request.session.session_key:
+        return f'session:{request.session.session_key}'
+    return None
+
+
+def build_event(request, event_type, data=None):
+    """Build a buffered event from the request; ``None`` when it can't be attributed"""
+    owner = get_event_owner(request)
+    if owner is None:
+        return None
+    data = data or {}
+    return {
+        'event_type': event_type,
+        'owner': owner,
+        'payload': {
+            'data': {field: str(data[field]) for field in CHECKOUT_FIELDS if data.get(field) is not None},
+            'session_id': request.session.session_key,
+            'user_agent': request.META.get('HTTP_USER_AGENT', ''),
+            'ip_address': get_client_ip(request) or None,
+            'referrer_url': request.META.get('HTTP_REFERER', '')[:200],
+            'timestamp': timezone.now().isoformat(),
+        },
+    }
+
+
+# ----------------------------------------------------------------------
+# Buffers
+# ----------------------------------------------------------------------
+class DatabaseEventBuffer:
+    """
+    Buffers events as rows of the append-only ``CheckoutEvent`` table.
+
+    Claimed rows are deleted in the consolidation transaction, a failed
+    consolidation rolls the deletion back.
+    """
+
+    def push(self, event):
+        CheckoutEvent.objects.create(**event)
+
+    def claim(self, limit):
+        """``(events, receipt)``, must be called inside the consolidation transaction"""
+        rows = list(
+            CheckoutEvent.objects.select_for_update(skip_locked=True)
+            .filter(event_type__in=EVENT_TYPES)
+            .order_by('id')[:limit]
+            .values('id', 'event_type', 'owner', 'payload')
+        )
+        CheckoutEvent.objects.filter(id__in=[row.pop('id') for row in rows]).delete()
+        return rows, None
+
+    def ack(self, receipt):
+        pass
+
+    def release(self, receipt):
+        pass
+
+    def size(self):
+        return CheckoutEvent.objects.filter(event_type__in=EVENT_TYPES).count()
+
+
+class RedisEventBuffer:
+    """
+    Buffers events in a Redis list.
+
+    Claimed events are moved (``LMOVE``) to a processing list of the run and
+    only dropped once the consolidation committed; a failed run moves them
+    back, lists of runs that died are moved back after ``processing_timeout``.
+    """
+
+    key = 'incomplete_orders:checkout_events'
+    processing_key = 'incomplete_orders:checkout_events:processing:{run}'
+    runs_key = 'incomplete_orders:checkout_events:runs'
+    processing_timeout = 60 * 10
+
+    def __init__(self):
+        from django_redis import get_redis_connection
+        self.client = get_redis_connection('default')
+
+    def push(self, event):
+        self.client.rpush(self.key, json.dumps(event))
+
+    def _requeue_stale_runs(self):
+        cutoff = time.time() - self.processing_timeout
+        for run in self.client.zrangebyscore(self.runs_key, 0, cutoff):
+            self.release(run.decode() if isinstance(run, bytes) else run)
+
+    def claim(self, limit):
+        self._requeue_stale_runs()
+        run = uuid.uuid4().hex
+        processing = self.processing_key.format(run=run)
+        self.client.zadd(self.runs_key, {run: time.time()})
+        pipe = self.client.pipeline(transaction=False)
+        for _ in range(limit):
+            pipe.lmove(self.key, processing, 'LEFT', 'RIGHT')
+        raw_events = [raw for raw in pipe.execute() if raw is not None]
+        return [json.loads(raw) for raw in raw_events], run
+
+    def ack(self, run):
+        pipe = self.client.pipeline(transaction=True)
+        pipe.delete(self.processing_key.format(run=run))
+        pipe.zrem(self.runs_key, run)
+        pipe.execute()
+
+    def release(self, run):
+        """Put the events of a run back at the head of the buffer, in order"""
+        processing = self.processing_key.format(run=run)
+        while self.client.lmove(processing, self.key, 'RIGHT', 'LEFT') is not None:
+            pass
+        self.client.zrem(self.runs_key, run)
+
+    def size(self):
+        return self.client.llen(self.key)
+
+
+@functools.lru_cache(maxsize=None)
+def _load_buffer(backend_path):
+    return import_string(backend_path)()
+
+
+def get_event_buffer():
+    return _load_buffer(getattr(
+        settings, 'CHECKOUT_EVENT_BUFFER_BACKEND', 'incomplete_orders.ingestion.DatabaseEventBuffer'
+    ))
+
+
+@receiver(setting_changed)
+def reset_event_buffer(setting, **kwargs):
+    if setting == 'CHECKOUT_EVENT_BUFFER_BACKEND':
+        _load_buffer.cache_clear()
+
+
+def record_event(request, event_type, data=None):
+    """Append a checkout event to the buffer; returns ``False`` if it was dropped"""
+    event = build_event(request, event_type, data)
+    if event is None:
+        return False
+    get_event_buffer().push(event)
+    return True
+
+
+# ----------------------------------------------------------------------
+# Consolidation
+# ----------------------------------------------------------------------
+def _split_name(full_name):
+    name_parts = full_name.split(' ', 1)
+    return name_parts[0], name_parts[1] if len(name_parts) > 1 else ''
+
+
+def _group_events(events):
+    """Merge the events of each owner: latest value per field, latest request metadata"""
+    groups = {}
+    for event in events:
+        group = groups.setdefault(event['owner'], {'data': {}, 'abandoned': False, 'meta': {}})
+        payload = event['payload']
+        group['data'].update({key: value for key, value in payload.get('data', {}).items() if value})
+        group['meta'] = payload
+        if event['event_type'] == 'abandonment':
+            group['abandoned'] = True
+    return groups
+
+
+def _find_active_orders(owners):
+    """Latest pending/abandoned incomplete order per owner, in two queries"""
+    user_ids = [int(owner.split(':', 1)[1]) for owner in owners if owner.startswith('user:')]
+    session_ids = [owner.split(':', 1)[1] for owner in owners if owner.startswith('session:')]
+
+    found = {}
+    queryset = IncompleteOrder.objects.filter(status__in=ACTIVE_STATUSES).select_related('shipping_address').order_by('created_at')
+    if user_ids:
+        for order in queryset.filter(user_id__in=user_ids):
+            found[f'user:{order.user_id}'] = order
+    if session_ids:
+        for order in queryset.filter(session_id__in=session_ids, user=None):
+            found[f'session:{order.session_id}'] = order
+    return found
+
+
+def _find_carts(owners):
+    """Carts with their items for the given owners, in two queries"""
+    from cart.models import Cart
+    from cart.totals import cart_items_prefetch
+
+    user_ids = [int(owner.split(':', 1)[1]) for owner in owners if owner.startswith('user:')]
+    session_ids = [owner.split(':', 1)[1] for owner in owners if owner.startswith('session:')]
+
+    carts = {}
+    queryset = Cart.objects.prefetch_related(cart_items_prefetch())
+    if user_ids:
+        for cart in queryset.filter(user_id__in=user_ids):
+            carts[f'user:{cart.user_id}'] = cart
+    if session_ids:
+        for cart in queryset.filter(session_id__in=session_ids, user=None):
+            carts[f'session:{cart.session_id}'] = cart
+    return carts
+
+
+def _apply_checkout_data(order, data):
+    if data.get('email'):
+        order.customer_email = data['email']
+        if not order.user_id:
+            order.guest_email = data['email']
+    if data.get('phone_number'):
+        order.customer_phone = data['phone_number'][:15]
+    if data.get('order_instruction'):
+        order.customer_notes = data['order_instruction']
+
+
+def _apply_shipping_data(address, data):
+    if data.get('full_name'):
+        address.first_name, address.last_name = _split_name(data['full_name'])
+    if data.get('phone_number'):
+        address.phone = data['phone_number'][:15]
+    if data.get('address'):
+        address.address_line_1 = data['address']
+
+
+def consolidate_events(batch_size=1000):
+    """
+    Consolidate one batch of buffered events into incomplete orders.
+
+    Existing pending/abandoned incomplete orders are updated with
+    ``bulk_update``; visitors who abandoned checkout without one get a new
+    incomplete order built from their cart with ``bulk_create``. Checkout
+    data of visitors who have not abandoned checkout yet is kept until they do.
+
+    Returns ``{'events': n, 'created': n, 'updated': n}``.
+    """
+    buffer = get_event_buffer()
+    receipt = None
+    try:
+        with transaction.atomic():
+            events, receipt = buffer.claim(batch_size)
+            stats = _consolidate(events)
+    except Exception:
+        if receipt is not None:
+            buffer.release(receipt)
+        raise
+    buffer.ack(receipt)
+    return stats
+
+
+def _consolidate(events):
+    stats = {'events': len(events), 'created': 0, 'updated': 0}
+    if not events:
+        return stats
+
+    groups = _group_events(events)
+    now = timezone.now()
+
+    # Merge checkout data kept by earlier runs, expired data is dropped
+    pending_rows = CheckoutEvent.objects.filter(event_type=PENDING_DATA_EVENT)
+    pending_rows.filter(created_at__lt=now - PENDING_DATA_TIMEOUT).delete()
+    for owner, payload in pending_rows.filter(owner__in=list(groups)).values_list('owner', 'payload'):
+        group = groups[owner]
+        group['data'] = {**payload.get('data', {}), **group['data']}
+
+    existing = _find_active_orders(list(groups))
+    to_create = [owner for owner, group in groups.items()
+                 if owner not in existing and group['abandoned'] and group['data']]
+    carts = _find_carts(to_create) if to_create else {}
+
+    stats['updated'] = _update_orders(existing, groups, now)
+    stats['created'] = _create_orders(to_create, groups, carts, now)
+
+    # Keep data of visitors without an incomplete order for a later abandonment event
+    pending_rows.filter(owner__in=list(groups)).delete()
+    CheckoutEvent.objects.bulk_create([
+        CheckoutEvent(event_type=PENDING_DATA_EVENT, owner=owner, payload={'data': group['data']})
+        for owner, group in groups.items()
+        if owner not in existing and not group['abandoned'] and group['data']
+    ])
+    return stats
+
+
+def _update_orders(existing, groups, now):
+    orders, addresses = [], []
+    for owner, order in existing.items():
+        data = groups[owner]['data']
+        if not data:
+            continue
+        _apply_checkout_data(order, data)
+        order.updated_at = now
+        orders.append(order)
+
+        address = getattr(order, 'shipping_address', None)
+        if address is not None:
+            _apply_shipping_data(address, data)
+            address.updated_at = now
+            addresses.append(address)
+
+    IncompleteOrder.objects.bulk_update(
+        orders, ['customer_email', 'guest_email', 'customer_phone', 'customer_notes', 'updated_at']
+    )
+    IncompleteShippingAddress.objects.bulk_update(
+        addresses, ['first_name', 'last_name', 'phone', 'address_line_1', 'updated_at']
+    )
+    return len(orders)
+
+
+def _create_orders(owners, groups, carts, now):
+    new_orders = {}
+    cart_items = {}
+    for owner in owners:
+        cart = carts.get(owner)
+        items = list(cart.items.all()) if cart else []
+        if not items:
+            continue
+
+        data, meta = groups[owner]['data'], groups[owner]['meta']
+        is_guest = owner.startswith('session:')
+        subtotal = sum((item.total_price for item in items), Decimal('0.00'))
+        order = IncompleteOrder(
+            incomplete_order_id=f"INC-{uuid.uuid4().hex[:8].upper()}",
+            user_id=None if is_guest else cart.user_id,
+            is_guest_order=is_guest,
+            session_id=meta.get('session_id'),
+            status='abandoned',
+            subtotal=subtotal,
+            total_amount=subtotal,
+            user_agent=meta.get('user_agent', ''),
+            ip_address=meta.get('ip_address'),
+            referrer_url=meta.get('referrer_url', ''),
+            abandonment_reason=ABANDONMENT_REASON,
+            abandoned_at=now,
+            expires_at=now + timedelta(days=30),
+        )
+        _apply_checkout_data(order, data)
+        new_orders[owner] = order
+        cart_items[owner] = items
+
+    if not new_orders:
+        return 0
+
+    IncompleteOrder.objects.bulk_create(new_orders.values())
+    # Not every database returns primary keys from bulk inserts
+    ids = dict(IncompleteOrder.objects.filter(
+        incomplete_order_id__in=[order.incomplete_order_id for order in new_orders.values()]
+    ).values_list('incomplete_order_id', 'id'))
+
+    items, addresses, history = [], [], []
+    for owner, order in new_orders.items():
+        order.pk = ids[order.incomplete_order_id]
+        for cart_item in cart_items[owner]:
+            items.append(IncompleteOrderItem(
+                incomplete_order_id=order.pk,
+                product=cart_item.product,
+                variant=cart_item.variant,
+                product_name=cart_item.product.name,
+                product_sku=cart_item.product.sku,
+                variant_name=cart_item.variant.name if cart_item.variant else '',
+                quantity=cart_item.quantity,
+                unit_price=cart_item.unit_price,
+            ))
+
+        data = groups[owner]['data']
+        if data.get('full_name') and data.get('address'):
+            address = IncompleteShippingAddress(
+                incomplete_order_id=order.pk,
+                city='Not specified',
+                country='Bangladesh',
+            )
+            _apply_shipping_data(address, data)
+            addresses.append(address)
+
+        history.append(IncompleteOrderHistory(
+            incomplete_order_id=order.pk, action='created',
+            details='Incomplete order created', created_by_system=True,
+        ))
+        history.append(IncompleteOrderHistory(
+            incomplete_order_id=order.pk, action='abandoned',
+            details='Status changed from pending to abandoned', created_by_system=True,
+        ))
+
+    IncompleteOrderItem.objects.bulk_create(items)
+    IncompleteShippingAddress.objects.bulk_create(addresses)
+    IncompleteOrderHistory.objects.bulk_create(history)
+    return len(new_orders)
@@ -0,0 +1,270 @@
+"""
+Batched recovery email dispatcher
+
+Recovery emails are rendered for a whole batch of incomplete orders up front
+(items and users loaded with the orders), then sent by a bounded pool of
+worker threads. Each worker opens one SMTP connection for the batch and
+reuses it for all of its messages, and a shared limiter keeps the send rate
+per recipient provider (email domain) under ``RECOVERY_EMAIL_RATE_LIMITS``.
+
+After the batch the bookkeeping is written in bulk: ``RecoveryEmailLog`` and
+``IncompleteOrderHistory`` rows with ``bulk_create`` and the recovery attempt
+counters with a single ``UPDATE``.
+
+Any SMTP server works for testing, e.g. a local sink started with
+``python -m aiosmtpd -n -l localhost:1025`` and ``EMAIL_BACKEND`` pointed
+at it.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import F
+from django.template import TemplateDoesNotExist
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from .models import IncompleteOrder, IncompleteOrderHistory, RecoveryEmailLog
+
+logger = logging.getLogger(__name__)
+
+EMAIL_TEMPLATES = {
+    'abandoned_cart': {
+        'subject': 'You left something in your cart!',
+        'template': 'emails/abandoned_cart.html'
+    },
+    'payment_reminder': {
+        'subject': 'Complete your purchase',
+        'template': 'emails/payment_reminder.html'
+    },
+    'final_reminder': {
+        'subject': 'Last chance - Complete your order',
+        'template': 'emails/final_reminder.html'
+    },
+    'discount_offer': {
+        'subject': 'Special discount on your cart!',
+        'template': 'emails/discount_offer.html'
+    }
+}
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_RATE_LIMITS = {'default': 10}  # messages per second per provider
+
+
+def email_type_for_attempt(attempts):
+    """Recovery email sent for the next attempt"""
+    if attempts == 0:
+        return 'abandoned_cart'
+    if attempts == 1:
+        return 'payment_reminder'
+    return 'final_reminder'
+
+
+def recipient_provider(email):
+    return email.rsplit('@', 1)[-1].lower()
+
+
+class ProviderRateLimiter:
+    """Spaces out sends per provider, shared by all worker threads"""
+
+    def __init__(self, limits=None):
+        self.limits = limits or {}
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, provider):
+        rate = self.limits.get(provider, self.limits.get('default'))
+        if not rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(provider, now))
+            self._next_slot[provider] = slot + 1.0 / rate
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class RecoveryMailer:
+    """Sends recovery emails for batches of incomplete orders"""
+
+    def __init__(self, concurrency=None, rate_limits=None, connection_factory=None):
+        self.concurrency = max(1, concurrency or getattr(settings, 'RECOVERY_EMAIL_CONCURRENCY', DEFAULT_CONCURRENCY))
+        self.limiter = ProviderRateLimiter(
+            rate_limits if rate_limits is not None
+            else getattr(settings, 'RECOVERY_EMAIL_RATE_LIMITS', DEFAULT_RATE_LIMITS)
+        )
+        self.connection_factory = connection_factory
+        self._config_loaded = False
+        self.active_config = None
+
+    # Connection --------------------------------------------------------
+    def _load_config(self):
+        if not self._config_loaded:
+            from dashboard.email_service import email_service
+            self.active_config = email_service.active_config
+            self.email_service = email_service
+            self._config_loaded = True
+        return self.active_config
+
+    def get_connection(self):
+        """A new, unopened connection; each worker opens one per batch"""
+        if self.connection_factory:
+            return self.connection_factory()
+        if self._load_config():
+            return self.email_service.get_connection()
+        return get_connection()
+
+    def get_from_email(self):
+        config = self._load_config()
+        if config:
+            return f"{config.from_name} <{config.from_email}>"
+        return settings.DEFAULT_FROM_EMAIL
+
+    # Rendering ---------------------------------------------------------
+    def build_message(self, order, email_type, subject=None):
+        config = EMAIL_TEMPLATES.get(email_type, EMAIL_TEMPLATES['abandoned_cart'])
+        subject = subject or config['subject']
+        recovery_url = (
+            f"{getattr(settings, 'FRONTEND_URL', '')}/checkout/recover/{order.incomplete_order_id}"
+        )
+        context = {
+            'incomplete_order': order,
+            'recovery_url': recovery_url,
+            'customer_name': order.user.get_full_name() if order.user else 'Customer',
+            'items': order.items.all(),
+        }
+
+        try:
+            html_content = render_to_string(config['template'], context)
+            text_content = strip_tags(html_content)
+        except TemplateDoesNotExist:
+            html_content = None
+            text_content = (
+                f"Hello {context['customer_name']},\n\n"
+                f"Your order is waiting for you. Complete it here: {recovery_url}\n"
+            )
+
+        message = EmailMultiAlternatives(
+            subject=subject,
+            body=text_content,
+            from_email=self.get_from_email(),
+            to=[order.customer_email or order.guest_email],
+        )
+        if html_content:
+            message.attach_alternative(html_content, 'text/html')
+        return message
+
+    # Sending -----------------------------------------------------------
+    def _send_chunk(self, chunk):
+        """Send a worker's share of the batch over a single connection"""
+        results = []
+        connection = self.get_connection()
+        try:
+            connection.open()
+        except Exception as e:
+            logger.error(f"Could not open email connection: {e}")
+            return [(index, str(e)) for index, _ in chunk]
+
+        try:
+            for index, message in chunk:
+                self.limiter.wait(recipient_provider(message.to[0]))
+                try:
+                    sent = connection.send_messages([message])
+                    results.append((index, None if sent else 'Message was not accepted'))
+                except Exception as e:
+                    results.append((index, str(e)))
+        finally:
+            connection.close()
+        return results
+
+    def _dispatch(self, messages):
+        """Send ``messages`` concurrently, returns an error (or ``None``) per message"""
+        errors = [None] * len(messages)
+        indexed = list(enumerate(messages))
+        chunks = [indexed[i::self.concurrency] for i in range(self.concurrency)]
+        chunks = [chunk for chunk in chunks if chunk]
+
+        if len(chunks) == 1:
+            results = [self._send_chunk(chunks[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=len(chunks)) as executor:
+                results = list(executor.map(self._send_chunk, chunks))
+
+        for chunk_results in results:
+            for index, error in chunk_results:
+                errors[index] = error
+        return errors
+
+    def send(self, orders, email_type=None, subject=None):
+        """
+        Send recovery emails for ``orders`` and record them in bulk.
+
+        ``email_type`` defaults to the type matching each order's attempt
+        count. Returns ``{'sent': n, 'failed': n}``.
+        """
+        orders = [order for order in orders if order.customer_email or order.guest_email]
+        if not orders:
+            return {'sent': 0, 'failed': 0}
+
+        messages, types = [], []
+        for order in orders:
+            order_email_type = email_type or email_type_for_attempt(order.recovery_attempts)
+            types.append(order_email_type)
+            messages.append(self.build_message(order, order_email_type, subject))
+
+        errors = self._dispatch(messages)
+
+        now = timezone.now()
+        logs, history, sent_ids = [], [], []
+        for order, order_email_type, message, error in zip(orders, types, messages, errors):
+            if error is None:
+                sent_ids.append(order.pk)
+                logs.append(RecoveryEmailLog(
+                    incomplete_order=order,
+                    email_type=order_email_type,
+                    recipient_email=message.to[0],
+                    subject=message.subject,
+                ))
+                details = f'Recovery email sent: {order_email_type}'
+            else:
+                details = f'Failed to send recovery email: {error}'
+            history.append(IncompleteOrderHistory(
+                incomplete_order=order,
+                action='recovery_sent',
+                details=details,
+                created_by_system=True,
+            ))
+
+        RecoveryEmailLog.objects.bulk_create(logs)
+        IncompleteOrderHistory.objects.bulk_create(history)
+        if sent_ids:
+            IncompleteOrder.objects.filter(pk__in=sent_ids).update(
+                recovery_attempts=F('recovery_attempts') + 1,
+                last_recovery_attempt=now,
+                updated_at=now,
+            )
+            for order in orders:
+                if order.pk in sent_ids:
+                    order.recovery_attempts += 1
+                    order.last_recovery_attempt = now
+
+        return {'sent': len(sent_ids), 'failed': len(orders) - len(sent_ids)}
+
+    def send_candidates(self, candidates, batch_size=100, email_type=None):
+        """Send to a queryset of candidates in primary key ordered batches"""
+        totals = {'sent': 0, 'failed': 0}
+        candidates = candidates.select_related('user').prefetch_related('items__product', 'items__variant')
+        last_pk = 0
+        while True:
+            batch = list(candidates.filter(pk__gt=last_pk).order_by('pk')[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            result = self.send(batch, email_type)
+            totals['sent'] += result['sent']
+            totals['failed'] += result['failed']
+        return totals
@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand
+from incomplete_orders.ingestion import consolidate_events, get_event_buffer
+
+
+class Command(BaseCommand):
+    help = 'Consolidate buffered checkout tracking events into incomplete orders'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of events consolidated per batch (default: 1000)'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running and consolidate every --interval seconds'
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=30,
+            help='Seconds between runs with --loop (default: 30)'
+        )
+    
+    def handle(self, *args, **options):
+        while True:
+            self.consolidate(options['batch_size'])
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+    
+    def consolidate(self, batch_size):
+        totals = {'events': 0, 'created': 0, 'updated': 0}
+        
+        # Drain the buffer batch by batch
+        while True:
+            stats = consolidate_events(batch_size)
+            for key in totals:
+                totals[key] += stats[key]
+            if stats['events'] < batch_size:
+                break
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Consolidated {totals['events']} events: "
+                f"{totals['created']} incomplete orders created, {totals['updated']} updated "
+                f"({get_event_buffer().size()} events left in buffer)"
+            )
+        )
@@ -1,7 +1,8 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from datetime import timedelta
-from incomplete_orders.models import IncompleteOrder, RecoveryEmailLog, IncompleteOrderHistory
+from incomplete_orders.mailer import RecoveryMailer
+from incomplete_orders.models import IncompleteOrder
 
 
 class Command(BaseCommand):
@@ -20,6 +21,17 @@ class Command(BaseCommand):
             default=3,
             help='Maximum recovery attempts per order (default: 3)'
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Orders rendered and sent per batch (default: 100)'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            help='Parallel SMTP connections per batch (default: RECOVERY_EMAIL_CONCURRENCY)'
+        )
         parser.add_argument(
             '--dry-run',
             action='store_true',
@@ -68,60 +80,16 @@ class Command(BaseCommand):
                     self.style.SUCCESS('No orders need recovery emails')
                 )
             else:
-                sent_count = 0
+                mailer = RecoveryMailer(concurrency=options['concurrency'])
+                result = mailer.send_candidates(orders_to_recover, batch_size=options['batch_size'])
                 
-                for order in orders_to_recover:
-                    try:
-                        # Determine email type based on attempts
-                        if order.recovery_attempts == 0:
-                            email_type = 'abandoned_cart'
-                            subject = 'You left something in your cart!'
-                        elif order.recovery_attempts == 1:
-                            email_type = 'payment_reminder'
-                            subject = 'Complete your purchase'
-                        else:
-                            email_type = 'final_reminder'
-                            subject = 'Last chance - Complete your order'
-                        
-                        email = order.customer_email or order.guest_email
-                        
-                        # Log the recovery email
-                        RecoveryEmailLog.objects.create(
-                            incomplete_order=order,
-                            email_type=email_type,
-                            recipient_email=email,
-                            subject=subject
-                        )
-                        
-                        # Increment recovery attempts
-                        order.increment_recovery_attempt()
-                        
-                        # Log in history
-                        IncompleteOrderHistory.objects.create(
-                            incomplete_order=order,
-                            action='recovery_sent',
-                            details=f'Recovery email sent: {email_type}',
-                            created_by_system=True
-                        )
-                        
-                        sent_count += 1
-                        
-                        self.stdout.write(
-                            f'Sent {email_type} email to {email} for order {order.incomplete_order_id}'
-                        )
-                        
-                        # Here you would integrate with your actual email sending service
-                        # For example: send_recovery_email(order, email_type)
-                        
-                    except Exception as e:
-                        self.stdout.write(
-                            self.style.ERROR(
-                                f'Failed to send email for order {order.incomplete_order_id}: {str(e)}'
-                            )
-                        )
+                if result['failed']:
+                    self.stdout.write(
+                        self.style.ERROR(f"Failed to send {result['failed']} recovery emails")
+                    )
                 
                 self.stdout.write(
                     self.style.SUCCESS(
-                        f'Successfully sent {sent_count} recovery emails'
+                        f"Successfully sent {result['sent']} recovery emails"
                     )
-                )
\ No newline at end of file
+                )
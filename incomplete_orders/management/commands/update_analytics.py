@@ -1,45 +1,79 @@
-from django.core.management.base import BaseCommand
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
-from incomplete_orders.signals import update_daily_analytics
+from incomplete_orders.analytics import refresh_analytics, rollup_range
 
 
 class Command(BaseCommand):
     help = 'Update daily analytics for incomplete orders'
-    
+
     def add_arguments(self, parser):
         parser.add_argument(
             '--date',
             type=str,
             help='Update analytics for specific date (YYYY-MM-DD format)'
         )
-    
+        parser.add_argument(
+            '--start',
+            type=str,
+            help='Backfill analytics starting at this date (YYYY-MM-DD format)'
+        )
+        parser.add_argument(
+            '--end',
+            type=str,
+            help='Last date of the backfill (YYYY-MM-DD format, default: today)'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            help='Backfill analytics for the last N days'
+        )
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Only recompute days touched since the previous run'
+        )
+
+    def parse_date(self, value):
+        return datetime.strptime(value, '%Y-%m-%d').date()
+
     def handle(self, *args, **options):
-        target_date = options.get('date')
-        
-        if target_date:
+        today = timezone.localdate()
+
+        if options['days'] is not None and options['days'] < 1:
+            raise CommandError('--days must be at least 1')
+
+        if options['incremental']:
+            self.stdout.write('Refreshing analytics for days changed since the last run')
+            rows = refresh_analytics()
+        else:
             try:
-                from datetime import datetime
-                target_date = datetime.strptime(target_date, '%Y-%m-%d').date()
-                self.stdout.write(f'Updating analytics for {target_date}')
+                if options['date']:
+                    start = end = self.parse_date(options['date'])
+                elif options['start']:
+                    start = self.parse_date(options['start'])
+                    end = self.parse_date(options['end']) if options['end'] else today
+                elif options['days'] is not None:
+                    start, end = today - timedelta(days=options['days'] - 1), today
+                else:
+                    start = end = today
             except ValueError:
                 self.stdout.write(
                     self.style.ERROR('Invalid date format. Use YYYY-MM-DD')
                 )
                 return
-        else:
-            target_date = timezone.now().date()
-            self.stdout.write(f'Updating analytics for today ({target_date})')
-        
-        try:
-            analytics = update_daily_analytics()
-            
-            self.stdout.write(
-                self.style.SUCCESS(
-                    f'Successfully updated analytics for {analytics.date}'
-                )
-            )
-            
-            # Display summary
+            self.stdout.write(f'Updating analytics for {start} to {end}')
+            rows = rollup_range(start, end)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully updated analytics for {len(rows)} day(s)')
+        )
+
+        # Display summary of the most recent day
+        if rows:
+            analytics = rows[-1]
+            self.stdout.write(f'Date: {analytics.date}')
             self.stdout.write(f'Total Incomplete Orders: {analytics.total_incomplete_orders}')
             self.stdout.write(f'Abandoned Orders: {analytics.abandoned_orders}')
             self.stdout.write(f'Converted Orders: {analytics.converted_orders}')
@@ -47,8 +81,3 @@ class Command(BaseCommand):
             self.stdout.write(f'Recovery Rate: {analytics.recovery_rate}%')
             self.stdout.write(f'Lost Revenue: ${analytics.total_lost_revenue}')
             self.stdout.write(f'Recovered Revenue: ${analytics.recovered_revenue}')
-            
-        except Exception as e:
-            self.stdout.write(
-                self.style.ERROR(f'Failed to update analytics: {str(e)}')
-            )
\ No newline at end of file
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.4 on 2026-10-18 22:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('incomplete_orders', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CheckoutEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('checkout_data', 'Checkout Data'), ('abandonment', 'Abandonment')], max_length=20)),
+                ('owner', models.CharField(max_length=150)),
+                ('payload', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+    ]
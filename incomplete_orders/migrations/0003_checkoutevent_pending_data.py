@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-18 23:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('incomplete_orders', '0002_checkoutevent'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='checkoutevent',
+            name='event_type',
+            field=models.CharField(choices=[('checkout_data', 'Checkout Data'), ('abandonment', 'Abandonment'), ('pending_data', 'Pending Checkout Data')], max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='checkoutevent',
+            index=models.Index(fields=['event_type', 'owner'], name='incomplete__event_t_2e62b8_idx'),
+        ),
+    ]
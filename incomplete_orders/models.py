@@ -425,3 +425,32 @@ class IncompleteOrderAnalytics(models.Model):
             self.recovery_rate = (self.recovery_success_count / self.recovery_emails_sent) * 100
         
         self.save()
+
+
+class CheckoutEvent(models.Model):
+    """
+    Append-only buffer of checkout tracking events.
+
+    Events are written by the ingestion endpoint and consolidated into
+    incomplete orders in bulk by ``consolidate_checkout_events``.
+    """
+    
+    EVENT_TYPE_CHOICES = [
+        ('checkout_data', 'Checkout Data'),
+        ('abandonment', 'Abandonment'),
+        ('pending_data', 'Pending Checkout Data'),  # kept until the visitor abandons checkout
+    ]
+    
+    event_type = models.CharField(max_length=20, choices=EVENT_TYPE_CHOICES)
+    owner = models.CharField(max_length=150)  # "user:<id>" or "session:<key>"
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['event_type', 'owner']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_event_type_display()} event for {self.owner}"
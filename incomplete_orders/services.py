@@ -2,12 +2,10 @@
 Service functions for incomplete orders
 """
 from django.utils import timezone
-from django.template.loader import render_to_string
-from django.conf import settings
 from datetime import timedelta
 from .models import (
     IncompleteOrder, IncompleteOrderItem, IncompleteShippingAddress,
-    IncompleteOrderHistory, RecoveryEmailLog
+    IncompleteOrderHistory
 )
 
 
@@ -135,86 +133,12 @@ class IncompleteOrderService:
         if not incomplete_order.customer_email and not incomplete_order.guest_email:
             return False
         
-        recipient_email = incomplete_order.customer_email or incomplete_order.guest_email
+        from .mailer import RecoveryMailer
         
-        # Determine email content based on type
-        email_templates = {
-            'abandoned_cart': {
-                'subject': 'You left something in your cart!',
-                'template': 'emails/abandoned_cart.html'
-            },
-            'payment_reminder': {
-                'subject': 'Complete your purchase',
-                'template': 'emails/payment_reminder.html'
-            },
-            'final_reminder': {
-                'subject': 'Last chance - Complete your order',
-                'template': 'emails/final_reminder.html'
-            },
-            'discount_offer': {
-                'subject': 'Special discount on your cart!',
-                'template': 'emails/discount_offer.html'
-            }
-        }
-        
-        email_config = email_templates.get(email_type, email_templates['abandoned_cart'])
-        subject = custom_subject or email_config['subject']
-        
-        # Create recovery URL (you'll need to implement this based on your frontend)
-        recovery_url = f"{settings.FRONTEND_URL}/checkout/recover/{incomplete_order.incomplete_order_id}"
-        
-        # Prepare email context
-        context = {
-            'incomplete_order': incomplete_order,
-            'recovery_url': recovery_url,
-            'customer_name': incomplete_order.user.get_full_name() if incomplete_order.user else 'Customer',
-            'items': incomplete_order.items.all(),
-        }
-        
-        try:
-            # Render email content
-            html_content = render_to_string(email_config['template'], context)
-            
-            # Send email using dashboard email service
-            from dashboard.email_service import email_service
-            
-            success = email_service.send_email(
-                subject=subject,
-                html_content=html_content,
-                recipient_email=recipient_email,
-                text_content='Please enable HTML to view this email.'
-            )
-            
-            # Log the email
-            RecoveryEmailLog.objects.create(
-                incomplete_order=incomplete_order,
-                email_type=email_type,
-                recipient_email=recipient_email,
-                subject=subject
-            )
-            
-            # Increment recovery attempts
-            incomplete_order.increment_recovery_attempt()
-            
-            # Log in history
-            IncompleteOrderHistory.objects.create(
-                incomplete_order=incomplete_order,
-                action='recovery_sent',
-                details=f'Recovery email sent: {email_type}',
-                created_by_system=True
-            )
-            
-            return True
-            
-        except Exception as e:
-            # Log the error
-            IncompleteOrderHistory.objects.create(
-                incomplete_order=incomplete_order,
-                action='recovery_sent',
-                details=f'Failed to send recovery email: {str(e)}',
-                created_by_system=True
-            )
-            return False
+        result = RecoveryMailer(concurrency=1).send(
+            [incomplete_order], email_type=email_type, subject=custom_subject
+        )
+        return result['sent'] == 1
     
     @staticmethod
     def get_recovery_candidates(hours_since_creation=2, max_attempts=3):
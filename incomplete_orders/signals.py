@@ -42,57 +42,14 @@ def track_incomplete_order_deletion(sender, instance, **kwargs):
     )
 
 
-def update_daily_analytics():
+def update_daily_analytics(date=None):
     """
     Update daily analytics for incomplete orders
-    This function should be called by a daily scheduled task (e.g., Celery)
+    Rolls up ``date`` (default: today); see ``incomplete_orders.analytics``
+    for ranges and incremental refreshes.
     """
-    today = timezone.now().date()
-    
-    # Get or create analytics record for today
-    analytics, created = IncompleteOrderAnalytics.objects.get_or_create(
-        date=today,
-        defaults={
-            'total_incomplete_orders': 0,
-            'abandoned_orders': 0,
-            'converted_orders': 0,
-            'expired_orders': 0,
-            'recovery_emails_sent': 0,
-            'recovery_success_count': 0,
-            'total_lost_revenue': 0,
-            'recovered_revenue': 0,
-        }
-    )
-    
-    # Count incomplete orders created today
-    todays_orders = IncompleteOrder.objects.filter(created_at__date=today)
-    
-    analytics.total_incomplete_orders = todays_orders.count()
-    analytics.abandoned_orders = todays_orders.filter(status='abandoned').count()
-    analytics.converted_orders = todays_orders.filter(status='converted').count()
-    analytics.expired_orders = todays_orders.filter(expires_at__lt=timezone.now()).count()
-    
-    # Calculate financial metrics
-    analytics.total_lost_revenue = todays_orders.filter(
-        status='abandoned'
-    ).aggregate(total=models.Sum('total_amount'))['total'] or 0
-    
-    analytics.recovered_revenue = todays_orders.filter(
-        status='converted'
-    ).aggregate(total=models.Sum('total_amount'))['total'] or 0
-    
-    # Count recovery emails sent today
-    from .models import RecoveryEmailLog
-    analytics.recovery_emails_sent = RecoveryEmailLog.objects.filter(
-        sent_at__date=today
-    ).count()
-    
-    analytics.recovery_success_count = RecoveryEmailLog.objects.filter(
-        sent_at__date=today,
-        responded=True
-    ).count()
-    
-    # Calculate rates
-    analytics.calculate_rates()
-    
-    return analytics
\ No newline at end of file
+    from .analytics import rollup_days
+
+    date = date or timezone.localdate()
+    rollup_days([date])
+    return IncompleteOrderAnalytics.objects.get(date=date)
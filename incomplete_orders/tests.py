@@ -366,3 +366,228 @@ class IncompleteOrderAPITest(APITestCase):
                 incomplete_order=self.incomplete_order
             ).exists()
         )
+
+
+class CheckoutEventIngestionTest(TestCase):
+    """Test cases for buffered checkout event ingestion and consolidation"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        from cart.models import Cart, CartItem
+        
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='buyer',
+            email='buyer@example.com',
+            password='testpass123',
+            is_email_verified=True
+        )
+        category = Category.objects.create(name='Test Category', slug='test-category')
+        self.product = Product.objects.create(
+            name='Test Product',
+            slug='test-product',
+            sku='TEST-1',
+            category=category,
+            price=100.00,
+            stock_quantity=10
+        )
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.product, quantity=2)
+        self.client.force_login(self.user)
+    
+    def post_event(self, event_type, **data):
+        return self.client.post(
+            '/api/v1/incomplete-orders/events/',
+            {'type': event_type, 'data': data},
+            content_type='application/json'
+        )
+    
+    def test_events_are_only_buffered(self):
+        """Test the endpoint appends to the buffer without touching incomplete orders"""
+        from .models import CheckoutEvent
+        
+        response = self.post_event('checkout_data', email='buyer@example.com', full_name='Jane Doe')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(CheckoutEvent.objects.count(), 1)
+        self.assertFalse(IncompleteOrder.objects.exists())
+        
+        self.assertEqual(self.post_event('unknown').status_code, 400)
+    
+    def test_consolidation_creates_and_updates_orders(self):
+        """Test buffered events are upserted into one incomplete order per visitor"""
+        from .ingestion import consolidate_events
+        
+        self.post_event('checkout_data', email='buyer@example.com')
+        self.assertEqual(consolidate_events()['created'], 0)
+        
+        # Data from the earlier batch is kept until checkout is abandoned
+        self.post_event('checkout_data', full_name='Jane Doe', address='1 Road', phone_number='01700000000')
+        self.post_event('abandonment')
+        stats = consolidate_events()
+        self.assertEqual(stats, {'events': 2, 'created': 1, 'updated': 0})
+        
+        order = IncompleteOrder.objects.get(user=self.user)
+        self.assertEqual(order.status, 'abandoned')
+        self.assertEqual(order.customer_email, 'buyer@example.com')
+        self.assertEqual(order.total_amount, 200)
+        self.assertEqual(order.items.get().quantity, 2)
+        self.assertEqual(order.shipping_address.first_name, 'Jane')
+        
+        self.post_event('checkout_data', phone_number='01800000000')
+        self.post_event('abandonment')
+        self.assertEqual(consolidate_events()['updated'], 1)
+        self.assertEqual(IncompleteOrder.objects.count(), 1)
+        order.refresh_from_db()
+        self.assertEqual(order.customer_phone, '01800000000')
+    
+    def test_failed_consolidation_keeps_events(self):
+        """Test claimed events stay buffered when the consolidation fails"""
+        from unittest import mock
+        from .ingestion import consolidate_events
+        from .models import CheckoutEvent
+        
+        self.post_event('checkout_data', email='buyer@example.com')
+        consolidate_events()
+        # Pending checkout data is kept in the table, not in the cache
+        self.assertEqual(CheckoutEvent.objects.get().event_type, 'pending_data')
+        
+        self.post_event('abandonment')
+        with mock.patch('incomplete_orders.ingestion._create_orders', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                consolidate_events()
+        self.assertEqual(
+            sorted(CheckoutEvent.objects.values_list('event_type', flat=True)), ['abandonment', 'pending_data']
+        )
+        
+        self.assertEqual(consolidate_events()['created'], 1)
+        self.assertEqual(IncompleteOrder.objects.get(user=self.user).customer_email, 'buyer@example.com')
+        self.assertFalse(CheckoutEvent.objects.exists())
+
+
+class AnalyticsRollupTest(TestCase):
+    """Test cases for the incomplete order analytics rollup"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        
+        cache.clear()
+        self.today = timezone.localdate()
+        self.yesterday = self.today - timedelta(days=1)
+        
+        for status_value, amount in (('abandoned', 100), ('abandoned', 50), ('converted', 80), ('pending', 10)):
+            IncompleteOrder.objects.create(status=status_value, total_amount=amount)
+        old = IncompleteOrder.objects.create(status='converted', total_amount=30)
+        IncompleteOrder.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=1))
+        
+        for responded in (True, False):
+            RecoveryEmailLog.objects.create(
+                incomplete_order=old, email_type='first_reminder',
+                recipient_email='buyer@example.com', subject='Reminder', responded=responded
+            )
+    
+    def test_rollup_range_one_query_per_table(self):
+        """Test every day of a range is computed and upserted in a fixed number of queries"""
+        from .analytics import rollup_range
+        from .models import IncompleteOrderAnalytics
+        
+        with self.assertNumQueries(3):
+            rows = rollup_range(self.yesterday - timedelta(days=5), self.today)
+        self.assertEqual(len(rows), 7)
+        
+        today = IncompleteOrderAnalytics.objects.get(date=self.today)
+        self.assertEqual(today.total_incomplete_orders, 4)
+        self.assertEqual(today.abandoned_orders, 2)
+        self.assertEqual(today.total_lost_revenue, 150)
+        self.assertEqual(today.conversion_rate, 25)
+        self.assertEqual(today.recovery_rate, 50)
+        self.assertEqual(IncompleteOrderAnalytics.objects.get(date=self.yesterday).recovered_revenue, 30)
+        
+        # Running again updates the existing rows
+        IncompleteOrder.objects.filter(status='pending').update(status='converted')
+        rollup_range(self.today)
+        self.assertEqual(IncompleteOrderAnalytics.objects.get(date=self.today).converted_orders, 2)
+        self.assertEqual(IncompleteOrderAnalytics.objects.count(), 7)
+    
+    def test_incremental_refresh_only_touched_days(self):
+        """Test the incremental refresh recomputes only days changed since the last run"""
+        from .analytics import refresh_analytics
+        
+        self.assertEqual({row.date for row in refresh_analytics()}, {self.yesterday, self.today})
+        self.assertEqual([row.date for row in refresh_analytics()], [self.today])
+        
+        order = IncompleteOrder.objects.get(total_amount=30)
+        order.admin_notes = 'Called customer'
+        order.save()
+        self.assertEqual({row.date for row in refresh_analytics()}, {self.yesterday, self.today})
+    
+    def test_command_rejects_empty_day_ranges(self):
+        """Test --days must cover at least one day"""
+        from io import StringIO
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        from .models import IncompleteOrderAnalytics
+        
+        for days in (0, -3):
+            with self.assertRaises(CommandError):
+                call_command('update_analytics', days=days, stdout=StringIO())
+        
+        call_command('update_analytics', days=2, stdout=StringIO())
+        self.assertEqual(
+            set(IncompleteOrderAnalytics.objects.values_list('date', flat=True)), {self.yesterday, self.today}
+        )
+
+
+class RecoveryMailerTest(TestCase):
+    """Test cases for the batched recovery email dispatcher"""
+    
+    def setUp(self):
+        self.orders = [
+            IncompleteOrder.objects.create(
+                status='abandoned',
+                customer_email=f'buyer{i}@{"gmail.com" if i % 2 else "example.com"}',
+                total_amount=100
+            )
+            for i in range(6)
+        ]
+        IncompleteOrder.objects.create(status='abandoned', total_amount=100)  # no email
+        self.connections = []
+    
+    def connection_factory(self):
+        from django.core.mail import get_connection
+        
+        connection = get_connection('django.core.mail.backends.locmem.EmailBackend')
+        self.connections.append(connection)
+        return connection
+    
+    def test_batch_sent_over_shared_connections(self):
+        """Test a batch uses one connection per worker and writes bookkeeping in bulk"""
+        from django.core import mail
+        from .mailer import RecoveryMailer
+        
+        mailer = RecoveryMailer(concurrency=2, rate_limits={}, connection_factory=self.connection_factory)
+        result = mailer.send_candidates(IncompleteOrder.objects.all(), batch_size=10)
+        
+        self.assertEqual(result, {'sent': 6, 'failed': 0})
+        self.assertEqual(len(mail.outbox), 6)
+        self.assertEqual(len(self.connections), 2)
+        self.assertEqual(RecoveryEmailLog.objects.filter(email_type='abandoned_cart').count(), 6)
+        self.assertEqual(IncompleteOrder.objects.filter(recovery_attempts=1).count(), 6)
+        self.assertEqual(
+            IncompleteOrderHistory.objects.filter(action='recovery_sent').count(), 6
+        )
+        
+        # The next attempt sends the follow-up email
+        mailer.send(IncompleteOrder.objects.filter(pk=self.orders[0].pk))
+        self.assertTrue(RecoveryEmailLog.objects.filter(email_type='payment_reminder').exists())
+    
+    def test_provider_rate_limit(self):
+        """Test sends to the same provider are spaced out by the rate limit"""
+        import time
+        from .mailer import ProviderRateLimiter
+        
+        limiter = ProviderRateLimiter({'gmail.com': 50, 'default': None})
+        started = time.monotonic()
+        for _ in range(4):
+            limiter.wait('gmail.com')
+            limiter.wait('example.com')
+        self.assertGreaterEqual(time.monotonic() - started, 0.06)
@@ -16,7 +16,10 @@ urlpatterns = [
     # API endpoints
     path('api/', include(router.urls)),
     
-    # Checkout abandonment tracking endpoints
-    path('api/incomplete-orders/save-checkout-data/', views.save_checkout_data, name='save_checkout_data'),
-    path('api/incomplete-orders/track-abandonment/', views.track_checkout_abandonment, name='track_abandonment'),
+    # Checkout abandonment tracking: events are buffered and consolidated periodically
+    path('events/', views.ingest_checkout_event, name='checkout_events'),
+    path('api/incomplete-orders/save-checkout-data/', views.ingest_checkout_event,
+         {'event_type': 'checkout_data'}, name='save_checkout_data'),
+    path('api/incomplete-orders/track-abandonment/', views.ingest_checkout_event,
+         {'event_type': 'abandonment'}, name='track_abandonment'),
 ]
\ No newline at end of file
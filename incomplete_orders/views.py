@@ -1,8 +1,7 @@
 from django.shortcuts import render
 from rest_framework import viewsets, status, permissions
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny
 from django.db.models import Q, Sum, Count, Avg
 from django.utils import timezone
 from datetime import timedelta
@@ -13,8 +12,9 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 import json
 
+from .ingestion import EVENT_TYPES, record_event
 from .models import (
-    IncompleteOrder, IncompleteOrderItem, IncompleteShippingAddress,
+    IncompleteOrder, IncompleteOrderItem,
     IncompleteOrderHistory, RecoveryEmailLog, IncompleteOrderAnalytics
 )
 from .serializers import (
@@ -369,195 +369,30 @@ def track_cart_abandonment(request, cart_items, stage='cart'):
 
 @csrf_exempt
 @require_POST
-@api_view(['POST'])
-@permission_classes([AllowAny])
-def save_checkout_data(request):
-    """Save checkout form data to session for abandonment tracking"""
-    try:
-        data = json.loads(request.body.decode('utf-8'))
-        
-        # Store checkout data in session
-        request.session['checkout_data'] = data
-        request.session['checkout_timestamp'] = str(timezone.now())
-        
-        return JsonResponse({'status': 'saved'})
-        
-    except Exception as e:
-        return JsonResponse({'error': str(e)}, status=400)
-
-
-@csrf_exempt
-@require_POST
-@api_view(['POST'])
-@permission_classes([AllowAny])
-def track_checkout_abandonment(request):
-    """Track checkout abandonment and create incomplete order"""
-    try:
-        from cart.models import Cart
-        
-        # Get checkout data from session
-        checkout_data = request.session.get('checkout_data')
-        if not checkout_data:
-            return JsonResponse({'status': 'no_data'})
-        
-        # Get user's cart
-        if request.user.is_authenticated:
-            try:
-                cart = Cart.objects.get(user=request.user)
-            except Cart.DoesNotExist:
-                return JsonResponse({'status': 'no_cart'})
-        else:
-            # Guest user
-            session_id = request.session.session_key
-            if not session_id:
-                return JsonResponse({'status': 'no_session'})
-            
-            try:
-                cart = Cart.objects.get(session_id=session_id, user=None)
-            except Cart.DoesNotExist:
-                return JsonResponse({'status': 'no_cart'})
-        
-        # Check if cart has items
-        if not cart.items.exists():
-            return JsonResponse({'status': 'empty_cart'})
-        
-        # Check if incomplete order already exists for this cart/session
-        if request.user.is_authenticated:
-            existing_incomplete = IncompleteOrder.objects.filter(
-                user=request.user,
-                status='pending'
-            ).first()
-        else:
-            existing_incomplete = IncompleteOrder.objects.filter(
-                session_id=session_id,
-                user=None,
-                status='pending'
-            ).first()
-        
-        # If incomplete order already exists, update it
-        if existing_incomplete:
-            _update_incomplete_order(existing_incomplete, checkout_data)
-            incomplete_order = existing_incomplete
-        else:
-            # Create new incomplete order
-            incomplete_order = _create_incomplete_order(request, cart, checkout_data)
-        
-        return JsonResponse({
-            'status': 'created',
-            'incomplete_order_id': incomplete_order.incomplete_order_id
-        })
-        
-    except Exception as e:
-        import traceback
-        print(f"Error in abandonment tracking: {str(e)}")
-        print(traceback.format_exc())
-        
-        return JsonResponse({'error': str(e)}, status=500)
-
-
-def _create_incomplete_order(request, cart, checkout_data):
-    """Create a new incomplete order from cart and checkout data"""
-    # Prepare customer data
-    customer_data = {
-        'email': checkout_data.get('email', ''),
-        'phone': checkout_data.get('phone_number', ''),
-        'notes': checkout_data.get('order_instruction', ''),
-    }
-    
-    # Prepare shipping data
-    shipping_data = {}
-    if checkout_data.get('full_name'):
-        name_parts = checkout_data['full_name'].split(' ', 1)
-        shipping_data['first_name'] = name_parts[0]
-        shipping_data['last_name'] = name_parts[1] if len(name_parts) > 1 else ''
-    
-    shipping_data.update({
-        'phone': checkout_data.get('phone_number', ''),
-        'address_line_1': checkout_data.get('address', ''),
-        'city': 'Not specified',
-        'postal_code': '',
-        'country': 'Bangladesh',
-    })
-    
-    # Create incomplete order
-    order_data = {
-        'user': request.user if request.user.is_authenticated else None,
-        'is_guest_order': not request.user.is_authenticated,
-        'session_id': request.session.session_key,
-        'customer_email': customer_data['email'],
-        'customer_phone': customer_data['phone'],
-        'customer_notes': customer_data['notes'],
-        'guest_email': customer_data['email'] if not request.user.is_authenticated else '',
-        'user_agent': request.META.get('HTTP_USER_AGENT', ''),
-        'ip_address': _get_client_ip(request),
-        'referrer_url': request.META.get('HTTP_REFERER', ''),
-    }
-    
-    incomplete_order = IncompleteOrder.objects.create(**order_data)
-    
-    # Add cart items to incomplete order
-    for cart_item in cart.items.all():
-        IncompleteOrderItem.objects.create(
-            incomplete_order=incomplete_order,
-            product=cart_item.product,
-            variant=cart_item.variant,
-            quantity=cart_item.quantity,
-            unit_price=cart_item.unit_price
-        )
-    
-    # Add shipping address if we have enough data
-    if shipping_data.get('first_name') and shipping_data.get('address_line_1'):
-        IncompleteShippingAddress.objects.create(
-            incomplete_order=incomplete_order,
-            **shipping_data
-        )
-    
-    # Calculate totals
-    incomplete_order.calculate_totals()
-    
-    # Mark as abandoned
-    incomplete_order.mark_as_abandoned('checkout_form_abandonment')
+def ingest_checkout_event(request, event_type=None):
+    """
+    Buffer a checkout tracking event for the consolidator.
     
-    return incomplete_order
-
-
-def _update_incomplete_order(incomplete_order, checkout_data):
-    """Update existing incomplete order with new checkout data"""
-    # Update customer data
-    if checkout_data.get('email'):
-        incomplete_order.customer_email = checkout_data['email']
-        if not incomplete_order.user:
-            incomplete_order.guest_email = checkout_data['email']
+    Accepts ``{"type": "checkout_data" | "abandonment", "data": {...}}``; the
+    per-type URLs take the checkout form fields as the body directly. Nothing
+    but the buffer append happens on the request path, incomplete orders are
+    created and updated by ``consolidate_checkout_events``.
+    """
+    try:
+        body = json.loads(request.body.decode('utf-8') or '{}')
+    except (ValueError, UnicodeDecodeError):
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
     
-    if checkout_data.get('phone_number'):
-        incomplete_order.customer_phone = checkout_data['phone_number']
+    if event_type is None:
+        event_type = body.get('type')
+        data = body.get('data') or {}
+    else:
+        data = body
     
-    if checkout_data.get('order_instruction'):
-        incomplete_order.customer_notes = checkout_data['order_instruction']
+    if event_type not in EVENT_TYPES or not isinstance(data, dict):
+        return JsonResponse({'error': 'Invalid event'}, status=400)
     
-    incomplete_order.save()
+    if not record_event(request, event_type, data):
+        return JsonResponse({'status': 'no_session'})
     
-    # Update shipping address if exists
-    if hasattr(incomplete_order, 'shipping_address'):
-        shipping_address = incomplete_order.shipping_address
-        
-        if checkout_data.get('full_name'):
-            name_parts = checkout_data['full_name'].split(' ', 1)
-            shipping_address.first_name = name_parts[0]
-            shipping_address.last_name = name_parts[1] if len(name_parts) > 1 else ''
-        
-        if checkout_data.get('phone_number'):
-            shipping_address.phone = checkout_data['phone_number']
-        
-        if checkout_data.get('address'):
-            shipping_address.address_line_1 = checkout_data['address']
-        
-        shipping_address.save()
-
-
-def _get_client_ip(request):
-    """Get client IP address"""
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        return x_forwarded_for.split(',')[0]
-    return request.META.get('REMOTE_ADDR', '')
+    return JsonResponse({'status': 'queued'}, status=202)
@@ -58,11 +58,7 @@ def order_detail_api(request, order_id):
         items = []
         for item in order.items.all():
             # Get the primary image if available
-            image_url = None
-            if item.product and hasattr(item.product, 'images'):
-                product_image = item.product.images.filter(is_primary=True).first()
-                if product_image:
-                    image_url = product_image.image.url
+            image_url = (item.product.primary_image_url or None) if item.product else None
             
             items.append({
                 'id': item.id,
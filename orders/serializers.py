@@ -200,6 +200,7 @@ class CreateOrderSerializer(serializers.Serializer):
     def create(self, validated_data):
         from cart.models import Cart, CouponUsage
         from cart.shipping import ShippingCalculator
+        from cart.storage import GuestCart
         from django.utils import timezone
         from decimal import Decimal
         from .utils import get_client_ip
@@ -225,6 +226,7 @@ class CreateOrderSerializer(serializers.Serializer):
         
         # Get cart - check both user cart and session cart for authenticated users
         cart = None
+        guest_cart = None if user else GuestCart(request)
         
         if user:
             # First try to get user's cart
@@ -250,16 +252,11 @@ class CreateOrderSerializer(serializers.Serializer):
                     logger.error("Cart not found for authenticated user")
                     raise serializers.ValidationError("Cart is empty. Please add items to your cart first.")
         else:
-            # For guest users, get cart by session
-            session_id = request.session.session_key
-            if not session_id:
-                request.session.create()
-                session_id = request.session.session_key
-            
-            try:
-                cart = Cart.objects.get(session_id=session_id, user=None)
+            # For guest users, write the stored guest cart to the database
+            cart = guest_cart.materialize()
+            if cart:
                 logger.info(f"Found guest cart with {cart.items.count()} items")
-            except Cart.DoesNotExist:
+            else:
                 logger.error("Cart not found for guest user")
                 raise serializers.ValidationError("Cart is empty. Please add items to your cart first.")
         
@@ -426,6 +423,8 @@ class CreateOrderSerializer(serializers.Serializer):
         
         # Clear cart
         cart.clear()
+        if guest_cart:
+            guest_cart.clear()
         
         return order
 
@@ -515,14 +514,7 @@ class OrderTrackingSerializer(serializers.ModelSerializer):
     
     def get_product_image_url(self, product):
         """Get product image URL safely"""
-        if product.images.exists():
-            first_image = product.images.first()
-            if hasattr(first_image, 'image') and hasattr(first_image.image, 'url'):
-                try:
-                    return first_image.image.url
-                except (ValueError, AttributeError):
-                    pass
-        return None
+        return product.primary_image_url or None
     
     def get_status_history(self, obj):
         # Get all visible status history entries
@@ -13,7 +13,7 @@ from .serializers import (
     OrderListSerializer, OrderDetailSerializer, CreateOrderSerializer,
     InvoiceSerializer, RefundRequestSerializer, OrderTrackingSerializer
 )
-from dashboard.models import BlockList
+from dashboard import blocklist
 from .utils import get_client_ip
 
 
@@ -27,25 +27,11 @@ def is_blocked(phone=None, ip=None):
     """Check if phone number or IP address is blocked"""
     blocked_items = []
     
-    if phone:
-        phone_blocked = BlockList.objects.filter(
-            block_type='phone',
-            value=phone,
-            is_active=True
-        ).first()
-        if phone_blocked:
-            phone_blocked.trigger_block()
-            blocked_items.append(f"Phone number {phone}")
+    if phone and blocklist.check('phone', phone) is not None:
+        blocked_items.append(f"Phone number {phone}")
     
-    if ip:
-        ip_blocked = BlockList.objects.filter(
-            block_type='ip', 
-            value=ip,
-            is_active=True
-        ).first()
-        if ip_blocked:
-            ip_blocked.trigger_block()
-            blocked_items.append(f"IP address {ip}")
+    if ip and blocklist.check('ip', ip) is not None:
+        blocked_items.append(f"IP address {ip}")
     
     return blocked_items
 
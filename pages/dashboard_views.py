@@ -3,7 +3,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q, Count
+from django.db.models import Avg, Count, Q, Sum
 from django.utils import timezone
 
 from pages.models import (
@@ -54,7 +54,7 @@ class PageDashboardViewSet(viewsets.ModelViewSet):
             'draft_pages': queryset.filter(status='draft').count(),
             'archived_pages': queryset.filter(status='archived').count(),
             'featured_pages': queryset.filter(is_featured=True).count(),
-            'total_views': queryset.aggregate(total=Count('view_count'))['total'] or 0,
+            'total_views': queryset.aggregate(total=Sum('view_count'))['total'] or 0,
             'recent_pages': PageListSerializer(
                 queryset.order_by('-created_at')[:5],
                 many=True
@@ -273,33 +273,24 @@ class PageAnalyticsDashboardViewSet(viewsets.ReadOnlyModelViewSet):
             queryset = queryset.filter(date__lte=date_to)
         
         # Aggregate data
-        total_views = sum(analytics.views for analytics in queryset)
-        total_unique_views = sum(analytics.unique_views for analytics in queryset)
-        avg_bounce_rate = queryset.aggregate(avg_bounce=Count('bounce_rate'))['avg_bounce'] or 0
+        totals = queryset.aggregate(
+            total_views=Sum('views'),
+            total_unique_views=Sum('unique_views'),
+            avg_bounce=Avg('bounce_rate'),
+        )
         
-        # Top performing pages
-        page_performance = {}
-        for analytics in queryset:
-            page_id = analytics.page.id
-            if page_id not in page_performance:
-                page_performance[page_id] = {
-                    'page': analytics.page.title,
-                    'views': 0,
-                    'unique_views': 0
-                }
-            page_performance[page_id]['views'] += analytics.views
-            page_performance[page_id]['unique_views'] += analytics.unique_views
-        
-        top_pages = sorted(
-            page_performance.values(),
-            key=lambda x: x['views'],
-            reverse=True
-        )[:10]
+        # Top performing pages (unique views are summed over days)
+        top_pages = [
+            {'page': row['page__title'], 'views': row['total_views'], 'unique_views': row['total_unique_views']}
+            for row in queryset.order_by().values('page_id', 'page__title')
+            .annotate(total_views=Sum('views'), total_unique_views=Sum('unique_views'))
+            .order_by('-total_views')[:10]
+        ]
         
         return Response({
-            'total_views': total_views,
-            'total_unique_views': total_unique_views,
-            'average_bounce_rate': avg_bounce_rate,
+            'total_views': totals['total_views'] or 0,
+            'total_unique_views': totals['total_unique_views'] or 0,
+            'average_bounce_rate': totals['avg_bounce'] or 0,
             'top_pages': top_pages,
             'date_range': {
                 'from': date_from,
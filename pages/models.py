@@ -4,7 +4,6 @@ from django.urls import reverse
 from django.utils.text import slugify
 from django.core.exceptions import ValidationError
 from django.utils import timezone
-from django.db.models import F
 from ckeditor_uploader.fields import RichTextUploadingField
 import os
 from uuid import uuid4
@@ -184,10 +183,10 @@ class Page(models.Model):
         word_count = len(self.content.split())
         return max(1, word_count // 200)  # Assuming 200 words per minute
 
-    def increment_view_count(self):
-        """Increment page view count"""
-        self.view_count = F('view_count') + 1
-        self.save(update_fields=['view_count'])
+    def increment_view_count(self, visitor=None):
+        """Count a page view, written to view_count and the daily analytics by the next flush"""
+        from utils.view_counters import record_view
+        record_view('page', self.pk, visitor)
 
 
 class PageRevision(models.Model):
@@ -1,3 +1,157 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
 
-# Create your tests here.
+from products.models import Category, Product, ProductAnalytics
+from utils.hyperloglog import SPARSE_LIMIT, HyperLogLog
+from utils.view_counters import flush_view_counts, get_view_counter, record_view
+
+from .models import Page, PageAnalytics
+
+
+@override_settings(VIEW_COUNTER_BACKEND='utils.view_counters.MemoryViewCounter', VIEW_COUNT_FLUSH_INTERVAL=3600)
+class ViewCounterTest(TestCase):
+    """Test cases for the buffered product and page view counters"""
+
+    def setUp(self):
+        get_view_counter().drain()
+        author = get_user_model().objects.create_user(email='author@example.com', password='secret')
+        self.page = Page.objects.create(title='About us', author=author, status='published')
+        self.product = Product.objects.create(
+            name='Runner', sku='RUN-1', category=Category.objects.create(name='Shoes'), price=50
+        )
+
+    def test_views_are_buffered_and_flushed_in_bulk(self):
+        """Test views only reach the database when flushed, added to existing counts"""
+        Product.objects.filter(pk=self.product.pk).update(view_count=10)
+        with self.assertNumQueries(0):
+            for _ in range(3):
+                record_view('product', self.product.pk)
+            self.page.increment_view_count()
+            self.page.increment_view_count()
+
+        self.assertEqual(flush_view_counts(), {'product': 3, 'page': 2})
+        self.product.refresh_from_db()
+        self.page.refresh_from_db()
+        self.assertEqual(self.product.view_count, 13)
+        self.assertEqual(self.page.view_count, 2)
+        analytics = PageAnalytics.objects.get(page=self.page, date=timezone.localdate())
+        self.assertEqual(analytics.views, 2)
+
+        self.page.increment_view_count()
+        flush_view_counts()
+        analytics.refresh_from_db()
+        self.assertEqual(analytics.views, 3)
+        self.assertEqual(flush_view_counts(), {'product': 0, 'page': 0})
+
+    def test_unique_visitors_rolled_into_daily_rows(self):
+        """Test unique visitors are estimated per day and stored with the views"""
+        for number in range(50):
+            for _ in range(3):
+                record_view('product', self.product.pk, f'session:{number}')
+        flush_view_counts()
+
+        analytics = ProductAnalytics.objects.get(product=self.product, date=timezone.localdate())
+        self.assertEqual(analytics.views, 150)
+        self.assertEqual(analytics.unique_views, 50)
+
+        record_view('product', self.product.pk, 'session:0')
+        record_view('product', self.product.pk, 'session:new')
+        flush_view_counts()
+        analytics.refresh_from_db()
+        self.assertEqual((analytics.views, analytics.unique_views), (152, 51))
+
+
+@override_settings(VIEW_COUNTER_BACKEND='utils.view_counters.DatabaseViewCounter', VIEW_COUNT_BUFFER_INTERVAL=3600)
+class DatabaseViewCounterTest(TestCase):
+    """Test cases for the database view counter shared by all workers"""
+
+    def setUp(self):
+        get_view_counter().drain()
+        self.product = Product.objects.create(
+            name='Runner', sku='RUN-1', category=Category.objects.create(name='Shoes'), price=50
+        )
+
+    def test_views_and_visitors_survive_until_flushed(self):
+        """Test buffered views are stored in the database and unique visitors counted exactly"""
+        from products.models import ViewEvent
+
+        with self.assertNumQueries(0):
+            for visitor in ('session:a', 'session:b', 'session:a'):
+                record_view('product', self.product.pk, visitor)
+        get_view_counter().write()
+        self.assertEqual(list(ViewEvent.objects.values_list('object_id', 'count')), [(self.product.pk, 3)])
+
+        self.assertEqual(flush_view_counts(), {'product': 3, 'page': 0})
+        self.assertFalse(ViewEvent.objects.exists())
+        analytics = ProductAnalytics.objects.get(product=self.product, date=timezone.localdate())
+        self.assertEqual((analytics.views, analytics.unique_views), (3, 2))
+
+        record_view('product', self.product.pk, 'session:c')
+        flush_view_counts()
+        analytics.refresh_from_db()
+        self.product.refresh_from_db()
+        self.assertEqual((analytics.views, analytics.unique_views), (4, 3))
+        self.assertEqual(self.product.view_count, 4)
+
+    def test_visitors_stored_as_fixed_size_sketches(self):
+        """Test the visitors of an object and day take one bounded sketch row, merged across writes"""
+        from products.models import ViewSketch
+
+        for number in range(300):
+            record_view('product', self.product.pk, f'session:{number}')
+            if number == 149:
+                get_view_counter().write()
+        flush_view_counts()
+
+        self.assertEqual([len(sketch) for sketch in ViewSketch.objects.values_list('sketch', flat=True)], [2 ** 14 + 1])
+        analytics = ProductAnalytics.objects.get(product=self.product, date=timezone.localdate())
+        self.assertAlmostEqual(analytics.unique_views, 300, delta=300 * 0.03)
+
+    @override_settings(VIEW_COUNT_BUFFER_SIZE=2)
+    def test_buffer_written_once_full(self):
+        """Test a worker writes one row per object as soon as the buffer holds enough objects"""
+        from products.models import ViewEvent
+
+        other = Product.objects.create(name='Trail', sku='TRL-1', category=self.product.category, price=60)
+        record_view('product', self.product.pk)
+        record_view('product', self.product.pk)
+        self.assertFalse(ViewEvent.objects.exists())
+
+        record_view('product', other.pk)
+        self.assertEqual(
+            set(ViewEvent.objects.values_list('object_id', 'count')), {(self.product.pk, 2), (other.pk, 1)}
+        )
+
+
+class HyperLogLogTest(TestCase):
+    """Test cases for the pure-Python HyperLogLog sketch"""
+
+    def test_estimate_within_error_bounds(self):
+        """Test large cardinalities are estimated within a few percent in fixed memory"""
+        sketch, other = HyperLogLog(), HyperLogLog()
+        for number in range(20000):
+            (sketch if number % 2 else other).add(f'visitor-{number}')
+            sketch.add(f'visitor-{number % 100}')
+        sketch.merge(other)
+
+        self.assertEqual(len(sketch.registers), 2 ** 14)
+        self.assertAlmostEqual(sketch.count(), 20000, delta=20000 * 0.03)
+
+    def test_small_sketches_stay_sparse(self):
+        """Test sketches of few visitors count exactly without allocating registers"""
+        sketch, other = HyperLogLog(), HyperLogLog()
+        for number in range(30):
+            sketch.add(f'visitor-{number}')
+            other.add(f'visitor-{number + 15}')
+        sketch.merge(other)
+
+        self.assertIsNone(sketch.registers)
+        self.assertEqual(sketch.count(), 45)
+        self.assertEqual(HyperLogLog.from_bytes(sketch.to_bytes()).count(), 45)
+
+        for number in range(SPARSE_LIMIT):
+            sketch.add(f'other-{number}')
+        self.assertEqual(len(sketch.registers), 2 ** 14)
+        self.assertAlmostEqual(sketch.count(), 45 + SPARSE_LIMIT, delta=5)
+        self.assertEqual(HyperLogLog.from_bytes(sketch.to_bytes()).count(), sketch.count())
@@ -1,6 +1,6 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.http import Http404
-from django.db.models import Q, Count, Avg
+from django.db.models import Q, Avg, Sum
 from django.utils import timezone
 from rest_framework import viewsets, status, permissions, filters
 from rest_framework.decorators import action, api_view, permission_classes
@@ -12,6 +12,8 @@ from django.core.paginator import Paginator
 from django.template.response import TemplateResponse
 from datetime import timedelta
 
+from utils.view_counters import get_visitor_id
+
 from .models import (
     PageCategory, PageTemplate, Page, PageRevision,
     PageMedia, PageAnalytics
@@ -117,7 +119,7 @@ class PageViewSet(viewsets.ModelViewSet):
         
         # Increment view count for published pages
         if instance.is_published:
-            instance.increment_view_count()
+            instance.increment_view_count(get_visitor_id(request))
         
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
@@ -293,8 +295,8 @@ class PageAnalyticsViewSet(viewsets.ReadOnlyModelViewSet):
             queryset = queryset.filter(date__lte=date_to)
         
         summary = queryset.aggregate(
-            total_views=Count('views'),
-            total_unique_views=Count('unique_views'),
+            total_views=Sum('views'),
+            total_unique_views=Sum('unique_views'),
             avg_bounce_rate=Avg('bounce_rate')
         )
         
@@ -322,7 +324,7 @@ def page_detail(request, slug):
     
     # Increment view count
     if page.is_published:
-        page.increment_view_count()
+        page.increment_view_count(get_visitor_id(request))
     
     # Get template
     template_name = 'pages/page_detail.html'
@@ -435,7 +437,7 @@ def page_statistics(request):
     stats = {
         'total_pages': Page.objects.filter(status='published').count(),
         'total_categories': PageCategory.objects.filter(is_active=True).count(),
-        'total_views': Page.objects.aggregate(total=Count('view_count'))['total'] or 0,
+        'total_views': Page.objects.aggregate(total=Sum('view_count'))['total'] or 0,
         'recent_pages': PageListSerializer(
             Page.objects.filter(status='published').order_by('-created_at')[:5],
             many=True
@@ -1,7 +1,16 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
-from .models import Category, Product, ProductImage, ProductVariant, Review, ReviewImage, Wishlist
+from utils.fragment_cache import bump_fragment_versions
+from .category_tree import bump_category_tree_version
+from .models import Category, Product, ProductAnalytics, ProductImage, ProductVariant, Review, ReviewImage, Wishlist
+
+
+def update_products(queryset, product_field='pk', **fields):
+    """``queryset.update()`` that also bumps the fragment versions of the changed products, update() sends no signals"""
+    product_ids = list(queryset.values_list(product_field, flat=True))
+    queryset.update(**fields)
+    bump_fragment_versions(Product, product_ids)
 
 
 class ProductImageInline(admin.TabularInline):
@@ -168,22 +177,26 @@ class ProductAdmin(admin.ModelAdmin):
     shipping_info.allow_tags = True
     
     def mark_as_featured(self, request, queryset):
-        queryset.update(is_featured=True)
+        update_products(queryset, is_featured=True)
         self.message_user(request, f"{queryset.count()} products marked as featured.")
     mark_as_featured.short_description = "Mark selected products as featured"
     
     def mark_as_not_featured(self, request, queryset):
-        queryset.update(is_featured=False)
+        update_products(queryset, is_featured=False)
         self.message_user(request, f"{queryset.count()} products marked as not featured.")
     mark_as_not_featured.short_description = "Mark selected products as not featured"
     
     def mark_as_active(self, request, queryset):
-        queryset.update(is_active=True)
+        update_products(queryset, is_active=True)
+        # Product counts of the category tree only follow saves
+        bump_category_tree_version()
         self.message_user(request, f"{queryset.count()} products marked as active.")
     mark_as_active.short_description = "Mark selected products as active"
     
     def mark_as_inactive(self, request, queryset):
-        queryset.update(is_active=False)
+        update_products(queryset, is_active=False)
+        # Product counts of the category tree only follow saves
+        bump_category_tree_version()
         self.message_user(request, f"{queryset.count()} products marked as inactive.")
     mark_as_inactive.short_description = "Mark selected products as inactive"
 
@@ -224,17 +237,17 @@ class ProductVariantAdmin(admin.ModelAdmin):
     mark_as_default.short_description = "Mark selected variants as default"
     
     def mark_as_not_default(self, request, queryset):
-        queryset.update(is_default=False)
+        update_products(queryset, 'product_id', is_default=False)
         self.message_user(request, f"{queryset.count()} variants marked as not default.")
     mark_as_not_default.short_description = "Mark selected variants as not default"
     
     def mark_as_in_stock(self, request, queryset):
-        queryset.update(in_stock=True)
+        update_products(queryset, 'product_id', in_stock=True)
         self.message_user(request, f"{queryset.count()} variants marked as in stock.")
     mark_as_in_stock.short_description = "Mark selected variants as in stock"
     
     def mark_as_out_of_stock(self, request, queryset):
-        queryset.update(in_stock=False)
+        update_products(queryset, 'product_id', in_stock=False)
         self.message_user(request, f"{queryset.count()} variants marked as out of stock.")
     mark_as_out_of_stock.short_description = "Mark selected variants as out of stock"
 
@@ -289,12 +302,12 @@ class ReviewAdmin(admin.ModelAdmin):
     has_images.short_description = "Images"
     
     def approve_reviews(self, request, queryset):
-        queryset.update(is_approved=True)
+        update_products(queryset, 'product_id', is_approved=True)
         self.message_user(request, f"{queryset.count()} reviews approved.")
     approve_reviews.short_description = "Approve selected reviews"
     
     def disapprove_reviews(self, request, queryset):
-        queryset.update(is_approved=False)
+        update_products(queryset, 'product_id', is_approved=False)
         self.message_user(request, f"{queryset.count()} reviews disapproved.")
     disapprove_reviews.short_description = "Disapprove selected reviews"
 
@@ -320,3 +333,12 @@ class WishlistAdmin(admin.ModelAdmin):
     list_display = ('user', 'product', 'created_at')
     list_filter = ('created_at',)
     search_fields = ('user__username', 'product__name')
+
+
+@admin.register(ProductAnalytics)
+class ProductAnalyticsAdmin(admin.ModelAdmin):
+    """Product analytics admin"""
+    list_display = ('product', 'date', 'views', 'unique_views')
+    list_filter = ('date',)
+    search_fields = ('product__name',)
+    readonly_fields = ('product', 'date', 'views', 'unique_views')
@@ -20,10 +20,7 @@ def wishlist_api(request):
         wishlist_items = []
         for item in wishlist_items_db:
             # Get the primary image if available
-            primary_image_url = None
-            product_images = item.product.images.filter(is_primary=True).first()
-            if product_images:
-                primary_image_url = product_images.image.url
+            primary_image_url = item.product.primary_image_url or None
             
             wishlist_items.append({
                 'id': item.id,
@@ -0,0 +1,183 @@
+"""
+In-memory category tree.
+
+All categories and the active product count per category are loaded with
+two queries and turned into a ``CategoryTree`` holding, per category:
+
+- its depth and ancestor path (for breadcrumbs)
+- its active children, sorted by name
+- the ids of its active subtree (itself and all active descendants, an
+  inactive category hides its whole subtree)
+- the active product count of the category and of its subtree
+
+The tree is stored in the cache under a version key and kept in process,
+so lookups are plain dict reads. The version is bumped whenever a
+``Category`` is saved or deleted and when a ``Product`` is created, deleted
+or moved in or out of the counts (``is_active`` or ``category`` changed),
+after which each process loads the new tree once. Other product saves,
+such as the stock updates of every order, keep the tree without a query:
+saved values are compared with the values the product was loaded with.
+Bulk ``update()`` calls changing those fields bump the version themselves.
+"""
+import threading
+import time
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db.models import DEFERRED, Count
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Category, Product
+
+VERSION_KEY = 'category_tree_version'
+TREE_KEY = 'category_tree_{version}'
+TREE_TIMEOUT = 60 * 60 * 24
+# Product fields the tree depends on, as ``update_fields`` names and attributes
+PRODUCT_TREE_FIELDS = {'is_active': 'is_active', 'category': 'category_id'}
+
+
+class CategoryTree:
+    """Category hierarchy with precomputed paths, subtrees and product counts"""
+
+    def __init__(self, version, categories, product_counts):
+        self.version = version
+        self.categories = {category.id: category for category in categories}
+        self.by_slug = {category.slug: category.id for category in categories}
+        self.product_counts = {category_id: product_counts.get(category_id, 0) for category_id in self.categories}
+
+        self.children = defaultdict(list)
+        for category in sorted(categories, key=lambda category: category.name):
+            if category.parent_id in self.categories:
+                self.children[category.parent_id].append(category.id)
+
+        self.paths = {category_id: self._path(category_id) for category_id in self.categories}
+
+        self.subtrees = {}
+        self.total_counts = {}
+        for category_id in self.categories:
+            self._subtree(category_id)
+
+    @classmethod
+    def load(cls, version=None):
+        categories = list(Category.objects.order_by('name'))
+        product_counts = dict(
+            Product.objects.filter(is_active=True)
+            .values('category_id').annotate(count=Count('id')).order_by()
+            .values_list('category_id', 'count')
+        )
+        return cls(version, categories, product_counts)
+
+    def _path(self, category_id):
+        """Ancestor ids from the root down to the category itself"""
+        path = []
+        node_id = category_id
+        # Stop at a repeated id so a cyclic parent chain can't loop forever
+        while node_id in self.categories and node_id not in path:
+            path.append(node_id)
+            node_id = self.categories[node_id].parent_id
+        return tuple(reversed(path))
+
+    def _subtree(self, category_id):
+        subtree = self.subtrees.get(category_id)
+        if subtree is None:
+            self.subtrees[category_id] = frozenset((category_id,))
+            ids = {category_id}
+            for child_id in self.children[category_id]:
+                if self.categories[child_id].is_active:
+                    ids |= self._subtree(child_id)
+            subtree = frozenset(ids)
+            self.subtrees[category_id] = subtree
+            self.total_counts[category_id] = sum(self.product_counts[node_id] for node_id in subtree)
+        return subtree
+
+    # Lookups -----------------------------------------------------------
+    def get(self, category_id):
+        return self.categories.get(category_id)
+
+    def get_by_slug(self, slug):
+        return self.categories.get(self.by_slug.get(slug))
+
+    def roots(self, active_only=True):
+        return [
+            category for category in sorted(self.categories.values(), key=lambda category: category.name)
+            if category.parent_id not in self.categories and (category.is_active or not active_only)
+        ]
+
+    def get_children(self, category_id, active_only=True):
+        children = [self.categories[child_id] for child_id in self.children.get(category_id, ())]
+        return [category for category in children if category.is_active or not active_only]
+
+    def descendant_ids(self, category_id, include_self=True):
+        """Ids of the active subtree of a category, empty for unknown categories"""
+        subtree = self.subtrees.get(category_id, frozenset())
+        return subtree if include_self else subtree - {category_id}
+
+    def depth(self, category_id):
+        return len(self.paths.get(category_id, ())) - 1
+
+    def breadcrumbs(self, category_id):
+        """Categories from the root down to the category itself"""
+        return [self.categories[node_id] for node_id in self.paths.get(category_id, ())]
+
+    def product_count(self, category_id, include_descendants=False):
+        counts = self.total_counts if include_descendants else self.product_counts
+        return counts.get(category_id, 0)
+
+
+_tree = None
+_lock = threading.Lock()
+
+
+def bump_category_tree_version():
+    cache.set(VERSION_KEY, time.time_ns(), None)
+
+
+def get_category_tree():
+    """The category tree of the current version, loaded once per process and version"""
+    global _tree
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+
+    tree = _tree
+    if tree is None or tree.version != version:
+        with _lock:
+            if _tree is None or _tree.version != version:
+                tree_key = TREE_KEY.format(version=version)
+                tree = cache.get(tree_key)
+                if tree is None:
+                    tree = CategoryTree.load(version)
+                    cache.set(tree_key, tree, TREE_TIMEOUT)
+                _tree = tree
+            tree = _tree
+    return tree
+
+
+def _tree_fields_saved(update_fields):
+    return update_fields is None or not PRODUCT_TREE_FIELDS.keys().isdisjoint(update_fields)
+
+
+@receiver(post_save, sender=Product)
+def invalidate_category_tree_for_product(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Only products entering, leaving or moving between category counts change
+    the tree. Saved values are compared with the ones loaded by
+    ``Product.from_db``, instances not loaded from the database always bump.
+    """
+    if not created and not _tree_fields_saved(update_fields):
+        return
+    loaded = getattr(instance, '_loaded_values', None) or {}
+    current = {attname: getattr(instance, attname) for attname in PRODUCT_TREE_FIELDS.values()}
+    if created or any(loaded.get(attname, DEFERRED) != value for attname, value in current.items()):
+        bump_category_tree_version()
+    # The next save of this instance compares with what was just written
+    instance._loaded_values = {**loaded, **current}
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Product)
+def invalidate_category_tree(sender, **kwargs):
+    bump_category_tree_version()
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from products.sitemap_builder import SitemapBuilder
+
+
+class Command(BaseCommand):
+    help = 'Pre-generate the sitemap index and gzipped sitemap files, rebuilding only changed sections'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Rebuild every section even if its data did not change',
+        )
+        parser.add_argument(
+            '--section',
+            action='append',
+            dest='sections',
+            help='Only consider this section (can be repeated), e.g. --section products',
+        )
+        parser.add_argument(
+            '--site-url',
+            help='Base URL used in sitemap locations (defaults to settings.SITE_URL)',
+        )
+
+    def handle(self, *args, **options):
+        builder = SitemapBuilder(site_url=options.get('site_url'))
+        rebuilt = builder.build(force=options['force'], sections=options.get('sections'))
+
+        if rebuilt:
+            self.stdout.write(
+                self.style.SUCCESS(f"Rebuilt sitemap sections: {', '.join(rebuilt)}")
+            )
+        else:
+            self.stdout.write('Sitemaps are up to date')
+        self.stdout.write(f"Sitemap files written to {builder.storage.location}")
@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.db import migrations, models
+
+
+def resolve_image_url(image):
+    # Same resolution as ProductImage.image_url, historical models have no properties
+    if image.startswith('http') or image.startswith('/media/'):
+        return image
+    return f"{settings.MEDIA_URL.rstrip('/')}/{image.lstrip('/')}"
+
+
+def backfill_image_urls(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    ProductImage = apps.get_model('products', 'ProductImage')
+
+    urls = {}
+    for product_id, image in ProductImage.objects.order_by('product_id', '-is_primary', 'created_at').values_list('product_id', 'image').iterator():
+        product_urls = urls.setdefault(product_id, [])
+        if len(product_urls) < 2:
+            product_urls.append(resolve_image_url(image))
+
+    for product_id, product_urls in urls.items():
+        product_urls += [''] * (2 - len(product_urls))
+        Product.objects.filter(pk=product_id).update(
+            primary_image_url=product_urls[0], secondary_image_url=product_urls[1]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0019_category_show_homepage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='primary_image_url',
+            field=models.CharField(blank=True, editable=False, max_length=500),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='secondary_image_url',
+            field=models.CharField(blank=True, editable=False, max_length=500),
+        ),
+        migrations.RunPython(backfill_image_urls, migrations.RunPython.noop),
+    ]
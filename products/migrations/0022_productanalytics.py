@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-18 22:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0021_product_view_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductAnalytics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('unique_views', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='analytics', to='products.product')),
+            ],
+            options={
+                'verbose_name': 'Product Analytics',
+                'verbose_name_plural': 'Product Analytics',
+                'ordering': ['-date'],
+                'unique_together': {('product', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-18 23:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0022_productanalytics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ViewEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('product', 'Product'), ('page', 'Page')], max_length=10)),
+                ('object_id', models.PositiveIntegerField()),
+                ('date', models.DateField()),
+                ('count', models.PositiveIntegerField(default=1)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ViewVisitor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('product', 'Product'), ('page', 'Page')], max_length=10)),
+                ('object_id', models.PositiveIntegerField()),
+                ('date', models.DateField()),
+                ('visitor', models.CharField(max_length=32)),
+            ],
+            options={
+                'unique_together': {('kind', 'object_id', 'date', 'visitor')},
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-18 23:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0023_viewevent_viewvisitor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ViewSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('product', 'Product'), ('page', 'Page')], max_length=10)),
+                ('object_id', models.PositiveIntegerField()),
+                ('date', models.DateField()),
+                ('sketch', models.BinaryField()),
+                ('changed', models.BooleanField(default=True)),
+            ],
+            options={
+                'unique_together': {('kind', 'object_id', 'date')},
+            },
+        ),
+        migrations.DeleteModel(
+            name='ViewVisitor',
+        ),
+    ]
@@ -2,6 +2,7 @@ from django.db import models
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils.text import slugify
+from utils.fragment_cache import bump_fragment_versions
 import uuid
 
 User = get_user_model()
@@ -89,6 +90,7 @@ class Product(models.Model):
     is_featured = models.BooleanField(default=False)
     is_digital = models.BooleanField(default=False)
     in_stock = models.BooleanField(default=True, help_text="Indicates if this product is currently in stock and available for ordering")
+    view_count = models.PositiveIntegerField(default=0, editable=False)
     
     # Physical attributes
     weight = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
@@ -147,6 +149,10 @@ class Product(models.Model):
         help_text="YouTube video URL (e.g., https://www.youtube.com/watch?v=VIDEO_ID)"
     )
     
+    # Resolved URLs of the primary and hover images, kept in sync by ProductImage
+    primary_image_url = models.CharField(max_length=500, blank=True, editable=False)
+    secondary_image_url = models.CharField(max_length=500, blank=True, editable=False)
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -162,11 +168,29 @@ class Product(models.Model):
     def __str__(self):
         return self.name
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Column values as loaded, saves compare against them (see products.category_tree)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+    
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
         super().save(*args, **kwargs)
     
+    def sync_image_urls(self):
+        """Store the URLs of the first two images (primary first) on the product"""
+        urls = [image.image_url for image in ProductImage.objects.filter(product_id=self.pk)[:2]]
+        urls += [''] * (2 - len(urls))
+        self.primary_image_url, self.secondary_image_url = urls
+        # update() keeps updated_at and the product save signals out of image changes
+        Product.objects.filter(pk=self.pk).update(primary_image_url=urls[0], secondary_image_url=urls[1])
+        # The image save signals bumped the card version before the URLs were
+        # stored, a card rendered in between would keep the old image
+        bump_fragment_versions(Product, [self.pk])
+    
     @property
     def is_available(self):
         """Check if product is available (active and in stock)"""
@@ -351,6 +375,13 @@ class ProductImage(models.Model):
             self.is_primary = True
             # Use update instead of save to avoid recursion and duplicate save
             ProductImage.objects.filter(id=self.id).update(is_primary=True)
+        
+        self.product.sync_image_urls()
+    
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self.product.sync_image_urls()
+        return result
     
     @property
     def image_url(self):
@@ -563,6 +594,69 @@ class ReviewImage(models.Model):
         return None
 
 
+class ProductAnalytics(models.Model):
+    """Daily views and unique visitors of a product"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='analytics')
+    date = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+    unique_views = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        verbose_name = "Product Analytics"
+        verbose_name_plural = "Product Analytics"
+        unique_together = ['product', 'date']
+        ordering = ['-date']
+    
+    def __str__(self):
+        return f"{self.product.name} - {self.date}"
+
+
+class ViewEvent(models.Model):
+    """
+    Append-only buffer of product and page views for deployments without Redis.
+
+    Rows are written by ``utils.view_counters.DatabaseViewCounter`` and
+    deleted by the ``flush_view_counts`` run that adds them to the counts.
+    """
+    
+    KIND_CHOICES = [
+        ('product', 'Product'),
+        ('page', 'Page'),
+    ]
+    
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.PositiveIntegerField()
+    date = models.DateField()
+    count = models.PositiveIntegerField(default=1)
+    
+    class Meta:
+        ordering = ['id']
+    
+    def __str__(self):
+        return f"{self.kind} {self.object_id} - {self.date}"
+
+
+class ViewSketch(models.Model):
+    """
+    HyperLogLog sketch of the visitors of a product or page per day, unique
+    visitors of the database view counter.
+
+    Sketches are merged by ``utils.view_counters.DatabaseViewCounter`` and
+    take at most 16 KB however many visitors they count.
+    """
+    kind = models.CharField(max_length=10, choices=ViewEvent.KIND_CHOICES)
+    object_id = models.PositiveIntegerField()
+    date = models.DateField()
+    sketch = models.BinaryField()  # utils.hyperloglog.HyperLogLog.to_bytes()
+    changed = models.BooleanField(default=True)  # estimate not written to the daily analytics yet
+    
+    class Meta:
+        unique_together = ['kind', 'object_id', 'date']
+    
+    def __str__(self):
+        return f"{self.kind} {self.object_id} - {self.date}"
+
+
 class Wishlist(models.Model):
     """User wishlist model"""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='wishlist_items')
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.db.models import Avg
+from .category_tree import get_category_tree
 from .models import Category, Product, ProductImage, ProductVariant, Review, ReviewImage, Wishlist
 
 
@@ -18,10 +19,10 @@ class CategorySerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'product_count', 'subcategories', 'get_absolute_url', 'created_at')
     
     def get_product_count(self, obj):
-        return obj.products.filter(is_active=True).count()
+        return get_category_tree().product_count(obj.id)
     
     def get_subcategories(self, obj):
-        subcategories = obj.subcategories.filter(is_active=True)
+        subcategories = get_category_tree().get_children(obj.id)
         return CategorySerializer(subcategories, many=True, context=self.context).data
 
 
@@ -145,12 +146,7 @@ class ProductListSerializer(serializers.ModelSerializer):
         )
     
     def get_primary_image(self, obj):
-        primary_image = obj.images.filter(is_primary=True).first()
-        if primary_image:
-            return primary_image.image_url
-        elif obj.images.exists():
-            return obj.images.first().image_url
-        return None
+        return obj.primary_image_url or None
 
 
 class ProductDetailSerializer(serializers.ModelSerializer):
@@ -0,0 +1,195 @@
+"""
+Pre-generated sitemap files
+
+Crawlers fetch every sitemap page of a large catalog at once, so instead of
+rendering the sitemaps from the ORM per request, this module writes them to
+disk ahead of time:
+
+- ``sitemap.xml``: the sitemap index, pointing at the section files
+- ``sitemap-<section>-<page>.xml.gz``: gzip-compressed sitemap pages
+- ``manifest.json``: a signature per section (row counts + latest
+  ``updated_at`` of the rows a section renders) used to rebuild only the
+  sections that changed, and the build time of each section: sections
+  older than ``MAX_SECTION_AGE`` are rebuilt anyway, their ``changefreq``
+  depends on the current date
+
+Usage:
+    python manage.py build_sitemaps            # rebuild changed sections
+    python manage.py build_sitemaps --force    # rebuild everything
+
+The files are served by ``products.views.sitemap_index`` and
+``products.views.sitemap_section``, which fall back to the live Django
+sitemap views while no prebuilt files exist.
+"""
+
+import gzip
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db.models import Count, Max, Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import Product, ProductImage, ProductVariant, Review, Category
+from .sitemaps import sitemaps
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'manifest.json'
+INDEX_NAME = 'sitemap.xml'
+MAX_SECTION_AGE = timedelta(days=1)
+
+
+def get_sitemap_storage():
+    """Storage the prebuilt sitemap files are written to"""
+    location = getattr(settings, 'SITEMAP_ROOT', os.path.join(settings.STATIC_ROOT, 'sitemaps'))
+    return FileSystemStorage(location=location)
+
+
+def section_filename(section, page):
+    return f'sitemap-{section}-{page}.xml.gz'
+
+
+def _queryset_signature(queryset, latest='updated_at', **aggregates):
+    stats = queryset.order_by().aggregate(count=Count('id'), latest=Max(latest), **aggregates)
+    return ':'.join(
+        value.isoformat() if hasattr(value, 'isoformat') else str(value)
+        for _, value in sorted(stats.items())
+    )
+
+
+def section_signature(section):
+    """
+    Return a cheap signature of the data behind a sitemap section.
+
+    Changes in row count catch deletions and deactivations, changes in the
+    latest ``updated_at`` catch edits; both come from a single aggregate per
+    table. Product priorities also depend on approved reviews and variant
+    stock, which bulk ``update()`` calls change without touching
+    ``updated_at``, so those are counted as well.
+    """
+    products = _queryset_signature(Product.objects.filter(is_active=True))
+    if section == 'products':
+        reviews = _queryset_signature(Review.objects.filter(product__is_active=True, is_approved=True))
+        variants = _queryset_signature(
+            ProductVariant.objects.filter(product__is_active=True),
+            in_stock=Count('id', filter=Q(is_active=True, in_stock=True)),
+        )
+        return f"{products}|{reviews}|{variants}"
+    if section == 'product-images':
+        # Images have no updated_at, the newest id catches a replaced image
+        images = _queryset_signature(ProductImage.objects.filter(product__is_active=True), latest='id')
+        return f"{products}|{images}"
+    if section == 'categories':
+        return f"{_queryset_signature(Category.objects.filter(is_active=True))}|{products}"
+    # Static sections only change with a deploy
+    return 'static'
+
+
+class SitemapBuilder:
+    """Writes the sitemap index and gzipped section files to storage"""
+
+    def __init__(self, sitemap_classes=None, storage=None, site_url=None):
+        self.sitemap_classes = sitemap_classes or sitemaps
+        self.storage = storage or get_sitemap_storage()
+        parsed = urlparse(site_url or getattr(settings, 'SITE_URL', 'http://localhost'))
+        self.site = SimpleNamespace(domain=parsed.netloc, name=parsed.netloc)
+        self.protocol = parsed.scheme or 'https'
+
+    def load_manifest(self):
+        if not self.storage.exists(MANIFEST_NAME):
+            return {'sections': {}}
+        with self.storage.open(MANIFEST_NAME) as f:
+            return json.loads(f.read().decode('utf-8'))
+
+    @staticmethod
+    def is_outdated(section_info):
+        """Sections built before ``MAX_SECTION_AGE`` (or by builds that did not record it) are stale"""
+        built_at = section_info.get('built_at')
+        return built_at is None or timezone.now() - datetime.fromisoformat(built_at) > MAX_SECTION_AGE
+
+    def _save(self, name, content):
+        if self.storage.exists(name):
+            self.storage.delete(name)
+        self.storage.save(name, ContentFile(content))
+
+    def build(self, force=False, sections=None):
+        """
+        Rebuild the sections whose data changed and rewrite the index.
+
+        Returns the list of section names that were regenerated.
+        """
+        manifest = self.load_manifest()
+        rebuilt = []
+
+        for section, sitemap_class in self.sitemap_classes.items():
+            if sections and section not in sections:
+                continue
+
+            signature = section_signature(section)
+            previous = manifest['sections'].get(section)
+            if not force and previous and previous['signature'] == signature and not self.is_outdated(previous):
+                continue
+
+            manifest['sections'][section] = self.build_section(section, sitemap_class, previous)
+            manifest['sections'][section].update(signature=signature, built_at=timezone.now().isoformat())
+            rebuilt.append(section)
+
+        # Drop sections that are no longer registered
+        for section in list(manifest['sections']):
+            if section not in self.sitemap_classes:
+                for filename in manifest['sections'].pop(section)['files']:
+                    if self.storage.exists(filename):
+                        self.storage.delete(filename)
+
+        if rebuilt or not self.storage.exists(INDEX_NAME):
+            self._save(INDEX_NAME, self.render_index(manifest).encode('utf-8'))
+            manifest['built_at'] = timezone.now().isoformat()
+            self._save(MANIFEST_NAME, json.dumps(manifest, indent=2).encode('utf-8'))
+
+        return rebuilt
+
+    def build_section(self, section, sitemap_class, previous=None):
+        """Render every page of one section into gzipped files"""
+        sitemap = sitemap_class() if isinstance(sitemap_class, type) else sitemap_class
+        files = []
+        lastmods = []
+
+        for page in sitemap.paginator.page_range:
+            sitemap.latest_lastmod = None
+            urls = sitemap.get_urls(page=page, site=self.site, protocol=self.protocol)
+            xml = render_to_string('sitemap.xml', {'urlset': urls})
+
+            filename = section_filename(section, page)
+            self._save(filename, gzip.compress(xml.encode('utf-8')))
+            files.append(filename)
+
+            latest = getattr(sitemap, 'latest_lastmod', None)
+            lastmods.append(latest.isoformat() if latest else None)
+
+        # Remove pages left over from a larger previous build
+        for filename in (previous or {}).get('files', []):
+            if filename not in files and self.storage.exists(filename):
+                self.storage.delete(filename)
+
+        return {'files': files, 'lastmods': lastmods}
+
+    def render_index(self, manifest):
+        items = []
+        for section in self.sitemap_classes:
+            info = manifest['sections'].get(section)
+            if not info:
+                continue
+            for filename, lastmod in zip(info['files'], info['lastmods']):
+                items.append(SimpleNamespace(
+                    location=f"{self.protocol}://{self.site.domain}/{filename}",
+                    last_mod=datetime.fromisoformat(lastmod) if lastmod else None,
+                ))
+        return render_to_string('sitemap_index.xml', {'sitemaps': items})
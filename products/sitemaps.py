@@ -23,10 +23,11 @@ Usage:
 """
 
 from django.contrib.sitemaps import Sitemap
+from django.db.models import Count, Exists, OuterRef, Q
 from django.urls import reverse
 from django.utils import timezone
 from datetime import timedelta
-from .models import Product, Category
+from .models import Product, Category, Review
 
 
 class ProductSitemap(Sitemap):
@@ -46,7 +47,11 @@ class ProductSitemap(Sitemap):
         """Return all active products ordered by most recently updated."""
         return Product.objects.filter(
             is_active=True
-        ).select_related('category').prefetch_related('images').order_by('-updated_at')
+        ).annotate(
+            has_approved_reviews=Exists(
+                Review.objects.filter(product=OuterRef('pk'), is_approved=True)
+            )
+        ).order_by('-updated_at', '-id')
     
     def lastmod(self, obj):
         """Return the last modification date of the product."""
@@ -71,7 +76,9 @@ class ProductSitemap(Sitemap):
             return 1.0
         if obj.in_stock:
             # Higher priority for products with reviews
-            if hasattr(obj, 'reviews') and obj.reviews.filter(is_approved=True).exists():
+            if getattr(obj, 'has_approved_reviews', None) is None:
+                obj.has_approved_reviews = obj.reviews.filter(is_approved=True).exists()
+            if obj.has_approved_reviews:
                 return 0.9
             return 0.8
         return 0.6
@@ -107,10 +114,18 @@ class CategorySitemap(Sitemap):
     limit = 500
     
     def items(self):
-        """Return all active categories."""
+        """Return all active categories with their product counts."""
         return Category.objects.filter(
             is_active=True
-        ).prefetch_related('products', 'subcategories').order_by('name')
+        ).annotate(
+            active_product_count=Count('products', filter=Q(products__is_active=True)),
+            has_subcategories=Exists(Category.objects.filter(parent=OuterRef('pk')))
+        ).order_by('name')
+    
+    def _product_count(self, obj):
+        if getattr(obj, 'active_product_count', None) is None:
+            obj.active_product_count = obj.products.filter(is_active=True).count()
+        return obj.active_product_count
     
     def lastmod(self, obj):
         """Return the last modification date of the category."""
@@ -131,9 +146,11 @@ class CategorySitemap(Sitemap):
         - 0.7: Subcategories with products
         - 0.6: Empty categories
         """
-        product_count = obj.products.filter(is_active=True).count()
-        is_parent = obj.parent is None
-        has_subcategories = obj.subcategories.exists()
+        product_count = self._product_count(obj)
+        is_parent = obj.parent_id is None
+        has_subcategories = getattr(obj, 'has_subcategories', None)
+        if has_subcategories is None:
+            has_subcategories = obj.subcategories.exists()
         
         if is_parent:
             if product_count > 20 or has_subcategories:
@@ -151,7 +168,7 @@ class CategorySitemap(Sitemap):
         Determine change frequency.
         Categories with more products may change more frequently.
         """
-        product_count = obj.products.filter(is_active=True).count()
+        product_count = self._product_count(obj)
         if product_count > 50:
             return 'daily'
         elif product_count > 10:
@@ -196,9 +213,10 @@ class ProductImageSitemap(Sitemap):
     def items(self):
         """Return products that have images."""
         return Product.objects.filter(
-            is_active=True,
-            images__isnull=False
-        ).select_related('category').prefetch_related('images').distinct().order_by('-updated_at')
+            is_active=True
+        ).annotate(
+            image_count=Count('images')
+        ).filter(image_count__gt=0).order_by('-updated_at', '-id')
     
     def lastmod(self, obj):
         return obj.updated_at
@@ -208,7 +226,9 @@ class ProductImageSitemap(Sitemap):
     
     def priority(self, obj):
         """Products with images get higher priority."""
-        image_count = obj.images.count()
+        image_count = getattr(obj, 'image_count', None)
+        if image_count is None:
+            image_count = obj.images.count()
         if image_count >= 5:
             return 1.0
         elif image_count >= 3:
@@ -1,3 +1,432 @@
-from django.test import TestCase
+import gzip
+import shutil
+import tempfile
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+from utils.testing import LOCMEM_CACHES
+from utils.view_counters import flush_view_counts, get_view_counter
+
+from .models import Category, Product, ProductImage, Review
+from .sitemap_builder import SitemapBuilder, get_sitemap_storage
+
+
+class SitemapBuilderTest(TestCase):
+    """Test cases for the pre-generated sitemap pipeline"""
+
+    def setUp(self):
+        self.sitemap_root = tempfile.mkdtemp()
+        self.override = override_settings(SITEMAP_ROOT=self.sitemap_root)
+        self.override.enable()
+
+        self.category = Category.objects.create(name='Shoes', slug='shoes')
+        self.product = Product.objects.create(
+            name='Runner', slug='runner', sku='RUN-1', category=self.category,
+            price=Decimal('50.00'), stock_quantity=3
+        )
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.sitemap_root)
+
+    def test_build_writes_index_and_gzipped_sections(self):
+        """Test the index points at gzipped section files"""
+        rebuilt = SitemapBuilder(site_url='https://shop.example').build()
+
+        self.assertEqual(set(rebuilt), {'products', 'categories', 'static'})
+        storage = get_sitemap_storage()
+        with storage.open('sitemap.xml') as f:
+            index = f.read().decode('utf-8')
+        self.assertIn('https://shop.example/sitemap-products-1.xml.gz', index)
+
+        with storage.open('sitemap-products-1.xml.gz') as f:
+            xml = gzip.decompress(f.read()).decode('utf-8')
+        self.assertIn('/products/runner/', xml)
+
+    def test_only_changed_sections_are_rebuilt(self):
+        """Test unchanged sections are skipped on the next build"""
+        builder = SitemapBuilder(site_url='https://shop.example')
+        builder.build()
+        self.assertEqual(builder.build(), [])
+
+        self.product.name = 'Runner 2'
+        self.product.save()
+        self.assertEqual(set(builder.build()), {'products', 'categories'})
+
+    def test_rows_rendered_with_products_trigger_rebuilds(self):
+        """Test reviews, variant stock and images changed without a product save still rebuild their sections"""
+        from .models import ProductVariant
+        from .sitemaps import extended_sitemaps
+
+        review = Review.objects.create(product=self.product, guest_name='Sam', rating=5, comment='Great')
+        variant = ProductVariant.objects.create(product=self.product, name='Large', sku='RUN-1-L', stock_quantity=2)
+        builder = SitemapBuilder(extended_sitemaps, site_url='https://shop.example')
+        builder.build()
+
+        Review.objects.filter(pk=review.pk).update(is_approved=True)
+        self.assertEqual(builder.build(), ['products'])
+        ProductVariant.objects.filter(pk=variant.pk).update(in_stock=False)
+        self.assertEqual(builder.build(), ['products'])
+
+        image = ProductImage.objects.create(product=self.product, image='https://cdn.example.com/a.jpg')
+        builder.build()
+        ProductImage.objects.filter(pk=image.pk).delete()
+        ProductImage.objects.create(product=self.product, image='https://cdn.example.com/b.jpg')
+        self.assertIn('product-images', builder.build())
+
+    def test_sections_rebuilt_after_max_age(self):
+        """Test unchanged sections are rebuilt once a day, changefreq depends on the date"""
+        from unittest import mock
+        from django.utils import timezone
+        from .sitemap_builder import MAX_SECTION_AGE
+
+        builder = SitemapBuilder(site_url='https://shop.example')
+        builder.build()
+        self.assertEqual(builder.build(), [])
+        with mock.patch('products.sitemap_builder.timezone.now', return_value=timezone.now() + MAX_SECTION_AGE * 2):
+            self.assertEqual(set(builder.build()), {'products', 'categories', 'static'})
+
+    def test_prebuilt_files_are_served(self):
+        """Test the sitemap views serve the prebuilt files"""
+        SitemapBuilder(site_url='https://shop.example').build()
+
+        response = self.client.get('/sitemap.xml')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'sitemap-products-1.xml.gz', b''.join(response.streaming_content))
+
+        response = self.client.get('/sitemap-products-1.xml.gz')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertEqual(self.client.get('/sitemap-products-9.xml.gz').status_code, 404)
+
+
+class KeysetPaginationTest(TestCase):
+    """Test cases for keyset pagination of catalog listings"""
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Bags', slug='bags')
+        # Duplicate prices make sure the id tie-breaker is used
+        for index in range(7):
+            Product.objects.create(
+                name=f'Bag {index}', slug=f'bag-{index}', sku=f'BAG-{index}',
+                category=self.category, price=Decimal('10.00') * (index // 2 + 1), stock_quantity=1
+            )
+
+    def test_pages_cover_all_rows_in_order(self):
+        """Test walking next and previous cursors visits every row once"""
+        from utils.pagination import KeysetPaginator
+
+        queryset = Product.objects.filter(is_active=True).order_by('price')
+        paginator = KeysetPaginator(queryset, 3)
+        expected = list(queryset.order_by('price', 'id').values_list('id', flat=True))
+
+        seen = []
+        page = paginator.page()
+        pages = [page]
+        while True:
+            seen.extend(p.id for p in page)
+            if not page.has_next():
+                break
+            page = paginator.page(page.next_cursor)
+            pages.append(page)
+        self.assertEqual(seen, expected)
+
+        previous = paginator.page(pages[-1].previous_cursor)
+        self.assertEqual([p.id for p in previous], [p.id for p in pages[-2]])
+
+    def test_rating_ordering_is_not_keyed(self):
+        """Test annotation orderings fall back to page numbers"""
+        from django.db.models import Avg
+        from utils.pagination import get_keyset_ordering
+
+        queryset = Product.objects.annotate(avg_rating=Avg('reviews__rating')).order_by('-avg_rating')
+        self.assertIsNone(get_keyset_ordering(queryset))
+        self.assertEqual(get_keyset_ordering(Product.objects.all()), ['-created_at', '-id'])
+
+    def test_api_keyset_mode(self):
+        """Test the product API returns cursor links on request"""
+        response = self.client.get('/api/v1/products/', {'pagination': 'keyset', 'page_size': 5})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertIsNone(response.data['previous'])
+        self.assertNotIn('count', response.data)
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNone(response.data['next'])
+
+    def test_html_keyset_mode(self):
+        """Test the storefront listing renders cursor links"""
+        response = self.client.get('/products/', {'pagination': 'keyset'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['products'].is_keyset)
+
+
+class ProductImageUrlTest(TestCase):
+    """Test cases for the image URLs stored on products"""
+
+    def test_image_urls_follow_image_changes(self):
+        """Test saving and deleting images keeps the product image URLs in sync"""
+        from .serializers import ProductListSerializer
+
+        category = Category.objects.create(name='Shoes')
+        product = Product.objects.create(name='Runner', sku='RUN-1', category=category, price=Decimal('50.00'))
+        first = ProductImage.objects.create(product=product, image='products/first.jpg')
+        second = ProductImage.objects.create(product=product, image='https://cdn.example/second.jpg', is_primary=True)
+
+        product.refresh_from_db()
+        self.assertEqual(product.primary_image_url, 'https://cdn.example/second.jpg')
+        self.assertEqual(product.secondary_image_url, '/media/products/first.jpg')
+
+        second.delete()
+        product.refresh_from_db()
+        self.assertEqual(product.primary_image_url, '/media/products/first.jpg')
+        self.assertEqual(product.secondary_image_url, '')
+
+        first.delete()
+        product.refresh_from_db()
+        with self.assertNumQueries(0):
+            self.assertIsNone(ProductListSerializer().get_primary_image(product))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CategoryTreeTest(TestCase):
+    """Test cases for the in-memory category tree"""
+
+    def test_tree_structure_and_invalidation(self):
+        """Test subtrees, paths and counts are precomputed and refreshed on saves"""
+        from .category_tree import get_category_tree
+
+        men = Category.objects.create(name='Men')
+        shirts = Category.objects.create(name='Shirts', parent=men)
+        formal = Category.objects.create(name='Formal', parent=shirts)
+        hidden = Category.objects.create(name='Hidden', parent=men, is_active=False)
+        for number, category in enumerate([men, shirts, formal, formal, hidden]):
+            Product.objects.create(name=f'Product {number}', sku=f'TREE-{number}', category=category, price=100)
+
+        tree = get_category_tree()
+        with self.assertNumQueries(0):
+            self.assertEqual(tree.descendant_ids(men.id), {men.id, shirts.id, formal.id})
+            self.assertEqual(tree.depth(formal.id), 2)
+            self.assertEqual([category.name for category in tree.breadcrumbs(formal.id)], ['Men', 'Shirts', 'Formal'])
+            self.assertEqual(tree.get_children(men.id), [shirts])
+            self.assertEqual(tree.product_count(men.id), 1)
+            self.assertEqual(tree.product_count(men.id, include_descendants=True), 4)
+            self.assertIs(get_category_tree(), tree)
+
+        hidden.is_active = True
+        hidden.save()
+        tree = get_category_tree()
+        self.assertIn(hidden.id, tree.descendant_ids(men.id))
+        self.assertEqual(tree.product_count(men.id, include_descendants=True), 5)
+
+    def test_only_counted_product_changes_reload_the_tree(self):
+        """Test stock updates keep the tree, moving or hiding a product replaces it"""
+        from .category_tree import get_category_tree
+
+        shoes = Category.objects.create(name='Shoes')
+        bags = Category.objects.create(name='Bags')
+        product = Product.objects.create(name='Runner', sku='RUN-1', category=shoes, price=100, stock_quantity=5)
+        tree = get_category_tree()
+
+        product.stock_quantity = 4
+        with self.assertNumQueries(1):  # only the UPDATE, no lookup of the saved values
+            product.save()
+        self.assertIs(get_category_tree(), tree)
+        loaded = Product.objects.select_related('category').get(pk=product.pk)
+        loaded.stock_quantity = 3
+        loaded.save()
+        self.assertIs(get_category_tree(), tree)
+
+        product.category = bags
+        product.save()
+        tree = get_category_tree()
+        self.assertEqual((tree.product_count(shoes.id), tree.product_count(bags.id)), (0, 1))
+
+        product.is_active = False
+        product.save(update_fields=['is_active'])
+        self.assertEqual(get_category_tree().product_count(bags.id), 0)
+
+    def test_admin_activation_reloads_the_tree(self):
+        """Test the admin bulk (in)activation, saved with update(), replaces the tree"""
+        from unittest import mock
+        from django.contrib.admin.sites import site
+        from .admin import ProductAdmin
+        from .category_tree import get_category_tree
+
+        shoes = Category.objects.create(name='Shoes')
+        product = Product.objects.create(name='Runner', sku='RUN-1', category=shoes, price=100)
+        self.assertEqual(get_category_tree().product_count(shoes.id), 1)
+
+        with mock.patch.object(ProductAdmin, 'message_user'):
+            ProductAdmin(Product, site).mark_as_inactive(None, Product.objects.filter(pk=product.pk))
+        self.assertEqual(get_category_tree().product_count(shoes.id), 0)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ConditionalGetTest(TestCase):
+    """Test cases for ETag / Last-Modified on the catalog APIs"""
+
+    def setUp(self):
+        for alias in LOCMEM_CACHES:
+            caches[alias].clear()
+        self.category = Category.objects.create(name='Shoes')
+        self.product = Product.objects.create(name='Runner', sku='RUN-1', category=self.category, price=Decimal('50.00'))
+        # Views buffered in process by earlier tests are not rolled back
+        get_view_counter().drain()
+
+    def test_product_detail_not_modified_until_reviewed(self):
+        """Test a repeat request gets a 304 until the product changes"""
+        url = f'/api/v1/products/{self.product.slug}/'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        flush_view_counts()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.view_count, 2)  # revalidations are views too
+
+        Review.objects.create(product=self.product, guest_name='Sam', rating=5, comment='Great', is_approved=True)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['review_count'], 1)
+
+    def test_bulk_review_approval_changes_product_detail(self):
+        """Test approving reviews from the dashboard bulk action invalidates the product detail"""
+        from django.contrib.auth import get_user_model
+        from rest_framework.test import APIClient
+
+        url = f'/api/v1/products/{self.product.slug}/'
+        etag = self.client.get(url)['ETag']
+        review = Review.objects.create(product=self.product, guest_name='Sam', rating=5, comment='Great')
+        etag = self.client.get(url, HTTP_IF_NONE_MATCH=etag)['ETag']
+
+        staff = get_user_model().objects.create_user(
+            username='staff', email='staff@example.com', password='pass12345', is_staff=True, is_superuser=True
+        )
+        admin = APIClient()
+        admin.force_authenticate(staff)
+        response = admin.post('/mb-admin/reviews/bulk-action/', {'action': 'approve', 'review_ids': [review.id]}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['review_count'], 1)
+
+    def test_product_detail_body_kept_when_other_products_change(self):
+        """Test the cached detail body survives saves of other products and not of its own"""
+        url = f'/api/v1/products/{self.product.slug}/'
+        self.client.get(url)
+        other = Product.objects.create(name='Boot', sku='BOOT-1', category=self.category, price=Decimal('80.00'))
+        other.stock_quantity = 3
+        other.save()
+        with self.assertNumQueries(1):  # the validators
+            response = self.client.get(url)
+        self.assertEqual(response.data['name'], 'Runner')
+
+        self.product.name = 'Trail runner'
+        self.product.save()
+        self.assertEqual(self.client.get(url).data['name'], 'Trail runner')
+
+    def test_product_list_validators_need_no_queries(self):
+        """Test a revalidated list is answered without touching the database"""
+        response = self.client.get('/api/v1/products/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/v1/products/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        self.category.name = 'Sneakers'
+        self.category.save()
+        response = self.client.get('/api/v1/products/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['category'], 'Sneakers')
+
+    def test_unknown_product_has_no_validators(self):
+        response = self.client.get('/api/v1/products/missing/')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('ETag'))
+
+
+class BenchmarkHarnessTest(TestCase):
+    """Test cases for the endpoint benchmark harness"""
+
+    def test_seed_and_run(self):
+        """Test the seeded store is reproducible and scenarios record queries"""
+        from orders.models import Order, OrderItem
+        from utils.benchmarks import run_scenarios, seed_store
+
+        created = seed_store(products=20, orders=30, items=90, seed=7)
+        self.assertEqual(Product.objects.count(), 20)
+        self.assertEqual(Order.objects.count(), 30)
+        self.assertEqual(OrderItem.objects.count(), created['orders.OrderItem'])
+        first_order = Order.objects.get(pk=1)
+        self.assertEqual(
+            first_order.subtotal,
+            sum(item.unit_price * item.quantity for item in first_order.items.all()),
+        )
+
+        results = run_scenarios(['product_detail', 'dashboard_statistics'], iterations=2, warmup=0)
+        self.assertEqual(results['product_detail']['status_codes'], {'200': 2})
+        self.assertEqual(results['dashboard_statistics']['status_codes'], {'200': 2})
+        self.assertGreater(results['dashboard_statistics']['queries'], 0)
+
+    def test_compare_flags_regressions(self):
+        """Test slower medians and extra queries are reported as regressions"""
+        from utils.benchmarks import compare_results
+
+        baseline = {'scenarios': {
+            'home': {'median_ms': 10.0, 'queries': 5},
+            'products': {'median_ms': 10.0, 'queries': 5},
+        }}
+        current = {'scenarios': {
+            'home': {'median_ms': 11.0, 'queries': 6},
+            'products': {'median_ms': 10.5, 'queries': 5},
+        }}
+        rows = {row['scenario']: row for row in compare_results(baseline, current, threshold=0.2)}
+        self.assertTrue(rows['home']['regression'])
+        self.assertFalse(rows['products']['regression'])
+
+
+class DataGeneratorTest(TestCase):
+    """Test cases for the synthetic data generator"""
+
+    def test_generate_volumes_without_signals(self):
+        """Test the requested volumes are written in bulk with signals muted"""
+        from django.db.models.signals import post_save
+        from incomplete_orders.models import IncompleteOrder
+        from inventory.models import StockActivity
+        from orders.models import Order
+        from utils.data_generator import DataGenerator
+
+        received = []
+
+        def receiver(sender, **kwargs):
+            received.append(sender)
+
+        post_save.connect(receiver)
+        try:
+            totals = DataGenerator(seed=3, batch_size=7).generate(
+                products=10, orders=25, reviews=15, stock_activities=12, incomplete_orders=5, customers=20,
+            )
+        finally:
+            post_save.disconnect(receiver)
+
+        # Only the generator's own staff user is created through the ORM with signals
+        self.assertEqual({sender._meta.label for sender in received}, {'users.User'})
+        self.assertEqual(totals['products.Product'], 10)
+        self.assertEqual(Order.objects.count(), 25)
+        self.assertEqual(Review.objects.count(), 15)
+        self.assertEqual(StockActivity.objects.count(), 12)
+        self.assertEqual(IncompleteOrder.objects.count(), 5)
+        self.assertEqual(
+            set(Order.objects.values_list('shipping_cost', flat=True)),
+            {Decimal('60.00'), Decimal('120.00')},
+        )
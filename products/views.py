@@ -10,6 +10,7 @@ from django.views.decorators.cache import cache_page
 from django.utils.decorators import method_decorator
 from django.views.decorators.vary import vary_on_headers, vary_on_cookie
 from .models import Category, Product, ProductImage, Review, ReviewImage, Wishlist
+from .category_tree import get_category_tree
 from .serializers import (
     CategorySerializer, 
     ProductListSerializer, 
@@ -23,9 +24,39 @@ from .serializers import (
 )
 from .filters import ProductFilter
 from utils.cache_utils import get_cache_manager, cache_view
+from utils.conditional import conditional, is_anonymous, version_validators
+from utils.fragment_cache import get_fragment_versions
+from utils.view_counters import get_visitor_id, record_product_view, record_view
+from utils.pagination import HybridPagination
 
 
-@method_decorator(cache_page(3600), name='dispatch')  # Cache for 1 hour
+def category_list_validators(request, *args, **kwargs):
+    """Categories carry product counts, so product changes count too"""
+    return version_validators(
+        ['products.category', 'products.product'],
+        request.META.get('HTTP_ACCEPT', ''), request.META.get('HTTP_ACCEPT_LANGUAGE', ''),
+    )
+
+
+def product_list_validators(request, *args, **kwargs):
+    return version_validators(['products.product', 'products.category'], request.META.get('HTTP_ACCEPT', ''))
+
+
+def product_detail_validators(request, slug, **kwargs):
+    """The detail has the wishlist flag of the user, only anonymous requests are revalidated"""
+    if not is_anonymous(request):
+        return None, None
+    product = Product.objects.filter(slug=slug, is_active=True).values_list('id', 'updated_at').first()
+    if product is None:
+        return None, None
+    product_id, updated_at = product
+    return version_validators(
+        [f'products.product:{product_id}', 'products.category'], request.META.get('HTTP_ACCEPT', ''),
+        updated_at=updated_at,
+    )
+
+
+@method_decorator(conditional(category_list_validators), name='dispatch')
 @method_decorator(vary_on_headers('Accept-Language'), name='dispatch')
 class CategoryListView(generics.ListAPIView):
     """List all active categories"""
@@ -73,9 +104,10 @@ class CategoryDetailView(generics.RetrieveAPIView):
         return response
 
 
+@method_decorator(conditional(product_list_validators), name='dispatch')
 class ProductListView(generics.ListAPIView):
     """List products with filtering, searching, and pagination"""
-    queryset = Product.objects.filter(is_active=True).select_related('category').prefetch_related('images', 'reviews')
+    queryset = Product.objects.filter(is_active=True).select_related('category').prefetch_related('reviews')
     serializer_class = ProductListSerializer
     permission_classes = [permissions.AllowAny]
     
@@ -84,6 +116,7 @@ class ProductListView(generics.ListAPIView):
     search_fields = ['name', 'description', 'short_description', 'category__name']
     ordering_fields = ['name', 'price', 'created_at']
     ordering = ['-created_at']
+    pagination_class = HybridPagination
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -93,7 +126,7 @@ class ProductListView(generics.ListAPIView):
         if category_slug:
             category = get_object_or_404(Category, slug=category_slug, is_active=True)
             # Include subcategory products
-            category_ids = [category.id] + list(category.subcategories.filter(is_active=True).values_list('id', flat=True))
+            category_ids = get_category_tree().descendant_ids(category.id)
             queryset = queryset.filter(category_id__in=category_ids)
         
         # Filter featured products
@@ -121,7 +154,8 @@ class ProductListView(generics.ListAPIView):
         
         # Generate cache key based on query parameters
         query_params = dict(request.GET)
-        cache_key = f"product_list_{hash(str(sorted(query_params.items())))}"
+        versions = get_fragment_versions(['products.product', 'products.category'])
+        cache_key = f"product_list_{hash(str(sorted(query_params.items())))}_{hash(str(sorted(versions.items())))}"
         
         # Check if it's a simple query that can be cached
         cacheable_params = ['category', 'featured', 'in_stock', 'page']
@@ -142,7 +176,7 @@ class ProductListView(generics.ListAPIView):
         return response
 
 
-@method_decorator(cache_page(1800), name='dispatch')  # Cache for 30 minutes
+@method_decorator(conditional(product_detail_validators, not_modified=record_product_view), name='dispatch')
 class ProductDetailView(generics.RetrieveAPIView):
     """Product detail view"""
     queryset = Product.objects.filter(is_active=True).select_related('category').prefetch_related(
@@ -152,29 +186,31 @@ class ProductDetailView(generics.RetrieveAPIView):
     permission_classes = [permissions.AllowAny]
     lookup_field = 'slug'
     
+    @staticmethod
+    def get_versions(product_id):
+        """The versions the validators use, so the body is never older than the ETag"""
+        return get_fragment_versions([f'products.product:{product_id}', 'products.category'])
+    
     def retrieve(self, request, *args, **kwargs):
         """Get product with caching"""
         cache_manager = get_cache_manager()
-        slug = kwargs.get('slug')
-        cache_key = f'product_detail_{slug}'
+        cache_key = f"product_detail_body_{kwargs.get('slug')}"
         
-        cached_product = cache_manager.get_product_cache(cache_key)
-        if cached_product is not None:
-            return Response(cached_product)
+        # Stored with the versions of its own product, saving another product keeps it
+        cached = cache_manager.get_product_cache(cache_key)
+        if cached is not None and cached['versions'] == self.get_versions(cached['data']['id']):
+            record_view('product', cached['data']['id'], get_visitor_id(request))
+            return Response(cached['data'])
         
-        response = super().retrieve(request, *args, **kwargs)
-        
-        if response.status_code == 200:
-            timeout = cache_manager.get_timeout('product_detail')
-            cache_manager.set_product_cache(cache_key, response.data, timeout)
-            
-            # Increment view count (don't cache this)
-            product = self.get_object()
-            Product.objects.filter(id=product.id).update(
-                view_count=product.view_count + 1
-            )
+        instance = self.get_object()
+        versions = self.get_versions(instance.id)
+        data = self.get_serializer(instance).data
+        timeout = cache_manager.get_timeout('product_detail')
+        cache_manager.set_product_cache(cache_key, {'versions': versions, 'data': data}, timeout)
         
-        return response
+        # Count the view in the buffer (don't cache this)
+        record_view('product', instance.id, get_visitor_id(request))
+        return Response(data)
 
 
 class ProductCreateView(generics.CreateAPIView):
@@ -193,7 +229,7 @@ class ProductUpdateView(generics.UpdateAPIView):
 
 class FeaturedProductsView(generics.ListAPIView):
     """List featured products"""
-    queryset = Product.objects.filter(is_active=True, is_featured=True).select_related('category').prefetch_related('images')
+    queryset = Product.objects.filter(is_active=True, is_featured=True).select_related('category')
     serializer_class = ProductListSerializer
     permission_classes = [permissions.AllowAny]
 
@@ -211,7 +247,7 @@ class RelatedProductsView(generics.ListAPIView):
         return Product.objects.filter(
             category=product.category,
             is_active=True
-        ).exclude(id=product_id).select_related('category').prefetch_related('images')[:6]
+        ).exclude(id=product_id).select_related('category')[:6]
 
 
 class ReviewListCreateView(generics.ListCreateAPIView):
@@ -319,7 +355,7 @@ def product_search(request):
     serializer = ProductSearchSerializer(data=request.query_params)
     serializer.is_valid(raise_exception=True)
     
-    queryset = Product.objects.filter(is_active=True).select_related('category').prefetch_related('images')
+    queryset = Product.objects.filter(is_active=True).select_related('category')
     
     # Text search
     search_query = serializer.validated_data.get('q')
@@ -335,7 +371,7 @@ def product_search(request):
     category_slug = serializer.validated_data.get('category')
     if category_slug:
         category = get_object_or_404(Category, slug=category_slug, is_active=True)
-        category_ids = [category.id] + list(category.subcategories.filter(is_active=True).values_list('id', flat=True))
+        category_ids = get_category_tree().descendant_ids(category.id)
         queryset = queryset.filter(category_id__in=category_ids)
     
     # Price range filter
@@ -392,12 +428,12 @@ def category_products(request, category_slug):
     category = get_object_or_404(Category, slug=category_slug, is_active=True)
     
     # Include subcategory products
-    category_ids = [category.id] + list(category.subcategories.filter(is_active=True).values_list('id', flat=True))
+    category_ids = get_category_tree().descendant_ids(category.id)
     
     products = Product.objects.filter(
         category_id__in=category_ids,
         is_active=True
-    ).select_related('category').prefetch_related('images')
+    ).select_related('category')
     
     # Apply filters similar to ProductListView
     # ... (implement additional filtering as needed)
@@ -412,3 +448,27 @@ def category_products(request, category_slug):
     
     serializer = ProductListSerializer(products, many=True, context={'request': request})
     return Response(serializer.data)
+
+
+def sitemap_index(request):
+    """Serve the prebuilt sitemap index, or render it live if it was never built"""
+    from django.contrib.sitemaps.views import sitemap
+    from django.http import FileResponse
+    from .sitemap_builder import get_sitemap_storage, INDEX_NAME
+    from .sitemaps import sitemaps
+    
+    storage = get_sitemap_storage()
+    if storage.exists(INDEX_NAME):
+        return FileResponse(storage.open(INDEX_NAME), content_type='application/xml')
+    return sitemap(request, sitemaps=sitemaps)
+
+
+def sitemap_section(request, filename):
+    """Serve a prebuilt, gzip-compressed sitemap page"""
+    from django.http import FileResponse, Http404
+    from .sitemap_builder import get_sitemap_storage
+    
+    storage = get_sitemap_storage()
+    if not storage.exists(filename):
+        raise Http404('Sitemap not found')
+    return FileResponse(storage.open(filename), content_type='application/gzip')
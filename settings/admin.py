@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import HeroContent, SiteSettings, Curier, CheckoutCustomization
+from .models import HeroContent, SiteSettings, Curier, CheckoutCustomization, MetaCapiEvent
 
 
 @admin.register(HeroContent)
@@ -292,3 +292,19 @@ class CheckoutCustomizationAdmin(admin.ModelAdmin):
         if obj.is_active:
             CheckoutCustomization.objects.exclude(pk=obj.pk).update(is_active=False)
         super().save_model(request, obj, form, change)
+
+
+@admin.register(MetaCapiEvent)
+class MetaCapiEventAdmin(admin.ModelAdmin):
+    list_display = ('event_name', 'event_id', 'status', 'attempts', 'next_attempt_at', 'created_at')
+    list_filter = ('status', 'event_name')
+    search_fields = ('event_id',)
+    readonly_fields = ('event_id', 'event_name', 'payload', 'attempts', 'last_error', 'created_at')
+    actions = ['requeue_events']
+
+    def requeue_events(self, request, queryset):
+        from .meta_capi_queue import requeue_dead_events
+        count = requeue_dead_events(queryset)
+        self.message_user(request, f"Requeued {count} dead letter events.")
+
+    requeue_events.short_description = "Requeue selected dead letter events"
@@ -0,0 +1,76 @@
+import time
+
+from django.core.management.base import BaseCommand
+from settings.meta_capi_queue import (
+    MAX_BATCH_SIZE, flush_events, get_queue_metrics, requeue_dead_events
+)
+
+
+class Command(BaseCommand):
+    help = 'Send queued Meta Conversions API events in batches'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=MAX_BATCH_SIZE,
+            help=f'Events per Graph API call (default and maximum: {MAX_BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running and flush every --interval seconds'
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=10,
+            help='Seconds between flushes with --loop (default: 10)'
+        )
+        parser.add_argument(
+            '--requeue-dead',
+            action='store_true',
+            help='Move dead letter events back to the queue before flushing'
+        )
+        parser.add_argument(
+            '--stats',
+            action='store_true',
+            help='Only show queue metrics'
+        )
+    
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.show_metrics()
+            return
+        
+        if options['requeue_dead']:
+            self.stdout.write(f'Requeued {requeue_dead_events()} dead letter events')
+        
+        while True:
+            self.flush(options['batch_size'])
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+    
+    def flush(self, batch_size):
+        totals = {'sent': 0, 'failed': 0, 'dead': 0}
+        
+        # Drain the due events batch by batch
+        while True:
+            stats = flush_events(batch_size=batch_size)
+            for key in totals:
+                totals[key] += stats[key]
+            if sum(stats.values()) < batch_size or stats['sent'] == 0:
+                break
+        
+        metrics = get_queue_metrics()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Sent {totals['sent']} events, {totals['failed']} rescheduled, "
+                f"{totals['dead']} dead ({metrics['pending']} pending, {metrics['dead']} dead letters)"
+            )
+        )
+    
+    def show_metrics(self):
+        for key, value in get_queue_metrics().items():
+            self.stdout.write(f'{key}: {value}')
@@ -0,0 +1,189 @@
+"""
+Buffered Meta Conversions API pipeline
+
+Request paths only enqueue CAPI events (one INSERT, deduplicated on
+``event_id``); the ``flush_meta_capi_events`` management command sends them
+to the Graph API in batches of up to 1000 events per call over a pooled HTTP
+session.
+
+Failed batches are retried with exponential backoff. A batch the Graph API
+rejects (4xx) is split in halves and resent until the offending events are
+isolated, so only their attempts go up. Events still failing after
+``MAX_ATTEMPTS`` are moved to the dead letter status, where they stay
+for inspection until requeued with ``requeue_dead_events``.
+
+Queue depth and flush latency are reported by ``get_queue_metrics``.
+"""
+import logging
+import time
+import uuid
+from datetime import timedelta
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from .models import MetaCapiEvent
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = 1000  # Graph API limit per request
+MAX_ATTEMPTS = 5
+RETRY_BASE_DELAY = 60  # seconds, doubled for every failed attempt
+CLAIM_TIMEOUT = 120  # seconds a claimed batch is hidden from other workers
+METRICS_KEY = 'meta_capi_metrics'
+
+_session = None
+
+
+def get_session():
+    """Process-wide HTTP session, keeps connections to the Graph API open"""
+    global _session
+    if _session is None:
+        session = requests.Session()
+        session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        session.headers['Content-Type'] = 'application/json'
+        _session = session
+    return _session
+
+
+def enqueue_event(event_data):
+    """
+    Queue an event for the next flush.
+
+    Returns ``False`` when an event with the same ``event_id`` is already
+    queued, so retried requests don't report an event twice.
+    """
+    event_data.setdefault('event_id', uuid.uuid4().hex)
+    try:
+        with transaction.atomic():
+            MetaCapiEvent.objects.create(
+                event_id=event_data['event_id'],
+                event_name=event_data.get('event_name', ''),
+                payload=event_data,
+            )
+    except IntegrityError:
+        logger.debug(f"Duplicate Meta CAPI event {event_data['event_id']} ignored")
+        return False
+    return True
+
+
+def _claim_batch(batch_size):
+    """Lock a batch of due events and hide it from other workers while it is sent"""
+    now = timezone.now()
+    with transaction.atomic():
+        events = list(
+            MetaCapiEvent.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('id')[:batch_size]
+        )
+        if events:
+            MetaCapiEvent.objects.filter(pk__in=[event.pk for event in events]).update(
+                next_attempt_at=now + timedelta(seconds=CLAIM_TIMEOUT)
+            )
+    return events
+
+
+def _record_flush(batch_size, seconds, sent, failed, dead):
+    metrics = cache.get(METRICS_KEY) or {'sent_total': 0, 'failed_total': 0, 'dead_total': 0}
+    metrics.update({
+        'last_flush_at': timezone.now(),
+        'last_flush_seconds': round(seconds, 3),
+        'last_batch_size': batch_size,
+        'sent_total': metrics['sent_total'] + sent,
+        'failed_total': metrics['failed_total'] + failed,
+        'dead_total': metrics['dead_total'] + dead,
+    })
+    cache.set(METRICS_KEY, metrics, None)
+
+
+def _send(capi, events):
+    """
+    Post ``events``, returns ``(sent, failed)`` where ``failed`` pairs the
+    undelivered events with their error.
+
+    Rejected batches are bisected so one malformed event doesn't fail the
+    events sent along with it; other errors (timeouts, 5xx, rate limiting)
+    fail the whole batch.
+    """
+    from .meta_conversions_api import MetaCapiError
+
+    try:
+        capi.post_events([event.payload for event in events], session=get_session())
+    except MetaCapiError as e:
+        if not e.is_rejected or len(events) == 1:
+            return [], [(event, str(e)) for event in events]
+        middle = len(events) // 2
+        sent_left, failed_left = _send(capi, events[:middle])
+        sent_right, failed_right = _send(capi, events[middle:])
+        return sent_left + sent_right, failed_left + failed_right
+    return events, []
+
+
+def flush_events(capi=None, batch_size=MAX_BATCH_SIZE):
+    """
+    Send one batch of due events.
+
+    Returns ``{'sent': n, 'failed': n, 'dead': n}``; ``failed`` events are
+    rescheduled and ``dead`` ones exceeded ``MAX_ATTEMPTS``.
+    """
+    from .meta_conversions_api import get_meta_capi_instance
+
+    stats = {'sent': 0, 'failed': 0, 'dead': 0}
+    capi = capi or get_meta_capi_instance()
+    if capi is None:
+        return stats
+
+    events = _claim_batch(min(batch_size, MAX_BATCH_SIZE))
+    if not events:
+        return stats
+
+    started = time.monotonic()
+    sent, failed = _send(capi, events)
+    elapsed = time.monotonic() - started
+
+    if sent:
+        MetaCapiEvent.objects.filter(pk__in=[event.pk for event in sent]).delete()
+        stats['sent'] = len(sent)
+    if failed:
+        logger.error(f"{len(failed)} of {len(events)} Meta CAPI events failed: {failed[0][1]}")
+        now = timezone.now()
+        for event, error in failed:
+            event.attempts += 1
+            event.last_error = error
+            if event.attempts >= MAX_ATTEMPTS:
+                event.status = 'dead'
+                stats['dead'] += 1
+            else:
+                event.next_attempt_at = now + timedelta(seconds=RETRY_BASE_DELAY * 2 ** (event.attempts - 1))
+                stats['failed'] += 1
+        MetaCapiEvent.objects.bulk_update(
+            [event for event, error in failed], ['attempts', 'last_error', 'status', 'next_attempt_at']
+        )
+
+    _record_flush(len(events), elapsed, stats['sent'], stats['failed'], stats['dead'])
+    return stats
+
+
+def requeue_dead_events(queryset=None):
+    """Move dead letter events (of ``queryset``, all by default) back to the queue, returns how many"""
+    queryset = MetaCapiEvent.objects.all() if queryset is None else queryset
+    return queryset.filter(status='dead').update(
+        status='pending', attempts=0, next_attempt_at=timezone.now()
+    )
+
+
+def get_queue_metrics():
+    """Queue depth, dead letters and statistics of the recent flushes"""
+    pending = MetaCapiEvent.objects.filter(status='pending')
+    oldest = pending.aggregate(oldest=Min('created_at'))['oldest']
+    metrics = {
+        'pending': pending.count(),
+        'dead': MetaCapiEvent.objects.filter(status='dead').count(),
+        'oldest_pending_seconds': int((timezone.now() - oldest).total_seconds()) if oldest else 0,
+    }
+    metrics.update(cache.get(METRICS_KEY) or {})
+    return metrics
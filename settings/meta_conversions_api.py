@@ -18,6 +18,19 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+class MetaCapiError(Exception):
+    """Raised when a batch of events could not be delivered"""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+    @property
+    def is_rejected(self):
+        """The Graph API refused the payload itself (4xx other than rate limiting)"""
+        return self.status_code is not None and 400 <= self.status_code < 500 and self.status_code != 429
+
+
 class MetaConversionsAPI:
     """
     Meta Conversions API service for sending server-side events to Facebook.
@@ -117,6 +130,41 @@ class MetaConversionsAPI:
         
         return custom_data
     
+    def build_event(self, event_name: str, request: HttpRequest,
+                    email: str = None, phone: str = None,
+                    first_name: str = None, last_name: str = None,
+                    city: str = None, state: str = None, country: str = None,
+                    zip_code: str = None, custom_data: Dict = None,
+                    event_id: str = None, **kwargs) -> Dict:
+        """Create the payload of a single event (see ``send_event`` for arguments)"""
+        # Create user data
+        user_data = self._create_user_data(
+            request, email, phone, first_name, last_name,
+            city, state, country, zip_code
+        )
+        
+        # Create custom data
+        if custom_data:
+            kwargs.update(custom_data)
+        event_custom_data = self._create_custom_data(**kwargs)
+        
+        # Create event payload
+        event_data = {
+            'event_name': event_name,
+            'event_time': int(time.time()),
+            'action_source': 'website',
+            'event_source_url': request.build_absolute_uri(),
+            'user_data': user_data,
+        }
+        
+        if event_custom_data:
+            event_data['custom_data'] = event_custom_data
+        
+        if event_id:
+            event_data['event_id'] = event_id
+        
+        return event_data
+    
     def send_event(self, event_name: str, request: HttpRequest, 
                    email: str = None, phone: str = None, 
                    first_name: str = None, last_name: str = None,
@@ -124,7 +172,10 @@ class MetaConversionsAPI:
                    zip_code: str = None, custom_data: Dict = None,
                    event_id: str = None, **kwargs) -> bool:
         """
-        Send a single event to Meta Conversions API
+        Queue a single event for Meta Conversions API
+        
+        Events are sent in batches by ``manage.py flush_meta_capi_events``
+        (see ``settings.meta_capi_queue``), so this never blocks the request.
         
         Args:
             event_name: Facebook event name (Purchase, AddToCart, etc.)
@@ -142,65 +193,54 @@ class MetaConversionsAPI:
             **kwargs: Additional custom data fields
         
         Returns:
-            bool: True if successful, False otherwise
+            bool: True if queued, False on errors or duplicate event IDs
         """
         try:
-            # Create user data
-            user_data = self._create_user_data(
-                request, email, phone, first_name, last_name,
-                city, state, country, zip_code
-            )
-            
-            # Create custom data
-            if custom_data:
-                kwargs.update(custom_data)
-            event_custom_data = self._create_custom_data(**kwargs)
-            
-            # Create event payload
-            event_data = {
-                'event_name': event_name,
-                'event_time': int(time.time()),
-                'action_source': 'website',
-                'event_source_url': request.build_absolute_uri(),
-                'user_data': user_data,
-            }
-            
-            if event_custom_data:
-                event_data['custom_data'] = event_custom_data
-            
-            if event_id:
-                event_data['event_id'] = event_id
+            from .meta_capi_queue import enqueue_event
             
-            # Create API payload
-            payload = {
-                'data': [event_data],
-                'access_token': self.access_token,
-            }
-            
-            # Send to Facebook
-            response = requests.post(
-                self.api_url,
-                json=payload,
-                headers={'Content-Type': 'application/json'},
-                timeout=30
+            event_data = self.build_event(
+                event_name, request, email, phone, first_name, last_name,
+                city, state, country, zip_code, custom_data, event_id, **kwargs
             )
-            
-            if response.status_code == 200:
-                result = response.json()
-                if result.get('events_received', 0) > 0:
-                    logger.info(f"Successfully sent {event_name} event to Meta CAPI")
-                    return True
-                else:
-                    logger.error(f"Meta CAPI error: {result}")
-                    return False
-            else:
-                logger.error(f"Meta CAPI HTTP error: {response.status_code} - {response.text}")
-                return False
+            return enqueue_event(event_data)
                 
         except Exception as e:
             logger.error(f"Meta CAPI exception: {str(e)}")
             return False
     
+    def post_events(self, events: List[Dict], session: requests.Session = None, timeout: int = 10) -> Dict:
+        """
+        Send a batch of up to 1000 events to Meta Conversions API
+        
+        Raises:
+            MetaCapiError: If the request fails or no events were received
+        """
+        try:
+            response = (session or requests).post(
+                self.api_url,
+                json={'data': events, 'access_token': self.access_token},
+                headers={'Content-Type': 'application/json'},
+                timeout=timeout
+            )
+        except requests.RequestException as e:
+            raise MetaCapiError(f"Request failed: {str(e)}")
+        
+        if response.status_code != 200:
+            raise MetaCapiError(
+                f"HTTP error: {response.status_code} - {response.text[:500]}",
+                status_code=response.status_code,
+            )
+        
+        try:
+            result = response.json()
+        except ValueError:
+            raise MetaCapiError(f"Invalid JSON response: {response.text[:500]}")
+        if result.get('events_received', 0) <= 0:
+            raise MetaCapiError(f"No events received: {result}")
+        
+        logger.info(f"Sent {result['events_received']} events to Meta CAPI")
+        return result
+    
     def send_purchase_event(self, request: HttpRequest, order_data: Dict,
                            user_data: Dict = None, event_id: str = None) -> bool:
         """
@@ -372,7 +412,9 @@ def send_purchase_event(request: HttpRequest, order_data: Dict, user_data: Dict
     """Helper function to send purchase event"""
     capi = get_meta_capi_instance()
     if capi:
-        event_id = f"purchase_{order_data.get('order_id', '')}_{int(time.time())}"
+        # Same ID for repeated calls so the queue drops duplicate purchases
+        order_id = order_data.get('order_id')
+        event_id = f"purchase_{order_id}" if order_id else None
         return capi.send_purchase_event(request, order_data, user_data, event_id)
     return False
 
@@ -390,6 +432,6 @@ def send_initiate_checkout_event(request: HttpRequest, cart_data: Dict, user_dat
     """Helper function to send initiate checkout event"""
     capi = get_meta_capi_instance()
     if capi:
-        event_id = f"initiate_checkout_{int(time.time())}"
+        event_id = None  # A unique ID is assigned when the event is queued
         return capi.send_initiate_checkout_event(request, cart_data, user_data, event_id)
     return False
\ No newline at end of file
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 class HeroContent(models.Model):
     """Model for storing hero carousel content with desktop and mobile images"""
@@ -1043,3 +1044,31 @@ height="0" width="0" style="display:none;visibility:hidden"></iframe></noscript>
             scripts.append(self.footer_scripts)
         
         return '\n\n'.join(scripts)
+
+
+class MetaCapiEvent(models.Model):
+    """Meta Conversions API event waiting to be sent in a batch"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('dead', 'Dead Letter'),
+    ]
+    
+    event_id = models.CharField(max_length=150, unique=True)  # Deduplication key shared with the browser pixel
+    event_name = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+        verbose_name = "Meta CAPI Event"
+        verbose_name_plural = "Meta CAPI Events"
+    
+    def __str__(self):
+        return f"{self.event_name} ({self.event_id})"
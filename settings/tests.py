@@ -1,3 +1,106 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+
+from .meta_capi_queue import MAX_ATTEMPTS, enqueue_event, flush_events, get_queue_metrics, requeue_dead_events
+from .meta_conversions_api import MetaCapiError, MetaConversionsAPI
+from .models import MetaCapiEvent
+
+
+class FakeCapi(MetaConversionsAPI):
+    """Records posted batches instead of calling the Graph API"""
+
+    def __init__(self, fail=False, reject=()):
+        super().__init__('123', 'token')
+        self.fail = fail
+        self.reject = set(reject)
+        self.batches = []
+
+    def post_events(self, events, session=None, timeout=10):
+        self.batches.append(events)
+        if self.fail:
+            raise MetaCapiError('HTTP error: 500', status_code=500)
+        if any(event['event_id'] in self.reject for event in events):
+            raise MetaCapiError('HTTP error: 400', status_code=400)
+        return {'events_received': len(events)}
+
+
+class MetaCapiQueueTest(TestCase):
+    """Test cases for the buffered Meta Conversions API pipeline"""
+
+    def setUp(self):
+        cache.clear()
+        self.request = RequestFactory().get('/checkout/')
+
+    def test_events_queued_and_deduplicated(self):
+        """Test sending only queues events, once per event ID"""
+        capi = FakeCapi()
+        self.assertTrue(capi.send_event('Purchase', self.request, email='a@example.com', event_id='purchase_1'))
+        self.assertFalse(capi.send_event('Purchase', self.request, event_id='purchase_1'))
+        self.assertTrue(capi.send_event('AddToCart', self.request))
+
+        self.assertEqual(capi.batches, [])
+        self.assertEqual(MetaCapiEvent.objects.count(), 2)
+        self.assertEqual(get_queue_metrics()['pending'], 2)
+
+    def test_flush_sends_one_batch(self):
+        """Test due events are posted in one call and removed"""
+        for i in range(3):
+            enqueue_event({'event_name': 'AddToCart', 'event_id': f'atc_{i}'})
+
+        capi = FakeCapi()
+        self.assertEqual(flush_events(capi), {'sent': 3, 'failed': 0, 'dead': 0})
+        self.assertEqual(len(capi.batches), 1)
+        self.assertEqual([event['event_id'] for event in capi.batches[0]], ['atc_0', 'atc_1', 'atc_2'])
+        self.assertFalse(MetaCapiEvent.objects.exists())
+        self.assertEqual(get_queue_metrics()['last_batch_size'], 3)
+
+    def test_failed_events_retried_then_dead_lettered(self):
+        """Test failures are rescheduled with backoff and dead lettered after the last attempt"""
+        enqueue_event({'event_name': 'Purchase', 'event_id': 'purchase_1'})
+        capi = FakeCapi(fail=True)
+
+        self.assertEqual(flush_events(capi)['failed'], 1)
+        event = MetaCapiEvent.objects.get()
+        self.assertEqual(event.attempts, 1)
+        self.assertGreater(event.next_attempt_at, timezone.now())
+        self.assertEqual(flush_events(capi)['failed'], 0)  # not due yet
+
+        MetaCapiEvent.objects.update(attempts=MAX_ATTEMPTS - 1, next_attempt_at=timezone.now())
+        self.assertEqual(flush_events(capi)['dead'], 1)
+        self.assertEqual(MetaCapiEvent.objects.get().status, 'dead')
+        self.assertEqual(get_queue_metrics()['dead'], 1)
+
+    def test_rejected_batch_isolates_bad_event(self):
+        """Test a rejected batch is split so only the offending event is retried"""
+        for i in range(5):
+            enqueue_event({'event_name': 'AddToCart', 'event_id': f'atc_{i}'})
+
+        capi = FakeCapi(reject={'atc_3'})
+        self.assertEqual(flush_events(capi), {'sent': 4, 'failed': 1, 'dead': 0})
+        event = MetaCapiEvent.objects.get()
+        self.assertEqual(event.event_id, 'atc_3')
+        self.assertEqual(event.attempts, 1)
+
+    def test_invalid_json_response(self):
+        """Test a response that is not JSON is reported as a delivery error"""
+        response = mock.Mock(status_code=200, text='<html>')
+        response.json.side_effect = ValueError('No JSON object could be decoded')
+        session = mock.Mock()
+        session.post.return_value = response
+
+        with self.assertRaises(MetaCapiError):
+            MetaConversionsAPI('123', 'token').post_events([{'event_name': 'Purchase'}], session=session)
+
+    def test_requeue_dead_events(self):
+        """Test only dead events of the given queryset are requeued"""
+        enqueue_event({'event_name': 'Purchase', 'event_id': 'purchase_1'})
+        enqueue_event({'event_name': 'Purchase', 'event_id': 'purchase_2'})
+        MetaCapiEvent.objects.update(status='dead', attempts=MAX_ATTEMPTS)
+
+        self.assertEqual(requeue_dead_events(MetaCapiEvent.objects.filter(event_id='purchase_1')), 1)
+        self.assertEqual(MetaCapiEvent.objects.get(event_id='purchase_1').attempts, 0)
+        self.assertEqual(requeue_dead_events(), 1)
+        self.assertFalse(MetaCapiEvent.objects.filter(status='dead').exists())
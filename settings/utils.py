@@ -15,20 +15,19 @@ def get_active_curier():
         steadfast = Curier.objects.filter(name='steadFast').first()
         if steadfast:
             # Debug log the found SteadFast configuration
-            print(f"DEBUG - Using SteadFast configuration: name={steadfast.name}, api_url={steadfast.api_url}")
+            logger.debug(f"Using SteadFast configuration: name={steadfast.name}, api_url={steadfast.api_url}")
             return steadfast
         
         # If no 'steadFast' curier exists, fall back to any active curier
         active_curier = Curier.objects.filter(is_active=True).first()
         if active_curier:
-            print(f"DEBUG - No 'steadFast' entry found, using active curier: name={active_curier.name}, api_url={active_curier.api_url}")
+            logger.debug(f"No 'steadFast' entry found, using active curier: name={active_curier.name}, api_url={active_curier.api_url}")
         else:
-            print("DEBUG - No curier configuration found!")
+            logger.warning("No curier configuration found")
             
         return active_curier
     except Exception as e:
         logger.error(f"Failed to retrieve active curier configuration: {str(e)}")
-        print(f"DEBUG - Error retrieving curier config: {str(e)}")
         return None
 
 def send_order_to_curier(order):
@@ -106,13 +105,9 @@ def send_order_to_curier(order):
             safe_headers['secret-key'] = '***REDACTED***'
         logger.info(f"Using headers: {safe_headers}")
         
-        # Print full headers for debugging (with sensitive data masked)
-        print(f"DEBUG - API Headers: {safe_headers}")
-        
         # Serialize the payload to JSON
         json_payload = json.dumps(payload)
-        print(f"DEBUG - API URL: {curier.api_url}")
-        print(f"DEBUG - Request Payload: {json_payload}")
+        logger.debug(f"Curier API URL: {curier.api_url}")
         
         # Make API request
         response = requests.post(
@@ -123,9 +118,8 @@ def send_order_to_curier(order):
         
         # Check response with detailed debugging
         logger.info(f"Received response with status code: {response.status_code}")
-        print(f"DEBUG - Response Status Code: {response.status_code}")
-        print(f"DEBUG - Response Headers: {dict(response.headers)}")
-        print(f"DEBUG - Response Content: {response.text}")
+        logger.debug(f"Curier response headers: {dict(response.headers)}")
+        logger.debug(f"Curier response content: {response.text}")
         
         logger.info(f"Response content: {response.text[:500]}...")  # Log first 500 chars for debugging
         
@@ -203,7 +197,11 @@ class DeliveryCalculator:
     def get_cutoff_time(self):
         """Get the daily cutoff time for order processing."""
         if self.settings and self.settings.delivery_cutoff_time:
-            return self.settings.delivery_cutoff_time
+            cutoff = self.settings.delivery_cutoff_time
+            # Freshly created settings still hold the "HH:MM" string default
+            if isinstance(cutoff, str):
+                cutoff = datetime.strptime(cutoff[:5], "%H:%M").time()
+            return cutoff
         return datetime.strptime("16:00", "%H:%M").time()  # Default 4 PM
     
     def is_after_cutoff(self, order_time=None):
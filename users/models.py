@@ -150,11 +150,9 @@ class User(AbstractUser):
         if self.is_superuser:
             return True
         
-        # Staff and regular users must have explicit permissions
-        try:
-            return self.dashboard_permissions.has_tab_access(tab_code)
-        except DashboardPermission.DoesNotExist:
-            return False
+        # Staff and regular users must have explicit permissions (cached, see users.permissions)
+        from .permissions import has_tab_access
+        return has_tab_access(self, tab_code)
 
 
 class DashboardPermission(models.Model):
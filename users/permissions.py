@@ -0,0 +1,130 @@
+"""
+Dashboard permission lookups.
+
+The dashboard route table is compiled once into a path-segment trie, so the
+permission required by a URL is found with a single longest-prefix walk.
+
+Each user's allowed tabs are cached as a bitmask (one bit per tab in
+``DashboardPermission.DASHBOARD_TABS``) and memoized on the user object for
+the rest of the request. The cache entry is dropped whenever the user's
+``DashboardPermission`` is saved or deleted, so permission checks need no
+queries.
+"""
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import DashboardPermission
+
+TABS_CACHE_KEY = 'dashboard_tabs_{user_id}'
+TABS_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Dashboard URL patterns that require permission checks
+DASHBOARD_ROUTES = {
+    '/mb-admin/': 'home',
+    '/mb-admin/products/': 'products',
+    '/mb-admin/categories/': 'categories',
+    '/mb-admin/media/': 'media',
+    '/mb-admin/stock/': 'stock',
+    '/mb-admin/orders/': 'orders',
+    '/mb-admin/incomplete-orders/': 'incomplete_orders',
+    '/mb-admin/reviews/': 'reviews',
+    '/mb-admin/contacts/': 'contacts',
+    '/mb-admin/pages/': 'pages',
+    '/mb-admin/blocklist/': 'blocklist',
+    '/mb-admin/users/': 'users',
+    '/mb-admin/expenses/': 'expenses',
+    '/mb-admin/statistics/': 'statistics',
+    '/mb-admin/email-settings/': 'email_settings',
+    '/mb-admin/settings/': 'settings',
+    '/mb-admin/api-docs/': 'api_docs',
+    '/mb-admin/backups/': 'backups',
+}
+
+# API endpoints that should also be checked
+API_ROUTES = {
+    '/mb-admin/api/products/': 'products',
+    '/mb-admin/api/categories/': 'categories',
+    '/mb-admin/api/stock/': 'stock',
+    '/mb-admin/api/orders/': 'orders',
+    '/mb-admin/api/incomplete-orders/': 'incomplete_orders',
+    '/mb-admin/api/users/': 'users',
+    '/mb-admin/api/expenses/': 'expenses',
+    '/mb-admin/api/statistics/': 'statistics',
+    '/mb-admin/api/performance/': 'statistics',
+    '/mb-admin/api/settings/': 'settings',
+    '/mb-admin/api/blocklist/': 'blocklist',
+    '/mb-admin/api/media/': 'media',
+    '/backups/api/': 'backups',
+}
+
+TAB_BITS = {code: 1 << index for index, (code, _) in enumerate(DashboardPermission.DASHBOARD_TABS)}
+
+
+class RouteMatcher:
+    """Longest-prefix matcher for slash-terminated URL prefixes"""
+
+    def __init__(self, routes):
+        self.root = {}
+        for prefix, permission in routes.items():
+            node = self.root
+            for segment in prefix.strip('/').split('/'):
+                node = node.setdefault(segment, {})
+            node[None] = permission
+
+    def match(self, path):
+        """Permission of the longest prefix of ``path``, or ``None``"""
+        node = self.root
+        permission = None
+        # Only segments followed by a slash can match a prefix
+        for segment in path.split('/')[1:-1]:
+            node = node.get(segment)
+            if node is None:
+                break
+            permission = node.get(None, permission)
+        return permission
+
+
+route_matcher = RouteMatcher({**DASHBOARD_ROUTES, **API_ROUTES})
+
+
+def get_required_permission(path):
+    """Dashboard tab required to access ``path``, ``None`` for other URLs"""
+    return route_matcher.match(path)
+
+
+def tabs_to_mask(tabs):
+    mask = 0
+    for tab in tabs or ():
+        mask |= TAB_BITS.get(tab, 0)
+    return mask
+
+
+def get_tabs_mask(user):
+    """Bitmask of the tabs ``user`` may access"""
+    mask = getattr(user, '_dashboard_tabs_mask', None)
+    if mask is not None:
+        return mask
+
+    key = TABS_CACHE_KEY.format(user_id=user.pk)
+    mask = cache.get(key)
+    if mask is None:
+        tabs = DashboardPermission.objects.filter(user_id=user.pk).values_list('allowed_tabs', flat=True).first()
+        mask = tabs_to_mask(tabs)
+        cache.set(key, mask, TABS_CACHE_TIMEOUT)
+    user._dashboard_tabs_mask = mask
+    return mask
+
+
+def has_tab_access(user, tab_code):
+    bit = TAB_BITS.get(tab_code)
+    return bool(bit and get_tabs_mask(user) & bit)
+
+
+@receiver(post_save, sender=DashboardPermission)
+@receiver(post_delete, sender=DashboardPermission)
+def invalidate_tabs_mask(sender, instance, **kwargs):
+    cache.delete(TABS_CACHE_KEY.format(user_id=instance.user_id))
+    user = instance._state.fields_cache.get('user')
+    if user is not None:
+        user.__dict__.pop('_dashboard_tabs_mask', None)
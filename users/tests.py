@@ -1,3 +1,44 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 
-# Create your tests here.
+from utils.testing import LOCMEM_CACHES
+from .models import DashboardPermission, User
+from .permissions import get_required_permission
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class DashboardPermissionLookupTest(TestCase):
+    """Test cases for the compiled route table and cached tab permissions"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='staff', email='staff@example.com', password='pass12345', is_staff=True
+        )
+        self.permission = DashboardPermission.objects.create(user=self.user, allowed_tabs=['orders'])
+
+    def test_longest_prefix_wins(self):
+        """Test nested dashboard URLs map to their own tab, not the dashboard home"""
+        self.assertEqual(get_required_permission('/mb-admin/'), 'home')
+        self.assertEqual(get_required_permission('/mb-admin/products/12/edit/'), 'products')
+        self.assertEqual(get_required_permission('/mb-admin/api/orders/5/'), 'orders')
+        self.assertEqual(get_required_permission('/backups/api/list/'), 'backups')
+        self.assertIsNone(get_required_permission('/backups/'))
+        self.assertIsNone(get_required_permission('/products/'))
+
+    def test_access_cached_until_permission_changes(self):
+        """Test tab checks are served from the cached bitmask"""
+        user = User.objects.get(pk=self.user.pk)
+        self.assertTrue(user.has_dashboard_access('orders'))
+
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(user.has_dashboard_access('orders'))
+            self.assertFalse(user.has_dashboard_access('products'))
+            self.assertFalse(user.has_dashboard_access('unknown'))
+
+        self.permission.allowed_tabs = ['products']
+        self.permission.save()
+        user = User.objects.get(pk=self.user.pk)
+        self.assertTrue(user.has_dashboard_access('products'))
+        self.assertFalse(user.has_dashboard_access('orders'))
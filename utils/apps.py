@@ -7,4 +7,9 @@ class UtilsConfig(AppConfig):
 
     def ready(self):
         # Import signals when app is ready
-        import utils.signals
\ No newline at end of file
+        import utils.signals
+
+        from django.conf import settings
+        if getattr(settings, 'PROFILING_ENABLED', False):
+            from utils.profiling import install_hooks
+            install_hooks()
@@ -0,0 +1,256 @@
+"""
+Endpoint benchmark harness.
+
+``seed_store`` fills the database with a reproducible store through
+``utils.data_generator`` (``bulk_create`` with explicit primary keys, so
+the same seed produces the same rows on SQLite and MySQL).
+``run_scenarios`` then requests the hot storefront and dashboard endpoints
+through the test client and records latency percentiles and query counts
+per scenario.
+
+Results are plain dicts saved as JSON (``save_results``) together with the
+git commit, database vendor and dataset size, and ``compare_results``
+reports latency and query count regressions against an earlier run.
+
+The ``run_benchmarks`` management command wraps all of this in a separate
+test database.
+"""
+import json
+import random
+import statistics
+import subprocess
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+SIZES = {
+    'tiny': {'products': 50, 'orders': 200, 'items': 600},
+    'small': {'products': 1000, 'orders': 10000, 'items': 40000},
+    'medium': {'products': 10000, 'orders': 100000, 'items': 400000},
+    'large': {'products': 50000, 'orders': 500000, 'items': 2000000},
+}
+SEARCH_TERMS = ('cotton', 'shirt', 'panjabi', 'saree', 'leather', 'classic', 'premium', 'summer')
+BENCHMARK_USER_EMAIL = 'benchmark@example.com'
+STAFF_USER_EMAIL = 'benchmark-admin@example.com'
+
+
+def seed_store(products=1000, orders=10000, items=40000, seed=42, workers=1, stdout=None):
+    """
+    Create a reproducible store with ``utils.data_generator``.
+
+    Orders average ``items / orders`` items. Returns the number of rows
+    written per model label.
+    """
+    from .data_generator import DataGenerator
+
+    return DataGenerator(seed=seed, stdout=stdout).generate(
+        products=products,
+        orders=orders,
+        items_per_order=max(1, round(items / max(orders, 1))),
+        workers=workers,
+    )
+
+
+# ----------------------------------------------------------------------
+# Scenarios
+# ----------------------------------------------------------------------
+def _get_user(email, **extra):
+    from django.contrib.auth import get_user_model
+
+    User = get_user_model()
+    user = User.objects.filter(email=email).first()
+    if user is None:
+        user = User.objects.create_user(email=email, password='benchmark', is_email_verified=True, **extra)
+    return user
+
+
+class Scenario:
+    """A benchmarked request, ``prepare`` runs untimed before every call"""
+
+    def __init__(self, name, method, path, data=None, user=None, prepare=None):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.data = data
+        self.user = user
+        self.prepare = prepare
+
+    def call(self, client, rng):
+        path = self.path(rng) if callable(self.path) else self.path
+        if self.method == 'post':
+            return client.post(path, self.data, content_type='application/json')
+        return client.get(path, self.data)
+
+
+def _prepare_cart(client, rng):
+    from cart.models import Cart, CartItem
+    from products.models import Product
+
+    user = _get_user(BENCHMARK_USER_EMAIL)
+    cart, _ = Cart.objects.get_or_create(user=user)
+    cart.items.all().delete()
+    product = Product.objects.get(slug=_product_path(rng).split('/')[2])
+    CartItem.objects.create(cart=cart, product=product, quantity=1, unit_price=product.price)
+
+
+_slugs = []
+
+
+def _product_path(rng):
+    from products.models import Product
+
+    if not _slugs:
+        _slugs.extend(Product.objects.filter(is_active=True).order_by('pk').values_list('slug', flat=True))
+    return f'/products/{rng.choice(_slugs)}/'
+
+
+def get_scenarios():
+    """Benchmarked endpoints, keyed by name"""
+    order_payload = {
+        'shipping_address': {
+            'first_name': 'Benchmark', 'last_name': 'Customer',
+            'address_line_1': 'House 1, Road 1', 'phone': '01712345678',
+        },
+        'shipping_location': 'dhaka',
+        'payment_method': 'cod',
+    }
+    scenarios = [
+        Scenario('home', 'get', '/'),
+        Scenario('products', 'get', '/products/'),
+        Scenario('product_detail', 'get', _product_path),
+        Scenario('live_search_api', 'get', lambda rng: f'/api/live-search/?q={rng.choice(SEARCH_TERMS)}'),
+        Scenario('order_create', 'post', '/api/v1/orders/create/', order_payload,
+                 user=BENCHMARK_USER_EMAIL, prepare=_prepare_cart),
+        Scenario('dashboard_statistics', 'get', '/mb-admin/api/statistics/', {'period': 'month'},
+                 user=STAFF_USER_EMAIL),
+        Scenario('product_performance', 'get', '/mb-admin/api/products-performance/', user=STAFF_USER_EMAIL),
+    ]
+    return {scenario.name: scenario for scenario in scenarios}
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_scenario(scenario, iterations=20, warmup=2, seed=42):
+    client = Client()
+    if scenario.user:
+        extra = {'is_staff': True, 'is_superuser': True} if scenario.user == STAFF_USER_EMAIL else {}
+        client.force_login(_get_user(scenario.user, **extra))
+    rng = random.Random(seed)
+
+    timings, queries, statuses = [], [], {}
+    for run in range(warmup + iterations):
+        if scenario.prepare:
+            scenario.prepare(client, rng)
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = scenario.call(client, rng)
+            elapsed = (time.perf_counter() - started) * 1000
+        if run < warmup:
+            continue
+        timings.append(elapsed)
+        queries.append(len(captured.captured_queries))
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    return {
+        'iterations': iterations,
+        'min_ms': round(min(timings), 2),
+        'median_ms': round(statistics.median(timings), 2),
+        'mean_ms': round(statistics.mean(timings), 2),
+        'p95_ms': round(_percentile(timings, 0.95), 2),
+        'max_ms': round(max(timings), 2),
+        'queries': max(queries),
+        'queries_min': min(queries),
+        'status_codes': {str(code): count for code, count in sorted(statuses.items())},
+    }
+
+
+# Public IP lookups call external services, keep them out of the measurements
+@override_settings(FORCE_PUBLIC_IP_DETECTION=False)
+def run_scenarios(names=None, iterations=20, warmup=2, seed=42, stdout=None):
+    scenarios = get_scenarios()
+    _slugs.clear()
+    results = {}
+    for name in names or scenarios:
+        results[name] = run_scenario(scenarios[name], iterations, warmup, seed)
+        if stdout:
+            result = results[name]
+            stdout.write(
+                f"{name:<22} median {result['median_ms']:>9.2f} ms  p95 {result['p95_ms']:>9.2f} ms  "
+                f"queries {result['queries']:>4}  status {result['status_codes']}"
+            )
+    return results
+
+
+# ----------------------------------------------------------------------
+# Results
+# ----------------------------------------------------------------------
+def get_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def build_report(scenario_results, dataset):
+    return {
+        'commit': get_commit(),
+        'created_at': timezone.now().isoformat(),
+        'database': connection.vendor,
+        'dataset': dataset,
+        'scenarios': scenario_results,
+    }
+
+
+def default_results_dir():
+    return Path(getattr(settings, 'BENCHMARK_RESULTS_DIR', Path(settings.BASE_DIR) / 'benchmarks' / 'results'))
+
+
+def save_results(report, path=None):
+    if path is None:
+        stamp = timezone.now().strftime('%Y%m%d-%H%M%S')
+        path = default_results_dir() / f"{stamp}-{report['database']}-{report['commit'][:8] or 'nocommit'}.json"
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2))
+    return path
+
+
+def load_results(path):
+    return json.loads(Path(path).read_text())
+
+
+def compare_results(baseline, current, threshold=0.2):
+    """
+    Compare two reports scenario by scenario.
+
+    A scenario regresses when its median latency grew by more than
+    ``threshold`` (a fraction) or it runs more queries than before.
+    """
+    rows = []
+    for name, result in current['scenarios'].items():
+        before = baseline['scenarios'].get(name)
+        if before is None:
+            continue
+        change = (result['median_ms'] - before['median_ms']) / before['median_ms'] if before['median_ms'] else 0
+        rows.append({
+            'scenario': name,
+            'median_before_ms': before['median_ms'],
+            'median_after_ms': result['median_ms'],
+            'change': round(change, 3),
+            'queries_before': before['queries'],
+            'queries_after': result['queries'],
+            'regression': change > threshold or result['queries'] > before['queries'],
+        })
+    return rows
@@ -1,5 +1,7 @@
 # Cache utility functions for eCommerce project
 from django.core.cache import caches, cache
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 from django.conf import settings
 from django.db.models import QuerySet
 from django.utils.cache import get_cache_key
@@ -39,6 +41,14 @@ class CacheManager:
             self.session_cache.delete('test_key')
         except Exception:
             self.session_cache = self.default_cache  # Fallback to default
+
+        try:
+            self.version_cache = caches['versions']
+            # Test version cache
+            self.version_cache.set('test_key', 'test_value', 1)
+            self.version_cache.delete('test_key')
+        except Exception:
+            self.version_cache = self.default_cache  # Fallback to default
         
     def get_cache_key(self, key_name: str, **kwargs) -> str:
         """Generate cache key with proper formatting"""
@@ -201,6 +211,15 @@ class CacheManager:
 # Initialize cache manager (will be initialized after Django setup)
 cache_manager = None
 
+
+@receiver(setting_changed)
+def reset_cache_manager(setting, **kwargs):
+    """The manager holds cache instances, rebuild it for new ``CACHES``"""
+    global cache_manager
+    if setting == 'CACHES':
+        cache_manager = None
+
+
 def get_cache_manager():
     """Get cache manager instance (lazy loading)"""
     global cache_manager
@@ -0,0 +1,94 @@
+"""
+Conditional GET (ETag / Last-Modified) for catalog APIs and pages.
+
+Views decorated with ``conditional(validators)`` compute cheap validators
+before doing any work and answer ``304 Not Modified`` when the client (a
+browser, mobile app or CDN) already holds the current representation.
+
+Validators are built from the version counters of ``utils.fragment_cache``
+(bumped by ``utils.signals`` whenever a product, category or site setting
+changes) or from ``MAX(updated_at)`` of small tables. Versions are
+``time.time_ns()`` values, so the newest one doubles as ``Last-Modified``.
+
+Responses that differ per user (wishlist flags, user menus) only get
+validators for anonymous requests, storefront pages also vary on the CSRF
+cookie their forms are rendered with. Guests with a cart are not revalidated
+either, the cart badge in the page header changes with every cart update.
+
+Views with side effects that must happen on every request (counting a
+product view) pass them as ``not_modified``, called instead of the view
+when a ``304`` is returned.
+"""
+import hashlib
+from datetime import datetime, timezone as dt_timezone
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .fragment_cache import get_fragment_versions
+
+
+def is_anonymous(request):
+    """No session user and no API credentials"""
+    user = getattr(request, 'user', None)
+    return not (user is not None and user.is_authenticated) and 'HTTP_AUTHORIZATION' not in request.META
+
+
+def make_validators(parts, last_modified=None):
+    """``(etag, last_modified)`` from the parts identifying a representation"""
+    etag = hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+    return etag, last_modified
+
+
+def version_validators(labels, *extra, updated_at=None):
+    """Validators from the current versions of ``labels``, newest version or ``updated_at`` as last modified"""
+    versions = get_fragment_versions(labels)
+    last_modified = datetime.fromtimestamp(max(versions.values(), default=0) / 1e9, tz=dt_timezone.utc)
+    if updated_at is not None and updated_at > last_modified:
+        last_modified = updated_at
+    return make_validators([f'{label}={versions[label]}' for label in labels] + list(extra), last_modified)
+
+
+def page_validators(request, labels, *extra):
+    """Validators of a storefront page, ``None`` for signed in users and guests with a cart"""
+    from cart.storage import GUEST_CART_SESSION_KEY
+
+    if not is_anonymous(request) or GUEST_CART_SESSION_KEY in request.session:
+        return None, None
+    return version_validators(labels, request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''), *extra)
+
+
+def conditional(validators, not_modified=None):
+    """
+    Like ``django.views.decorators.http.condition`` with a single function
+    returning ``(etag, last_modified)`` (either may be ``None``) so the
+    validators are computed once per request. ``not_modified(request, *args,
+    **kwargs)`` is called when the view is skipped for a ``304``.
+    """
+    def decorator(view):
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+
+            etag, last_modified = validators(request, *args, **kwargs)
+            etag = quote_etag(etag) if etag else None
+            timestamp = int(last_modified.timestamp()) if last_modified else None
+
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            elif not_modified is not None and response.status_code == 304:
+                not_modified(request, *args, **kwargs)
+
+            # Errors (a 404 for an unknown slug) are never revalidated
+            if response.status_code in (200, 304):
+                if etag and not response.has_header('ETag'):
+                    response.headers['ETag'] = etag
+                if timestamp and not response.has_header('Last-Modified'):
+                    response.headers['Last-Modified'] = http_date(timestamp)
+            return response
+        return inner
+    return decorator
@@ -0,0 +1,585 @@
+"""
+High-volume synthetic store data.
+
+``DataGenerator`` writes a realistic catalog (categories, products with
+primary images and variants, coupons) and then orders with items, shipping
+addresses and status history, reviews, stock activities and incomplete
+orders, all with ``bulk_create`` in batches. ``bulk_create`` sends no model
+signals, and receivers are additionally muted while generating, so none of
+the per-save cache invalidation or status history hooks run; caches are
+cleared once at the end instead.
+
+Distributions follow the live store: a status mix dominated by delivered
+and pending orders, about 60% of orders shipped inside Dhaka, a third of
+the products sold in variants, repeat customers, 12% of orders with a
+coupon and recent days busier than old ones.
+
+Parent rows get explicit primary keys from ranges reserved up front, so
+order, review, stock and incomplete order shards can be written by
+separate processes (``workers``) without coordination on server databases.
+SQLite allows a single writer and each shard is one transaction, so SQLite
+shards always run one after the other in process. Each shard has its own
+seed and the output is the same for the same seed and worker count.
+"""
+import math
+import multiprocessing
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connections, transaction
+from django.db.models import Max
+from django.db.models import signals as model_signals
+from django.utils import timezone
+
+BATCH_SIZE = 2000
+ORDER_STATUSES = (
+    ('pending', 18), ('confirmed', 12), ('processing', 6), ('ready_for_shipped', 3),
+    ('shipped', 8), ('delivered', 38), ('cancelled', 10), ('returned', 3),
+    ('partially_returned', 1), ('refunded', 1),
+)
+PAYMENT_METHODS = (('cod', 80), ('bkash', 12), ('nagad', 8))
+INCOMPLETE_STATUSES = (
+    ('abandoned', 55), ('pending', 15), ('payment_failed', 8), ('payment_pending', 5),
+    ('expired', 10), ('converted', 7),
+)
+STOCK_ACTIVITIES = (
+    ('stock_in', 35), ('sold', 40), ('adjustment', 10), ('returned', 6), ('damaged', 5), ('initial', 4),
+)
+RATINGS = ((5, 45), (4, 30), (3, 12), (2, 6), (1, 7))
+# Hours of the day weighted like storefront traffic, busiest in the evening
+HOUR_WEIGHTS = (1, 1, 1, 1, 1, 1, 2, 3, 4, 5, 6, 6, 6, 6, 5, 5, 6, 7, 8, 9, 10, 9, 6, 3)
+DHAKA_SHARE = 0.6
+DHAKA_SHIPPING = Decimal('60')
+OUTSIDE_SHIPPING = Decimal('120')
+COUPON_SHARE = 0.12
+VARIANT_SHARE = 0.33
+CITIES_OUTSIDE_DHAKA = ('Chattogram', 'Sylhet', 'Khulna', 'Rajshahi', 'Barishal', 'Rangpur', 'Mymensingh', 'Cumilla')
+WORDS = (
+    'classic', 'premium', 'cotton', 'leather', 'summer', 'winter', 'slim', 'casual',
+    'formal', 'panjabi', 'shirt', 'saree', 'kurti', 'watch', 'wallet', 'sneaker',
+)
+FIRST_NAMES = ('Rahim', 'Karim', 'Nusrat', 'Farhana', 'Tanvir', 'Sadia', 'Arif', 'Mitu', 'Rakib', 'Shila')
+LAST_NAMES = ('Hossain', 'Ahmed', 'Islam', 'Rahman', 'Khan', 'Chowdhury', 'Akter', 'Begum')
+SIZES = ('S', 'M', 'L', 'XL')
+COLORS = ('Black', 'White', 'Navy', 'Maroon', 'Olive')
+GENERATOR_USER_EMAIL = 'data-generator@example.com'
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let ``bulk_create`` keep the ``created_at`` values set on the objects"""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now_add', False)
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+@contextmanager
+def muted_signals():
+    """Disconnect all model signal receivers for the duration of the block"""
+    model_signal_list = [
+        model_signals.pre_save, model_signals.post_save, model_signals.pre_delete,
+        model_signals.post_delete, model_signals.m2m_changed,
+    ]
+    saved = [(signal, signal.receivers) for signal in model_signal_list]
+    for signal in model_signal_list:
+        signal.receivers = []
+        signal.sender_receivers_cache.clear()
+    try:
+        yield
+    finally:
+        for signal, receivers in saved:
+            signal.receivers = receivers
+            signal.sender_receivers_cache.clear()
+
+
+def _weighted(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+
+def _next_id(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+def _split(start, count, shards):
+    """Split ``count`` ids from ``start`` into at most ``shards`` contiguous ranges"""
+    size = math.ceil(count / shards) if count else 0
+    ranges = []
+    for index in range(shards):
+        first = start + index * size
+        shard_count = min(size, start + count - first)
+        if shard_count > 0:
+            ranges.append((first, shard_count))
+    return ranges
+
+
+class BatchWriter:
+    """Collects rows per model and writes them with ``bulk_create`` in batches"""
+
+    def __init__(self, models, batch_size=BATCH_SIZE):
+        # Models are flushed in the given order, parents before children
+        self.models = models
+        self.batch_size = batch_size
+        self.rows = {model: [] for model in models}
+        self.written = {model._meta.label: 0 for model in models}
+
+    def add(self, obj):
+        rows = self.rows[type(obj)]
+        rows.append(obj)
+        if len(rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        for model in self.models:
+            rows = self.rows[model]
+            if rows:
+                model.objects.bulk_create(rows, batch_size=self.batch_size)
+                self.written[model._meta.label] += len(rows)
+                rows.clear()
+
+
+class DataGenerator:
+    """Generates store data, see the module docstring"""
+
+    def __init__(self, seed=42, days=365, batch_size=BATCH_SIZE, stdout=None):
+        self.seed = seed
+        self.days = days
+        self.batch_size = batch_size
+        self.now = timezone.now()
+        self.log = stdout.write if stdout else (lambda message: None)
+        self.catalog = None
+
+    # Helpers -----------------------------------------------------------
+    def created_at(self, rng):
+        """A timestamp in the last ``days`` days, recent days and evenings busier"""
+        day = int(self.days * rng.random() ** 1.6)
+        hour = rng.choices(range(24), HOUR_WEIGHTS)[0]
+        moment = (self.now - timedelta(days=day)).replace(hour=hour, minute=rng.randint(0, 59), second=rng.randint(0, 59))
+        return min(moment, self.now)
+
+    def customer(self, rng, customers):
+        """Contact details of a customer, about 30% of orders come from a small pool of regulars"""
+        if rng.random() < 0.3:
+            index = rng.randrange(max(1, customers // 20))
+        else:
+            index = rng.randrange(customers)
+        first, last = FIRST_NAMES[index % len(FIRST_NAMES)], LAST_NAMES[index % len(LAST_NAMES)]
+        return {
+            'first_name': first,
+            'last_name': last,
+            'email': f'{first.lower()}.{last.lower()}{index}@example.com',
+            'phone': f'01{"3456789"[index % 7]}{index % 100000000:08d}',
+        }
+
+    def get_generator_user(self):
+        from django.contrib.auth import get_user_model
+
+        User = get_user_model()
+        user = User.objects.filter(email=GENERATOR_USER_EMAIL).first()
+        if user is None:
+            user = User.objects.create_user(
+                email=GENERATOR_USER_EMAIL, username='data-generator', password=None, is_staff=True
+            )
+        return user
+
+    # Catalog -----------------------------------------------------------
+    def generate_catalog(self, products=0, categories=40, coupons=20):
+        """Add categories, products (with images and variants) and coupons"""
+        from cart.models import Coupon
+        from products.models import Category, Product, ProductImage, ProductVariant
+
+        rng = random.Random(self.seed)
+        writer = BatchWriter([Category, Product, ProductImage, ProductVariant, Coupon], self.batch_size)
+        category_start = _next_id(Category)
+        existing_categories = list(Category.objects.values_list('pk', flat=True))
+        if products and not existing_categories:
+            for pk in range(category_start, category_start + categories):
+                writer.add(Category(
+                    id=pk, name=f'Category {pk}', slug=f'gen-category-{pk}',
+                    is_active=True, show_homepage=pk < category_start + 4,
+                ))
+            writer.flush()
+            existing_categories = list(range(category_start, category_start + categories))
+
+        self.log(f'Generating {products} products...')
+        product_start = _next_id(Product)
+        variant_id = _next_id(ProductVariant)
+        for pk in range(product_start, product_start + products):
+            name = ' '.join(rng.sample(WORDS, 3)).title() + f' {pk}'
+            price = Decimal(rng.randrange(200, 9000, 10))
+            markup = rng.choice((0, 0, 100, 250, 500))
+            image = ProductImage(
+                product_id=pk, image=f'products/gen-{pk}.jpg', alt_text=name, is_primary=True,
+                created_at=self.now,
+            )
+            writer.add(Product(
+                id=pk,
+                name=name,
+                slug=f'gen-product-{pk}',
+                sku=f'GEN-{pk}',
+                description=f'{name} made for everyday use.',
+                short_description=name,
+                category_id=rng.choice(existing_categories),
+                price=price,
+                compare_price=price + markup if markup else None,
+                cost_price=(price * Decimal('0.6')).quantize(Decimal('1')),
+                stock_quantity=rng.randint(0, 200),
+                is_featured=rng.random() < 0.05,
+                is_active=rng.random() < 0.97,
+                created_at=self.now - timedelta(days=rng.randint(0, 2 * self.days)),
+                primary_image_url=image.image_url,
+            ))
+            writer.add(image)
+            if rng.random() < VARIANT_SHARE:
+                color = rng.choice(COLORS)
+                for size in rng.sample(SIZES, rng.randint(2, 4)):
+                    writer.add(ProductVariant(
+                        id=variant_id, product_id=pk, name=f'{color} - {size}', sku=f'GEN-{pk}-{variant_id}',
+                        size=size, color=color, price=price + (50 if size == 'XL' else 0),
+                        stock_quantity=rng.randint(0, 50), is_default=size == 'M',
+                    ))
+                    variant_id += 1
+
+        if coupons:
+            coupon_start = _next_id(Coupon)
+            for pk in range(coupon_start, coupon_start + coupons):
+                percentage = rng.random() < 0.6
+                writer.add(Coupon(
+                    id=pk, code=f'GEN{pk:05d}', name=f'Generated coupon {pk}',
+                    discount_type='percentage' if percentage else 'flat',
+                    discount_value=Decimal(rng.choice((5, 10, 15, 20))) if percentage else Decimal(rng.choice((50, 100, 200))),
+                    valid_from=self.now - timedelta(days=self.days), valid_until=self.now + timedelta(days=90),
+                ))
+
+        with explicit_timestamps(Product, ProductImage):
+            writer.flush()
+        return writer.written
+
+    def load_catalog(self):
+        """Plain data of the catalog, shared with the worker processes"""
+        from cart.models import Coupon
+        from products.models import Product, ProductVariant
+
+        variants = {}
+        for variant_id, product_id, name, price in ProductVariant.objects.filter(is_active=True).values_list(
+            'id', 'product_id', 'name', 'price'
+        ):
+            variants.setdefault(product_id, []).append((variant_id, name, price))
+        products = [
+            (pk, name, sku, price, cost_price or price * Decimal('0.6'), variants.get(pk, []))
+            for pk, name, sku, price, cost_price in Product.objects.filter(is_active=True).values_list(
+                'id', 'name', 'sku', 'price', 'cost_price'
+            )
+        ]
+        coupons = list(
+            Coupon.objects.filter(is_active=True, discount_type__in=['percentage', 'flat'])
+            .values_list('id', 'code', 'discount_type', 'discount_value')
+        )
+        self.catalog = {'products': products, 'coupons': coupons}
+        return self.catalog
+
+    # Shards ------------------------------------------------------------
+    def generate_orders(self, start, count, seed, items_per_order=4, customers=50000):
+        from cart.models import CouponUsage
+        from orders.models import Order, OrderItem, OrderStatusHistory, ShippingAddress
+
+        rng = random.Random(seed)
+        products, coupons = self.catalog['products'], self.catalog['coupons']
+        max_items = max(1, 2 * items_per_order - 1)
+        writer = BatchWriter([Order, OrderItem, ShippingAddress, OrderStatusHistory, CouponUsage], self.batch_size)
+
+        for pk in range(start, start + count):
+            created_at = self.created_at(rng)
+            customer = self.customer(rng, customers)
+            subtotal = cost = Decimal('0')
+            for product_id, name, sku, price, cost_price, variants in rng.sample(
+                products, min(len(products), rng.randint(1, max_items))
+            ):
+                variant = rng.choice(variants) if variants else None
+                unit_price = (variant[2] or price) if variant else price
+                quantity = rng.choices((1, 2, 3, 4), (70, 20, 7, 3))[0]
+                subtotal += unit_price * quantity
+                cost += cost_price * quantity
+                writer.add(OrderItem(
+                    order_id=pk, product_id=product_id, variant_id=variant[0] if variant else None,
+                    product_name=name, product_sku=sku, variant_name=variant[1] if variant else '',
+                    quantity=quantity, unit_price=unit_price, created_at=created_at,
+                ))
+
+            inside_dhaka = rng.random() < DHAKA_SHARE
+            shipping_cost = DHAKA_SHIPPING if inside_dhaka else OUTSIDE_SHIPPING
+            coupon_code, coupon_discount = '', Decimal('0')
+            if coupons and rng.random() < COUPON_SHARE:
+                coupon_id, coupon_code, discount_type, value = rng.choice(coupons)
+                if discount_type == 'percentage':
+                    coupon_discount = (subtotal * value / 100).quantize(Decimal('0.01'))
+                else:
+                    coupon_discount = min(value, subtotal)
+                writer.add(CouponUsage(
+                    coupon_id=coupon_id, order_id=f'MB{100000 + pk}', guest_email=customer['email'],
+                    guest_phone=customer['phone'], used_at=created_at,
+                ))
+
+            status = _weighted(rng, ORDER_STATUSES)
+            payment_method = _weighted(rng, PAYMENT_METHODS)
+            writer.add(Order(
+                id=pk,
+                order_number=f'MB{100000 + pk}',
+                is_guest_order=True,
+                guest_email=customer['email'],
+                customer_email=customer['email'],
+                customer_phone=customer['phone'],
+                status=status,
+                payment_status='cod_confirmed' if status == 'delivered' else ('refunded' if status == 'refunded' else 'pending'),
+                payment_method=payment_method,
+                bkash_transaction_id=f'BK{pk:010d}' if payment_method == 'bkash' else '',
+                nagad_transaction_id=f'NG{pk:010d}' if payment_method == 'nagad' else '',
+                subtotal=subtotal,
+                shipping_cost=shipping_cost,
+                discount_amount=coupon_discount,
+                coupon_code=coupon_code,
+                coupon_discount=coupon_discount,
+                total_amount=subtotal + shipping_cost - coupon_discount,
+                cost_price=cost,
+                customer_ip=f'103.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}',
+                created_at=created_at,
+                confirmed_at=created_at + timedelta(hours=2) if status not in ('pending', 'cancelled') else None,
+                delivered_at=created_at + timedelta(days=2 if inside_dhaka else 4) if status == 'delivered' else None,
+            ))
+            writer.add(ShippingAddress(
+                order_id=pk, first_name=customer['first_name'], last_name=customer['last_name'],
+                address_line_1=f'House {rng.randint(1, 200)}, Road {rng.randint(1, 30)}',
+                city='Dhaka' if inside_dhaka else rng.choice(CITIES_OUTSIDE_DHAKA),
+                state='Dhaka' if inside_dhaka else 'Outside Dhaka', postal_code=str(rng.randint(1000, 9499)),
+                country='Bangladesh', phone=customer['phone'], email=customer['email'], created_at=created_at,
+            ))
+            writer.add(OrderStatusHistory(
+                order_id=pk, old_status='', new_status='pending', status='pending', title='Order Placed',
+                is_system_generated=True, created_at=created_at,
+            ))
+            if status != 'pending':
+                writer.add(OrderStatusHistory(
+                    order_id=pk, old_status='pending', new_status=status, title=status.replace('_', ' ').title(),
+                    created_at=created_at + timedelta(hours=rng.randint(1, 72)),
+                ))
+
+        with explicit_timestamps(Order, OrderItem, ShippingAddress, OrderStatusHistory, CouponUsage):
+            writer.flush()
+        return writer.written
+
+    def generate_reviews(self, start, count, seed):
+        from products.models import Review
+
+        rng = random.Random(seed)
+        products = self.catalog['products']
+        writer = BatchWriter([Review], self.batch_size)
+        for pk in range(start, start + count):
+            product = rng.choice(products)
+            rating = _weighted(rng, RATINGS)
+            writer.add(Review(
+                id=pk, product_id=product[0],
+                guest_name=f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+                guest_email=f'reviewer{pk}@example.com',
+                rating=rating,
+                title='Great product' if rating >= 4 else ('Okay' if rating == 3 else 'Not as expected'),
+                comment=f'{product[1]} - rated {rating} out of 5.',
+                is_approved=rng.random() < 0.85,
+                is_verified_purchase=rng.random() < 0.6,
+                created_at=self.created_at(rng),
+            ))
+        with explicit_timestamps(Review):
+            writer.flush()
+        return writer.written
+
+    def generate_stock_activities(self, start, count, seed, user_id, content_types):
+        from inventory.models import StockActivity
+
+        rng = random.Random(seed)
+        products = self.catalog['products']
+        writer = BatchWriter([StockActivity], self.batch_size)
+        for pk in range(start, start + count):
+            product_id, name, sku, price, cost_price, variants = rng.choice(products)
+            variant = rng.choice(variants) if variants and rng.random() < 0.7 else None
+            activity_type = _weighted(rng, STOCK_ACTIVITIES)
+            before = rng.randint(0, 200)
+            if activity_type in ('stock_in', 'returned', 'initial'):
+                changed = rng.randint(1, 50)
+            elif activity_type == 'adjustment':
+                changed = rng.randint(-10, 10) or 1
+            else:
+                changed = -min(before, rng.randint(1, 5))
+            activity_date = self.created_at(rng)
+            writer.add(StockActivity(
+                id=pk,
+                activity_type=activity_type,
+                content_type_id=content_types['variant' if variant else 'product'],
+                object_id=variant[0] if variant else product_id,
+                quantity_before=before,
+                quantity_changed=changed,
+                quantity_after=before + changed,
+                unit_cost=cost_price,
+                total_cost=cost_price * abs(changed),
+                reason=activity_type.replace('_', ' ').capitalize(),
+                reference_number=f'GEN-{pk}',
+                created_by_id=user_id,
+                activity_date=activity_date,
+                created_at=activity_date,
+            ))
+        with explicit_timestamps(StockActivity):
+            writer.flush()
+        return writer.written
+
+    def generate_incomplete_orders(self, start, count, seed, customers=50000):
+        from incomplete_orders.models import IncompleteOrder, IncompleteOrderItem, IncompleteShippingAddress
+
+        rng = random.Random(seed)
+        products = self.catalog['products']
+        writer = BatchWriter([IncompleteOrder, IncompleteOrderItem, IncompleteShippingAddress], self.batch_size)
+        for pk in range(start, start + count):
+            created_at = self.created_at(rng)
+            customer = self.customer(rng, customers)
+            status = _weighted(rng, INCOMPLETE_STATUSES)
+            subtotal = Decimal('0')
+            for product_id, name, sku, price, cost_price, variants in rng.sample(
+                products, min(len(products), rng.randint(1, 3))
+            ):
+                variant = rng.choice(variants) if variants else None
+                unit_price = (variant[2] or price) if variant else price
+                subtotal += unit_price
+                writer.add(IncompleteOrderItem(
+                    incomplete_order_id=pk, product_id=product_id, variant_id=variant[0] if variant else None,
+                    product_name=name, product_sku=sku, variant_name=variant[1] if variant else '',
+                    quantity=1, unit_price=unit_price, added_at=created_at,
+                ))
+            shipping_cost = DHAKA_SHIPPING if rng.random() < DHAKA_SHARE else OUTSIDE_SHIPPING
+            has_contact = rng.random() < 0.7
+            attempts = rng.choices((0, 1, 2, 3), (50, 30, 15, 5))[0] if status == 'abandoned' and has_contact else 0
+            writer.add(IncompleteOrder(
+                id=pk,
+                incomplete_order_id=f'INC-G{pk:08d}',
+                is_guest_order=True,
+                guest_email=customer['email'] if has_contact else '',
+                customer_email=customer['email'] if has_contact else '',
+                customer_phone=customer['phone'],
+                status=status,
+                subtotal=subtotal,
+                shipping_cost=shipping_cost,
+                total_amount=subtotal + shipping_cost,
+                recovery_attempts=attempts,
+                last_recovery_attempt=created_at + timedelta(hours=attempts * 24) if attempts else None,
+                created_at=created_at,
+                abandoned_at=created_at + timedelta(minutes=30) if status == 'abandoned' else None,
+                expires_at=created_at + timedelta(days=30),
+                converted_at=created_at + timedelta(hours=6) if status == 'converted' else None,
+            ))
+            writer.add(IncompleteShippingAddress(
+                incomplete_order_id=pk, first_name=customer['first_name'], last_name=customer['last_name'],
+                phone=customer['phone'], city='Dhaka' if shipping_cost == DHAKA_SHIPPING else rng.choice(CITIES_OUTSIDE_DHAKA),
+                country='Bangladesh', created_at=created_at,
+            ))
+        with explicit_timestamps(IncompleteOrder, IncompleteOrderItem, IncompleteShippingAddress):
+            writer.flush()
+        return writer.written
+
+    # Orchestration -----------------------------------------------------
+    def plan(self, orders=0, reviews=0, stock_activities=0, incomplete_orders=0, workers=1):
+        """Reserve id ranges and split them into ``(kind, start, count, seed)`` shards"""
+        from incomplete_orders.models import IncompleteOrder
+        from inventory.models import StockActivity
+        from orders.models import Order
+        from products.models import Review
+
+        tasks = []
+        for kind, model, count in (
+            ('orders', Order, orders),
+            ('reviews', Review, reviews),
+            ('stock_activities', StockActivity, stock_activities),
+            ('incomplete_orders', IncompleteOrder, incomplete_orders),
+        ):
+            for start, shard_count in _split(_next_id(model), count, workers):
+                tasks.append((kind, start, shard_count, self.seed * 1000 + len(tasks)))
+        return tasks
+
+    def run_task(self, task, options):
+        kind, start, count, seed = task
+        with muted_signals(), transaction.atomic():
+            if kind == 'orders':
+                return self.generate_orders(start, count, seed, options['items_per_order'], options['customers'])
+            if kind == 'reviews':
+                return self.generate_reviews(start, count, seed)
+            if kind == 'stock_activities':
+                return self.generate_stock_activities(start, count, seed, options['user_id'], options['content_types'])
+            return self.generate_incomplete_orders(start, count, seed, options['customers'])
+
+    def generate(self, products=0, orders=0, items_per_order=4, reviews=0, stock_activities=0,
+                 incomplete_orders=0, customers=50000, workers=1, clear_cache=True):
+        """
+        Generate the requested volumes, returns the rows written per model.
+
+        With ``workers`` > 1 the shards run in forked processes; SQLite
+        databases take one writer at a time and always run in process.
+        """
+        from django.contrib.contenttypes.models import ContentType
+        from products.models import Product, ProductVariant
+
+        totals = {}
+
+        def add(written):
+            for label, rows in written.items():
+                totals[label] = totals.get(label, 0) + rows
+
+        with muted_signals(), transaction.atomic():
+            add(self.generate_catalog(products, coupons=20 if products else 0))
+        self.load_catalog()
+        if not self.catalog['products'] and (orders or reviews or stock_activities or incomplete_orders):
+            raise ValueError('No active products to generate orders for, generate a catalog first')
+
+        options = {'items_per_order': items_per_order, 'customers': customers}
+        if stock_activities:
+            options['user_id'] = self.get_generator_user().pk
+            options['content_types'] = {
+                'product': ContentType.objects.get_for_model(Product).pk,
+                'variant': ContentType.objects.get_for_model(ProductVariant).pk,
+            }
+
+        tasks = self.plan(orders, reviews, stock_activities, incomplete_orders, workers)
+        single_writer = connections['default'].vendor == 'sqlite'
+        if workers > 1 and single_writer:
+            self.log('SQLite takes one writer at a time, running the shards in process')
+        if workers > 1 and len(tasks) > 1 and not single_writer:
+            global _worker_generator
+            self.log(f'Running {len(tasks)} shards in {workers} processes...')
+            # Forked children inherit the generator but must open their own database connections
+            _worker_generator = self
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            with context.Pool(workers) as pool:
+                for written in pool.starmap(_run_task, [(task, options) for task in tasks]):
+                    add(written)
+        else:
+            for task in tasks:
+                self.log(f'Generating {task[2]} {task[0].replace("_", " ")} from id {task[1]}...')
+                add(self.run_task(task, options))
+
+        if clear_cache:
+            from utils.cache_utils import get_cache_manager
+            get_cache_manager().clear_all_caches()
+        return totals
+
+
+_worker_generator = None
+
+
+def _run_task(task, options):
+    connections.close_all()
+    return _worker_generator.run_task(task, options)
@@ -0,0 +1,91 @@
+"""
+Versioned template fragment cache.
+
+Rendered fragments (product cards, navbar category lists, ...) are cached
+under a key built from the fragment name and the current version of every
+object the fragment shows, so the same card HTML is reused by every page
+and user until one of those objects changes.
+
+A version is kept per object (``products.product:12``), per model
+(``products.category``, for fragments listing a whole model) and for the
+site settings (``site``). ``utils.signals``
+bumps them when the objects or the rows rendered with them (images,
+variants, reviews) are saved or deleted, and bulk ``update()`` calls bump
+them with ``bump_fragment_versions``; stale fragments are never read
+again and expire after ``CACHE_TIMEOUTS['fragments']``. Versions live in the
+``versions`` cache when one is configured (the database cache, whose culling
+would otherwise drop them as the catalog grows) and in the default cache
+otherwise.
+
+Templates use the ``{% cached_fragment %}`` tag of ``frontend.templatetags.fragment_cache``.
+"""
+import hashlib
+import time
+
+from .cache_utils import get_cache_manager
+
+VERSION_KEY = 'fragment_version:{label}'
+FRAGMENT_KEY = 'fragment:{name}:{digest}'
+
+
+def version_label(obj, object_id=None):
+    """``app.model:<pk>`` for an instance or model with an id, ``app.model`` for a model"""
+    if isinstance(obj, str):
+        label = obj
+    else:
+        label = obj._meta.label_lower
+        if object_id is None and not isinstance(obj, type):
+            object_id = obj.pk
+    return label if object_id is None else f'{label}:{object_id}'
+
+
+def bump_fragment_version(obj, object_id=None):
+    """Invalidate the fragments rendered with an object (or with a whole model)"""
+    get_cache_manager().version_cache.set(VERSION_KEY.format(label=version_label(obj, object_id)), time.time_ns(), None)
+
+
+def bump_fragment_versions(model, object_ids):
+    """
+    Invalidate the fragments rendered with the objects of a bulk ``update()``,
+    which sends no signals, and with the whole model
+    """
+    version = time.time_ns()
+    get_cache_manager().version_cache.set_many({
+        VERSION_KEY.format(label=version_label(model, object_id)): version
+        for object_id in set(object_ids)
+    }, None)
+    bump_fragment_version(model)
+
+
+def get_fragment_versions(labels):
+    """Current version per label, initializing missing ones, in one cache round trip"""
+    cache = get_cache_manager().version_cache
+    keys = {VERSION_KEY.format(label=label): label for label in labels}
+    found = cache.get_many(keys)
+    versions = {}
+    for key, label in keys.items():
+        version = found.get(key)
+        if version is None:
+            cache.add(key, time.time_ns(), None)
+            version = cache.get(key, 0)
+        versions[label] = version
+    return versions
+
+
+def fragment_key(name, objects, vary_on=()):
+    labels = [version_label(obj) for obj in objects if obj is not None]
+    versions = get_fragment_versions(labels)
+    parts = [f'{label}={versions[label]}' for label in labels] + [str(value) for value in vary_on]
+    digest = hashlib.md5(':'.join(parts).encode()).hexdigest()
+    return FRAGMENT_KEY.format(name=name, digest=digest)
+
+
+def render_fragment(name, objects, render, vary_on=()):
+    """The cached HTML of a fragment, rendered with ``render()`` on a miss"""
+    cache_manager = get_cache_manager()
+    key = fragment_key(name, objects, vary_on)
+    html = cache_manager.product_cache.get(key)
+    if html is None:
+        html = render()
+        cache_manager.product_cache.set(key, html, cache_manager.get_timeout('fragments'))
+    return html
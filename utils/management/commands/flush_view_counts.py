@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+from utils.view_counters import flush_view_counts
+
+
+class Command(BaseCommand):
+    help = 'Write buffered product and page view counts to the database'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running and flush every --interval seconds'
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=60,
+            help='Seconds between flushes with --loop (default: 60)'
+        )
+    
+    def handle(self, *args, **options):
+        while True:
+            written = flush_view_counts()
+            self.stdout.write(
+                self.style.SUCCESS(f"Flushed {written['product']} product views and {written['page']} page views")
+            )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.data_generator import DataGenerator
+
+
+class Command(BaseCommand):
+    help = 'Generate high-volume synthetic store data for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=0, help='Products to add to the catalog')
+        parser.add_argument('--orders', type=int, default=0, help='Orders to generate')
+        parser.add_argument('--items-per-order', type=int, default=4, help='Average items per order')
+        parser.add_argument('--reviews', type=int, default=0, help='Reviews to generate')
+        parser.add_argument('--stock-activities', type=int, default=0, help='Stock activities to generate')
+        parser.add_argument('--incomplete-orders', type=int, default=0, help='Incomplete orders to generate')
+        parser.add_argument('--customers', type=int, default=50000, help='Size of the customer pool')
+        parser.add_argument('--days', type=int, default=365, help='Spread the data over this many past days')
+        parser.add_argument('--workers', type=int, default=1, help='Processes writing order, review, stock and incomplete order shards (not with SQLite)')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows per bulk insert')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed')
+        parser.add_argument('--keep-cache', action='store_true', help="Don't clear the caches afterwards")
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--workers and --batch-size must be positive')
+
+        generator = DataGenerator(
+            seed=options['seed'], days=options['days'], batch_size=options['batch_size'], stdout=self.stdout
+        )
+        try:
+            totals = generator.generate(
+                products=options['products'],
+                orders=options['orders'],
+                items_per_order=options['items_per_order'],
+                reviews=options['reviews'],
+                stock_activities=options['stock_activities'],
+                incomplete_orders=options['incomplete_orders'],
+                customers=options['customers'],
+                workers=options['workers'],
+                clear_cache=not options['keep_cache'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        for label, rows in sorted(totals.items()):
+            if rows:
+                self.stdout.write(f'{label:<40} {rows:>10}')
+        self.stdout.write(self.style.SUCCESS('Data generation completed'))
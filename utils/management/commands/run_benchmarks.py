@@ -0,0 +1,90 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from utils import benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Benchmark storefront and dashboard endpoints against a seeded test database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', choices=sorted(benchmarks.SIZES), default='small',
+                            help='Dataset size preset (default: small)')
+        parser.add_argument('--products', type=int, help='Override the number of products')
+        parser.add_argument('--orders', type=int, help='Override the number of orders')
+        parser.add_argument('--items', type=int, help='Override the approximate number of order items')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for data and request order')
+        parser.add_argument('--workers', type=int, default=1, help='Processes used to seed the data')
+        parser.add_argument('--iterations', type=int, default=20, help='Timed requests per scenario')
+        parser.add_argument('--warmup', type=int, default=2, help='Untimed requests per scenario')
+        parser.add_argument('--scenario', action='append', dest='scenarios',
+                            help='Scenario to run, repeatable (default: all)')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Keep the benchmark database and reuse its data on the next run')
+        parser.add_argument('--output', help='Results file (default: benchmarks/results/<date>-<db>-<commit>.json)')
+        parser.add_argument('--compare', help='Earlier results file to compare against')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Median latency increase counted as a regression (default: 0.2 = 20%%)')
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help='Exit with an error when a regression is found')
+
+    def handle(self, *args, **options):
+        scenarios = benchmarks.get_scenarios()
+        for name in options['scenarios'] or []:
+            if name not in scenarios:
+                raise CommandError(f"Unknown scenario '{name}', choose from: {', '.join(scenarios)}")
+
+        dataset = dict(benchmarks.SIZES[options['size']])
+        for key in ('products', 'orders', 'items'):
+            if options[key] is not None:
+                dataset[key] = options[key]
+        dataset['seed'] = options['seed']
+
+        baseline = benchmarks.load_results(options['compare']) if options['compare'] else None
+
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=options['verbosity'], keepdb=options['keepdb'])
+        try:
+            from products.models import Product
+
+            if Product.objects.exists():
+                self.stdout.write('Reusing the data of the kept benchmark database')
+            else:
+                created = benchmarks.seed_store(
+                    dataset['products'], dataset['orders'], dataset['items'], dataset['seed'],
+                    workers=options['workers'], stdout=self.stdout,
+                )
+                self.stdout.write(self.style.SUCCESS(f'Seeded {created}'))
+
+            results = benchmarks.run_scenarios(
+                options['scenarios'], options['iterations'], options['warmup'], options['seed'], stdout=self.stdout
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=options['verbosity'], keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        report = benchmarks.build_report(results, dataset)
+        path = benchmarks.save_results(report, options['output'])
+        self.stdout.write(self.style.SUCCESS(f'Results saved to {path}'))
+
+        if baseline:
+            self.report_comparison(baseline, report, options['threshold'], options['fail_on_regression'])
+
+    def report_comparison(self, baseline, report, threshold, fail_on_regression):
+        if baseline.get('database') != report['database'] or baseline.get('dataset') != report['dataset']:
+            self.stdout.write(self.style.WARNING('Baseline was recorded with a different database or dataset'))
+
+        self.stdout.write(f"Compared with {baseline.get('commit', '')[:8] or 'baseline'}:")
+        rows = benchmarks.compare_results(baseline, report, threshold)
+        for row in rows:
+            line = (
+                f"{row['scenario']:<22} {row['median_before_ms']:>9.2f} -> {row['median_after_ms']:>9.2f} ms "
+                f"({row['change']:+.0%})  queries {row['queries_before']} -> {row['queries_after']}"
+            )
+            self.stdout.write(self.style.ERROR(line) if row['regression'] else line)
+
+        regressions = [row['scenario'] for row in rows if row['regression']]
+        if regressions and fail_on_regression:
+            raise CommandError(f"Regressions in: {', '.join(regressions)}")
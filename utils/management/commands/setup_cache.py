@@ -15,6 +15,7 @@ class Command(BaseCommand):
                 call_command('createcachetable', 'cache_table')
                 call_command('createcachetable', 'session_cache_table') 
                 call_command('createcachetable', 'product_cache_table')
+                call_command('createcachetable', 'version_cache_table')
                 
                 self.stdout.write(
                     self.style.SUCCESS('Successfully created cache tables')
@@ -0,0 +1,33 @@
+"""
+Request profiling middleware
+"""
+from . import profiling
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a sample of requests (see ``utils.profiling``) and records
+    them under the method and URL route of the endpoint.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not profiling.should_sample():
+            return self.get_response(request)
+
+        with profiling.profile_request() as profile:
+            response = self.get_response(request)
+
+        profiling.record(self.endpoint_name(request), profile, response.status_code)
+        return response
+
+    @staticmethod
+    def endpoint_name(request):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            name = 'unresolved'
+        else:
+            name = f"/{match.route}" if match.route else match.view_name
+        return f"{request.method} {name}"
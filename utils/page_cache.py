@@ -0,0 +1,113 @@
+"""
+Anonymous full-page cache.
+
+Pages of anonymous visitors without a cart are the same for everyone except
+for the CSRF token and the cart badge. ``cache_anonymous_page`` renders such
+a page once with placeholder holes in their place (see the
+``page_cache_holes`` context processor), stores the HTML and fills the holes
+for every request it serves: a fresh CSRF token for the visitor's cookie and
+the visitor's cart count.
+
+Requests of signed in users or of sessions holding a guest cart always run
+the view. Pages are keyed on the path and the product, category and site
+versions of ``utils.fragment_cache``, so the invalidation in
+``utils.signals`` purges them, stale entries expire after
+``CACHE_TIMEOUTS['anonymous_pages']``.
+"""
+import hashlib
+from functools import wraps
+
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.functional import SimpleLazyObject
+
+from .cache_utils import get_cache_manager
+from .conditional import is_anonymous
+from .fragment_cache import get_fragment_versions
+
+CATALOG_LABELS = ('products.product', 'products.category', 'site')
+PAGE_KEY = 'page_cache:{name}:{digest}'
+
+# Plain ASCII so escaping in attributes and scripts leaves them intact
+CSRF_HOLE = 'PAGECACHEHOLECSRFTOKEN'
+CART_HOLE = 'PAGECACHEHOLECARTCOUNT'
+
+
+def get_cart_count(request):
+    from cart.storage import GuestCart
+    from cart.totals import get_cart_id, get_cart_summary
+
+    if not request.user.is_authenticated:
+        return GuestCart(request).total_items
+    cart_id = get_cart_id(request)
+    return get_cart_summary(cart_id)['total_items'] if cart_id else 0
+
+
+def page_cache_holes(request):
+    """Context processor: placeholders while a cached page renders, the cart count otherwise"""
+    if getattr(request, 'page_cache_holes', False):
+        return {'csrf_token': CSRF_HOLE, 'cart_count': CART_HOLE}
+    return {'cart_count': SimpleLazyObject(lambda: get_cart_count(request))}
+
+
+def versioned_key(name, *parts, labels=CATALOG_LABELS):
+    """Cache key of ``name`` and ``parts`` for the current catalog versions"""
+    versions = get_fragment_versions(labels)
+    key_data = [str(part) for part in parts] + [f'{label}={versions[label]}' for label in labels]
+    return PAGE_KEY.format(name=name, digest=hashlib.md5(':'.join(key_data).encode()).hexdigest())
+
+
+def is_cacheable_request(request):
+    from cart.storage import GUEST_CART_SESSION_KEY
+
+    return (
+        request.method in ('GET', 'HEAD')
+        and is_anonymous(request)
+        and GUEST_CART_SESSION_KEY not in request.session
+    )
+
+
+def fill_holes(content, request):
+    if CSRF_HOLE in content:
+        content = content.replace(CSRF_HOLE, get_token(request))
+    if CART_HOLE in content:
+        content = content.replace(CART_HOLE, str(get_cart_count(request)))
+    return content
+
+
+def cache_anonymous_page(timeout=None, labels=CATALOG_LABELS):
+    """Serve the view from the anonymous page cache when the request allows it"""
+    def decorator(view):
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            if not is_cacheable_request(request):
+                return view(request, *args, **kwargs)
+
+            cache_manager = get_cache_manager()
+            key = versioned_key(view.__name__, request.get_host(), request.get_full_path(), labels=labels)
+            cached = cache_manager.default_cache.get(key)
+            if cached is not None:
+                content, content_type = cached
+                return HttpResponse(fill_holes(content, request), content_type=content_type)
+
+            token_used = request.META.get('CSRF_COOKIE_NEEDS_UPDATE', False)
+            request.page_cache_holes = True
+            try:
+                response = view(request, *args, **kwargs)
+            finally:
+                request.page_cache_holes = False
+            if response.streaming:
+                return response
+
+            content = response.content.decode(response.charset)
+            # A real token fetched during rendering would be cached for everyone
+            leaked_token = not token_used and request.META.get('CSRF_COOKIE_NEEDS_UPDATE', False)
+            if response.status_code == 200 and not response.cookies and not leaked_token:
+                cache_manager.default_cache.set(
+                    key, (content, response['Content-Type']),
+                    timeout if timeout is not None else cache_manager.get_timeout('anonymous_pages'),
+                )
+            response.content = fill_holes(content, request)
+            return response
+        return inner
+    return decorator
@@ -0,0 +1,379 @@
+# Keyset (cursor) pagination for large listings
+"""
+Keyset pagination avoids the ``COUNT(*)`` and ``OFFSET`` scans of page-number
+pagination: the next page is fetched with a ``WHERE (created_at, id) < (...)``
+style condition built from the last row of the current page, so deep pages
+cost the same as the first one.
+
+The ordering is taken from the queryset (e.g. ``-created_at``, ``price``,
+``name``) and ``id`` is always appended as a tie-breaker. Only concrete,
+non-nullable model fields can be used as keys; querysets ordered by
+annotations (ratings) keep using page-number pagination.
+
+Usage in HTML views::
+
+    page = paginate(request, products_list, per_page=12)
+
+Usage in DRF views::
+
+    pagination_class = HybridPagination
+"""
+import base64
+import hashlib
+import json
+from collections import OrderedDict
+from typing import List, Optional
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from utils.cache_utils import get_cache_manager
+
+
+CURSOR_PARAM = 'cursor'
+MODE_PARAM = 'pagination'
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor cannot be decoded or does not match the ordering"""
+
+
+def keyset_mode_requested(params) -> bool:
+    """Whether a request asks for keyset pagination (or the site defaults to it)"""
+    if params.get(CURSOR_PARAM):
+        return True
+    mode = params.get(MODE_PARAM) or getattr(settings, 'PAGINATION_MODE', 'page')
+    return mode == 'keyset'
+
+
+def get_keyset_ordering(queryset) -> Optional[List[str]]:
+    """
+    Return the keyset ordering for a queryset, or ``None`` if it cannot be
+    paginated by keys (ordered by an annotation, expression or nullable field).
+    """
+    ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+    model = queryset.model
+    keys = []
+
+    for item in ordering:
+        if not isinstance(item, str):
+            return None
+        name = item.lstrip('-')
+        if name == 'pk':
+            name = model._meta.pk.name
+        if '__' in name or name in queryset.query.annotations:
+            return None
+        try:
+            field = model._meta.get_field(name)
+        except Exception:
+            return None
+        if not field.concrete or field.null:
+            return None
+        keys.append(('-' if item.startswith('-') else '') + field.attname)
+
+    pk = model._meta.pk.attname
+    if not any(key.lstrip('-') == pk for key in keys):
+        # Unique tie-breaker in the direction of the last key
+        descending = keys[-1].startswith('-') if keys else True
+        keys.append(('-' if descending else '') + pk)
+    return keys
+
+
+def approximate_count(queryset, timeout: int = 300) -> int:
+    """
+    Cheap total count for a listing.
+
+    Unfiltered tables use the database's own row estimate; filtered
+    querysets use an exact ``COUNT(*)`` that is cached for ``timeout``
+    seconds, so repeated pages of the same listing don't recount.
+    """
+    if not queryset.query.where:
+        estimate = _table_row_estimate(queryset)
+        if estimate is not None:
+            return estimate
+
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    digest = hashlib.md5(f"{sql}|{params}".encode()).hexdigest()
+    cache_key = f'approx_count_{digest}'
+    cache = get_cache_manager().default_cache
+
+    count = cache.get(cache_key)
+    if count is None:
+        count = queryset.order_by().count()
+        cache.set(cache_key, count, timeout)
+    return count
+
+
+def _table_row_estimate(queryset) -> Optional[int]:
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute(
+                "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+                [table]
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class KeysetPage:
+    """
+    One page of keyset-paginated results.
+
+    Iterates like a Django ``Page``; instead of page numbers it exposes
+    ``next_cursor`` / ``previous_cursor`` tokens.
+    """
+    is_keyset = True
+
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def count(self):
+        return self.paginator.count
+
+
+class KeysetPaginator:
+    """Paginates a queryset by its ordering keys instead of offsets"""
+
+    def __init__(self, queryset, per_page, ordering=None, with_count=False):
+        self.ordering = ordering or get_keyset_ordering(queryset)
+        if not self.ordering:
+            raise ValueError('Queryset ordering cannot be used for keyset pagination')
+        self.queryset = queryset.order_by(*self.ordering)
+        self.per_page = int(per_page)
+        self.with_count = with_count
+
+    @cached_property
+    def count(self):
+        """Approximate number of rows, or ``None`` when counting is disabled"""
+        if not self.with_count:
+            return None
+        return approximate_count(self.queryset)
+
+    # ------------------------------------------------------------------
+    # Cursor encoding
+    # ------------------------------------------------------------------
+    def _fields(self):
+        return [self.queryset.model._meta.get_field(key.lstrip('-')) for key in self.ordering]
+
+    def encode_cursor(self, obj, direction):
+        values = [
+            field.value_to_string(obj) for field in self._fields()
+        ]
+        payload = json.dumps({'d': direction, 'k': self.ordering, 'v': values}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            direction, keys, raw_values = payload['d'], payload['k'], payload['v']
+        except (ValueError, KeyError, TypeError):
+            raise InvalidCursor('Invalid cursor')
+
+        if keys != self.ordering or direction not in ('next', 'prev') or len(raw_values) != len(keys):
+            raise InvalidCursor('Cursor does not match the current ordering')
+
+        try:
+            values = [field.to_python(value) for field, value in zip(self._fields(), raw_values)]
+        except Exception:
+            raise InvalidCursor('Invalid cursor')
+        return direction, values
+
+    # ------------------------------------------------------------------
+    # Querying
+    # ------------------------------------------------------------------
+    def _seek_filter(self, values, reverse=False):
+        """
+        Build ``(k1, k2, ...) > (v1, v2, ...)`` respecting each key's
+        direction, as an OR of equality prefixes.
+        """
+        condition = Q()
+        for index, key in enumerate(self.ordering):
+            descending = key.startswith('-') != reverse
+            name = key.lstrip('-')
+            clause = Q(**{f"{name}__{'lt' if descending else 'gt'}": values[index]})
+            for prev_key, prev_value in zip(self.ordering[:index], values[:index]):
+                clause &= Q(**{prev_key.lstrip('-'): prev_value})
+            condition |= clause
+        return condition
+
+    def page(self, cursor=None):
+        """Return the page that follows (or precedes) ``cursor``"""
+        queryset = self.queryset
+        direction = 'next'
+
+        if cursor:
+            direction, values = self.decode_cursor(cursor)
+            queryset = queryset.filter(self._seek_filter(values, reverse=direction == 'prev'))
+
+        if direction == 'prev':
+            reversed_ordering = [key[1:] if key.startswith('-') else f'-{key}' for key in self.ordering]
+            queryset = queryset.order_by(*reversed_ordering)
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if direction == 'prev':
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, bool(cursor)
+
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = self.encode_cursor(rows[-1], 'next')
+        if rows and has_previous:
+            previous_cursor = self.encode_cursor(rows[0], 'prev')
+
+        return KeysetPage(rows, self, next_cursor, previous_cursor)
+
+
+def paginate(request, queryset, per_page, with_count=None):
+    """
+    Paginate an HTML listing.
+
+    Uses keyset pagination when requested (``?pagination=keyset``, a
+    ``cursor`` param, or ``settings.PAGINATION_MODE = 'keyset'``) and the
+    queryset ordering allows it; otherwise falls back to Django's Paginator.
+    """
+    if keyset_mode_requested(request.GET) and get_keyset_ordering(queryset):
+        if with_count is None:
+            with_count = getattr(settings, 'PAGINATION_APPROXIMATE_COUNT', False)
+        paginator = KeysetPaginator(queryset, per_page, with_count=with_count)
+        try:
+            return paginator.page(request.GET.get(CURSOR_PARAM))
+        except InvalidCursor:
+            return paginator.page()
+
+    paginator = Paginator(queryset, per_page)
+    return paginator.get_page(request.GET.get('page'))
+
+
+class KeysetPagination(BasePagination):
+    """DRF keyset pagination based on the view's (filtered) queryset ordering"""
+    page_size = api_settings.PAGE_SIZE or 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    count_query_param = 'count'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        with_count = request.query_params.get(self.count_query_param) == 'approximate' or getattr(
+            settings, 'PAGINATION_APPROXIMATE_COUNT', False
+        )
+        self.paginator = KeysetPaginator(queryset, self.get_page_size(request), with_count=with_count)
+        try:
+            self.page = self.paginator.page(request.query_params.get(CURSOR_PARAM))
+        except InvalidCursor as exc:
+            raise NotFound(str(exc))
+        return list(self.page)
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, 'page')
+        return replace_query_param(url, CURSOR_PARAM, cursor)
+
+    def get_next_link(self):
+        return self._link(self.page.next_cursor)
+
+    def get_previous_link(self):
+        return self._link(self.page.previous_cursor)
+
+    def get_paginated_response(self, data):
+        payload = OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+        ])
+        if self.paginator.count is not None:
+            payload['count'] = self.paginator.count
+            payload['count_is_approximate'] = True
+        payload['results'] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {'type': 'integer'},
+                'count_is_approximate': {'type': 'boolean'},
+                'results': schema,
+            },
+        }
+
+
+class HybridPagination(BasePagination):
+    """
+    Page-number pagination by default, keyset pagination on request.
+
+    Clients opt in with ``?pagination=keyset`` and then follow the
+    ``next``/``previous`` cursor links. Querysets whose ordering cannot be
+    keyed (e.g. by rating) always use page numbers.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if keyset_mode_requested(request.query_params) and get_keyset_ordering(queryset):
+            self.delegate = KeysetPagination()
+        else:
+            self.delegate = PageNumberPagination()
+        return self.delegate.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.delegate.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return PageNumberPagination().get_paginated_response_schema(schema)
+
+    def get_results(self, data):
+        return data['results']
@@ -0,0 +1,413 @@
+"""
+Per-request performance profiler.
+
+A sampled fraction of requests (``PROFILING_SAMPLE_RATE``) is profiled by
+``utils.middleware.ProfilingMiddleware``. While a request is profiled:
+
+- every SQL query is timed through a connection ``execute_wrapper`` and its
+  shape (the SQL with literals and ``IN`` lists collapsed) counted; a shape
+  repeated ``PROFILING_N_PLUS_ONE_THRESHOLD`` times or more is flagged as an
+  N+1 pattern
+- cache ``get``/``get_many`` calls are counted as hits and misses
+- outgoing ``requests`` calls are counted and timed
+
+Results are aggregated per endpoint (method and URL route) into latency
+histograms and totals. Every worker process keeps its own totals and writes
+them, at most every ``PROFILING_FLUSH_INTERVAL`` seconds, to a cache entry
+only that worker writes (its slot, numbered with ``incr`` and claimed with ``add``), so
+concurrent flushes never overwrite each other. ``get_stats`` merges the
+entries of all workers for the dashboard API.
+
+Unsampled requests only pay a context variable lookup in the cache and HTTP
+hooks, and no database wrapper is installed for them.
+"""
+import contextvars
+import logging
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.signals import setting_changed
+from django.db import connections
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+STATS_CACHE_KEY = 'profiling_stats:{slot}'
+SLOTS_CACHE_KEY = 'profiling_stats_slots'
+SLOT_OWNER_CACHE_KEY = 'profiling_stats_owner:{slot}'
+EPOCH_CACHE_KEY = 'profiling_stats_epoch'
+# Upper bounds of the latency histogram buckets in milliseconds, the last bucket is open
+LATENCY_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+TOP_SHAPES = 5
+
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*%s\s*,?)+\)', re.IGNORECASE)
+_NUMBER = re.compile(r'\b\d+\b')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_SPACE = re.compile(r'\s+')
+
+_current = contextvars.ContextVar('request_profile', default=None)
+
+
+def get_setting(name, default):
+    return getattr(settings, name, default)
+
+
+def sql_shape(sql):
+    """The query with literals and ``IN`` lists collapsed, identical for N+1 queries"""
+    sql = _STRING.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _NUMBER.sub('?', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+class RequestProfile:
+    """Counters collected while one request is handled"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.shapes = Counter()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.in_cache_call = False  # backends implement get and get_many with each other
+        self.http_count = 0
+        self.http_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Database execute wrapper
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            self.sql_count += 1
+            self.shapes[sql_shape(sql)] += 1
+
+    def n_plus_one(self, threshold):
+        """Query shapes executed at least ``threshold`` times"""
+        return {shape: count for shape, count in self.shapes.items() if count >= threshold}
+
+
+def current_profile():
+    return _current.get()
+
+
+def should_sample():
+    if not get_setting('PROFILING_ENABLED', False):
+        return False
+    rate = get_setting('PROFILING_SAMPLE_RATE', 0.1)
+    return rate >= 1 or random.random() < rate
+
+
+class profile_request:
+    """
+    Context manager profiling the code it wraps.
+
+    The profile is available as the ``as`` target once the block exits.
+    """
+
+    def __init__(self):
+        self.profile = RequestProfile()
+        self._stack = None
+        self._token = None
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self.profile))
+        self._token = _current.set(self.profile)
+        return self.profile
+
+    def __exit__(self, *exc_info):
+        _current.reset(self._token)
+        self._stack.close()
+        self.profile.duration = time.perf_counter() - self.profile.started
+        return False
+
+
+# ----------------------------------------------------------------------
+# Cache and HTTP hooks
+# ----------------------------------------------------------------------
+_MISSING = object()
+_installed = False
+
+
+def _wrap_cache_get(original):
+    def get(self, key, default=None, version=None, **kwargs):
+        profile = _current.get()
+        if profile is None or profile.in_cache_call:
+            return original(self, key, default, version, **kwargs)
+        profile.in_cache_call = True
+        try:
+            value = original(self, key, _MISSING, version, **kwargs)
+        finally:
+            profile.in_cache_call = False
+        if value is _MISSING:
+            profile.cache_misses += 1
+            return default
+        profile.cache_hits += 1
+        return value
+    get._profiled = True
+    return get
+
+
+def _wrap_cache_get_many(original):
+    def get_many(self, keys, version=None, **kwargs):
+        profile = _current.get()
+        if profile is None or profile.in_cache_call:
+            return original(self, keys, version, **kwargs)
+        keys = list(keys)
+        profile.in_cache_call = True
+        try:
+            result = original(self, keys, version, **kwargs)
+        finally:
+            profile.in_cache_call = False
+        profile.cache_hits += len(result)
+        profile.cache_misses += len(keys) - len(result)
+        return result
+    get_many._profiled = True
+    return get_many
+
+
+def _wrap_http_send(original):
+    def send(self, request, **kwargs):
+        profile = _current.get()
+        if profile is None:
+            return original(self, request, **kwargs)
+        started = time.perf_counter()
+        try:
+            return original(self, request, **kwargs)
+        finally:
+            profile.http_time += time.perf_counter() - started
+            profile.http_count += 1
+    send._profiled = True
+    return send
+
+
+def _install_cache_hooks():
+    for alias in settings.CACHES:
+        backend = type(caches[alias])
+        if not getattr(backend.get, '_profiled', False):
+            backend.get = _wrap_cache_get(backend.get)
+        if not getattr(backend.get_many, '_profiled', False):
+            backend.get_many = _wrap_cache_get_many(backend.get_many)
+
+
+@receiver(setting_changed)
+def reinstall_cache_hooks(setting, **kwargs):
+    """Backends configured later are profiled too"""
+    if setting == 'CACHES' and _installed:
+        _install_cache_hooks()
+
+
+def install_hooks():
+    """Patch the configured cache backends and ``requests`` once per process"""
+    global _installed
+    if _installed:
+        return
+    _installed = True
+    _install_cache_hooks()
+
+    try:
+        import requests
+    except ImportError:
+        return
+    if not getattr(requests.Session.send, '_profiled', False):
+        requests.Session.send = _wrap_http_send(requests.Session.send)
+
+
+# ----------------------------------------------------------------------
+# Aggregation
+# ----------------------------------------------------------------------
+def _empty_endpoint():
+    return {
+        'requests': 0,
+        'errors': 0,
+        'total_ms': 0.0,
+        'max_ms': 0.0,
+        'histogram': [0] * (len(LATENCY_BUCKETS) + 1),
+        'sql_count': 0,
+        'sql_ms': 0.0,
+        'cache_hits': 0,
+        'cache_misses': 0,
+        'http_count': 0,
+        'http_ms': 0.0,
+        'n_plus_one_requests': 0,
+        'n_plus_one_shapes': {},
+    }
+
+
+def _bucket(duration_ms):
+    for index, bound in enumerate(LATENCY_BUCKETS):
+        if duration_ms <= bound:
+            return index
+    return len(LATENCY_BUCKETS)
+
+
+def _merge(target, source):
+    for field in ('requests', 'errors', 'total_ms', 'sql_count', 'sql_ms',
+                  'cache_hits', 'cache_misses', 'http_count', 'http_ms', 'n_plus_one_requests'):
+        target[field] += source[field]
+    target['max_ms'] = max(target['max_ms'], source['max_ms'])
+    target['histogram'] = [a + b for a, b in zip(target['histogram'], source['histogram'])]
+    shapes = target['n_plus_one_shapes']
+    for shape, count in source['n_plus_one_shapes'].items():
+        shapes[shape] = max(shapes.get(shape, 0), count)
+    if len(shapes) > TOP_SHAPES:
+        target['n_plus_one_shapes'] = dict(sorted(shapes.items(), key=lambda item: -item[1])[:TOP_SHAPES])
+
+
+_pending = {}
+_pending_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+def record(endpoint, profile, status_code=200):
+    """Add a finished request profile to the endpoint aggregates"""
+    duration_ms = profile.duration * 1000
+    threshold = get_setting('PROFILING_N_PLUS_ONE_THRESHOLD', 5)
+    n_plus_one = profile.n_plus_one(threshold)
+    if n_plus_one:
+        logger.warning(
+            f"Possible N+1 queries on {endpoint}: "
+            + '; '.join(f"{count}x {shape[:200]}" for shape, count in n_plus_one.items())
+        )
+
+    with _pending_lock:
+        stats = _pending.setdefault(endpoint, _empty_endpoint())
+        stats['requests'] += 1
+        stats['errors'] += 1 if status_code >= 500 else 0
+        stats['total_ms'] += duration_ms
+        stats['max_ms'] = max(stats['max_ms'], duration_ms)
+        stats['histogram'][_bucket(duration_ms)] += 1
+        stats['sql_count'] += profile.sql_count
+        stats['sql_ms'] += profile.sql_time * 1000
+        stats['cache_hits'] += profile.cache_hits
+        stats['cache_misses'] += profile.cache_misses
+        stats['http_count'] += profile.http_count
+        stats['http_ms'] += profile.http_time * 1000
+        if n_plus_one:
+            stats['n_plus_one_requests'] += 1
+            _merge(stats, {**_empty_endpoint(), 'n_plus_one_shapes': n_plus_one})
+
+    flush_if_due()
+
+
+def flush_if_due():
+    if _pending and time.monotonic() - _last_flush >= get_setting('PROFILING_FLUSH_INTERVAL', 30):
+        flush()
+
+
+_slot = None
+_totals = None
+_epoch = None
+_flush_lock = threading.Lock()
+
+
+def _new_totals():
+    return {'since': time.time(), 'endpoints': {}}
+
+
+def _worker_slot():
+    global _slot
+    if _slot is None:
+        owner = uuid.uuid4().hex
+        while _slot is None:
+            cache.add(SLOTS_CACHE_KEY, 0, None)
+            try:
+                slot = cache.incr(SLOTS_CACHE_KEY)
+            except ValueError:
+                continue
+            # incr is not atomic on every backend, the owner key settles races
+            if cache.add(SLOT_OWNER_CACHE_KEY.format(slot=slot), owner, None):
+                _slot = slot
+    else:
+        # Keep the slot listed if the counter was evicted
+        cache.add(SLOTS_CACHE_KEY, _slot, None)
+    return _slot
+
+
+def _slot_keys():
+    return [STATS_CACHE_KEY.format(slot=slot) for slot in range(1, (cache.get(SLOTS_CACHE_KEY) or 0) + 1)]
+
+
+def flush():
+    """Add the pending aggregates to the totals of this worker and store them in its cache slot"""
+    global _last_flush, _totals, _epoch
+    with _pending_lock:
+        pending = dict(_pending)
+        _pending.clear()
+        _last_flush = time.monotonic()
+    if not pending:
+        return
+
+    with _flush_lock:
+        # A reset from any worker starts new totals everywhere
+        epoch = cache.get(EPOCH_CACHE_KEY)
+        if _totals is None or epoch != _epoch:
+            _totals, _epoch = _new_totals(), epoch
+        for endpoint, endpoint_stats in pending.items():
+            _merge(_totals['endpoints'].setdefault(endpoint, _empty_endpoint()), endpoint_stats)
+        cache.set(STATS_CACHE_KEY.format(slot=_worker_slot()), _totals, None)
+
+
+def _percentile(histogram, requests, fraction):
+    """Upper bound of the bucket holding the given fraction of requests"""
+    if not requests:
+        return None
+    target = requests * fraction
+    seen = 0
+    for index, count in enumerate(histogram):
+        seen += count
+        if seen >= target:
+            return LATENCY_BUCKETS[index] if index < len(LATENCY_BUCKETS) else None
+    return None
+
+
+def get_stats():
+    """Endpoint aggregates with averages and latency percentiles, slowest first"""
+    flush()
+    stats = {'since': None, 'endpoints': {}}
+    for worker_stats in cache.get_many(_slot_keys()).values():
+        since = worker_stats['since']
+        stats['since'] = since if stats['since'] is None else min(stats['since'], since)
+        for endpoint, endpoint_stats in worker_stats['endpoints'].items():
+            _merge(stats['endpoints'].setdefault(endpoint, _empty_endpoint()), endpoint_stats)
+
+    endpoints = []
+    for endpoint, data in stats['endpoints'].items():
+        requests = data['requests']
+        cache_lookups = data['cache_hits'] + data['cache_misses']
+        endpoints.append({
+            'endpoint': endpoint,
+            **data,
+            'avg_ms': round(data['total_ms'] / requests, 2) if requests else 0,
+            'avg_sql_count': round(data['sql_count'] / requests, 2) if requests else 0,
+            'avg_sql_ms': round(data['sql_ms'] / requests, 2) if requests else 0,
+            'cache_hit_ratio': round(data['cache_hits'] / cache_lookups, 3) if cache_lookups else None,
+            'p50_ms': _percentile(data['histogram'], requests, 0.5),
+            'p95_ms': _percentile(data['histogram'], requests, 0.95),
+            'p99_ms': _percentile(data['histogram'], requests, 0.99),
+        })
+    endpoints.sort(key=lambda item: -item['total_ms'])
+    return {
+        'since': stats['since'],
+        'sample_rate': get_setting('PROFILING_SAMPLE_RATE', 0.1),
+        'latency_buckets_ms': list(LATENCY_BUCKETS),
+        'endpoints': endpoints,
+    }
+
+
+def reset_stats():
+    with _pending_lock:
+        _pending.clear()
+    cache.delete_many(_slot_keys())
+    cache.set(EPOCH_CACHE_KEY, time.time_ns(), None)
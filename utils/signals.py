@@ -1,7 +1,9 @@
 from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
-from products.models import Product, Category
+from products.models import Product, Category, ProductImage, ProductVariant, Review
+from settings.models import CheckoutCustomization, HeroContent, IntegrationSettings, SiteSettings
 from utils.cache_utils import get_cache_manager
+from utils.fragment_cache import bump_fragment_version
 
 
 @receiver(post_save, sender=Product)
@@ -52,4 +54,48 @@ def clear_category_cache_on_delete(sender, instance, **kwargs):
     cache_manager = get_cache_manager()
     cache_manager.invalidate_category_caches(instance.id)
     cache_manager.default_cache.delete('all_categories')
-    cache_manager.default_cache.delete('categories_list')
\ No newline at end of file
+    cache_manager.default_cache.delete('categories_list')
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_fragments(sender, instance, **kwargs):
+    """Re-render the cached cards of a product and the product lists"""
+    bump_fragment_version(instance)
+    bump_fragment_version(Product)
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_product_fragments_on_related_change(sender, instance, **kwargs):
+    """
+    Cards show the image, stock of the variants and rating of the reviews,
+    bulk update() calls send no signals and use ``bump_fragment_versions``
+    """
+    bump_fragment_version(Product, instance.product_id)
+    bump_fragment_version(Product)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_fragments(sender, instance, **kwargs):
+    """Re-render the fragments of a category and the category lists (navbar)"""
+    bump_fragment_version(instance)
+    bump_fragment_version(Category)
+
+
+@receiver(post_save, sender=SiteSettings)
+@receiver(post_delete, sender=SiteSettings)
+@receiver(post_save, sender=CheckoutCustomization)
+@receiver(post_delete, sender=CheckoutCustomization)
+@receiver(post_save, sender=IntegrationSettings)
+@receiver(post_delete, sender=IntegrationSettings)
+@receiver(post_save, sender=HeroContent)
+@receiver(post_delete, sender=HeroContent)
+def invalidate_site_version(sender, **kwargs):
+    """Storefront pages render the site settings, validators include the 'site' version"""
+    bump_fragment_version('site')
@@ -0,0 +1,9 @@
+"""
+Shared test helpers.
+"""
+
+# Query count assertions must not see the database cache used without Redis
+LOCMEM_CACHES = {
+    alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'tests-{alias}'}
+    for alias in ('default', 'sessions', 'products', 'versions')
+}
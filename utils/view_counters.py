@@ -0,0 +1,430 @@
+"""
+Buffered view counters and unique visitor sketches.
+
+Product and page views are counted in a buffer instead of updating the
+database on every request, and the visitor of each view is added to a
+HyperLogLog sketch of that object and day, so unique visitors are
+estimated in at most 16 KB per object and day however large the traffic.
+``flush_view_counts`` (run periodically by the ``flush_view_counts``
+command) drains the buffer and writes in bulk:
+
+- the view deltas to ``Product.view_count`` and ``Page.view_count`` with
+  one ``UPDATE`` each (``F() + CASE``), so concurrent flushes and edits
+  never lose counts
+- the views and unique visitor estimates to the daily ``ProductAnalytics``
+  and ``PageAnalytics`` rows
+
+Buffers (``settings.VIEW_COUNTER_BACKEND``):
+
+- ``RedisViewCounter``: a Redis hash incremented with ``HINCRBY`` and
+  ``PFADD`` sketches, shared by all workers
+- ``DatabaseViewCounter``: per-process counts and sketches written every
+  few seconds to the append-only ``ViewEvent`` table and merged into the
+  ``ViewSketch`` of each object and day, for deployments without Redis
+- ``MemoryViewCounter``: an in-process counter and ``utils.hyperloglog``
+  sketches for tests, flushed inline every ``VIEW_COUNT_FLUSH_INTERVAL``
+  seconds. Views of a process that exits before its next flush are lost.
+"""
+import functools
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Greatest
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .hyperloglog import HyperLogLog
+
+KINDS = ('product', 'page')
+UPDATE_BATCH_SIZE = 500
+SKETCH_DAYS = 2  # sketches of today and yesterday are kept for late flushes
+
+
+def _field(kind, object_id, day):
+    return f'{kind}:{object_id}:{day.isoformat()}'
+
+
+def _parse_field(field):
+    kind, object_id, day = field.split(':')
+    return kind, int(object_id), date.fromisoformat(day)
+
+
+def get_visitor_id(request):
+    """Stable visitor identifier: the user, else the session, else IP and user agent"""
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    session_key = getattr(request.session, 'session_key', None)
+    if session_key:
+        return f'session:{session_key}'
+    ip_address = request.META.get('HTTP_X_FORWARDED_FOR', request.META.get('REMOTE_ADDR', '')).split(',')[0]
+    return f"anonymous:{ip_address}:{request.META.get('HTTP_USER_AGENT', '')}"
+
+
+# ----------------------------------------------------------------------
+# Buffers
+# ----------------------------------------------------------------------
+class MemoryViewCounter:
+    """Counts views in process, flushed by the requests themselves (tests only)"""
+
+    flush_inline = True
+
+    def __init__(self):
+        self.counts = Counter()
+        self.sketches = {}
+        self.changed = set()
+        self.lock = threading.Lock()
+
+    def incr(self, field, amount=1):
+        with self.lock:
+            self.counts[field] += amount
+
+    def add_visitor(self, field, visitor):
+        with self.lock:
+            sketch = self.sketches.get(field)
+            if sketch is None:
+                sketch = self.sketches[field] = HyperLogLog()
+            sketch.add(visitor)
+            self.changed.add(field)
+
+    def drain(self):
+        with self.lock:
+            counts = dict(self.counts)
+            self.counts.clear()
+        return counts
+
+    def drain_unique_counts(self):
+        """Unique visitor estimates of the sketches changed since the last call"""
+        oldest = (timezone.localdate() - timedelta(days=SKETCH_DAYS - 1)).isoformat()
+        with self.lock:
+            changed, self.changed = self.changed, set()
+            estimates = {field: self.sketches[field].count() for field in changed}
+            for field in [field for field in self.sketches if field.rsplit(':', 1)[1] < oldest]:
+                del self.sketches[field]
+        return estimates
+
+    def size(self):
+        return len(self.counts)
+
+
+class DatabaseViewCounter:
+    """
+    Counts views in process and writes them to the append-only ``ViewEvent``
+    table, one row per object and day, every ``VIEW_COUNT_BUFFER_INTERVAL``
+    seconds or once ``VIEW_COUNT_BUFFER_SIZE`` objects were viewed, so
+    requests don't write to the database for every view.
+
+    Drained rows are deleted in the same transaction that reads them, rows
+    locked by a concurrent drain are skipped. Views are written by the next
+    view after the interval; views a worker buffered since its last write
+    are lost if it exits.
+    """
+
+    flush_inline = False
+
+    def __init__(self):
+        self.counts = Counter()
+        self.sketches = {}
+        self.lock = threading.Lock()
+        self.last_write = time.monotonic()
+
+    def incr(self, field, amount=1):
+        with self.lock:
+            self.counts[field] += amount
+        self._write_if_due()
+
+    def add_visitor(self, field, visitor):
+        with self.lock:
+            sketch = self.sketches.get(field)
+            if sketch is None:
+                sketch = self.sketches[field] = HyperLogLog()
+            sketch.add(visitor)
+        self._write_if_due()
+
+    def _write_if_due(self):
+        if (
+            len(self.counts) >= getattr(settings, 'VIEW_COUNT_BUFFER_SIZE', 500)
+            or time.monotonic() - self.last_write >= getattr(settings, 'VIEW_COUNT_BUFFER_INTERVAL', 10)
+        ):
+            self.write()
+
+    def write(self):
+        """Write the views buffered in this process in one transaction"""
+        from products.models import ViewEvent
+
+        with self.lock:
+            counts, self.counts = self.counts, Counter()
+            sketches, self.sketches = self.sketches, {}
+            self.last_write = time.monotonic()
+        if not counts and not sketches:
+            return
+
+        events = []
+        for field, count in counts.items():
+            kind, object_id, day = _parse_field(field)
+            events.append(ViewEvent(kind=kind, object_id=object_id, date=day, count=count))
+        try:
+            with transaction.atomic():
+                ViewEvent.objects.bulk_create(events)
+                self._merge_sketches(sketches)
+        except Exception:
+            # Keep the views for the next write
+            with self.lock:
+                self.counts.update(counts)
+                for field, sketch in sketches.items():
+                    if field in self.sketches:
+                        sketch.merge(self.sketches[field])
+                    self.sketches[field] = sketch
+            raise
+
+    def _merge_sketches(self, sketches):
+        """Merge sketches into the stored sketch of their object and day, creating missing ones"""
+        from products.models import ViewSketch
+
+        sketches = {_parse_field(field): sketch for field, sketch in sketches.items()}
+        if not sketches:
+            return
+        ViewSketch.objects.bulk_create(
+            [ViewSketch(kind=kind, object_id=object_id, date=day, sketch=HyperLogLog().to_bytes())
+             for kind, object_id, day in sketches],
+            ignore_conflicts=True,
+        )
+        rows = ViewSketch.objects.select_for_update().filter(
+            kind__in={kind for kind, _, _ in sketches},
+            object_id__in={object_id for _, object_id, _ in sketches},
+            date__in={day for _, _, day in sketches},
+        ).order_by('pk')
+        updated = []
+        for row in rows:
+            sketch = sketches.get((row.kind, row.object_id, row.date))
+            if sketch is None:
+                continue
+            stored = HyperLogLog.from_bytes(row.sketch)
+            stored.merge(sketch)
+            row.sketch, row.changed = stored.to_bytes(), True
+            updated.append(row)
+        ViewSketch.objects.bulk_update(updated, ['sketch', 'changed'], batch_size=UPDATE_BATCH_SIZE)
+
+    def drain(self):
+        from products.models import ViewEvent
+
+        self.write()
+        counts = Counter()
+        with transaction.atomic():
+            rows = list(
+                ViewEvent.objects.select_for_update(skip_locked=True)
+                .values_list('id', 'kind', 'object_id', 'date', 'count')
+            )
+            ViewEvent.objects.filter(id__in=[row[0] for row in rows]).delete()
+        for _, kind, object_id, day, count in rows:
+            counts[_field(kind, object_id, day)] += count
+        return dict(counts)
+
+    def drain_unique_counts(self):
+        """Unique visitor estimates of the sketches changed since the last call"""
+        from products.models import ViewSketch
+
+        oldest = timezone.localdate() - timedelta(days=SKETCH_DAYS - 1)
+        with transaction.atomic():
+            ViewSketch.objects.filter(date__lt=oldest).delete()
+            rows = list(
+                ViewSketch.objects.select_for_update(skip_locked=True).filter(changed=True)
+                .values_list('id', 'kind', 'object_id', 'date', 'sketch')
+            )
+            ViewSketch.objects.filter(id__in=[row[0] for row in rows]).update(changed=False)
+        return {
+            _field(kind, object_id, day): HyperLogLog.from_bytes(sketch).count()
+            for _, kind, object_id, day, sketch in rows
+        }
+
+    def size(self):
+        from products.models import ViewEvent
+
+        return ViewEvent.objects.count() + len(self.counts)
+
+
+class RedisViewCounter:
+    """Counts views in a Redis hash shared by all workers"""
+
+    flush_inline = False
+    key = 'view_counters:pending'
+    sketch_key = 'view_counters:visitors:{field}'
+    changed_key = 'view_counters:visitors_changed'
+
+    def __init__(self):
+        from django_redis import get_redis_connection
+        self.client = get_redis_connection('default')
+
+    def incr(self, field, amount=1):
+        self.client.hincrby(self.key, field, amount)
+
+    def add_visitor(self, field, visitor):
+        sketch_key = self.sketch_key.format(field=field)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.pfadd(sketch_key, visitor)
+        pipe.expire(sketch_key, SKETCH_DAYS * 24 * 60 * 60)
+        pipe.sadd(self.changed_key, field)
+        pipe.execute()
+
+    def drain_unique_counts(self):
+        """Unique visitor estimates of the sketches changed since the last call"""
+        pipe = self.client.pipeline(transaction=True)
+        pipe.smembers(self.changed_key)
+        pipe.delete(self.changed_key)
+        changed, _ = pipe.execute()
+        fields = [field.decode() if isinstance(field, bytes) else field for field in changed]
+        if not fields:
+            return {}
+        pipe = self.client.pipeline(transaction=False)
+        for field in fields:
+            pipe.pfcount(self.sketch_key.format(field=field))
+        return dict(zip(fields, pipe.execute()))
+
+    def drain(self):
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hgetall(self.key)
+        pipe.delete(self.key)
+        counts, _ = pipe.execute()
+        return {field.decode() if isinstance(field, bytes) else field: int(count) for field, count in counts.items()}
+
+    def size(self):
+        return self.client.hlen(self.key)
+
+
+@functools.lru_cache(maxsize=None)
+def _load_counter(backend_path):
+    return import_string(backend_path)()
+
+
+def get_view_counter():
+    return _load_counter(getattr(settings, 'VIEW_COUNTER_BACKEND', 'utils.view_counters.DatabaseViewCounter'))
+
+
+@receiver(setting_changed)
+def reset_view_counter(setting, **kwargs):
+    if setting == 'VIEW_COUNTER_BACKEND':
+        _load_counter.cache_clear()
+
+
+_last_flush = time.monotonic()
+
+
+def record_view(kind, object_id, visitor=None):
+    """Count a view of a product or page by ``visitor``, written with the next flush"""
+    if kind not in KINDS:
+        raise ValueError(f"Unknown view counter kind: {kind}")
+    counter = get_view_counter()
+    field = _field(kind, object_id, timezone.localdate())
+    counter.incr(field)
+    if visitor:
+        counter.add_visitor(field, visitor)
+    if counter.flush_inline and time.monotonic() - _last_flush >= getattr(settings, 'VIEW_COUNT_FLUSH_INTERVAL', 60):
+        flush_view_counts()
+
+
+def record_product_view(request, slug, **kwargs):
+    """Count a view of the product with ``slug`` when its page was not rendered (``304 Not Modified``)"""
+    from products.models import Product
+
+    product_id = Product.objects.filter(slug=slug, is_active=True).values_list('pk', flat=True).first()
+    if product_id is not None:
+        record_view('product', product_id, get_visitor_id(request))
+
+
+# ----------------------------------------------------------------------
+# Flush
+# ----------------------------------------------------------------------
+def _add_counts(model, totals):
+    """``field = field + delta`` for many rows, one UPDATE per batch"""
+    items = list(totals.items())
+    for start in range(0, len(items), UPDATE_BATCH_SIZE):
+        batch = dict(items[start:start + UPDATE_BATCH_SIZE])
+        model.objects.filter(pk__in=batch).update(view_count=F('view_count') + Case(
+            *[When(pk=object_id, then=Value(count)) for object_id, count in batch.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        ))
+
+
+def _add_daily(model, owner_model, daily_views, daily_uniques):
+    """
+    Add views and unique visitor estimates keyed by ``(owner_id, day)`` to
+    the daily analytics rows, creating missing rows. Unique estimates cover
+    the whole day so they replace smaller stored values.
+    """
+    keys = set(daily_views) | set(daily_uniques)
+    owner_ids = set(owner_model.objects.filter(pk__in={owner_id for owner_id, _ in keys}).values_list('pk', flat=True))
+    keys = {key for key in keys if key[0] in owner_ids}
+    if not keys:
+        return
+
+    owner_field = f'{owner_model._meta.model_name}_id'
+    model.objects.bulk_create(
+        [model(**{owner_field: owner_id, 'date': day}) for owner_id, day in keys],
+        ignore_conflicts=True,
+    )
+    rows = model.objects.filter(
+        **{f'{owner_field}__in': {owner_id for owner_id, _ in keys}, 'date__in': {day for _, day in keys}}
+    ).values_list('pk', owner_field, 'date')
+    row_keys = {pk: (owner_id, day) for pk, owner_id, day in rows if (owner_id, day) in keys}
+
+    items = list(row_keys.items())
+    for start in range(0, len(items), UPDATE_BATCH_SIZE):
+        batch = dict(items[start:start + UPDATE_BATCH_SIZE])
+        model.objects.filter(pk__in=batch).update(
+            views=F('views') + Case(
+                *[When(pk=pk, then=Value(daily_views[key])) for pk, key in batch.items() if key in daily_views],
+                default=Value(0),
+                output_field=IntegerField(),
+            ),
+            unique_views=Greatest(F('unique_views'), Case(
+                *[When(pk=pk, then=Value(daily_uniques[key])) for pk, key in batch.items() if key in daily_uniques],
+                default=Value(0),
+                output_field=IntegerField(),
+            )),
+        )
+
+
+def flush_view_counts():
+    """Write the buffered view counts, returns the number of views written per kind"""
+    from pages.models import Page, PageAnalytics
+    from products.models import Product, ProductAnalytics
+
+    global _last_flush
+    _last_flush = time.monotonic()
+    counter = get_view_counter()
+    counts = counter.drain()
+    uniques = counter.drain_unique_counts()
+    if not counts and not uniques:
+        return {kind: 0 for kind in KINDS}
+
+    totals = {kind: defaultdict(int) for kind in KINDS}
+    daily_views = {kind: {} for kind in KINDS}
+    daily_uniques = {kind: {} for kind in KINDS}
+    for field, count in counts.items():
+        kind, object_id, day = _parse_field(field)
+        totals[kind][object_id] += count
+        daily_views[kind][(object_id, day)] = count
+    for field, estimate in uniques.items():
+        kind, object_id, day = _parse_field(field)
+        daily_uniques[kind][(object_id, day)] = estimate
+
+    try:
+        with transaction.atomic():
+            _add_counts(Product, totals['product'])
+            _add_counts(Page, totals['page'])
+            _add_daily(ProductAnalytics, Product, daily_views['product'], daily_uniques['product'])
+            _add_daily(PageAnalytics, Page, daily_views['page'], daily_uniques['page'])
+    except Exception:
+        # Put the drained counts back so the next flush retries them, the sketches are kept anyway
+        for field, count in counts.items():
+            counter.incr(field, count)
+        raise
+
+    return {kind: sum(totals[kind].values()) for kind in KINDS}